@@ -0,0 +1,51 @@
+"""
+Микробенчмарк выбора формата по записанным спискам форматов
+
+Сравнивает прежнюю строку формата yt-dlp (разбор селектора один раз, затем
+фильтрация на каждом видео) с ранжированием FormatSelector.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_format_selector
+"""
+import timeit
+
+import yt_dlp
+
+from benchmarks.format_samples import SAMPLES
+from src.services.format_selector import FormatSelector
+
+MAX_FILE_SIZE = 50 * 1024 * 1024
+
+OLD_FORMAT = (f'best[height<=720][filesize<{MAX_FILE_SIZE}]/best[filesize<{MAX_FILE_SIZE}]'
+              f'/mp4[filesize<{MAX_FILE_SIZE}]/best')
+
+def context(sample):
+    formats = sample['formats']
+    return {
+        'formats': formats,
+        'has_merged_format': any('none' not in (f.get('acodec'), f.get('vcodec')) for f in formats),
+        'incomplete_formats': False,
+    }
+
+def bench(name, select, number=2000):
+    contexts = [context(sample) for sample in SAMPLES.values()]
+    elapsed = timeit.timeit(lambda: [list(select(ctx)) for ctx in contexts], number=number)
+    per_call = elapsed / (number * len(contexts)) * 1e6
+    print(f"{name:<16} {per_call:8.1f} мкс/видео")
+
+def show_choices(old_selector, selector):
+    for name, sample in SAMPLES.items():
+        old = list(old_selector(context(sample)))
+        new = selector.select(sample)
+        print(f"  {name:<12} строка: {old[-1]['format_id'] if old else '-':<4} "
+              f"FormatSelector: {new[0]['format_id'] if new else '-'}")
+
+if __name__ == '__main__':
+    with yt_dlp.YoutubeDL({'quiet': True}) as ydl:
+        old_selector = ydl.build_format_selector(OLD_FORMAT)
+    selector = FormatSelector(MAX_FILE_SIZE, max_height=720)
+    
+    bench('format string', old_selector)
+    bench('FormatSelector', lambda ctx: selector.rank(ctx['formats'])[:1])
+    print("Выбранные форматы:")
+    show_choices(old_selector, selector)
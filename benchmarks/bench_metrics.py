@@ -0,0 +1,29 @@
+"""
+Микробенчмарк накладных расходов метрик на горячем пути
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_metrics
+"""
+import timeit
+
+from src.services.metrics import Counter, Histogram, timed
+
+HISTOGRAM = Histogram('bench_seconds', 'Бенчмарк', ['method'])
+COUNTER = Counter('bench_total', 'Бенчмарк', ['outcome'])
+
+def plain():
+    return 1
+
+@timed(HISTOGRAM, method='plain')
+def instrumented():
+    return 1
+
+def bench(name, func, number=100000):
+    elapsed = min(timeit.repeat(func, number=number, repeat=5))
+    print(f"{name:<24} {elapsed / number * 1e9:8.0f} нс/вызов")
+
+if __name__ == '__main__':
+    bench('вызов без метрик', plain)
+    bench('вызов с @timed', instrumented)
+    bench('Histogram.observe', lambda: HISTOGRAM.observe(0.3, method='plain'))
+    bench('Counter.inc', lambda: COUNTER.inc(outcome='completed'))
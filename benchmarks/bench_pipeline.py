@@ -0,0 +1,231 @@
+"""
+Нагрузочный бенчмарк всего пути обработки ссылки без сети
+
+BotHandlers получает поток синтетических Update с заданной частотой; yt-dlp,
+Telegram Bot API и PostgreSQL заменены локальными заглушками из benchmarks/fakes.py.
+Отчет: p50/p95/p99 задержки ответа, пропускная способность, пиковый RSS и пиковый
+объем временных файлов. С --json результат печатается одной строкой JSON для
+сравнения между коммитами.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_pipeline --requests 200 --rate 20 --sizes 1MB,5MB
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import re
+import resource
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List
+from unittest import mock
+
+import yt_dlp
+from telegram import Bot, Update
+from telegram.request import HTTPXRequest
+
+from benchmarks.fakes import FakeMediaServer, FakeTelegramServer, FakeYoutubeDL, InMemoryDatabaseService
+from src.bot.handlers import BotHandlers
+from src.services.download_pool import DownloadPool
+from src.services.file_id_cache import FileIdCache
+from src.services.media_cache import MediaCache
+from src.services.metadata_cache import MetadataCache
+from src.services.rate_limiter import RateLimiter
+from src.services.ydl_pool import YoutubeDLPool
+from src.services.youtube_downloader import YouTubeDownloader
+
+SIZE_RE = re.compile(r'(\d+(?:\.\d+)?)\s*(B|KB|MB|GB)?', re.IGNORECASE)
+SIZE_UNITS = {'B': 1, 'KB': 1024, 'MB': 1024 ** 2, 'GB': 1024 ** 3}
+
+def parse_size(value: str) -> int:
+    """Размер вида 512KB, 5MB или число байт"""
+    match = SIZE_RE.fullmatch(value.strip())
+    if not match:
+        raise argparse.ArgumentTypeError(f"Некорректный размер: {value}")
+    return int(float(match.group(1)) * SIZE_UNITS[(match.group(2) or 'B').upper()])
+
+def percentile(values: List[float], q: float) -> float:
+    """Процентиль по ближайшему рангу"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+def video_id(index: int) -> str:
+    """Синтетический ID видео из 11 символов"""
+    return f"bench{index:06d}"
+
+def make_update(bot: Bot, update_id: int, user_id: int, text: str) -> Update:
+    """Update с текстовым сообщением пользователя"""
+    return Update.de_json({
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': int(datetime.now().timestamp()),
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': {'id': user_id, 'is_bot': False, 'first_name': f"user{user_id}"},
+            'text': text,
+        },
+    }, bot)
+
+class DiskSampler:
+    """Фоновый замер объема файлов во временном каталоге"""
+    
+    def __init__(self, path: str, interval: float = 0.02):
+        self.path = path
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+    
+    def usage(self) -> int:
+        total = 0
+        for entry in os.scandir(self.path):
+            try:
+                total += entry.stat().st_size
+            except FileNotFoundError:
+                pass
+        return total
+    
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self.usage())
+            self._stop.wait(self.interval)
+    
+    def __enter__(self):
+        self._thread.start()
+        return self
+    
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+async def drive(args: argparse.Namespace, handlers: BotHandlers, bot: Bot) -> Dict[str, Any]:
+    """Подать поток запросов с частотой args.rate и дождаться всех ответов"""
+    latencies: List[float] = []
+    
+    async def one(update: Update) -> None:
+        started = time.perf_counter()
+        await handlers.handle_message(update, None)
+        latencies.append(time.perf_counter() - started)
+    
+    tasks = []
+    started = time.perf_counter()
+    for index in range(args.requests):
+        # Равномерный поток запросов: запрос index отправляется в момент index / rate
+        delay = started + index / args.rate - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        user_id = 1000 + index % args.users
+        text = f"https://youtu.be/{video_id(index % args.videos)}"
+        tasks.append(asyncio.create_task(one(make_update(bot, index + 1, user_id, text))))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+    
+    return {'latencies': latencies, 'elapsed': elapsed}
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    """Поднять заглушки, прогнать нагрузку и собрать отчет"""
+    temp_dir = tempfile.mkdtemp(prefix='bench-pipeline-')
+    media = FakeMediaServer(rate=args.download_rate).start()
+    telegram = FakeTelegramServer(upload_latency=args.upload_latency).start()
+    FakeYoutubeDL.configure(media, args.sizes, extract_latency=args.extract_latency, fail_rate=args.fail_rate)
+    db = InMemoryDatabaseService(latency=args.db_latency)
+    download_pool = DownloadPool(max_workers=args.workers, max_queue=args.requests, executor_type='thread')
+    
+    ydl_pool = YoutubeDLPool(max_idle=args.workers)
+    media_cache = MediaCache(os.path.join(temp_dir, 'media-cache'), args.media_cache) if args.media_cache else None
+    downloader = YouTubeDownloader(ydl_pool, MetadataCache(), media_cache)
+    downloader.stream_mode = args.mode == 'stream'
+    downloader.range_connections = args.range_connections
+    downloader.range_chunk_size = args.range_chunk
+    downloader.range_min_size = 0
+    handlers = BotHandlers(
+        db, downloader, download_pool,
+        file_id_cache=FileIdCache(db),
+        rate_limiter=RateLimiter(user_rate=0, user_burst=1, global_rate=0, global_burst=1)
+    )
+    
+    bot = Bot('123456:BENCH', base_url=telegram.bot_url,
+              request=HTTPXRequest(connection_pool_size=args.workers * 4 + 8, read_timeout=60, write_timeout=60))
+    try:
+        with mock.patch.object(yt_dlp, 'YoutubeDL', FakeYoutubeDL), \
+                mock.patch.object(tempfile, 'tempdir', temp_dir), \
+                DiskSampler(temp_dir) as disk:
+            async with bot:
+                result = await drive(args, handlers, bot)
+    finally:
+        download_pool.shutdown()
+        ydl_pool.close()
+        media.stop()
+        telegram.stop()
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    
+    latencies = result['latencies']
+    statuses = db.statuses()
+    return {
+        'requests': args.requests,
+        'completed': statuses.get('completed', 0),
+        'failed': statuses.get('failed', 0),
+        'elapsed_s': round(result['elapsed'], 3),
+        'throughput_rps': round(len(latencies) / result['elapsed'], 2),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 1),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 1),
+        # ru_maxrss в Linux - килобайты
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'peak_temp_disk_mb': round(disk.peak / 1024 ** 2, 1),
+        'media_requests': media.requests,
+        'media_mb': round(media.bytes_sent / 1024 ** 2, 1),
+        'uploads': telegram.calls['sendVideo'],
+        'uploaded_mb': round(telegram.bytes_received / 1024 ** 2, 1),
+        'ydl_instances': FakeYoutubeDL.instances,
+        'ydl_recycled': ydl_pool.recycled,
+    }
+
+def parse_args(argv: List[str] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Нагрузочный бенчмарк обработки ссылок без сети")
+    parser.add_argument('--requests', type=int, default=200, help="Число запросов")
+    parser.add_argument('--rate', type=float, default=20, help="Запросов в секунду")
+    parser.add_argument('--users', type=int, default=50, help="Число разных пользователей")
+    parser.add_argument('--videos', type=int, default=100,
+                        help="Число разных видео (повторы отдаются из кэша file_id)")
+    parser.add_argument('--sizes', type=lambda v: [parse_size(s) for s in v.split(',')], default=[1024 ** 2],
+                        help="Размеры видео через запятую, например 1MB,5MB")
+    parser.add_argument('--extract-latency', type=float, default=0.2, help="Время извлечения, секунды")
+    parser.add_argument('--download-rate', type=parse_size, default=parse_size('20MB'),
+                        help="Скорость скачивания одного соединения, байт/с (0 - без ограничения)")
+    parser.add_argument('--upload-latency', type=float, default=0.1, help="Время отправки в Telegram, секунды")
+    parser.add_argument('--db-latency', type=float, default=0.002, help="Время запроса к БД, секунды")
+    parser.add_argument('--fail-rate', type=float, default=0.0,
+                        help="Доля видео, у которых первая попытка скачивания падает (путь запасного формата)")
+    parser.add_argument('--workers', type=int, default=4, help="Размер пула скачиваний")
+    parser.add_argument('--media-cache', type=parse_size, default=0,
+                        help="Бюджет кэша видео на диске, например 500MB (0 - выключен)")
+    parser.add_argument('--mode', choices=('file', 'stream'), default='file', help="Режим скачивания")
+    parser.add_argument('--range-connections', type=int, default=1,
+                        help="Соединений на файл при скачивании диапазонами (1 - одним потоком)")
+    parser.add_argument('--range-chunk', type=parse_size, default=parse_size('1MB'), help="Размер диапазона")
+    parser.add_argument('--json', action='store_true', help="Вывести результат одной строкой JSON")
+    return parser.parse_args(argv)
+
+def main(argv: List[str] = None) -> Dict[str, Any]:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.ERROR)
+    report = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False))
+    else:
+        for key, value in report.items():
+            print(f"{key:<20} {value}")
+    return report
+
+if __name__ == '__main__':
+    main()
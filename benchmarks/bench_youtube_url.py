@@ -0,0 +1,38 @@
+"""
+Микробенчмарк разбора YouTube ссылок
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_youtube_url
+"""
+import re
+import timeit
+
+from src.services.youtube_url import parse_youtube_url
+
+URLS = [
+    'https://www.youtube.com/watch?v=dQw4w9WgXcQ',
+    'https://youtu.be/dQw4w9WgXcQ?si=AbCdEf123&t=7',
+    'https://m.youtube.com/watch?v=dQw4w9WgXcQ&feature=share&t=1m30s',
+    'https://www.youtube.com/shorts/dQw4w9WgXcQ',
+    'https://vimeo.com/123456',
+    'просто текст без ссылки',
+]
+
+# Прежняя проверка: поиск подстроки домена и отдельный regex для ID
+OLD_DOMAINS = ['youtube.com', 'youtu.be', 'www.youtube.com', 'm.youtube.com']
+OLD_VIDEO_ID_RE = re.compile(r'(?:[?&]v=|youtu\.be/|/shorts/|/embed/|/live/)([A-Za-z0-9_-]{11})(?![A-Za-z0-9_-])')
+
+def old_parse(url):
+    if not any(domain in url.lower() for domain in OLD_DOMAINS):
+        return None
+    match = OLD_VIDEO_ID_RE.search(url)
+    return match.group(1) if match else None
+
+def bench(name, func, number=20000):
+    elapsed = timeit.timeit(lambda: [func(url) for url in URLS], number=number)
+    per_call = elapsed / (number * len(URLS)) * 1e9
+    print(f"{name:<20} {per_call:8.0f} нс/ссылка")
+
+if __name__ == '__main__':
+    bench('substring + regex', old_parse)
+    bench('parse_youtube_url', parse_youtube_url)
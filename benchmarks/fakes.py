@@ -0,0 +1,416 @@
+"""
+Локальные заменители YouTube, Telegram Bot API и PostgreSQL для бенчмарков
+
+Все работает на 127.0.0.1 без доступа в сеть:
+- FakeMediaServer отдает сгенерированные "видео" нужного размера с ограничением
+  скорости, поддержкой Range запросов и обрывом заданного числа ответов;
+- FakeYoutubeDL подменяет yt_dlp.YoutubeDL: извлечение с заданной задержкой,
+  скачивание - настоящим HTTP запросом к FakeMediaServer;
+- FakeTelegramServer принимает запросы python-telegram-bot (getMe, sendMessage,
+  editMessageText, sendVideo) и отвечает как Bot API;
+- InMemoryDatabaseService - DatabaseService в памяти с задержкой запросов.
+"""
+import json
+import os
+import re
+import threading
+import time
+import urllib.request
+import zlib
+from collections import Counter
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+import yt_dlp
+
+from src.models.download import Download
+from src.services.youtube_url import parse_youtube_url
+
+CHUNK_SIZE = 64 * 1024
+RANGE_RE = re.compile(r'bytes=(\d*)-(\d*)')
+
+# Повторяющийся блок содержимого: генерация "видео" не нагружает процессор
+PATTERN = bytes(range(256)) * (CHUNK_SIZE // 256)
+
+class BackgroundServer:
+    """ThreadingHTTPServer в фоновом потоке"""
+    
+    def __init__(self, handler_class: type):
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), handler_class)
+        self._server.daemon_threads = True
+        self._server.owner = self
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, kwargs={'poll_interval': 0.05},
+                                        daemon=True)
+    
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+    
+    def start(self) -> 'BackgroundServer':
+        self._thread.start()
+        return self
+    
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+class QuietHandler(BaseHTTPRequestHandler):
+    """Обработчик без логирования каждого запроса"""
+    
+    protocol_version = 'HTTP/1.1'
+    
+    def log_message(self, format, *args):
+        pass
+
+class MediaHandler(QuietHandler):
+    """GET/HEAD /media/<id>.mp4?size=N[&rate=байт/с] с поддержкой Range"""
+    
+    def _parse(self):
+        parsed = urlparse(self.path)
+        params = parse_qs(parsed.query)
+        size = int(params.get('size', ['0'])[0])
+        rate = float(params.get('rate', [self.server.owner.rate])[0] or 0)
+        return size, rate
+    
+    def _range(self, size: int):
+        """Запрошенный диапазон [start, end] или None для всего файла"""
+        header = self.headers.get('Range')
+        match = RANGE_RE.fullmatch(header.strip()) if header else None
+        if not match or not (match.group(1) or match.group(2)):
+            return None
+        if match.group(1):
+            start = int(match.group(1))
+            end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+        else:
+            start, end = max(size - int(match.group(2)), 0), size - 1
+        return start, end
+    
+    def _headers(self, size: int):
+        byte_range = self._range(size)
+        if byte_range is None:
+            self.send_response(200)
+            start, end = 0, size - 1
+        else:
+            start, end = byte_range
+            if start >= size or start > end:
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{size}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return None
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+        self.send_header('Content-Type', 'video/mp4')
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Content-Length', str(end - start + 1))
+        self.end_headers()
+        return start, end
+    
+    def do_HEAD(self):
+        size, _ = self._parse()
+        self._headers(size)
+    
+    def do_GET(self):
+        owner = self.server.owner
+        size, rate = self._parse()
+        byte_range = self._headers(size)
+        if byte_range is None:
+            return
+        start, end = byte_range
+        # Обрыв соединения на середине ответа (имитация сбоя CDN)
+        drop = owner.begin_request()
+        if drop:
+            end = start + (end - start) // 2
+            self.close_connection = True
+        position = start
+        started = time.perf_counter()
+        try:
+            while position <= end:
+                length = min(CHUNK_SIZE, end - position + 1)
+                offset = position % len(PATTERN)
+                chunk = (PATTERN[offset:] + PATTERN[:offset])[:length]
+                self.wfile.write(chunk)
+                position += length
+                owner.bytes_sent += length
+                if rate:
+                    # Ограничение скорости одного соединения
+                    ahead = (position - start) / rate - (time.perf_counter() - started)
+                    if ahead > 0:
+                        time.sleep(ahead)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            owner.end_request()
+
+class FakeMediaServer(BackgroundServer):
+    """Сервер сгенерированных видеофайлов"""
+    
+    def __init__(self, rate: float = 0):
+        super().__init__(MediaHandler)
+        self.rate = rate
+        self.requests = 0
+        self.bytes_sent = 0
+        # Сколько следующих ответов оборвать на середине
+        self.drop_requests = 0
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+    
+    def begin_request(self) -> bool:
+        """Учесть запрос; True - ответ нужно оборвать"""
+        with self._lock:
+            self.requests += 1
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            if self.drop_requests:
+                self.drop_requests -= 1
+                return True
+            return False
+    
+    def end_request(self) -> None:
+        with self._lock:
+            self.active -= 1
+    
+    def url(self, video_id: str, size: int, rate: float = None) -> str:
+        query = f"size={size}" + (f"&rate={rate}" if rate is not None else '')
+        return f"{self.base_url}/media/{video_id}.mp4?{query}"
+
+def media_bytes(start: int, length: int) -> bytes:
+    """Ожидаемое содержимое файла FakeMediaServer с позиции start"""
+    result = bytearray()
+    position = start
+    while len(result) < length:
+        offset = position % len(PATTERN)
+        piece = PATTERN[offset:offset + length - len(result)]
+        result += piece
+        position += len(piece)
+    return bytes(result)
+
+class FakeYoutubeDL:
+    """
+    Заменитель yt_dlp.YoutubeDL для бенчмарков
+    
+    Размер видео выбирается из sizes по ID детерминированно, извлечение занимает
+    extract_latency секунд, скачивание идет по HTTP с FakeMediaServer.
+    Доля fail_rate первых попыток скачивания падает, чтобы нагрузить путь запасного формата.
+    """
+    
+    media_server: Optional[FakeMediaServer] = None
+    sizes: List[int] = [1024 * 1024]
+    extract_latency: float = 0.0
+    fail_rate: float = 0.0
+    duration: int = 120
+    
+    instances = 0
+    
+    def __init__(self, params: Dict[str, Any] = None):
+        self.params = dict(params or {})
+        # Как в yt-dlp: шаблон имени хранится словарем по типам файлов
+        if not isinstance(self.params.get('outtmpl', {}), dict):
+            self.params['outtmpl'] = {'default': self.params['outtmpl']}
+        type(self).instances += 1
+    
+    @classmethod
+    def configure(cls, media_server: FakeMediaServer, sizes: List[int], extract_latency: float = 0.0,
+                  fail_rate: float = 0.0) -> None:
+        cls.media_server = media_server
+        cls.sizes = sizes
+        cls.extract_latency = extract_latency
+        cls.fail_rate = fail_rate
+        cls.instances = 0
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    def close(self) -> None:
+        pass
+    
+    def extract_info(self, url: str, download: bool = True) -> Dict[str, Any]:
+        parsed = parse_youtube_url(url)
+        if parsed is None:
+            raise yt_dlp.utils.DownloadError(f"Unsupported URL: {url}")
+        if self.extract_latency:
+            time.sleep(self.extract_latency)
+        
+        video_id = parsed.video_id
+        size = self.sizes[zlib.crc32(video_id.encode()) % len(self.sizes)]
+        formats = [
+            {
+                'format_id': '17', 'ext': '3gp', 'vcodec': 'mp4v', 'acodec': 'mp4a', 'height': 144,
+                'filesize': size // 4, 'url': self.media_server.url(video_id, size // 4),
+                'protocol': 'http', 'http_headers': {},
+            },
+            {
+                'format_id': '18', 'ext': 'mp4', 'vcodec': 'avc1', 'acodec': 'mp4a', 'height': 360,
+                'filesize': size, 'url': self.media_server.url(video_id, size),
+                'protocol': 'http', 'http_headers': {},
+            },
+        ]
+        info = {
+            'id': video_id,
+            'title': f"Benchmark video {video_id}",
+            'duration': self.duration,
+            'view_count': 1000,
+            'formats': formats,
+        }
+        # Формат выбирает селектор из настроек, как yt-dlp с callable в 'format'
+        selector = self.params.get('format')
+        selected = formats[-1]
+        if callable(selector):
+            ctx = {'formats': formats, 'has_merged_format': True, 'incomplete_formats': False}
+            selected = next(iter(selector(ctx)), selected)
+        info.update(selected)
+        return info
+    
+    def _should_fail(self, info: Dict[str, Any]) -> bool:
+        """Детерминированный отказ первой попытки для доли fail_rate видео"""
+        if not self.fail_rate or info.get('format_id') != '18':
+            return False
+        return zlib.crc32(info['id'].encode() + b'fail') % 1000 < self.fail_rate * 1000
+    
+    def process_info(self, info: Dict[str, Any]) -> Dict[str, Any]:
+        if self._should_fail(info):
+            raise yt_dlp.utils.DownloadError("HTTP Error 403: Forbidden")
+        
+        path = self.params['outtmpl']['default']
+        total = info.get('filesize')
+        downloaded = 0
+        hooks = self.params.get('progress_hooks') or []
+        with urllib.request.urlopen(info['url']) as response, open(path + '.part', 'wb') as part:
+            while True:
+                chunk = response.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                part.write(chunk)
+                downloaded += len(chunk)
+                for hook in hooks:
+                    hook({'status': 'downloading', 'downloaded_bytes': downloaded, 'total_bytes': total})
+        os.replace(path + '.part', path)
+        for hook in hooks:
+            hook({'status': 'finished', 'downloaded_bytes': downloaded, 'total_bytes': total})
+        return info
+    
+    def urlopen(self, request):
+        return urllib.request.urlopen(urllib.request.Request(request.url, headers=dict(request.headers)))
+
+class TelegramHandler(QuietHandler):
+    """POST /bot<token>/<method> в стиле Bot API"""
+    
+    def do_POST(self):
+        owner = self.server.owner
+        method = self.path.rsplit('/', 1)[-1]
+        length = int(self.headers.get('Content-Length') or 0)
+        remaining = length
+        while remaining:
+            chunk = self.rfile.read(min(remaining, CHUNK_SIZE))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+        
+        with owner.lock:
+            owner.calls[method] += 1
+            owner.bytes_received += length
+            owner.message_id += 1
+            message_id = owner.message_id
+        
+        if method == 'sendVideo' and owner.upload_latency:
+            time.sleep(owner.upload_latency)
+        
+        if method == 'getMe':
+            result: Any = {'id': 1, 'is_bot': True, 'first_name': 'bench', 'username': 'bench_bot'}
+        elif method in ('sendMessage', 'editMessageText', 'sendVideo'):
+            result = {
+                'message_id': message_id,
+                'date': int(datetime.now().timestamp()),
+                'chat': {'id': 1, 'type': 'private'},
+            }
+            if method == 'sendVideo':
+                result['video'] = {
+                    'file_id': f"file-{message_id}", 'file_unique_id': f"u{message_id}",
+                    'width': 640, 'height': 360, 'duration': FakeYoutubeDL.duration,
+                }
+            else:
+                result['text'] = ''
+        else:
+            result = True
+        
+        body = json.dumps({'ok': True, 'result': result}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+class FakeTelegramServer(BackgroundServer):
+    """Заменитель Bot API, считающий вызовы и принятые байты"""
+    
+    def __init__(self, upload_latency: float = 0.0):
+        super().__init__(TelegramHandler)
+        self.upload_latency = upload_latency
+        self.lock = threading.Lock()
+        self.calls: Counter = Counter()
+        self.bytes_received = 0
+        self.message_id = 0
+    
+    @property
+    def bot_url(self) -> str:
+        return f"{self.base_url}/bot"
+
+class InMemoryDatabaseService:
+    """DatabaseService в памяти: те же методы, что использует BotHandlers, с задержкой запроса"""
+    
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.downloads: List[Download] = []
+        self.file_ids: Dict[tuple, Dict[str, Any]] = {}
+    
+    def _wait(self) -> None:
+        if self.latency:
+            time.sleep(self.latency)
+    
+    def save_download(self, download: Download) -> bool:
+        self._wait()
+        with self.lock:
+            self.downloads.append(download)
+        return True
+    
+    def save_downloads(self, downloads: List[Download]) -> bool:
+        self._wait()
+        with self.lock:
+            self.downloads.extend(downloads)
+        return True
+    
+    def get_user_stats(self, user_id: int) -> List[Dict[str, Any]]:
+        self._wait()
+        with self.lock:
+            count = sum(1 for d in self.downloads if d.user_id == user_id and d.status == 'completed')
+        return [{'platform': 'youtube', 'count': count}] if count else []
+    
+    def get_file_id(self, video_id: str, format_key: str) -> Optional[Dict[str, Any]]:
+        self._wait()
+        return self.file_ids.get((video_id, format_key))
+    
+    def save_file_id(self, video_id: str, format_key: str, file_id: str,
+                     title: str = None, file_size: int = None) -> bool:
+        self._wait()
+        self.file_ids[(video_id, format_key)] = {'file_id': file_id, 'title': title, 'file_size': file_size}
+        return True
+    
+    def delete_file_id(self, video_id: str, format_key: str) -> bool:
+        self._wait()
+        return self.file_ids.pop((video_id, format_key), None) is not None
+    
+    def pool_stats(self) -> Dict[str, Any]:
+        return {}
+    
+    def statuses(self) -> Counter:
+        with self.lock:
+            return Counter(d.status for d in self.downloads)
@@ -0,0 +1,91 @@
+"""
+Записанные списки форматов YouTube (info['formats'] yt-dlp, лишние поля убраны)
+
+Используются тестами селектора форматов и бенчмарком bench_format_selector.
+"""
+
+def storyboard(format_id, height, width):
+    return {'format_id': format_id, 'ext': 'mhtml', 'vcodec': 'none', 'acodec': 'none',
+            'height': height, 'width': width, 'protocol': 'mhtml', 'format_note': 'storyboard'}
+
+def progressive(format_id, ext, height, tbr, filesize=None, filesize_approx=None, vcodec='avc1.42001E'):
+    fmt = {'format_id': format_id, 'ext': ext, 'vcodec': vcodec, 'acodec': 'mp4a.40.2',
+           'height': height, 'width': height * 16 // 9, 'tbr': tbr, 'protocol': 'https',
+           'url': f"https://rr3---sn-abc.googlevideo.com/videoplayback?itag={format_id}&expire=1700000000"}
+    if filesize:
+        fmt['filesize'] = filesize
+    if filesize_approx:
+        fmt['filesize_approx'] = filesize_approx
+    return fmt
+
+def dash(format_id, ext, height=None, tbr=0, filesize=None, vcodec='none', acodec='none'):
+    return {'format_id': format_id, 'ext': ext, 'vcodec': vcodec, 'acodec': acodec,
+            'height': height, 'tbr': tbr, 'filesize': filesize, 'protocol': 'https',
+            'url': f"https://rr3---sn-abc.googlevideo.com/videoplayback?itag={format_id}&expire=1700000000"}
+
+# Клип 3:32 (android + web, dash и hls пропущены): 22 помещается в 50 MB
+MUSIC_VIDEO = {
+    'duration': 212,
+    'formats': [
+        storyboard('sb2', 45, 80),
+        storyboard('sb1', 90, 160),
+        storyboard('sb0', 180, 320),
+        progressive('17', '3gp', 144, 79.5, filesize=2112020, vcodec='mp4v.20.3'),
+        progressive('18', 'mp4', 360, 503.7, filesize=13356722),
+        progressive('22', 'mp4', 720, 1290.4, filesize_approx=34196000),
+    ],
+}
+
+# Лекция 9:40: 720p ≈ 106 MB не помещается, размер 22 известен только по битрейту
+LECTURE = {
+    'duration': 580,
+    'formats': [
+        storyboard('sb0', 180, 320),
+        progressive('18', 'mp4', 360, 389.1),
+        progressive('22', 'mp4', 720, 1465.0),
+    ],
+}
+
+# Полный список web-клиента: видео и звук отдельными дорожками и один прогрессивный формат
+WEB_DASH = {
+    'duration': 253,
+    'formats': [
+        storyboard('sb0', 180, 320),
+        dash('139', 'm4a', tbr=48.8, filesize=1544830, acodec='mp4a.40.5'),
+        dash('140', 'm4a', tbr=129.5, filesize=4097522, acodec='mp4a.40.2'),
+        dash('251', 'webm', tbr=135.2, filesize=4280911, acodec='opus'),
+        progressive('18', 'mp4', 360, 590.2, filesize=18664902),
+        dash('134', 'mp4', 360, 246.4, filesize=7791213, vcodec='avc1.4d401e'),
+        dash('136', 'mp4', 720, 1133.6, filesize=35846129, vcodec='avc1.4d401f'),
+        dash('247', 'webm', 720, 1210.2, filesize=38270551, vcodec='vp9'),
+        dash('137', 'mp4', 1080, 4248.3, filesize=134341532, vcodec='avc1.640028'),
+    ],
+}
+
+# Короткое видео без mp4 720p: webm выше по высоте, но mp4 360p без перепаковки
+SHORT_WEBM = {
+    'duration': 45,
+    'formats': [
+        progressive('18', 'mp4', 360, 612.0, filesize=3442500),
+        progressive('43', 'webm', 360, 700.0, filesize=3937500, vcodec='vp8.0'),
+        progressive('45', 'webm', 720, 2100.0, filesize=11812500, vcodec='vp8.0'),
+        progressive('37', 'mp4', 1080, 4400.0, filesize=24750000),
+    ],
+}
+
+# Длинный стрим в записи: ни один формат не помещается
+TOO_LARGE = {
+    'duration': 3540,
+    'formats': [
+        progressive('18', 'mp4', 360, 480.0, filesize=212400000),
+        progressive('22', 'mp4', 720, 1500.0, filesize_approx=663750000),
+    ],
+}
+
+SAMPLES = {
+    'music_video': MUSIC_VIDEO,
+    'lecture': LECTURE,
+    'web_dash': WEB_DASH,
+    'short_webm': SHORT_WEBM,
+    'too_large': TOO_LARGE,
+}
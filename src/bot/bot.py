@@ -1,10 +1,23 @@
+import asyncio
 import logging
+import signal
 from typing import Optional
 
+from telegram import Update
 from telegram.ext import Application
 
 from .handlers import BotHandlers
+from .webhook import WebhookServer
+from ..services.async_database import AsyncDatabaseService
 from ..services.database import DatabaseService
+from ..services.download_pool import DownloadPool
+from ..services.download_writer import BufferedDownloadWriter
+from ..services.job_queue import JobQueue
+from ..services.metadata_cache import MetadataCache
+from ..services.metrics import MetricsServer, bind_db_pool, bind_download_pools, bind_job_queue
+from ..services.partition_keeper import PartitionKeeper
+from ..services.platforms import build_registry
+from ..services.rate_limiter import PostgresRateLimiter, RateLimiter
 from ..services.youtube_downloader import YouTubeDownloader
 from ..config.settings import settings
 
@@ -17,8 +30,41 @@ class YouTubeBotApp:
         self.token = token or settings.BOT_TOKEN
         self.application: Optional[Application] = None
         self.db_service = DatabaseService()
-        self.youtube_service = YouTubeDownloader()
-        self.handlers = BotHandlers(self.db_service, self.youtube_service)
+        # Кэш метаданных видео: в памяти или еще и общий для реплик в PostgreSQL
+        metadata_cache = MetadataCache(
+            self.db_service if settings.METADATA_CACHE_BACKEND == 'postgres' else None
+        )
+        # У каждой платформы свой загрузчик (профиль yt-dlp, лимиты) и свой пул скачиваний
+        self.platforms = build_registry()
+        self.services = {
+            platform.name: YouTubeDownloader(metadata_cache=metadata_cache, platform=platform)
+            for platform in self.platforms
+        }
+        self.download_pools = {platform.name: DownloadPool(max_workers=platform.workers) for platform in self.platforms}
+        # Загрузчик и пул первой платформы реестра - для кода, которому нужен один
+        self.youtube_service = next(iter(self.services.values()))
+        self.download_pool = next(iter(self.download_pools.values()))
+        # Обработчики работают с асинхронным адаптером, если он выбран в настройках
+        self.handler_db_service = (
+            AsyncDatabaseService(self.db_service) if settings.DB_BACKEND == 'async' else self.db_service
+        )
+        # Записи о скачиваниях пишутся пачками в фоне, если включен write-behind
+        self.download_writer = BufferedDownloadWriter(self.db_service) if settings.DB_WRITE_BEHIND else None
+        # В режиме очереди бот только принимает запросы, скачивают воркеры
+        self.job_queue = JobQueue(self.db_service) if settings.DOWNLOAD_DISPATCH == 'queue' else None
+        # Лимиты запросов: в памяти процесса или общие для реплик в PostgreSQL
+        self.rate_limiter = (
+            PostgresRateLimiter(self.db_service) if settings.RATE_LIMIT_BACKEND == 'postgres' else RateLimiter()
+        )
+        self.metrics_server: Optional[MetricsServer] = None
+        # Секции downloads на следующие месяцы досоздаются в фоне
+        self.partition_keeper = PartitionKeeper(self.db_service)
+        self.handlers = BotHandlers(
+            self.handler_db_service, self.youtube_service, self.download_pool,
+            download_writer=self.download_writer, job_queue=self.job_queue,
+            rate_limiter=self.rate_limiter, platforms=self.platforms,
+            services=self.services, download_pools=self.download_pools
+        )
     
     def setup(self):
         """Настройка приложения"""
@@ -27,6 +73,13 @@ class YouTubeBotApp:
         
         # Инициализируем базу данных
         self.db_service.init_database()
+        self.partition_keeper.start()
+        if self.download_writer:
+            self.download_writer.start()
+        # Экземпляры YoutubeDL создаются заранее; в пуле процессов у каждого процесса свой пул
+        if settings.DOWNLOAD_DISPATCH == 'local' and settings.DOWNLOAD_EXECUTOR == 'thread':
+            for service in self.services.values():
+                service.warm_up()
         
         # Создаем приложение
         self.application = Application.builder().token(self.token).build()
@@ -36,19 +89,92 @@ class YouTubeBotApp:
         
         logger.info("Приложение настроено успешно")
     
-    def run(self):
+    def start_metrics(self, port: int) -> None:
+        """Отдавать метрики пулов, очереди и этапов обработки на /metrics"""
+        bind_download_pools(self.download_pools)
+        bind_db_pool(self.db_service)
+        if self.job_queue:
+            bind_job_queue(self.job_queue)
+        self.metrics_server = MetricsServer(settings.METRICS_LISTEN, port)
+        try:
+            self.metrics_server.start()
+        except OSError as e:
+            # Занятый порт метрик не должен останавливать бота
+            logger.error(f"Не удалось запустить сервер метрик на порту {port}: {e}")
+            self.metrics_server = None
+    
+    def run(self, register_webhook: bool = True, metrics_port: int = None):
         """Запуск бота"""
         if not self.application:
             raise RuntimeError("Приложение не настроено. Вызовите setup() сначала")
         
+        metrics_port = settings.METRICS_PORT if metrics_port is None else metrics_port
+        if metrics_port:
+            self.start_metrics(metrics_port)
+        
         logger.info("🚀 YouTube Bot запущен!")
-        logger.info("📺 Поддерживает только YouTube видео")
+        logger.info(f"📺 Платформы: {', '.join(platform.title for platform in self.platforms)}")
+        
+        if settings.BOT_MODE == 'webhook':
+            asyncio.run(self.run_webhook(register_webhook))
+        else:
+            self.application.run_polling()
+    
+    def create_webhook_server(self) -> WebhookServer:
+        """HTTP сервер для приема обновлений по webhook"""
+        return WebhookServer(
+            self.application,
+            listen=settings.WEBHOOK_LISTEN,
+            port=settings.WEBHOOK_PORT,
+            url_path=settings.WEBHOOK_PATH,
+            secret_token=settings.WEBHOOK_SECRET,
+            reuse_port=settings.WEBHOOK_WORKERS > 1
+        )
+    
+    async def run_webhook(self, register_webhook: bool = True, stop_event: asyncio.Event = None):
+        """Прием обновлений через webhook до сигнала остановки"""
+        stop_event = stop_event or asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop_event.set)
+            except (NotImplementedError, RuntimeError):
+                pass
         
-        self.application.run_polling()
+        server = self.create_webhook_server()
+        async with self.application:
+            if register_webhook:
+                # Адрес webhook регистрирует один воркер, остальные только слушают порт
+                await self.application.bot.set_webhook(
+                    url=settings.WEBHOOK_URL.rstrip('/') + server.url_path,
+                    secret_token=settings.WEBHOOK_SECRET,
+                    max_connections=settings.WEBHOOK_MAX_CONNECTIONS,
+                    allowed_updates=Update.ALL_TYPES
+                )
+            await self.application.start()
+            await server.start()
+            try:
+                await stop_event.wait()
+            finally:
+                await server.stop()
+                await self.application.stop()
     
     def stop(self):
         """Остановка бота"""
-        if self.application:
+        if self.application and self.application.running:
             self.application.stop()
             logger.info("Бот остановлен")
+        if self.metrics_server:
+            self.metrics_server.stop()
+            self.metrics_server = None
+        for download_pool in self.download_pools.values():
+            download_pool.shutdown()
+        for service in self.services.values():
+            service.ydl_pool.close()
+        if self.download_writer:
+            self.download_writer.close()
+        self.partition_keeper.close()
+        if self.handler_db_service is not self.db_service:
+            self.handler_db_service.close()
+        self.db_service.close()
 
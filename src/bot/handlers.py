@@ -1,24 +1,107 @@
 import logging
+import math
 import os
-from typing import TYPE_CHECKING
+from typing import IO, TYPE_CHECKING, Awaitable, Callable, Dict, Union
 
-from telegram import Update
+from telegram import Message, Update
+from telegram.error import BadRequest, TelegramError
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes
 
 if TYPE_CHECKING:
+    from ..services.async_database import AsyncDatabaseService
     from ..services.database import DatabaseService
     from ..services.youtube_downloader import YouTubeDownloader
 
 from ..models.download import Download
+from ..models.job import DownloadJob
+from ..services.async_database import resolve
+from ..services.download_pool import DownloadPool, DownloadQueueFull
+from ..services.download_writer import BufferedDownloadWriter
+from ..services.file_id_cache import FileIdCache
+from ..services.job_queue import JobQueue
+from ..services.metrics import REQUESTS, UPLOAD_SECONDS
+from ..services.platforms import Platform, PlatformRegistry, build_registry
+from ..services.rate_limiter import RateLimiter
+from ..services.single_flight import SingleFlight
+from ..services.tracing import current_span, span, start_trace
+from ..services.youtube_downloader import ERROR_LIMIT, LIMIT_DURATION
 
 logger = logging.getLogger(__name__)
 
+def build_caption(info: dict, platform_title: str) -> str:
+    """Подпись к отправляемому видео"""
+    caption = f"🎥 {(info.get('title') or 'Unknown')[:100]}\n📺 {platform_title}"
+    if info.get('file_size'):
+        caption += f"\n📊 {info['file_size'] // (1024*1024)} MB"
+    if info.get('view_count'):
+        caption += f"\n👀 {info['view_count']:,} просмотров"
+    return caption
+
+def request_outcome(success: bool, info: dict) -> str:
+    """Исход запроса для метрики bot_requests_total"""
+    if success:
+        return 'completed'
+    if info.get('error_kind') == ERROR_LIMIT:
+        return 'too_long' if info.get('limit') == LIMIT_DURATION else 'too_big'
+    return 'failed'
+
+def record_outcome(outcome: str) -> None:
+    """Учесть исход запроса в метриках и в корневом span'е трассировки"""
+    REQUESTS.inc(outcome=outcome)
+    current_span().set('outcome', outcome)
+
+async def upload_video(send_video: Callable[..., Awaitable[Message]],
+                       result: Union[str, IO[bytes]], caption: str) -> Message:
+    """Отправить скачанное видео (путь к временному файлу или буфер) и освободить его"""
+    if isinstance(result, str):
+        try:
+            with open(result, 'rb') as video_file, UPLOAD_SECONDS.time(), span('telegram.upload'):
+                return await send_video(
+                    video_file,
+                    caption=caption,
+                    supports_streaming=True
+                )
+        finally:
+            # Удаляем временный файл, даже если отправка не удалась
+            os.unlink(result)
+    
+    # Буфер потокового режима: временного файла нет. У SpooledTemporaryFile в памяти
+    # name = None, а python-telegram-bot берет имя из obj.name, поэтому отправляем
+    # содержимое (библиотека все равно читает файл в память целиком)
+    try:
+        with UPLOAD_SECONDS.time(), span('telegram.upload', mode='stream'):
+            return await send_video(
+                result.read(),
+                filename='video.mp4',
+                caption=caption,
+                supports_streaming=True
+            )
+    finally:
+        result.close()
+
 class BotHandlers:
     """Обработчики команд и сообщений бота"""
     
-    def __init__(self, db_service: 'DatabaseService', youtube_service: 'YouTubeDownloader'):
+    def __init__(self, db_service: Union['DatabaseService', 'AsyncDatabaseService'],
+                 youtube_service: 'YouTubeDownloader', download_pool: DownloadPool = None,
+                 file_id_cache: FileIdCache = None, download_writer: BufferedDownloadWriter = None,
+                 job_queue: JobQueue = None, rate_limiter: RateLimiter = None,
+                 platforms: PlatformRegistry = None, services: Dict[str, 'YouTubeDownloader'] = None,
+                 download_pools: Dict[str, DownloadPool] = None):
         self.db_service = db_service
+        self.download_writer = download_writer
+        # Режим диспетчера: скачивание выполняют отдельные воркеры из очереди заданий
+        self.job_queue = job_queue
+        self.platforms = platforms or build_registry()
+        # Загрузчик и пул скачиваний у каждой платформы свои, чтобы медленная платформа
+        # не занимала слоты остальных; youtube_service и download_pool - для платформ без своих
         self.youtube_service = youtube_service
+        self.download_pool = download_pool or DownloadPool()
+        self.services = services or {}
+        self.download_pools = download_pools or {}
+        self.file_id_cache = file_id_cache or FileIdCache(db_service)
+        self.in_flight = SingleFlight()
+        self.rate_limiter = rate_limiter or RateLimiter()
     
     def register_handlers(self, application: Application):
         """Регистрация обработчиков"""
@@ -27,16 +110,32 @@ class BotHandlers:
         application.add_handler(CommandHandler("stats", self.stats_command))
         application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, self.handle_message))
     
+    def service_for(self, platform: Platform) -> 'YouTubeDownloader':
+        """Загрузчик платформы"""
+        return self.services.get(platform.name, self.youtube_service)
+    
+    def pool_for(self, platform: Platform) -> DownloadPool:
+        """Пул скачиваний платформы"""
+        return self.download_pools.get(platform.name, self.download_pool)
+    
+    def platform_titles(self) -> str:
+        """Названия поддерживаемых платформ через запятую"""
+        return ', '.join(platform.title for platform in self.platforms)
+    
+    def link_examples(self) -> str:
+        """Примеры ссылок всех поддерживаемых платформ"""
+        return '\n'.join(f"• {example}" for platform in self.platforms for example in platform.examples)
+    
     async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Команда /start"""
-        welcome_message = """
-🎥 Привет! Я бот для скачивания YouTube видео!
+        welcome_message = f"""
+🎥 Привет! Я бот для скачивания видео!
 
-📺 Поддерживается только YouTube
+📺 Поддерживается: {self.platform_titles()}
 ⏱️ Максимальная длительность: 10 минут
 📊 Максимальный размер: 50MB
 
-Просто отправь ссылку на YouTube видео!
+Просто отправь ссылку на видео!
 
 Команды:
 /start - начать работу
@@ -47,111 +146,283 @@ class BotHandlers:
     
     async def help_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Команда /help"""
-        help_text = """
+        help_text = f"""
 🔧 Как пользоваться ботом:
 
-1. Отправь ссылку на YouTube видео
+1. Отправь ссылку на видео
 2. Дождись обработки (обычно 10-30 секунд)
 3. Получи видео прямо в чат!
 
 ⚠️ Ограничения:
-• Только YouTube видео
+• Только {self.platform_titles()}
 • Максимум 10 минут длительностью
 • Размер файла до 50MB
 • Только публичные видео
 
 Примеры ссылок:
-• https://www.youtube.com/watch?v=...
-• https://youtu.be/...
-• https://youtube.com/shorts/...
+{self.link_examples()}
 """
         await update.message.reply_text(help_text)
     
     async def stats_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Команда /stats - статистика пользователя"""
         user_id = update.effective_user.id
-        stats = self.db_service.get_user_stats(user_id)
+        stats = await resolve(self.db_service.get_user_stats(user_id))
         
         if stats:
-            total = sum(stat['count'] for stat in stats)
-            stats_text = f"📊 Ваша статистика скачиваний:\n\n📺 YouTube: {total} видео"
+            # Счетчики по платформам, самая частая первой
+            lines = [f"📺 {self.platforms.title(stat['platform'])}: {stat['count']} видео"
+                     for stat in sorted(stats, key=lambda stat: -stat['count'])]
+            stats_text = "📊 Ваша статистика скачиваний:\n\n" + "\n".join(lines)
+            if len(lines) > 1:
+                stats_text += f"\n\nВсего: {sum(stat['count'] for stat in stats)} видео"
         else:
             stats_text = "У вас пока нет скачанных видео."
         
         await update.message.reply_text(stats_text)
     
-    def is_youtube_url(self, url: str) -> bool:
-        """Проверка, является ли ссылка YouTube URL"""
-        youtube_domains = ['youtube.com', 'youtu.be', 'www.youtube.com', 'm.youtube.com']
-        return any(domain in url.lower() for domain in youtube_domains)
+    async def save_download(self, download: Download) -> None:
+        """Сохранить запись о скачивании (через буфер, если он включен)"""
+        if self.download_writer:
+            self.download_writer.save_download(download)
+        else:
+            await resolve(self.db_service.save_download(download))
+    
+    def is_supported_url(self, url: str) -> bool:
+        """Проверка, является ли ссылка ссылкой на видео поддерживаемой платформы"""
+        return self.platforms.route(url) is not None
+    
+    def build_caption(self, info: dict, platform: Platform) -> str:
+        """Подпись к отправляемому видео"""
+        return build_caption(info, platform.title)
+    
+    async def send_cached_video(self, update: Update, platform: Platform, video_id: str, format_key: str) -> bool:
+        """Повторная отправка видео по сохраненному file_id без скачивания"""
+        cached = await self.file_id_cache.get(video_id, format_key)
+        if not cached:
+            return False
+        
+        try:
+            await update.message.reply_video(
+                cached['file_id'],
+                caption=self.build_caption(cached, platform),
+                supports_streaming=True
+            )
+            return True
+        except BadRequest as e:
+            logger.warning(f"Telegram отклонил file_id для {video_id}: {e}")
+            await self.file_id_cache.invalidate(video_id, format_key)
+            return False
+        except TelegramError as e:
+            # Сетевой сбой не значит, что file_id устарел: просто скачиваем заново
+            logger.warning(f"Не удалось отправить {video_id} по file_id: {e}")
+            return False
+    
+    async def download_and_send(self, update: Update, platform: Platform, url: str, video_id: str, format_key: str):
+        """
+        Скачать видео в пуле воркеров платформы и отправить его в чат
+        
+        Returns:
+            Tuple[bool, str, Dict]: (success, file_id_or_error, info)
+        """
+        # Скачиваем видео в пуле воркеров, не блокируя event loop
+        download_pool = self.pool_for(platform)
+        with span('download_pool.run', platform=platform.name, queued=download_pool.queue_position()):
+            success, result, info = await download_pool.run(self.service_for(platform).download, url)
+        if not success:
+            return False, result, info
+        
+        # Отправляем видео
+        message = await upload_video(update.message.reply_video, result, self.build_caption(info, platform))
+        
+        file_id = message.video.file_id if message and message.video else None
+        
+        # Запоминаем file_id для повторных запросов; запасной формат хуже профиля
+        # format_key, поэтому его не кэшируем
+        if video_id and file_id and not info.get('fallback'):
+            await self.file_id_cache.put(
+                video_id, format_key, file_id,
+                info.get('title'), info.get('file_size')
+            )
+        
+        return True, file_id, info
+    
+    async def dispatch_download(self, update: Update, text: str, platform: Platform, video_id: str) -> None:
+        """Поставить задание на скачивание в очередь для воркеров"""
+        status_message = await update.message.reply_text(
+            "🕒 Запрос принят в очередь.\n"
+            "Видео придет, как только его скачает свободный воркер."
+        )
+        try:
+            await self.job_queue.submit(DownloadJob(
+                user_id=update.effective_user.id,
+                chat_id=update.effective_chat.id,
+                video_url=text,
+                video_id=video_id,
+                platform=platform.name,
+                message_id=update.message.message_id,
+                status_message_id=status_message.message_id
+            ))
+        except Exception as e:
+            logger.error(f"Ошибка постановки задания в очередь: {e}")
+            await status_message.edit_text(
+                "❌ Произошла ошибка при обработке видео.\n"
+                "Попробуйте еще раз или используйте другую ссылку."
+            )
     
     async def handle_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Обработка сообщений с YouTube ссылками"""
+        """Обработка сообщений со ссылками на видео"""
+        # Каждое сообщение - отдельный запрос со своим ID и трассировкой этапов
+        with start_trace('handle_message', user_id=update.effective_user.id):
+            await self.process_message(update)
+    
+    async def process_message(self, update: Update):
+        """Проверка ссылки, лимитов и кэша, затем скачивание и отправка видео"""
         user_id = update.effective_user.id
         text = update.message.text.strip()
         
-        # Проверяем, что это YouTube ссылка
-        if not self.is_youtube_url(text):
+        # Определяем платформу по ссылке и получаем канонический ID видео
+        media = self.platforms.route(text)
+        if media is None:
             await update.message.reply_text(
                 "❌ Неподдерживаемая ссылка!\n\n"
-                "Отправьте ссылку на YouTube видео:\n"
-                "• https://www.youtube.com/watch?v=...\n"
-                "• https://youtu.be/...\n"
-                "• https://youtube.com/shorts/..."
+                f"Отправьте ссылку на видео ({self.platform_titles()}):\n"
+                + self.link_examples()
+            )
+            return
+        
+        # Лимит частоты: отказ сразу, до обращения к кэшу и пулу скачиваний
+        decision = await self.rate_limiter.acquire(user_id)
+        if not decision.allowed:
+            record_outcome('rate_limited')
+            logger.info(f"Запрос пользователя {user_id} отклонен лимитом {decision.scope}")
+            await update.message.reply_text(
+                "⏳ Слишком много запросов.\n"
+                f"Попробуйте снова через {math.ceil(decision.retry_after)} с."
+            )
+            return
+        
+        platform = media.platform
+        video_id = media.video_id
+        url = platform.canonical_url(video_id)
+        download_pool = self.pool_for(platform)
+        current_span().set('video_id', video_id)
+        current_span().set('platform', platform.name)
+        
+        # Популярные видео отправляем по file_id без повторного скачивания
+        format_key = self.service_for(platform).format_key
+        with span('file_id_cache.send'):
+            sent_cached = await self.send_cached_video(update, platform, video_id, format_key)
+        if sent_cached:
+            record_outcome('cached')
+            download = Download(
+                user_id=user_id,
+                platform=platform.name,
+                video_url=text,
+                video_id=video_id,
+                status='completed'
+            )
+            await self.save_download(download)
+            return
+        
+        # В режиме диспетчера только ставим задание в очередь
+        if self.job_queue:
+            record_outcome('queued')
+            await self.dispatch_download(update, text, platform, video_id)
+            return
+        
+        # Повторный запрос того же видео присоединяется к уже идущему скачиванию
+        flight_key = (video_id, format_key)
+        attached = self.in_flight.is_running(flight_key)
+        
+        # Проверяем загрузку пула скачиваний
+        if not attached and download_pool.is_full():
+            record_outcome('busy')
+            await update.message.reply_text(
+                "🚦 Сейчас слишком много запросов.\n"
+                "Попробуйте еще раз через пару минут."
             )
             return
         
         # Отправляем сообщение о начале обработки
-        status_message = await update.message.reply_text(
-            "⏳ Обрабатываю YouTube видео...\n"
-            "Это может занять до 30 секунд ⏱️"
-        )
+        position = 0 if attached else download_pool.queue_position()
+        if position:
+            status_message = await update.message.reply_text(
+                f"🕒 Запрос в очереди, позиция {position}.\n"
+                "Видео начнет скачиваться, как только освободится место."
+            )
+        else:
+            status_message = await update.message.reply_text(
+                f"⏳ Обрабатываю видео {platform.title}...\n"
+                "Это может занять до 30 секунд ⏱️"
+            )
+        
+        # Скачивание, к которому присоединился запрос, могло завершиться, пока отправлялось
+        # сообщение о статусе: его file_id уже в кэше, второй раз видео не скачиваем
+        if attached and not self.in_flight.is_running(flight_key) and \
+                await self.send_cached_video(update, platform, video_id, format_key):
+            record_outcome('cached')
+            download = Download(
+                user_id=user_id,
+                platform=platform.name,
+                video_url=text,
+                video_id=video_id,
+                status='completed'
+            )
+            await self.save_download(download)
+            await status_message.edit_text("✅ Видео отправлено!")
+            return
         
         try:
-            # Скачиваем видео
-            success, result, info = self.youtube_service.download(text)
-            
-            if success:
-                # Отправляем видео
-                with open(result, 'rb') as video_file:
-                    caption = f"🎥 {info['title'][:100]}\n📺 YouTube"
-                    if info.get('file_size'):
-                        caption += f"\n📊 {info['file_size'] // (1024*1024)} MB"
-                    if info.get('view_count'):
-                        caption += f"\n👀 {info['view_count']:,} просмотров"
-                    
+            (success, result, info), shared = await self.in_flight.do(
+                flight_key,
+                lambda: self.download_and_send(update, platform, url, video_id, format_key)
+            )
+            if success and shared:
+                # Видео уже загружено в Telegram другим запросом - отправляем по file_id
+                if not result:
+                    raise RuntimeError("Telegram не вернул file_id для общего скачивания")
+                with span('telegram.send_file_id'):
                     await update.message.reply_video(
-                        video_file,
-                        caption=caption,
+                        result,
+                        caption=self.build_caption(info, platform),
                         supports_streaming=True
                     )
-                
-                # Удаляем временный файл
-                os.unlink(result)
-                
+            
+            record_outcome(request_outcome(success, info))
+            if success:
                 # Сохраняем в БД
                 download = Download(
                     user_id=user_id,
-                    platform='youtube',
+                    platform=platform.name,
                     video_url=text,
+                    video_id=video_id,
                     status='completed'
                 )
-                self.db_service.save_download(download)
+                await self.save_download(download)
                 
                 await status_message.edit_text("✅ Видео отправлено!")
             else:
                 # Сохраняем ошибку в БД
                 download = Download(
                     user_id=user_id,
-                    platform='youtube',
+                    platform=platform.name,
                     video_url=text,
+                    video_id=video_id,
                     status='failed'
                 )
-                self.db_service.save_download(download)
+                await self.save_download(download)
                 
                 await status_message.edit_text(f"❌ Ошибка: {result}")
-                
+        
+        except DownloadQueueFull:
+            record_outcome('busy')
+            await status_message.edit_text(
+                "🚦 Сейчас слишком много запросов.\n"
+                "Попробуйте еще раз через пару минут."
+            )
         except Exception as e:
+            record_outcome('failed')
             logger.error(f"Ошибка обработки сообщения: {e}")
             await status_message.edit_text(
                 "❌ Произошла ошибка при обработке видео.\n"
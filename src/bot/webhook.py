@@ -0,0 +1,155 @@
+import asyncio
+import hmac
+import json
+import logging
+from contextlib import suppress
+from typing import Dict, Optional, Set
+
+from telegram import Update
+from telegram.ext import Application
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = 'x-telegram-bot-api-secret-token'
+
+STATUS_TEXT = {
+    200: 'OK',
+    400: 'Bad Request',
+    403: 'Forbidden',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    413: 'Payload Too Large',
+}
+
+class WebhookServer:
+    """
+    Встроенный HTTP сервер на asyncio для приема обновлений Telegram
+    
+    Проверяет путь и секретный токен из заголовка X-Telegram-Bot-Api-Secret-Token,
+    разбирает Update и кладет его в update_queue приложения, сразу отвечая 200.
+    С reuse_port несколько процессов-воркеров слушают один порт, и ядро
+    распределяет соединения между ними.
+    """
+    
+    def __init__(self, application: Application, listen: str, port: int, url_path: str,
+                 secret_token: str, reuse_port: bool = False, max_body_size: int = 1024 * 1024,
+                 idle_timeout: float = 60.0):
+        self.application = application
+        self.listen = listen
+        self.port = port
+        self.url_path = '/' + url_path.strip('/')
+        self.secret_token = secret_token.encode()
+        self.reuse_port = reuse_port
+        self.max_body_size = max_body_size
+        self.idle_timeout = idle_timeout
+        
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._clients: Set[asyncio.Task] = set()
+        self.received = 0
+        self.rejected = 0
+    
+    async def start(self) -> None:
+        """Начать прием соединений"""
+        self._server = await asyncio.start_server(
+            self._handle_client, self.listen, self.port, reuse_port=self.reuse_port
+        )
+        # При port=0 узнаем порт, выбранный системой
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"Webhook сервер слушает {self.listen}:{self.port}{self.url_path}")
+    
+    async def stop(self) -> None:
+        """Прекратить прием соединений"""
+        if self._server is not None:
+            self._server.close()
+            # Открытые keep-alive соединения закрываем сами
+            for task in list(self._clients):
+                task.cancel()
+            await asyncio.gather(*self._clients, return_exceptions=True)
+            await self._server.wait_closed()
+            self._server = None
+            logger.info("Webhook сервер остановлен")
+    
+    async def handle_request(self, method: str, target: str, headers: Dict[str, str], body: bytes) -> int:
+        """Обработать запрос и вернуть HTTP статус"""
+        if target.split('?', 1)[0] != self.url_path:
+            return 404
+        if method != 'POST':
+            return 405
+        if not hmac.compare_digest(headers.get(SECRET_HEADER, '').encode(), self.secret_token):
+            self.rejected += 1
+            logger.warning("Webhook запрос с неверным секретным токеном отклонен")
+            return 403
+        
+        try:
+            payload = json.loads(body)
+            if not isinstance(payload, dict):
+                raise ValueError("ожидался JSON объект")
+            update = Update.de_json(payload, self.application.bot)
+        except (ValueError, TypeError, KeyError, AttributeError) as e:
+            logger.warning(f"Некорректное обновление в webhook: {e}")
+            return 400
+        if update is None:
+            return 400
+        
+        await self.application.update_queue.put(update)
+        self.received += 1
+        return 200
+    
+    async def _respond(self, writer: asyncio.StreamWriter, status: int, keep_alive: bool) -> None:
+        """Отправить пустой ответ с заданным статусом"""
+        writer.write(
+            f"HTTP/1.1 {status} {STATUS_TEXT[status]}\r\n"
+            f"Content-Length: 0\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1')
+        )
+        await writer.drain()
+    
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Обслуживание одного соединения (Telegram держит соединения открытыми)"""
+        task = asyncio.current_task()
+        self._clients.add(task)
+        try:
+            while True:
+                try:
+                    request_line = await asyncio.wait_for(reader.readline(), self.idle_timeout)
+                except asyncio.TimeoutError:
+                    break
+                if not request_line:
+                    break
+                
+                parts = request_line.decode('latin-1').split()
+                if len(parts) != 3:
+                    await self._respond(writer, 400, keep_alive=False)
+                    break
+                method, target, version = parts
+                
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                
+                try:
+                    length = int(headers.get('content-length') or 0)
+                except ValueError:
+                    await self._respond(writer, 400, keep_alive=False)
+                    break
+                if length < 0 or length > self.max_body_size:
+                    await self._respond(writer, 413, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+                
+                status = await self.handle_request(method, target, headers, body)
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                await self._respond(writer, status, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._clients.discard(task)
+            writer.close()
+            with suppress(Exception):
+                await writer.wait_closed()
@@ -0,0 +1,218 @@
+import asyncio
+import functools
+import logging
+import os
+import socket
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from telegram import Bot
+from telegram.error import BadRequest, TelegramError
+
+from .handlers import build_caption, record_outcome, request_outcome, upload_video
+from ..models.download import Download
+from ..models.job import DownloadJob
+from ..services.async_database import resolve
+from ..services.download_pool import DownloadPool
+from ..services.file_id_cache import FileIdCache
+from ..services.job_queue import JobQueue
+from ..services.platforms import Platform, PlatformRegistry, build_registry
+from ..services.tracing import in_context, span, start_trace
+from ..services.youtube_downloader import PERMANENT_ERRORS
+from ..config.settings import settings
+
+if TYPE_CHECKING:
+    from ..services.database import DatabaseService
+    from ..services.youtube_downloader import YouTubeDownloader
+
+logger = logging.getLogger(__name__)
+
+class DownloadWorker:
+    """Воркер очереди заданий: скачивает видео и отправляет его пользователю"""
+    
+    def __init__(self, bot: Bot, job_queue: JobQueue, db_service: 'DatabaseService',
+                 youtube_service: 'YouTubeDownloader', download_pool: DownloadPool = None,
+                 file_id_cache: FileIdCache = None, concurrency: int = None, poll_interval: float = None,
+                 platforms: PlatformRegistry = None, services: Dict[str, 'YouTubeDownloader'] = None,
+                 download_pools: Dict[str, DownloadPool] = None):
+        self.bot = bot
+        self.job_queue = job_queue
+        self.db_service = db_service
+        self.platforms = platforms or build_registry()
+        # Как в обработчиках: youtube_service и download_pool - для платформ без своих
+        self.youtube_service = youtube_service
+        self.download_pool = download_pool or DownloadPool()
+        self.services = services or {}
+        self.download_pools = download_pools or {}
+        self.file_id_cache = file_id_cache or FileIdCache(db_service)
+        self.concurrency = concurrency or self.download_pool.max_workers
+        self.poll_interval = poll_interval or settings.JOB_POLL_INTERVAL
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    
+    def service_for(self, platform: Platform) -> 'YouTubeDownloader':
+        """Загрузчик платформы"""
+        return self.services.get(platform.name, self.youtube_service)
+    
+    def pool_for(self, platform: Platform) -> DownloadPool:
+        """Пул скачиваний платформы"""
+        return self.download_pools.get(platform.name, self.download_pool)
+    
+    async def _call(self, func, *args):
+        """Блокирующий вызов очереди заданий вне event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, in_context(func, *args))
+    
+    async def notify(self, job: DownloadJob, text: str) -> None:
+        """Обновить статусное сообщение пользователя"""
+        if not job.status_message_id:
+            return
+        try:
+            await self.bot.edit_message_text(text, chat_id=job.chat_id, message_id=job.status_message_id)
+        except Exception as e:
+            logger.warning(f"Не удалось обновить статус задания {job.id}: {e}")
+    
+    async def save_result(self, job: DownloadJob, status: str) -> None:
+        """Сохранить запись о скачивании"""
+        await resolve(self.db_service.save_download(Download(
+            user_id=job.user_id,
+            platform=job.platform,
+            video_url=job.video_url,
+            video_id=job.video_id,
+            status=status
+        )))
+    
+    async def send_cached(self, job: DownloadJob, platform: Platform, format_key: str) -> bool:
+        """Отправить видео по сохраненному file_id, если его уже загружали"""
+        cached = await self.file_id_cache.get(job.video_id, format_key)
+        if not cached:
+            return False
+        try:
+            await self.bot.send_video(
+                job.chat_id, cached['file_id'],
+                caption=build_caption(cached, platform.title),
+                supports_streaming=True,
+                reply_to_message_id=job.message_id
+            )
+            return True
+        except BadRequest as e:
+            logger.warning(f"Telegram отклонил file_id для {job.video_id}: {e}")
+            await self.file_id_cache.invalidate(job.video_id, format_key)
+            return False
+        except TelegramError as e:
+            # Сетевой сбой не значит, что file_id устарел: просто скачиваем заново
+            logger.warning(f"Не удалось отправить {job.video_id} по file_id: {e}")
+            return False
+    
+    async def process(self, job: DownloadJob) -> None:
+        """Выполнить задание в отдельной трассировке"""
+        with start_trace('download_job', job_id=job.id, video_id=job.video_id, platform=job.platform,
+                         attempt=job.attempts):
+            await self.execute(job)
+    
+    async def execute(self, job: DownloadJob) -> None:
+        """
+        Выполнить задание
+        
+        Ошибки лимитов и недоступные видео подтверждаются как failed сразу,
+        остальные ошибки (сеть, Telegram) возвращают задание в очередь с паузой.
+        """
+        if job.attempts > job.max_attempts:
+            # Воркер, бравший задание последним, пропал - попытки исчерпаны
+            await self._call(self.job_queue.ack, job, 'failed', "превышен таймаут выполнения")
+            record_outcome('failed')
+            await self.save_result(job, 'failed')
+            await self.notify(job, "❌ Ошибка: не удалось скачать видео, попробуйте позже")
+            return
+        
+        platform = self.platforms.get(job.platform)
+        if platform is None:
+            # Платформу отключили, пока задание ждало в очереди
+            await self._call(self.job_queue.ack, job, 'failed', f"платформа {job.platform} отключена")
+            record_outcome('failed')
+            await self.save_result(job, 'failed')
+            await self.notify(job, "❌ Ошибка: ссылки этой платформы больше не поддерживаются")
+            return
+        
+        service = self.service_for(platform)
+        download_pool = self.pool_for(platform)
+        format_key = service.format_key
+        outcome = 'cached'
+        try:
+            with span('file_id_cache.send'):
+                sent_cached = await self.send_cached(job, platform, format_key)
+            if not sent_cached:
+                outcome = 'completed'
+                with span('download_pool.run', platform=platform.name, queued=download_pool.queue_position()):
+                    success, result, info = await download_pool.run(
+                        service.download, platform.canonical_url(job.video_id)
+                    )
+                if not success:
+                    if info.get('error_kind') in PERMANENT_ERRORS:
+                        await self._call(self.job_queue.ack, job, 'failed', result)
+                        record_outcome(request_outcome(False, info))
+                        await self.save_result(job, 'failed')
+                        await self.notify(job, f"❌ Ошибка: {result}")
+                        return
+                    raise RuntimeError(result)
+                
+                message = await upload_video(
+                    functools.partial(self.bot.send_video, job.chat_id, reply_to_message_id=job.message_id),
+                    result, build_caption(info, platform.title)
+                )
+                # Запасной формат хуже профиля format_key - его не кэшируем
+                if message and message.video and not info.get('fallback'):
+                    await self.file_id_cache.put(
+                        job.video_id, format_key, message.video.file_id,
+                        info.get('title'), info.get('file_size')
+                    )
+        except Exception as e:
+            logger.error(f"Ошибка выполнения задания {job.id}: {e}")
+            if not await self._call(self.job_queue.retry, job, str(e)):
+                record_outcome('failed')
+                await self.save_result(job, 'failed')
+                await self.notify(job, "❌ Произошла ошибка при обработке видео.\nПопробуйте еще раз позже.")
+            return
+        
+        record_outcome(outcome)
+        if not await self._call(self.job_queue.ack, job):
+            logger.warning(f"Задание {job.id} уже забрал другой воркер (истек таймаут видимости)")
+        await self.save_result(job, 'completed')
+        await self.notify(job, "✅ Видео отправлено!")
+    
+    def slots(self) -> List[Optional[str]]:
+        """
+        Платформы слотов обработки
+        
+        С пулами по платформам у каждой платформы столько слотов, сколько воркеров
+        в ее пуле, и слот берет задания только своей платформы: очередь медленной
+        платформы не занимает слоты остальных. Без них - concurrency слотов на все задания.
+        """
+        if not self.download_pools:
+            return [None] * self.concurrency
+        return [name for name, pool in self.download_pools.items() for _ in range(pool.max_workers)]
+    
+    async def run_loop(self, stop_event: asyncio.Event, platform: str = None) -> None:
+        """Цикл одного слота: брать задания (платформы platform, если задана), пока не придет сигнал остановки"""
+        while not stop_event.is_set():
+            try:
+                job = await self._call(self.job_queue.claim, self.worker_id, platform)
+            except Exception as e:
+                logger.error(f"Ошибка получения задания: {e}")
+                job = None
+            
+            if job is None:
+                # Очередь пуста - ждем интервал опроса или остановку
+                try:
+                    await asyncio.wait_for(stop_event.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            
+            await self.process(job)
+    
+    async def run(self, stop_event: Optional[asyncio.Event] = None) -> None:
+        """Запуск параллельных слотов обработки"""
+        stop_event = stop_event or asyncio.Event()
+        slots = self.slots()
+        logger.info(f"Воркер {self.worker_id} запущен, слотов: {len(slots)}")
+        await asyncio.gather(*(self.run_loop(stop_event, platform) for platform in slots))
+        logger.info(f"Воркер {self.worker_id} остановлен")
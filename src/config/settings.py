@@ -1,4 +1,5 @@
 import os
+import re
 from typing import Dict, Any
 from dotenv import load_dotenv
 
@@ -12,6 +13,16 @@ class Settings:
     # Telegram Bot
     BOT_TOKEN: str = os.getenv("BOT_TOKEN", "")
     
+    # Режим получения обновлений: polling - long polling, webhook - встроенный HTTP сервер
+    BOT_MODE: str = os.getenv('BOT_MODE', 'polling')
+    WEBHOOK_URL: str = os.getenv('WEBHOOK_URL', '')  # публичный адрес, например https://bot.example.com
+    WEBHOOK_PATH: str = os.getenv('WEBHOOK_PATH', '/telegram')
+    WEBHOOK_LISTEN: str = os.getenv('WEBHOOK_LISTEN', '0.0.0.0')
+    WEBHOOK_PORT: int = int(os.getenv('WEBHOOK_PORT', 8443))
+    WEBHOOK_SECRET: str = os.getenv('WEBHOOK_SECRET', '')
+    WEBHOOK_WORKERS: int = int(os.getenv('WEBHOOK_WORKERS', 1))  # процессы на одном порту (SO_REUSEPORT)
+    WEBHOOK_MAX_CONNECTIONS: int = int(os.getenv('WEBHOOK_MAX_CONNECTIONS', 40))
+    
     # Database - используем переменные окружения Docker
     DB_CONFIG: Dict[str, Any] = {
         'host': os.getenv('DB_HOST', 'localhost'),
@@ -21,9 +32,120 @@ class Settings:
         'port': int(os.getenv('DB_PORT', 5432))
     }
     
+    # Бэкенд БД для обработчиков: sync - прямые вызовы, async - через пул потоков
+    DB_BACKEND: str = os.getenv('DB_BACKEND', 'sync')
+    
+    # Пул соединений с БД
+    DB_POOL_MIN_SIZE: int = int(os.getenv('DB_POOL_MIN_SIZE', 1))
+    DB_POOL_MAX_SIZE: int = int(os.getenv('DB_POOL_MAX_SIZE', 10))
+    DB_POOL_TIMEOUT: float = float(os.getenv('DB_POOL_TIMEOUT', 10))  # ожидание соединения, секунды
+    DB_POOL_CHECK_INTERVAL: float = float(os.getenv('DB_POOL_CHECK_INTERVAL', 30))  # проверка простаивающих, секунды
+    
+    # Секционирование downloads по месяцам
+    DB_PARTITION_MONTHS_AHEAD: int = int(os.getenv('DB_PARTITION_MONTHS_AHEAD', 3))
+    DB_RETENTION_MONTHS: int = int(os.getenv('DB_RETENTION_MONTHS', 60))  # 5 лет
+    # Как часто бот и воркер досоздают секции, секунды (0 - только при старте и через manage.py)
+    DB_PARTITION_CHECK_INTERVAL: float = float(os.getenv('DB_PARTITION_CHECK_INTERVAL', 86400))
+    
+    # Кэш статистики /stats
+    STATS_CACHE_SIZE: int = int(os.getenv('STATS_CACHE_SIZE', 10000))
+    STATS_CACHE_TTL: int = int(os.getenv('STATS_CACHE_TTL', 60))  # секунды
+    
+    # Отложенная пакетная запись скачиваний (write-behind)
+    DB_WRITE_BEHIND: bool = os.getenv('DB_WRITE_BEHIND', 'false').lower() in ('1', 'true', 'yes')
+    DB_WRITE_BATCH_SIZE: int = int(os.getenv('DB_WRITE_BATCH_SIZE', 100))
+    DB_WRITE_FLUSH_INTERVAL: float = float(os.getenv('DB_WRITE_FLUSH_INTERVAL', 2))  # секунды
+    DB_WRITE_BUFFER_SIZE: int = int(os.getenv('DB_WRITE_BUFFER_SIZE', 10000))
+    
+    # Платформы, ссылки на которые принимает бот (через запятую): youtube, vimeo, tiktok.
+    # У каждой платформы свой пул скачиваний; его размер и лимит длительности задаются
+    # по платформам, например PLATFORM_WORKERS=youtube=4,tiktok=2 (не указанные
+    # платформы получают DOWNLOAD_WORKERS и MAX_DURATION)
+    PLATFORMS: str = os.getenv('PLATFORMS', 'youtube')
+    PLATFORM_WORKERS: str = os.getenv('PLATFORM_WORKERS', '')
+    PLATFORM_MAX_DURATION: str = os.getenv('PLATFORM_MAX_DURATION', '')  # секунды
+    
     # YouTube Download
     MAX_DURATION: int = 600  # 10 minutes
     MAX_FILE_SIZE: int = 50 * 1024 * 1024  # 50MB
+    MAX_HEIGHT: int = 720  # предпочтительная высота кадра при выборе формата
+    
+    # Режим скачивания: file - через временный файл, stream - в буфер, который
+    # сбрасывается на диск только сверх STREAM_SPOOL_SIZE
+    DOWNLOAD_MODE: str = os.getenv('DOWNLOAD_MODE', 'file')  # file | stream
+    STREAM_SPOOL_SIZE: int = int(os.getenv('STREAM_SPOOL_SIZE', 8 * 1024 * 1024))
+    
+    # Скачивание одиночного HTTP формата параллельными Range запросами:
+    # соединений на файл (1 - выключено), размер куска, минимальный размер файла
+    # и повторы оборвавшегося куска
+    RANGE_CONNECTIONS: int = int(os.getenv('RANGE_CONNECTIONS', 1))
+    RANGE_CHUNK_SIZE: int = int(os.getenv('RANGE_CHUNK_SIZE', 4 * 1024 * 1024))
+    RANGE_MIN_SIZE: int = int(os.getenv('RANGE_MIN_SIZE', 8 * 1024 * 1024))
+    RANGE_RETRIES: int = int(os.getenv('RANGE_RETRIES', 3))
+    
+    # Пул скачиваний
+    DOWNLOAD_EXECUTOR: str = os.getenv('DOWNLOAD_EXECUTOR', 'thread')  # thread | process
+    DOWNLOAD_WORKERS: int = int(os.getenv('DOWNLOAD_WORKERS', 4))
+    DOWNLOAD_QUEUE_SIZE: int = int(os.getenv('DOWNLOAD_QUEUE_SIZE', 20))
+    
+    # Пул экземпляров YoutubeDL: свободных экземпляров на профиль и запросов до пересоздания.
+    # YTDL_CACHE_DIR - общий кэш плеера и подписей (пусто - ~/.cache/yt-dlp)
+    YTDL_POOL_SIZE: int = int(os.getenv('YTDL_POOL_SIZE', os.getenv('DOWNLOAD_WORKERS', 4)))
+    YTDL_MAX_USES: int = int(os.getenv('YTDL_MAX_USES', 50))
+    YTDL_CACHE_DIR: str = os.getenv('YTDL_CACHE_DIR', '')
+    
+    # Разделение на диспетчер и воркеры: local - бот скачивает сам,
+    # queue - бот ставит задания в download_jobs, скачивает src/worker.py
+    DOWNLOAD_DISPATCH: str = os.getenv('DOWNLOAD_DISPATCH', 'local')
+    JOB_MAX_ATTEMPTS: int = int(os.getenv('JOB_MAX_ATTEMPTS', 3))
+    JOB_VISIBILITY_TIMEOUT: float = float(os.getenv('JOB_VISIBILITY_TIMEOUT', 900))  # секунды
+    JOB_RETRY_BACKOFF: float = float(os.getenv('JOB_RETRY_BACKOFF', 10))  # первая пауза повтора, секунды
+    JOB_RETRY_BACKOFF_MAX: float = float(os.getenv('JOB_RETRY_BACKOFF_MAX', 600))
+    JOB_POLL_INTERVAL: float = float(os.getenv('JOB_POLL_INTERVAL', 1))  # опрос пустой очереди, секунды
+    
+    # Ограничение частоты запросов (корзины токенов): 0 в *_PER_MINUTE отключает лимит.
+    # memory - счетчики в процессе, postgres - общие для всех реплик (таблица rate_limit_buckets)
+    RATE_LIMIT_BACKEND: str = os.getenv('RATE_LIMIT_BACKEND', 'memory')
+    RATE_LIMIT_USER_PER_MINUTE: float = float(os.getenv('RATE_LIMIT_USER_PER_MINUTE', 6))
+    RATE_LIMIT_USER_BURST: int = int(os.getenv('RATE_LIMIT_USER_BURST', 3))
+    RATE_LIMIT_GLOBAL_PER_MINUTE: float = float(os.getenv('RATE_LIMIT_GLOBAL_PER_MINUTE', 120))
+    RATE_LIMIT_GLOBAL_BURST: int = int(os.getenv('RATE_LIMIT_GLOBAL_BURST', 30))
+    RATE_LIMIT_CACHE_SIZE: int = int(os.getenv('RATE_LIMIT_CACHE_SIZE', 100000))  # корзин пользователей в памяти
+    
+    # Метрики в формате Prometheus на http://METRICS_LISTEN:METRICS_PORT/metrics (0 - выключено).
+    # Воркеры webhook занимают порты METRICS_PORT + номер воркера, воркер очереди
+    # src/worker.py - свой WORKER_METRICS_PORT, чтобы не занять порт бота на том же хосте
+    METRICS_LISTEN: str = os.getenv('METRICS_LISTEN', '127.0.0.1')
+    METRICS_PORT: int = int(os.getenv('METRICS_PORT', 0))
+    WORKER_METRICS_PORT: int = int(os.getenv('WORKER_METRICS_PORT', 0))
+    
+    # Трассировка запросов: span'ы этапов доли TRACE_SAMPLE_RATE запросов дописываются
+    # в TRACE_FILE в формате JSON lines (пустой путь - выключено)
+    TRACE_FILE: str = os.getenv('TRACE_FILE', '')
+    TRACE_SAMPLE_RATE: float = float(os.getenv('TRACE_SAMPLE_RATE', 0.01))
+    
+    # Кэш метаданных extract_info по ID видео: свежие METADATA_CACHE_TTL секунд, затем до
+    # METADATA_CACHE_STALE_TTL отвечают на проверки лимитов и обновляются в фоне.
+    # memory - кэш в процессе, postgres - еще и общая таблица video_metadata_cache
+    METADATA_CACHE_BACKEND: str = os.getenv('METADATA_CACHE_BACKEND', 'memory')
+    METADATA_CACHE_SIZE: int = int(os.getenv('METADATA_CACHE_SIZE', 2000))
+    METADATA_CACHE_TTL: float = float(os.getenv('METADATA_CACHE_TTL', 1800))  # секунды
+    METADATA_CACHE_STALE_TTL: float = float(os.getenv('METADATA_CACHE_STALE_TTL', 86400))
+    METADATA_URL_MARGIN: float = float(os.getenv('METADATA_URL_MARGIN', 900))  # запас до expire ссылок, секунды
+    
+    # Кэш скачанных видео на диске по ID видео и формата (пустой каталог - выключен).
+    # Для отдачи без копирования каталог должен быть на той же файловой системе, что и TMPDIR
+    MEDIA_CACHE_DIR: str = os.getenv('MEDIA_CACHE_DIR', '')
+    MEDIA_CACHE_MAX_BYTES: int = int(os.getenv('MEDIA_CACHE_MAX_BYTES', 2 * 1024 * 1024 * 1024))
+    
+    # Недокачанные файлы с состоянием для возобновления (пустой каталог - выключено)
+    # и срок, после которого заброшенный файл удаляется
+    PARTIAL_DIR: str = os.getenv('PARTIAL_DIR', '')
+    PARTIAL_TTL: float = float(os.getenv('PARTIAL_TTL', 6 * 3600))  # секунды
+    
+    # Кэш Telegram file_id
+    FILE_ID_CACHE_SIZE: int = int(os.getenv('FILE_ID_CACHE_SIZE', 10000))
+    FILE_ID_CACHE_TTL: int = int(os.getenv('FILE_ID_CACHE_TTL', 3600))  # секунды
     
     @classmethod
     def validate(cls) -> None:
@@ -32,6 +154,44 @@ class Settings:
             raise ValueError("BOT_TOKEN is required")
         if not cls.DB_CONFIG['password']:
             raise ValueError("Database password is required")
+        if cls.BOT_MODE not in ('polling', 'webhook'):
+            raise ValueError("BOT_MODE must be 'polling' or 'webhook'")
+        if cls.BOT_MODE == 'webhook':
+            if not cls.WEBHOOK_URL:
+                raise ValueError("WEBHOOK_URL is required in webhook mode")
+            if not re.fullmatch(r'[A-Za-z0-9_-]{1,256}', cls.WEBHOOK_SECRET):
+                raise ValueError("WEBHOOK_SECRET must be 1-256 characters A-Z, a-z, 0-9, _ or -")
+        if cls.DB_BACKEND not in ('sync', 'async'):
+            raise ValueError("DB_BACKEND must be 'sync' or 'async'")
+        if cls.DOWNLOAD_EXECUTOR not in ('thread', 'process'):
+            raise ValueError("DOWNLOAD_EXECUTOR must be 'thread' or 'process'")
+        if cls.DOWNLOAD_DISPATCH not in ('local', 'queue'):
+            raise ValueError("DOWNLOAD_DISPATCH must be 'local' or 'queue'")
+        if cls.YTDL_POOL_SIZE < 1 or cls.YTDL_MAX_USES < 1:
+            raise ValueError("YTDL_POOL_SIZE and YTDL_MAX_USES must be at least 1")
+        if cls.METADATA_CACHE_BACKEND not in ('memory', 'postgres'):
+            raise ValueError("METADATA_CACHE_BACKEND must be 'memory' or 'postgres'")
+        if cls.PARTIAL_DIR and cls.PARTIAL_TTL <= 0:
+            raise ValueError("PARTIAL_TTL must be positive")
+        if cls.MEDIA_CACHE_DIR and cls.MEDIA_CACHE_MAX_BYTES < 1:
+            raise ValueError("MEDIA_CACHE_MAX_BYTES must be positive")
+        if cls.RATE_LIMIT_BACKEND not in ('memory', 'postgres'):
+            raise ValueError("RATE_LIMIT_BACKEND must be 'memory' or 'postgres'")
+        if cls.RATE_LIMIT_USER_BURST < 1 or cls.RATE_LIMIT_GLOBAL_BURST < 1:
+            raise ValueError("RATE_LIMIT_USER_BURST and RATE_LIMIT_GLOBAL_BURST must be at least 1")
+        if not 0 <= cls.TRACE_SAMPLE_RATE <= 1:
+            raise ValueError("TRACE_SAMPLE_RATE must be between 0 and 1")
+        if cls.RANGE_CONNECTIONS < 1 or cls.RANGE_CHUNK_SIZE < 1 or cls.RANGE_RETRIES < 0:
+            raise ValueError("RANGE_CONNECTIONS and RANGE_CHUNK_SIZE must be positive, RANGE_RETRIES non-negative")
+        if not re.fullmatch(r'[a-z]+(?:,[a-z]+)*', cls.PLATFORMS):
+            raise ValueError("PLATFORMS must be a comma-separated list of platform names")
+        for value in (cls.PLATFORM_WORKERS, cls.PLATFORM_MAX_DURATION):
+            if value and not re.fullmatch(r'[a-z]+=[1-9]\d*(?:,[a-z]+=[1-9]\d*)*', value):
+                raise ValueError("PLATFORM_WORKERS and PLATFORM_MAX_DURATION must be name=positive integer pairs")
+        if cls.DOWNLOAD_MODE not in ('file', 'stream'):
+            raise ValueError("DOWNLOAD_MODE must be 'file' or 'stream'")
+        if cls.DOWNLOAD_MODE == 'stream' and cls.DOWNLOAD_EXECUTOR == 'process':
+            raise ValueError("DOWNLOAD_MODE=stream requires DOWNLOAD_EXECUTOR=thread")
 
 settings = Settings()
 
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 
 import logging
+import multiprocessing
 import sys
 from pathlib import Path
 
@@ -8,6 +9,7 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from src.bot.bot import YouTubeBotApp
+from src.config.settings import settings
 
 # Настройка логирования
 logging.basicConfig(
@@ -19,8 +21,42 @@ logging.basicConfig(
     ]
 )
 
+def run_worker(index: int):
+    """Воркер webhook: отдельный процесс со своим приложением на общем порту"""
+    app = YouTubeBotApp()
+    try:
+        app.setup()
+        # У каждого воркера свои метрики на своем порту
+        metrics_port = settings.METRICS_PORT + index if settings.METRICS_PORT else 0
+        app.run(register_webhook=index == 0, metrics_port=metrics_port)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        app.stop()
+
+def run_workers(count: int):
+    """Запуск нескольких воркеров webhook за одним адресом"""
+    workers = [
+        multiprocessing.Process(target=run_worker, args=(index,), name=f'bot-worker-{index}')
+        for index in range(count)
+    ]
+    for worker in workers:
+        worker.start()
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        logging.info("Получен сигнал остановки")
+        for worker in workers:
+            worker.join()
+
 def main():
     """Главная функция запуска бота"""
+    if settings.BOT_MODE == 'webhook' and settings.WEBHOOK_WORKERS > 1:
+        run_workers(settings.WEBHOOK_WORKERS)
+        return
+    
+    app = None
     try:
         app = YouTubeBotApp()
         app.setup()
@@ -30,6 +66,9 @@ def main():
     except Exception as e:
         logging.error(f"Критическая ошибка: {e}")
         sys.exit(1)
+    finally:
+        if app:
+            app.stop()
 
 if __name__ == '__main__':
     main()
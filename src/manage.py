@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+# Добавляем корневую папку в путь
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.services.database import DatabaseService
+from src.services.job_queue import JobQueue
+
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+
+def rebuild_stats(db_service: DatabaseService, args: argparse.Namespace) -> None:
+    """Пересчет предагрегированной статистики пользователей"""
+    rows = db_service.rebuild_user_stats()
+    print(f"user_stats пересчитана: {rows} строк")
+
+def ensure_partitions(db_service: DatabaseService, args: argparse.Namespace) -> None:
+    """Создание месячных секций downloads заранее"""
+    created = db_service.ensure_partitions(args.months_ahead)
+    print(f"Создано секций: {created}")
+
+def migrate_partitions(db_service: DatabaseService, args: argparse.Namespace) -> None:
+    """Перевод существующей таблицы downloads на секционирование"""
+    if db_service.migrate_to_partitioned(drop_legacy=args.drop_legacy):
+        print("downloads переведена на месячные секции")
+    else:
+        print("Миграция не требуется")
+
+def apply_retention(db_service: DatabaseService, args: argparse.Namespace) -> None:
+    """Отсоединение секций старше срока хранения"""
+    detached = db_service.detach_old_partitions(args.keep_months, drop=args.drop)
+    print(f"Обработано секций: {len(detached)}")
+
+def purge_jobs(db_service: DatabaseService, args: argparse.Namespace) -> None:
+    """Удаление завершенных заданий очереди скачиваний"""
+    deleted = JobQueue(db_service).purge(args.older_than_days)
+    print(f"Удалено заданий: {deleted}")
+
+def purge_metadata(db_service: DatabaseService, args: argparse.Namespace) -> None:
+    """Удаление устаревших записей кэша метаданных видео"""
+    deleted = db_service.purge_video_metadata()
+    print(f"Удалено записей метаданных: {deleted}")
+
+def build_parser() -> argparse.ArgumentParser:
+    """Описание команд обслуживания"""
+    parser = argparse.ArgumentParser(description="Команды обслуживания YouTube бота")
+    commands = parser.add_subparsers(dest='command', required=True)
+    
+    rebuild = commands.add_parser('rebuild-stats', help="пересчитать user_stats по таблице downloads")
+    rebuild.set_defaults(func=rebuild_stats)
+    
+    partitions = commands.add_parser('partitions', help="создать секции downloads на будущие месяцы")
+    partitions.add_argument('--months-ahead', type=int, default=None)
+    partitions.set_defaults(func=ensure_partitions)
+    
+    migrate = commands.add_parser('migrate-partitions', help="перевести downloads на месячные секции")
+    migrate.add_argument('--drop-legacy', action='store_true', help="удалить downloads_legacy после переноса")
+    migrate.set_defaults(func=migrate_partitions)
+    
+    retention = commands.add_parser('retention', help="отсоединить секции старше срока хранения")
+    retention.add_argument('--keep-months', type=int, default=None)
+    retention.add_argument('--drop', action='store_true', help="удалить секции вместо переноса в архив")
+    retention.set_defaults(func=apply_retention)
+    
+    purge = commands.add_parser('purge-jobs', help="удалить завершенные задания download_jobs")
+    purge.add_argument('--older-than-days', type=int, default=7)
+    purge.set_defaults(func=purge_jobs)
+    
+    metadata = commands.add_parser('purge-metadata', help="удалить устаревшие записи video_metadata_cache")
+    metadata.set_defaults(func=purge_metadata)
+    
+    return parser
+
+def main(argv=None):
+    """Точка входа команд обслуживания"""
+    args = build_parser().parse_args(argv)
+    db_service = DatabaseService()
+    try:
+        args.func(db_service, args)
+    except Exception as e:
+        logging.error(f"Ошибка выполнения команды {args.command}: {e}")
+        sys.exit(1)
+    finally:
+        db_service.close()
+
+if __name__ == '__main__':
+    main()
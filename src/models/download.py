@@ -9,6 +9,7 @@ class Download:
     platform: str
     video_url: str
     status: str = 'completed'
+    video_id: Optional[str] = None
     id: Optional[int] = None
     created_at: Optional[datetime] = None
     
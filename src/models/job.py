@@ -0,0 +1,20 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+@dataclass
+class DownloadJob:
+    """Задание на скачивание в очереди download_jobs"""
+    user_id: int
+    chat_id: int
+    video_url: str
+    video_id: Optional[str] = None
+    platform: str = 'youtube'
+    message_id: Optional[int] = None
+    status_message_id: Optional[int] = None
+    status: str = 'queued'
+    attempts: int = 0
+    max_attempts: int = 3
+    last_error: Optional[str] = None
+    id: Optional[int] = None
+    created_at: Optional[datetime] = None
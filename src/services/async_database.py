@@ -0,0 +1,80 @@
+import asyncio
+import inspect
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from .database import DatabaseService
+from .tracing import in_context
+from ..config.settings import settings
+from ..models.download import Download
+
+logger = logging.getLogger(__name__)
+
+async def resolve(result: Any) -> Any:
+    """Дождаться результата, если метод сервиса асинхронный"""
+    if inspect.isawaitable(result):
+        return await result
+    return result
+
+class AsyncDatabaseService:
+    """Асинхронный сервис БД: методы DatabaseService выполняются в отдельном пуле потоков"""
+    
+    def __init__(self, db_service: DatabaseService = None, max_workers: int = None):
+        self.db_service = db_service or DatabaseService()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or settings.DB_POOL_MAX_SIZE,
+            thread_name_prefix='db'
+        )
+    
+    @property
+    def db_config(self) -> Dict[str, Any]:
+        return self.db_service.db_config
+    
+    async def _run(self, func, *args) -> Any:
+        """Выполнить блокирующий вызов вне event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, in_context(func, *args))
+    
+    async def save_download(self, download: Download) -> bool:
+        """Сохранение информации о скачивании"""
+        return await self._run(self.db_service.save_download, download)
+    
+    async def save_downloads(self, downloads: List[Download]) -> bool:
+        """Пакетное сохранение записей о скачиваниях"""
+        return await self._run(self.db_service.save_downloads, downloads)
+    
+    async def get_user_stats(self, user_id: int) -> List[Dict[str, Any]]:
+        """Получение статистики пользователя"""
+        return await self._run(self.db_service.get_user_stats, user_id)
+    
+    async def rebuild_user_stats(self) -> int:
+        """Пересчет таблицы user_stats по таблице downloads"""
+        return await self._run(self.db_service.rebuild_user_stats)
+    
+    async def get_file_id(self, video_id: str, format_key: str) -> Optional[Dict[str, Any]]:
+        """Получение сохраненного Telegram file_id для видео"""
+        return await self._run(self.db_service.get_file_id, video_id, format_key)
+    
+    async def save_file_id(self, video_id: str, format_key: str, file_id: str,
+                           title: str = None, file_size: int = None) -> bool:
+        """Сохранение Telegram file_id после первой отправки"""
+        return await self._run(self.db_service.save_file_id, video_id, format_key, file_id, title, file_size)
+    
+    async def delete_file_id(self, video_id: str, format_key: str) -> bool:
+        """Удаление устаревшего Telegram file_id"""
+        return await self._run(self.db_service.delete_file_id, video_id, format_key)
+    
+    async def init_database(self) -> None:
+        """Инициализация базы данных"""
+        await self._run(self.db_service.init_database)
+    
+    def pool_stats(self) -> Dict[str, Any]:
+        """Статистика пула соединений для мониторинга"""
+        return self.db_service.pool_stats()
+    
+    def close(self) -> None:
+        """Остановка пула потоков и закрытие соединений"""
+        self._executor.shutdown(wait=True)
+        self.db_service.close()
+        logger.info("Асинхронный сервис БД остановлен")
@@ -1,98 +1,587 @@
 import logging
+import re
+from datetime import date
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values
 from typing import List, Optional, Dict, Any
 from contextlib import contextmanager
 
+from .cache import TTLCache
+from .db_pool import ConnectionPool
+from .metrics import timed_query
 from ..config.settings import settings
 from ..models.download import Download
 
 logger = logging.getLogger(__name__)
 
+# Схема БД. downloads секционирована по месяцам (RANGE по created_at);
+# на случай отсутствия нужной секции строки попадают в downloads_default.
+SCHEMA_SQL = """
+    DO $$
+    BEGIN
+        IF to_regclass('downloads') IS NULL THEN
+            CREATE TABLE downloads (
+                id BIGSERIAL,
+                user_id BIGINT NOT NULL,
+                platform VARCHAR(50) NOT NULL,
+                video_url TEXT NOT NULL,
+                video_id VARCHAR(32),
+                status VARCHAR(20) DEFAULT 'completed',
+                created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (id, created_at)
+            ) PARTITION BY RANGE (created_at);
+            
+            CREATE TABLE downloads_default PARTITION OF downloads DEFAULT;
+        END IF;
+    END
+    $$;
+    
+    -- Канонический ID видео (для таблиц, созданных до его появления)
+    ALTER TABLE downloads ADD COLUMN IF NOT EXISTS video_id VARCHAR(32);
+    
+    CREATE INDEX IF NOT EXISTS idx_downloads_user_id 
+    ON downloads(user_id);
+    
+    CREATE INDEX IF NOT EXISTS idx_downloads_created_at 
+    ON downloads(created_at);
+    
+    -- Создание месячной секции; строки этого месяца из downloads_default переносятся в нее
+    CREATE OR REPLACE FUNCTION downloads_create_partition(month_start DATE) RETURNS BOOLEAN AS $$
+    DECLARE
+        part_start DATE := date_trunc('month', month_start)::date;
+        part_end DATE := (date_trunc('month', month_start) + interval '1 month')::date;
+        part_name TEXT := 'downloads_' || to_char(month_start, 'YYYY_MM');
+    BEGIN
+        IF to_regclass(part_name) IS NOT NULL THEN
+            RETURN FALSE;
+        END IF;
+        
+        EXECUTE format('CREATE TABLE %I (LIKE downloads INCLUDING DEFAULTS)', part_name);
+        IF to_regclass('downloads_default') IS NOT NULL THEN
+            EXECUTE format(
+                'WITH moved AS (DELETE FROM downloads_default WHERE created_at >= %L AND created_at < %L RETURNING *) '
+                'INSERT INTO %I SELECT * FROM moved',
+                part_start, part_end, part_name
+            );
+        END IF;
+        EXECUTE format(
+            'ALTER TABLE downloads ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+            part_name, part_start, part_end
+        );
+        RETURN TRUE;
+    END;
+    $$ LANGUAGE plpgsql;
+    
+    -- Секции на текущий месяц и months_ahead месяцев вперед
+    CREATE OR REPLACE FUNCTION downloads_ensure_partitions(months_ahead INT) RETURNS INT AS $$
+    DECLARE
+        created INT := 0;
+    BEGIN
+        IF (SELECT relkind FROM pg_class WHERE oid = to_regclass('downloads')) <> 'p' THEN
+            RAISE WARNING 'downloads не секционирована, выполните migrate-partitions';
+            RETURN 0;
+        END IF;
+        
+        FOR i IN 0..months_ahead LOOP
+            IF downloads_create_partition((date_trunc('month', CURRENT_DATE) + make_interval(months => i))::date) THEN
+                created := created + 1;
+            END IF;
+        END LOOP;
+        RETURN created;
+    END;
+    $$ LANGUAGE plpgsql;
+    
+    CREATE TABLE IF NOT EXISTS telegram_file_cache (
+        video_id VARCHAR(32) NOT NULL,
+        format_key VARCHAR(64) NOT NULL,
+        file_id TEXT NOT NULL,
+        title TEXT,
+        file_size BIGINT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (video_id, format_key)
+    );
+    
+    -- Корзины токенов лимита запросов, общие для всех реплик (RATE_LIMIT_BACKEND=postgres)
+    CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+        key VARCHAR(64) PRIMARY KEY,
+        tokens DOUBLE PRECISION NOT NULL,
+        updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    );
+    
+    -- Кэш метаданных yt-dlp, общий для реплик (METADATA_CACHE_BACKEND=postgres); сроки - unix time
+    CREATE TABLE IF NOT EXISTS video_metadata_cache (
+        video_id VARCHAR(32) PRIMARY KEY,
+        profile VARCHAR(64) NOT NULL,
+        info_json TEXT NOT NULL,
+        host VARCHAR(255) NOT NULL,
+        fetched_at DOUBLE PRECISION NOT NULL,
+        fresh_until DOUBLE PRECISION NOT NULL,
+        stale_until DOUBLE PRECISION NOT NULL,
+        urls_expire_at DOUBLE PRECISION
+    );
+    
+    -- Очередь заданий на скачивание для отдельных воркеров. run_at - момент, с которого
+    -- задание можно взять: для queued - после паузы повтора, для running - после
+    -- истечения таймаута видимости (воркер пропал, задание забирает другой)
+    CREATE TABLE IF NOT EXISTS download_jobs (
+        id BIGSERIAL PRIMARY KEY,
+        user_id BIGINT NOT NULL,
+        chat_id BIGINT NOT NULL,
+        message_id BIGINT,
+        status_message_id BIGINT,
+        video_url TEXT NOT NULL,
+        video_id VARCHAR(32),
+        platform VARCHAR(50) NOT NULL DEFAULT 'youtube',
+        status VARCHAR(20) NOT NULL DEFAULT 'queued',
+        attempts INT NOT NULL DEFAULT 0,
+        max_attempts INT NOT NULL DEFAULT 3,
+        run_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        locked_by TEXT,
+        last_error TEXT,
+        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    );
+    
+    CREATE INDEX IF NOT EXISTS idx_download_jobs_ready 
+    ON download_jobs(run_at) WHERE status IN ('queued', 'running');
+    
+    -- Платформа задания (для таблиц, созданных до ее появления): у каждой платформы
+    -- свои слоты воркера, и задания берутся по платформе
+    ALTER TABLE download_jobs ADD COLUMN IF NOT EXISTS platform VARCHAR(50) NOT NULL DEFAULT 'youtube';
+    
+    CREATE INDEX IF NOT EXISTS idx_download_jobs_platform_ready 
+    ON download_jobs(platform, run_at) WHERE status IN ('queued', 'running');
+    
+    -- Предагрегированные счетчики для /stats
+    DO $$
+    BEGIN
+        IF to_regclass('user_stats') IS NULL THEN
+            CREATE TABLE user_stats (
+                user_id BIGINT NOT NULL,
+                platform VARCHAR(50) NOT NULL,
+                count BIGINT NOT NULL DEFAULT 0,
+                PRIMARY KEY (user_id, platform)
+            );
+            
+            INSERT INTO user_stats (user_id, platform, count) 
+            SELECT user_id, platform, COUNT(*) 
+            FROM downloads 
+            WHERE status = 'completed'
+            GROUP BY user_id, platform;
+        END IF;
+    END
+    $$;
+    
+    CREATE OR REPLACE FUNCTION downloads_update_user_stats() RETURNS trigger AS $$
+    BEGIN
+        IF NEW.status = 'completed' THEN
+            INSERT INTO user_stats (user_id, platform, count) 
+            VALUES (NEW.user_id, NEW.platform, 1)
+            ON CONFLICT (user_id, platform) DO UPDATE 
+            SET count = user_stats.count + 1;
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+    
+    CREATE OR REPLACE TRIGGER trg_downloads_user_stats 
+    AFTER INSERT ON downloads 
+    FOR EACH ROW EXECUTE FUNCTION downloads_update_user_stats();
+"""
+
+# Ключ advisory-блокировки: несколько процессов, стартующих одновременно,
+# применяют схему по очереди
+SCHEMA_LOCK_ID = 7340021
+
+PARTITION_NAME_RE = re.compile(r'^downloads_(\d{4})_(\d{2})$')
+
+# Перенос существующей несекционированной downloads в downloads_legacy
+RENAME_LEGACY_SQL = """
+    LOCK TABLE downloads IN ACCESS EXCLUSIVE MODE;
+    DROP TRIGGER IF EXISTS trg_downloads_user_stats ON downloads;
+    ALTER TABLE downloads RENAME TO downloads_legacy;
+    ALTER TABLE downloads_legacy RENAME CONSTRAINT downloads_pkey TO downloads_legacy_pkey;
+    ALTER INDEX IF EXISTS idx_downloads_user_id RENAME TO idx_downloads_legacy_user_id;
+    ALTER INDEX IF EXISTS idx_downloads_created_at RENAME TO idx_downloads_legacy_created_at;
+    ALTER TABLE downloads_legacy ADD COLUMN IF NOT EXISTS video_id VARCHAR(32);
+"""
+
+# Секции за весь период данных legacy, копирование строк и сдвиг последовательности id
+COPY_LEGACY_SQL = """
+    SELECT downloads_create_partition(month::date) 
+    FROM generate_series(
+        (SELECT date_trunc('month', MIN(created_at)) FROM downloads_legacy),
+        (SELECT date_trunc('month', MAX(created_at)) FROM downloads_legacy),
+        interval '1 month'
+    ) AS month;
+    
+    INSERT INTO downloads (id, user_id, platform, video_url, video_id, status, created_at) 
+    SELECT id, user_id, platform, video_url, video_id, status, COALESCE(created_at, CURRENT_TIMESTAMP) 
+    FROM downloads_legacy;
+    
+    SELECT setval(
+        pg_get_serial_sequence('downloads', 'id'),
+        GREATEST((SELECT MAX(id) FROM downloads), 1)
+    );
+"""
+
+# Пересчет user_stats по downloads с нуля
+REBUILD_USER_STATS_SQL = """
+    LOCK TABLE downloads IN SHARE MODE;
+    
+    TRUNCATE user_stats;
+    
+    INSERT INTO user_stats (user_id, platform, count) 
+    SELECT user_id, platform, COUNT(*) 
+    FROM downloads 
+    WHERE status = 'completed'
+    GROUP BY user_id, platform;
+"""
+
 class DatabaseService:
     """Сервис для работы с базой данных"""
     
     def __init__(self, db_config: Dict[str, Any] = None):
         self.db_config = db_config or settings.DB_CONFIG
+        self._pool: Optional[ConnectionPool] = None
+        self._stats_cache = TTLCache(maxsize=settings.STATS_CACHE_SIZE, ttl=settings.STATS_CACHE_TTL)
+    
+    @property
+    def pool(self) -> ConnectionPool:
+        """Пул соединений (создается при первом обращении)"""
+        if self._pool is None:
+            self._pool = ConnectionPool(
+                self.db_config,
+                min_size=settings.DB_POOL_MIN_SIZE,
+                max_size=settings.DB_POOL_MAX_SIZE,
+                timeout=settings.DB_POOL_TIMEOUT,
+                check_interval=settings.DB_POOL_CHECK_INTERVAL
+            )
+        return self._pool
     
     @contextmanager
     def get_connection(self):
-        """Контекстный менеджер для подключения к БД"""
+        """Контекстный менеджер для получения соединения из пула"""
         conn = None
+        broken = False
         try:
-            conn = psycopg2.connect(**self.db_config)
+            conn = self.pool.getconn()
             yield conn
         except Exception as e:
             logger.error(f"Ошибка подключения к БД: {e}")
-            if conn:
+            broken = isinstance(e, (psycopg2.OperationalError, psycopg2.InterfaceError))
+            if conn and not broken:
                 conn.rollback()
             raise
         finally:
             if conn:
-                conn.close()
+                self.pool.putconn(conn, broken=broken)
+    
+    def pool_stats(self) -> Dict[str, Any]:
+        """Статистика пула соединений для мониторинга"""
+        return self.pool.stats()
     
+    def close(self) -> None:
+        """Закрытие пула соединений"""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
+    
+    @timed_query
     def save_download(self, download: Download) -> bool:
         """Сохранение информации о скачивании"""
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute("""
-                    INSERT INTO downloads (user_id, platform, video_url, status) 
-                    VALUES (%s, %s, %s, %s)
+                    INSERT INTO downloads (user_id, platform, video_url, video_id, status) 
+                    VALUES (%s, %s, %s, %s, %s)
                     RETURNING id, created_at
-                """, (download.user_id, download.platform, download.video_url, download.status))
+                """, (download.user_id, download.platform, download.video_url,
+                      download.video_id, download.status))
                 
                 result = cursor.fetchone()
                 if result:
                     download.id, download.created_at = result
                 
                 conn.commit()
+                self._stats_cache.pop(download.user_id)
                 return True
         except Exception as e:
             logger.error(f"Ошибка сохранения в БД: {e}")
             return False
     
+    @timed_query
+    def save_downloads(self, downloads: List[Download]) -> bool:
+        """Пакетное сохранение записей о скачиваниях одним multi-row INSERT"""
+        if not downloads:
+            return True
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                execute_values(cursor, """
+                    INSERT INTO downloads (user_id, platform, video_url, video_id, status, created_at) 
+                    VALUES %s
+                """, [
+                    (d.user_id, d.platform, d.video_url, d.video_id, d.status, d.created_at)
+                    for d in downloads
+                ], page_size=len(downloads))
+                
+                conn.commit()
+                for download in downloads:
+                    self._stats_cache.pop(download.user_id)
+                return True
+        except Exception as e:
+            logger.error(f"Ошибка пакетного сохранения в БД: {e}")
+            return False
+    
+    @timed_query
     def get_user_stats(self, user_id: int) -> List[Dict[str, Any]]:
-        """Получение статистики пользователя"""
+        """Получение статистики пользователя из предагрегированной таблицы user_stats"""
+        cached = self._stats_cache.get(user_id)
+        if cached is not None:
+            return cached
+        
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor(cursor_factory=RealDictCursor)
                 cursor.execute("""
-                    SELECT platform, COUNT(*) as count 
-                    FROM downloads 
-                    WHERE user_id = %s AND status = 'completed'
-                    GROUP BY platform
+                    SELECT platform, count 
+                    FROM user_stats 
+                    WHERE user_id = %s AND count > 0
                 """, (user_id,))
                 
-                return [dict(row) for row in cursor.fetchall()]
+                stats = [dict(row) for row in cursor.fetchall()]
+                self._stats_cache.set(user_id, stats)
+                return stats
         except Exception as e:
             logger.error(f"Ошибка получения статистики: {e}")
             return []
     
+    def rebuild_user_stats(self) -> int:
+        """Пересчет таблицы user_stats по таблице downloads"""
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(REBUILD_USER_STATS_SQL)
+                rows = cursor.rowcount
+                conn.commit()
+                self._stats_cache.clear()
+                logger.info(f"Статистика пользователей пересчитана: {rows} строк")
+                return rows
+        except Exception as e:
+            logger.error(f"Ошибка пересчета статистики: {e}")
+            raise
+    
+    @timed_query
+    def get_file_id(self, video_id: str, format_key: str) -> Optional[Dict[str, Any]]:
+        """Получение сохраненного Telegram file_id для видео"""
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor(cursor_factory=RealDictCursor)
+                cursor.execute("""
+                    SELECT file_id, title, file_size 
+                    FROM telegram_file_cache 
+                    WHERE video_id = %s AND format_key = %s
+                """, (video_id, format_key))
+                
+                row = cursor.fetchone()
+                return dict(row) if row else None
+        except Exception as e:
+            logger.error(f"Ошибка получения file_id: {e}")
+            return None
+    
+    @timed_query
+    def save_file_id(self, video_id: str, format_key: str, file_id: str,
+                     title: str = None, file_size: int = None) -> bool:
+        """Сохранение Telegram file_id после первой отправки"""
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    INSERT INTO telegram_file_cache (video_id, format_key, file_id, title, file_size) 
+                    VALUES (%s, %s, %s, %s, %s)
+                    ON CONFLICT (video_id, format_key) DO UPDATE 
+                    SET file_id = EXCLUDED.file_id, title = EXCLUDED.title,
+                        file_size = EXCLUDED.file_size, created_at = CURRENT_TIMESTAMP
+                """, (video_id, format_key, file_id, title, file_size))
+                conn.commit()
+                return True
+        except Exception as e:
+            logger.error(f"Ошибка сохранения file_id: {e}")
+            return False
+    
+    @timed_query
+    def delete_file_id(self, video_id: str, format_key: str) -> bool:
+        """Удаление устаревшего Telegram file_id"""
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    DELETE FROM telegram_file_cache 
+                    WHERE video_id = %s AND format_key = %s
+                """, (video_id, format_key))
+                conn.commit()
+                return True
+        except Exception as e:
+            logger.error(f"Ошибка удаления file_id: {e}")
+            return False
+    
+    @timed_query
+    def get_video_metadata(self, video_id: str) -> Optional[Dict[str, Any]]:
+        """Получение кэшированных метаданных видео"""
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor(cursor_factory=RealDictCursor)
+                cursor.execute("""
+                    SELECT video_id, profile, info_json, host, fetched_at,
+                           fresh_until, stale_until, urls_expire_at
+                    FROM video_metadata_cache 
+                    WHERE video_id = %s
+                """, (video_id,))
+                
+                row = cursor.fetchone()
+                return dict(row) if row else None
+        except Exception as e:
+            logger.error(f"Ошибка получения метаданных: {e}")
+            return None
+    
+    @timed_query
+    def save_video_metadata(self, entry: Any) -> bool:
+        """Сохранение метаданных видео (запись CachedMetadata)"""
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    INSERT INTO video_metadata_cache (video_id, profile, info_json, host, fetched_at,
+                                                      fresh_until, stale_until, urls_expire_at) 
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                    ON CONFLICT (video_id) DO UPDATE 
+                    SET profile = EXCLUDED.profile, info_json = EXCLUDED.info_json, host = EXCLUDED.host,
+                        fetched_at = EXCLUDED.fetched_at, fresh_until = EXCLUDED.fresh_until,
+                        stale_until = EXCLUDED.stale_until, urls_expire_at = EXCLUDED.urls_expire_at
+                """, tuple(entry))
+                conn.commit()
+                return True
+        except Exception as e:
+            logger.error(f"Ошибка сохранения метаданных: {e}")
+            return False
+    
+    @timed_query
+    def delete_video_metadata(self, video_id: str) -> bool:
+        """Удаление метаданных видео"""
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("DELETE FROM video_metadata_cache WHERE video_id = %s", (video_id,))
+                conn.commit()
+                return True
+        except Exception as e:
+            logger.error(f"Ошибка удаления метаданных: {e}")
+            return False
+    
+    def purge_video_metadata(self) -> int:
+        """Удаление метаданных, которые уже нельзя использовать даже для отказов"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM video_metadata_cache WHERE stale_until < extract(epoch FROM now())")
+            deleted = cursor.rowcount
+            conn.commit()
+            logger.info(f"Удалено устаревших метаданных: {deleted}")
+            return deleted
+    
     def init_database(self) -> None:
         """Инициализация базы данных"""
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
-                cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS downloads (
-                        id SERIAL PRIMARY KEY,
-                        user_id BIGINT NOT NULL,
-                        platform VARCHAR(50) NOT NULL,
-                        video_url TEXT NOT NULL,
-                        status VARCHAR(20) DEFAULT 'completed',
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                    );
-                    
-                    CREATE INDEX IF NOT EXISTS idx_downloads_user_id 
-                    ON downloads(user_id);
-                    
-                    CREATE INDEX IF NOT EXISTS idx_downloads_created_at 
-                    ON downloads(created_at);
-                """)
+                cursor.execute(
+                    f"SELECT pg_advisory_xact_lock({SCHEMA_LOCK_ID});"
+                    + SCHEMA_SQL
+                    + f"SELECT downloads_ensure_partitions({int(settings.DB_PARTITION_MONTHS_AHEAD)});"
+                )
                 conn.commit()
                 logger.info("База данных инициализирована")
+            self.pool.warmup()
         except Exception as e:
             logger.error(f"Ошибка инициализации БД: {e}")
             raise
-
+    
+    def ensure_partitions(self, months_ahead: int = None) -> int:
+        """Создание месячных секций downloads на текущий и будущие месяцы"""
+        months_ahead = settings.DB_PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            # Бот, воркеры и cron создают секции по очереди, а не наперегонки
+            cursor.execute("SELECT pg_advisory_xact_lock(%s)", (SCHEMA_LOCK_ID,))
+            cursor.execute("SELECT downloads_ensure_partitions(%s)", (months_ahead,))
+            created = cursor.fetchone()[0]
+            conn.commit()
+            logger.info(f"Создано секций downloads: {created}")
+            return created
+    
+    def list_partitions(self) -> List[str]:
+        """Список месячных секций downloads"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT c.relname 
+                FROM pg_inherits i 
+                JOIN pg_class c ON c.oid = i.inhrelid 
+                WHERE i.inhparent = to_regclass('downloads')
+                ORDER BY c.relname
+            """)
+            return [row[0] for row in cursor.fetchall() if PARTITION_NAME_RE.match(row[0])]
+    
+    def migrate_to_partitioned(self, drop_legacy: bool = False) -> bool:
+        """Перенос несекционированной таблицы downloads в секционированную"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass('downloads')")
+            row = cursor.fetchone()
+            if not row or row[0] != 'r':
+                logger.info("Таблица downloads уже секционирована, миграция не требуется")
+                return False
+            
+            cursor.execute(RENAME_LEGACY_SQL)
+            cursor.execute(
+                SCHEMA_SQL
+                + f"SELECT downloads_ensure_partitions({int(settings.DB_PARTITION_MONTHS_AHEAD)});"
+            )
+            cursor.execute(COPY_LEGACY_SQL)
+            # Копирование строк сработало через триггер и удвоило счетчики:
+            # пересчитываем их в той же транзакции, чтобы сбой не оставил удвоенные
+            cursor.execute(REBUILD_USER_STATS_SQL)
+            if drop_legacy:
+                cursor.execute("DROP TABLE downloads_legacy")
+            conn.commit()
+            self._stats_cache.clear()
+            logger.info("Таблица downloads переведена на месячные секции")
+        return True
+    
+    def detach_old_partitions(self, keep_months: int = None, drop: bool = False) -> List[str]:
+        """Отсоединение секций старше keep_months месяцев (архивация или удаление)"""
+        keep_months = settings.DB_RETENTION_MONTHS if keep_months is None else keep_months
+        today = date.today()
+        months = today.year * 12 + today.month - 1 - keep_months
+        cutoff = (months // 12, months % 12 + 1)
+        
+        detached = []
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            for name in self.list_partitions():
+                match = PARTITION_NAME_RE.match(name)
+                if (int(match.group(1)), int(match.group(2))) >= cutoff:
+                    continue
+                cursor.execute(f'ALTER TABLE downloads DETACH PARTITION "{name}"')
+                if drop:
+                    cursor.execute(f'DROP TABLE "{name}"')
+                else:
+                    cursor.execute(f'ALTER TABLE "{name}" RENAME TO "{name.replace("downloads_", "downloads_archive_", 1)}"')
+                detached.append(name)
+            conn.commit()
+        
+        if detached:
+            action = "удалены" if drop else "отсоединены в архив"
+            logger.info(f"Секции downloads {action}: {', '.join(detached)}")
+        return detached
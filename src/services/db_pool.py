@@ -0,0 +1,195 @@
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Tuple
+
+import psycopg2
+from psycopg2 import extensions
+
+logger = logging.getLogger(__name__)
+
+class PoolTimeout(Exception):
+    """Не удалось получить соединение из пула за отведенное время"""
+
+class ConnectionPool:
+    """Потокобезопасный пул соединений PostgreSQL с проверкой при выдаче"""
+    
+    def __init__(self, db_config: Dict[str, Any], min_size: int = 1, max_size: int = 10,
+                 timeout: float = 10.0, check_interval: float = 30.0):
+        if min_size > max_size:
+            raise ValueError("min_size не может быть больше max_size")
+        self.db_config = db_config
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.check_interval = check_interval
+        
+        self._idle: Deque[Tuple[Any, float]] = deque()
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        
+        # Статистика ожидания соединений
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._timeouts = 0
+        self._reconnects = 0
+    
+    def _connect(self):
+        """Открыть новое соединение"""
+        return psycopg2.connect(**self.db_config)
+    
+    def _discard(self, conn) -> None:
+        """Закрыть соединение и освободить место в пуле"""
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+    
+    def _is_healthy(self, conn, idle_since: float) -> bool:
+        """Проверка соединения перед выдачей"""
+        if conn.closed:
+            return False
+        if time.monotonic() - idle_since < self.check_interval:
+            return True
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
+            conn.rollback()
+            return True
+        except Exception as e:
+            logger.warning(f"Соединение с БД не прошло проверку: {e}")
+            return False
+    
+    def getconn(self):
+        """Получить соединение из пула (ждет, если пул исчерпан)"""
+        started = time.monotonic()
+        deadline = started + self.timeout
+        waited = False
+        
+        while True:
+            with self._cond:
+                if self._closed:
+                    raise RuntimeError("Пул соединений закрыт")
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeout(f"Нет свободных соединений за {self.timeout} с")
+                    waited = True
+                    self._cond.wait(remaining)
+                    if self._closed:
+                        raise RuntimeError("Пул соединений закрыт")
+                if self._idle:
+                    conn, idle_since = self._idle.pop()
+                    reuse = True
+                else:
+                    self._size += 1
+                    reuse = False
+            
+            if reuse:
+                if self._is_healthy(conn, idle_since):
+                    break
+                # Сломанное соединение заменяем новым
+                self._reconnects += 1
+                self._discard(conn)
+                continue
+            
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+            break
+        
+        wait_time = time.monotonic() - started
+        with self._cond:
+            self._checkouts += 1
+            if waited:
+                self._waits += 1
+            self._wait_total += wait_time
+            self._wait_max = max(self._wait_max, wait_time)
+        return conn
+    
+    def putconn(self, conn, broken: bool = False) -> None:
+        """Вернуть соединение в пул"""
+        if broken or conn.closed or self._closed:
+            self._discard(conn)
+            return
+        
+        # Незавершенную транзакцию откатываем, чтобы не отдать ее следующему
+        status = conn.info.transaction_status
+        if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+            self._discard(conn)
+            return
+        if status != extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except Exception:
+                self._discard(conn)
+                return
+        
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+    
+    @contextmanager
+    def connection(self):
+        """Контекстный менеджер выдачи соединения"""
+        conn = self.getconn()
+        broken = False
+        try:
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            broken = True
+            raise
+        finally:
+            self.putconn(conn, broken=broken)
+    
+    def warmup(self) -> None:
+        """Открыть min_size соединений заранее"""
+        conns = [self.getconn() for _ in range(max(0, self.min_size - self._size))]
+        for conn in conns:
+            self.putconn(conn)
+    
+    def close(self) -> None:
+        """Закрыть все соединения пула"""
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn, _ in idle:
+            try:
+                conn.close()
+            except Exception:
+                pass
+        logger.info("Пул соединений с БД закрыт")
+    
+    def stats(self) -> Dict[str, Any]:
+        """Статистика пула для мониторинга"""
+        with self._cond:
+            return {
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'max_size': self.max_size,
+                'checkouts': self._checkouts,
+                'waits': self._waits,
+                'wait_time_total': self._wait_total,
+                'wait_time_max': self._wait_max,
+                'wait_time_avg': self._wait_total / self._checkouts if self._checkouts else 0.0,
+                'timeouts': self._timeouts,
+                'reconnects': self._reconnects,
+            }
@@ -0,0 +1,78 @@
+import asyncio
+import functools
+import logging
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from .tracing import in_context
+from ..config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+class DownloadQueueFull(Exception):
+    """Очередь скачиваний переполнена"""
+
+class DownloadPool:
+    """Ограниченный пул воркеров для блокирующих скачиваний"""
+
+    def __init__(self, max_workers: int = None, max_queue: int = None, executor_type: str = None):
+        self.max_workers = max_workers or settings.DOWNLOAD_WORKERS
+        self.max_queue = settings.DOWNLOAD_QUEUE_SIZE if max_queue is None else max_queue
+        self.executor_type = executor_type or settings.DOWNLOAD_EXECUTOR
+        if self.executor_type not in ('thread', 'process'):
+            raise ValueError(f"Неизвестный тип пула: {self.executor_type}")
+
+        self._executor: Optional[Executor] = None
+        self._semaphore = asyncio.Semaphore(self.max_workers)
+        self.active = 0
+        self.waiting = 0
+
+    def _get_executor(self) -> Executor:
+        """Ленивое создание пула"""
+        if self._executor is None:
+            if self.executor_type == 'process':
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix='download'
+                )
+        return self._executor
+
+    def queue_position(self) -> int:
+        """Позиция нового запроса в очереди (0 - свободный воркер есть)"""
+        if self.active + self.waiting < self.max_workers:
+            return 0
+        return self.active + self.waiting - self.max_workers + 1
+
+    def is_full(self) -> bool:
+        """Проверка переполнения очереди ожидания"""
+        return self.queue_position() > self.max_queue
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Выполнить функцию в пуле с учетом лимитов"""
+        if self.is_full():
+            raise DownloadQueueFull(f"В очереди уже {self.waiting} запросов")
+
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+        self.active += 1
+        try:
+            loop = asyncio.get_running_loop()
+            # В пул потоков передаем контекст запроса (трассировку); в дочерний процесс его не передать
+            call = in_context(func, *args) if self.executor_type == 'thread' else functools.partial(func, *args)
+            return await loop.run_in_executor(self._get_executor(), call)
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Остановка пула"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+            logger.info("Пул скачиваний остановлен")
@@ -0,0 +1,125 @@
+import logging
+import threading
+from collections import deque
+from typing import TYPE_CHECKING, Deque, List
+
+from ..config.settings import settings
+from ..models.download import Download
+
+if TYPE_CHECKING:
+    from .database import DatabaseService
+
+logger = logging.getLogger(__name__)
+
+class BufferedDownloadWriter:
+    """
+    Отложенная пакетная запись скачиваний в БД (write-behind)
+    
+    Записи копятся в памяти и сбрасываются пачками по размеру или по таймеру.
+    Политика при переполнении: буфер ограничен max_buffer записями, при переполнении
+    отбрасываются самые старые записи (счетчик dropped), обработчик никогда не ждет БД.
+    Если БД недоступна, пачка возвращается в буфер и повторяется на следующем такте.
+    При остановке выполняется финальный сброс; то, что не удалось записать, теряется
+    с записью в лог.
+    """
+    
+    def __init__(self, db_service: 'DatabaseService', batch_size: int = None,
+                 flush_interval: float = None, max_buffer: int = None):
+        self.db_service = db_service
+        self.batch_size = batch_size or settings.DB_WRITE_BATCH_SIZE
+        self.flush_interval = flush_interval or settings.DB_WRITE_FLUSH_INTERVAL
+        self.max_buffer = max_buffer or settings.DB_WRITE_BUFFER_SIZE
+        
+        self._buffer: Deque[Download] = deque()
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._stopping = False
+        
+        self.written = 0
+        self.dropped = 0
+        self.failed_flushes = 0
+    
+    def start(self) -> None:
+        """Запуск фонового потока сброса"""
+        if self._thread is None:
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name='download-writer', daemon=True)
+            self._thread.start()
+    
+    def _drop_overflow(self) -> None:
+        """Отбросить самые старые записи сверх лимита буфера (под self._cond)"""
+        overflow = len(self._buffer) - self.max_buffer
+        if overflow > 0:
+            for _ in range(overflow):
+                self._buffer.popleft()
+            self.dropped += overflow
+            logger.warning(f"Буфер записи переполнен, отброшено записей: {overflow}")
+    
+    def save_download(self, download: Download) -> bool:
+        """Поставить запись в буфер без ожидания БД"""
+        with self._cond:
+            self._buffer.append(download)
+            self._drop_overflow()
+            if len(self._buffer) >= self.batch_size:
+                self._cond.notify()
+        return True
+    
+    def pending(self) -> int:
+        """Количество записей, ожидающих сброса"""
+        return len(self._buffer)
+    
+    def flush(self) -> bool:
+        """Сбросить накопленные записи в БД пачками"""
+        with self._flush_lock:
+            while True:
+                with self._cond:
+                    if not self._buffer:
+                        return True
+                    batch: List[Download] = [
+                        self._buffer.popleft()
+                        for _ in range(min(self.batch_size, len(self._buffer)))
+                    ]
+                
+                if self.db_service.save_downloads(batch):
+                    self.written += len(batch)
+                    continue
+                
+                # Возвращаем пачку в начало буфера для повторной попытки
+                self.failed_flushes += 1
+                with self._cond:
+                    self._buffer.extendleft(reversed(batch))
+                    self._drop_overflow()
+                return False
+    
+    def _run(self) -> None:
+        """Цикл фонового сброса по размеру или таймеру"""
+        while True:
+            with self._cond:
+                if not self._stopping and len(self._buffer) < self.batch_size:
+                    self._cond.wait(self.flush_interval)
+                if self._stopping:
+                    return
+            try:
+                flushed = self.flush()
+            except Exception as e:
+                logger.error(f"Ошибка фоновой записи в БД: {e}")
+                flushed = False
+            if not flushed:
+                # БД недоступна - ждем интервал перед повтором
+                with self._cond:
+                    if not self._stopping:
+                        self._cond.wait(self.flush_interval)
+    
+    def close(self) -> None:
+        """Остановка с финальным сбросом буфера"""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        
+        if not self.flush():
+            logger.error(f"При остановке не удалось записать {self.pending()} записей о скачиваниях")
+        logger.info("Отложенная запись скачиваний остановлена")
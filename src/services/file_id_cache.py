@@ -0,0 +1,49 @@
+import logging
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+from .async_database import resolve
+from .cache import TTLCache
+from ..config.settings import settings
+
+if TYPE_CHECKING:
+    from .database import DatabaseService
+
+logger = logging.getLogger(__name__)
+
+class FileIdCache:
+    """Кэш Telegram file_id: LRU в памяти поверх таблицы telegram_file_cache"""
+    
+    def __init__(self, db_service: 'DatabaseService', maxsize: int = None, ttl: float = None):
+        self.db_service = db_service
+        self._memory = TTLCache(
+            maxsize=maxsize or settings.FILE_ID_CACHE_SIZE,
+            ttl=settings.FILE_ID_CACHE_TTL if ttl is None else ttl
+        )
+    
+    async def get(self, video_id: str, format_key: str) -> Optional[Dict[str, Any]]:
+        """Найти file_id: сначала в памяти, затем в БД"""
+        key = (video_id, format_key)
+        entry = self._memory.get(key)
+        if entry is not None:
+            return entry
+        
+        entry = await resolve(self.db_service.get_file_id(video_id, format_key))
+        if entry:
+            self._memory.set(key, entry)
+        return entry
+    
+    async def put(self, video_id: str, format_key: str, file_id: str,
+                  title: str = None, file_size: int = None) -> None:
+        """Запомнить file_id, полученный после загрузки в Telegram"""
+        self._memory.set((video_id, format_key), {
+            'file_id': file_id,
+            'title': title,
+            'file_size': file_size
+        })
+        await resolve(self.db_service.save_file_id(video_id, format_key, file_id, title, file_size))
+    
+    async def invalidate(self, video_id: str, format_key: str) -> None:
+        """Удалить file_id, который Telegram больше не принимает"""
+        logger.info(f"Инвалидация file_id для {video_id} ({format_key})")
+        self._memory.pop((video_id, format_key))
+        await resolve(self.db_service.delete_file_id(video_id, format_key))
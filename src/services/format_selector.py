@@ -0,0 +1,87 @@
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Раскадровки (storyboard) yt-dlp отдает как форматы с картинкой, но это не видео
+SKIPPED_EXTS = ('mhtml',)
+
+# Насколько формат укладывается в лимит размера (первый критерий ранжирования)
+FITS = 2
+FITS_UNKNOWN = 1
+TOO_LARGE = 0
+
+def estimate_size(fmt: Dict[str, Any], duration: Optional[float] = None) -> Optional[float]:
+    """Размер формата в байтах: filesize, filesize_approx или битрейт × длительность"""
+    size = fmt.get('filesize') or fmt.get('filesize_approx')
+    if size:
+        return size
+    bitrate = fmt.get('tbr') or sum(filter(None, (fmt.get('vbr'), fmt.get('abr'))))
+    if bitrate and duration:
+        return bitrate * 1000 / 8 * duration  # tbr в Кбит/с
+    return None
+
+def is_progressive(fmt: Dict[str, Any]) -> bool:
+    """Формат с видео и звуком в одном файле: не нужны склейка и перепаковка"""
+    return (fmt.get('vcodec') != 'none' and fmt.get('acodec') != 'none'
+            and fmt.get('ext') not in SKIPPED_EXTS)
+
+class FormatSelector:
+    """
+    Выбор формата по уже извлеченному списку форматов за один проход
+    
+    Каждый прогрессивный формат получает ключ ранжирования: укладывается ли в
+    max_file_size (по filesize или битрейту × длительности, неизвестный размер
+    ниже известного подходящего), не выше ли max_height, mp4 ли это, затем высота
+    и битрейт. Равные ключи различает format_id, поэтому выбор детерминирован и
+    не зависит от порядка форматов в ответе YouTube. Следующий по рангу формат -
+    запасной, если скачать выбранный не удалось.
+    """
+    
+    def __init__(self, max_file_size: int, max_height: int):
+        self.max_file_size = max_file_size
+        self.max_height = max_height
+    
+    def score(self, fmt: Dict[str, Any], duration: Optional[float] = None) -> Tuple:
+        """Ключ ранжирования формата: больше - лучше"""
+        size = estimate_size(fmt, duration)
+        if size is None:
+            fits = FITS_UNKNOWN
+        else:
+            fits = FITS if size <= self.max_file_size else TOO_LARGE
+        height = fmt.get('height') or 0
+        return (
+            fits,
+            height <= self.max_height,
+            fmt.get('ext') == 'mp4',
+            height,
+            fmt.get('tbr') or 0,
+            str(fmt.get('format_id') or ''),
+        )
+    
+    def fits(self, fmt: Dict[str, Any], duration: Optional[float] = None) -> bool:
+        """Формат не превышает лимит размера (или его размер неизвестен)"""
+        size = estimate_size(fmt, duration)
+        return size is None or size <= self.max_file_size
+    
+    def rank(self, formats: Iterable[Dict[str, Any]], duration: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Прогрессивные форматы от лучшего к худшему; превышающие лимит - в конце"""
+        scored = [(self.score(fmt, duration), fmt) for fmt in formats if is_progressive(fmt)]
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return [fmt for _, fmt in scored]
+    
+    def select(self, info: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Форматы видео по рангу с учетом его длительности"""
+        return self.rank(info.get('formats') or [], info.get('duration'))
+    
+    def __call__(self, ctx: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """
+        Селектор для параметра format yt-dlp
+        
+        Длительность в контекст не передается, поэтому здесь размер известен только
+        по filesize; окончательный выбор уточняется по info после извлечения.
+        """
+        ranked = self.rank(ctx['formats'])
+        if ranked:
+            # Даже слишком большой формат выбирается: отказ по размеру дает check_limits
+            yield ranked[0]
+        elif ctx['formats']:
+            # Ни одного прогрессивного формата - как 'best' у yt-dlp (список от худшего к лучшему)
+            yield ctx['formats'][-1]
@@ -0,0 +1,166 @@
+import asyncio
+import logging
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+from psycopg2.extras import RealDictCursor
+
+from .metrics import timed_query
+from .tracing import in_context
+from ..config.settings import settings
+from ..models.job import DownloadJob
+
+if TYPE_CHECKING:
+    from .database import DatabaseService
+
+logger = logging.getLogger(__name__)
+
+JOB_FIELDS = (
+    'id', 'user_id', 'chat_id', 'video_url', 'video_id', 'platform', 'message_id', 'status_message_id',
+    'status', 'attempts', 'max_attempts', 'last_error', 'created_at'
+)
+
+class JobQueue:
+    """
+    Очередь заданий на скачивание в PostgreSQL (таблица download_jobs)
+    
+    Воркеры забирают задания через SELECT ... FOR UPDATE SKIP LOCKED, поэтому
+    их можно запускать на любом количестве машин. Взятое задание невидимо для других
+    воркеров visibility_timeout секунд: если воркер не подтвердил его за это время,
+    задание забирает другой. Ошибки повторяются с экспоненциальной паузой,
+    после max_attempts попыток задание помечается failed.
+    """
+    
+    def __init__(self, db_service: 'DatabaseService', visibility_timeout: float = None,
+                 max_attempts: int = None, backoff: float = None, backoff_max: float = None):
+        self.db_service = db_service
+        self.visibility_timeout = visibility_timeout or settings.JOB_VISIBILITY_TIMEOUT
+        self.max_attempts = max_attempts or settings.JOB_MAX_ATTEMPTS
+        self.backoff = settings.JOB_RETRY_BACKOFF if backoff is None else backoff
+        self.backoff_max = backoff_max or settings.JOB_RETRY_BACKOFF_MAX
+    
+    def _to_job(self, row: Dict[str, Any]) -> DownloadJob:
+        """Строка download_jobs в модель"""
+        return DownloadJob(**{field: row[field] for field in JOB_FIELDS})
+    
+    def retry_delay(self, attempts: int) -> float:
+        """Пауза перед следующей попыткой: backoff * 2^(attempts-1), не больше backoff_max"""
+        return min(self.backoff * (2 ** max(attempts - 1, 0)), self.backoff_max)
+    
+    @timed_query
+    def enqueue(self, job: DownloadJob) -> DownloadJob:
+        """Поставить задание в очередь"""
+        with self.db_service.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO download_jobs
+                    (user_id, chat_id, message_id, status_message_id, video_url, video_id, platform, max_attempts)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                RETURNING id, created_at
+            """, (job.user_id, job.chat_id, job.message_id, job.status_message_id,
+                  job.video_url, job.video_id, job.platform, self.max_attempts))
+            job.id, job.created_at = cursor.fetchone()
+            job.max_attempts = self.max_attempts
+            conn.commit()
+        return job
+    
+    async def submit(self, job: DownloadJob) -> DownloadJob:
+        """Поставить задание в очередь, не блокируя event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, in_context(self.enqueue, job))
+    
+    @timed_query
+    def claim(self, worker_id: str, platform: str = None) -> Optional[DownloadJob]:
+        """
+        Взять следующее готовое задание (только платформы platform, если она задана)
+        
+        Returns:
+            Optional[DownloadJob]: задание с увеличенным attempts или None, если очередь пуста
+        """
+        with self.db_service.get_connection() as conn:
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
+            cursor.execute("""
+                UPDATE download_jobs
+                SET status = 'running', attempts = attempts + 1, locked_by = %s,
+                    run_at = now() + make_interval(secs => %s), updated_at = now()
+                WHERE id = (
+                    SELECT id FROM download_jobs
+                    WHERE status IN ('queued', 'running') AND run_at <= now()
+                        AND (%s::text IS NULL OR platform = %s)
+                    ORDER BY run_at, id
+                    FOR UPDATE SKIP LOCKED
+                    LIMIT 1
+                )
+                RETURNING *
+            """, (worker_id, self.visibility_timeout, platform, platform))
+            row = cursor.fetchone()
+            conn.commit()
+        return self._to_job(row) if row else None
+    
+    @timed_query
+    def ack(self, job: DownloadJob, status: str = 'done', error: str = None) -> bool:
+        """
+        Подтвердить завершение задания (done или окончательный failed)
+        
+        Подтверждение засчитывается только для той попытки, которая взяла задание:
+        если таймаут видимости истек и задание забрал другой воркер, вернется False.
+        """
+        with self.db_service.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE download_jobs
+                SET status = %s, last_error = %s, locked_by = NULL, updated_at = now()
+                WHERE id = %s AND attempts = %s AND status = 'running'
+            """, (status, error, job.id, job.attempts))
+            acked = cursor.rowcount == 1
+            conn.commit()
+        job.status = status
+        job.last_error = error
+        return acked
+    
+    @timed_query
+    def retry(self, job: DownloadJob, error: str) -> bool:
+        """
+        Вернуть задание в очередь после ошибки
+        
+        Returns:
+            bool: True - задание будет повторено, False - попытки исчерпаны (failed)
+        """
+        if job.attempts >= job.max_attempts:
+            self.ack(job, status='failed', error=error)
+            logger.warning(f"Задание {job.id} провалено после {job.attempts} попыток: {error}")
+            return False
+        
+        delay = self.retry_delay(job.attempts)
+        with self.db_service.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE download_jobs
+                SET status = 'queued', last_error = %s, locked_by = NULL,
+                    run_at = now() + make_interval(secs => %s), updated_at = now()
+                WHERE id = %s AND attempts = %s AND status = 'running'
+            """, (error, delay, job.id, job.attempts))
+            conn.commit()
+        job.status = 'queued'
+        job.last_error = error
+        logger.info(f"Задание {job.id} будет повторено через {delay:.0f} с: {error}")
+        return True
+    
+    def purge(self, older_than_days: int) -> int:
+        """Удалить завершенные задания старше заданного срока"""
+        with self.db_service.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                DELETE FROM download_jobs
+                WHERE status IN ('done', 'failed')
+                  AND updated_at < now() - make_interval(days => %s)
+            """, (older_than_days,))
+            deleted = cursor.rowcount
+            conn.commit()
+        return deleted
+    
+    def depth(self) -> Dict[str, int]:
+        """Количество заданий по статусам"""
+        with self.db_service.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT status, COUNT(*) FROM download_jobs GROUP BY status")
+            return dict(cursor.fetchall())
@@ -0,0 +1,207 @@
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+import uuid
+from collections import OrderedDict
+from typing import IO, Any, Dict, Optional, Tuple, Union
+
+from .metrics import MEDIA_CACHE, MEDIA_CACHE_BYTES
+from ..config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Имя файла кэша - ключ: <video_id>.<format_id>.mp4, рядом <video_id>.<format_id>.json с info
+MEDIA_SUFFIX = '.mp4'
+INFO_SUFFIX = '.json'
+TMP_PREFIX = '.tmp-'
+NAME_RE = re.compile(r'([A-Za-z0-9_-]{1,32})\.([A-Za-z0-9_+-]{1,64})' + re.escape(MEDIA_SUFFIX))
+UNSAFE_FORMAT_RE = re.compile(r'[^A-Za-z0-9_+-]')
+
+class MediaCache:
+    """
+    Кэш скачанных видео на диске по ID видео и формата
+    
+    Файлы пишутся под временным именем и переименовываются атомарно, поэтому в
+    каталоге не бывает недописанных видео. Индекс (имя -> размер, порядок LRU)
+    восстанавливается при старте по именам и stat файлов, не читая содержимое;
+    время последнего использования хранится в mtime. Сверх max_bytes вытесняются
+    давно не использованные файлы.
+    """
+    
+    def __init__(self, directory: str = None, max_bytes: int = None):
+        self.directory = directory or settings.MEDIA_CACHE_DIR
+        self.max_bytes = max_bytes or settings.MEDIA_CACHE_MAX_BYTES
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[str, int]' = OrderedDict()  # имя файла -> размер, от старых к новым
+        self._by_video: Dict[str, set] = {}
+        self.total_bytes = 0
+        os.makedirs(self.directory, exist_ok=True)
+        self.rebuild_index()
+    
+    def __reduce__(self) -> Tuple[Any, Tuple[str, int]]:
+        # Дочерний процесс (DOWNLOAD_EXECUTOR=process) работает со своим индексом того же каталога
+        return shared_media_cache, (self.directory, self.max_bytes)
+    
+    @staticmethod
+    def filename(video_id: str, format_id: str) -> str:
+        """Имя файла видео в кэше"""
+        return f"{video_id}.{UNSAFE_FORMAT_RE.sub('_', format_id)}{MEDIA_SUFFIX}"
+    
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+    
+    def info_path(self, name: str) -> str:
+        return self.path(name[:-len(MEDIA_SUFFIX)] + INFO_SUFFIX)
+    
+    def rebuild_index(self) -> None:
+        """Восстановить индекс по именам файлов и удалить остатки прерванных записей"""
+        found = []
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.name.startswith(TMP_PREFIX):
+                    self._remove(entry.path)
+                    continue
+                if NAME_RE.fullmatch(entry.name) and entry.is_file():
+                    stat = entry.stat()
+                    found.append((stat.st_mtime, entry.name, stat.st_size))
+        
+        with self._lock:
+            self._entries.clear()
+            self._by_video.clear()
+            self.total_bytes = 0
+            for _, name, size in sorted(found):
+                self._add_locked(name, size)
+            self._evict_locked()
+        logger.info(f"Кэш видео: {len(self._entries)} файлов, {self.total_bytes // (1024 * 1024)} MB")
+    
+    def _add_locked(self, name: str, size: int) -> None:
+        self.total_bytes -= self._entries.pop(name, 0)
+        self._entries[name] = size
+        self._by_video.setdefault(name.split('.', 1)[0], set()).add(name)
+        self.total_bytes += size
+    
+    def _discard_locked(self, name: str) -> None:
+        self.total_bytes -= self._entries.pop(name, 0)
+        video_id = name.split('.', 1)[0]
+        names = self._by_video.get(video_id)
+        if names is not None:
+            names.discard(name)
+            if not names:
+                del self._by_video[video_id]
+    
+    def _evict_locked(self) -> None:
+        """Удалить давно не использованные файлы сверх бюджета"""
+        while self.total_bytes > self.max_bytes and self._entries:
+            name = next(iter(self._entries))
+            self._discard_locked(name)
+            self._remove(self.path(name))
+            self._remove(self.info_path(name))
+            MEDIA_CACHE.inc(result='evicted')
+        MEDIA_CACHE_BYTES.set(self.total_bytes)
+    
+    def _remove(self, path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Не удалось удалить файл кэша {path}: {e}")
+    
+    def _temp_path(self, directory: str, suffix: str = '') -> str:
+        return os.path.join(directory, f"{TMP_PREFIX}{uuid.uuid4().hex}{suffix}")
+    
+    def _link_or_copy(self, source: str, target: str) -> None:
+        """Жесткая ссылка (без копирования данных) или копия на другой файловой системе"""
+        try:
+            os.link(source, target)
+        except OSError:
+            shutil.copyfile(source, target)
+    
+    def checkout(self, video_id: str, max_size: int) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """
+        Взять из кэша самый крупный формат видео не больше max_size
+        
+        Возвращает путь к отдельному временному файлу (жесткой ссылке на файл кэша),
+        который вызывающий код удаляет после отправки, и сохраненный info.
+        """
+        with self._lock:
+            names = sorted(self._by_video.get(video_id, ()), key=lambda n: self._entries[n], reverse=True)
+            name = next((n for n in names if self._entries[n] <= max_size), None)
+            if name is not None:
+                self._entries.move_to_end(name)
+        if name is None:
+            MEDIA_CACHE.inc(result='miss')
+            return None
+        
+        source = self.path(name)
+        target = os.path.join(tempfile.gettempdir(), f"cached-{uuid.uuid4().hex}{MEDIA_SUFFIX}")
+        try:
+            self._link_or_copy(source, target)
+            os.utime(source)
+        except OSError as e:
+            # Файл удалили мимо индекса (другой процесс или вручную)
+            logger.warning(f"Файл кэша {name} недоступен: {e}")
+            with self._lock:
+                self._discard_locked(name)
+            self._remove(target)
+            MEDIA_CACHE.inc(result='miss')
+            return None
+        
+        try:
+            with open(self.info_path(name), encoding='utf-8') as info_file:
+                info = json.load(info_file)
+        except (OSError, ValueError):
+            info = {}
+        info['file_size'] = self._entries.get(name) or os.path.getsize(target)
+        MEDIA_CACHE.inc(result='hit')
+        return target, info
+    
+    def put(self, video_id: str, format_id: str, source: Union[str, IO[bytes]], info: Dict[str, Any]) -> bool:
+        """Сохранить скачанное видео (путь к файлу или буфер) под ключом video_id и format_id"""
+        name = self.filename(video_id, format_id)
+        media_tmp = self._temp_path(self.directory, MEDIA_SUFFIX)
+        info_tmp = self._temp_path(self.directory, INFO_SUFFIX)
+        try:
+            if isinstance(source, str):
+                self._link_or_copy(source, media_tmp)
+            else:
+                with open(media_tmp, 'wb') as media_file:
+                    shutil.copyfileobj(source, media_file)
+                source.seek(0)
+            size = os.path.getsize(media_tmp)
+            if size > self.max_bytes:
+                self._remove(media_tmp)
+                return False
+            
+            with open(info_tmp, 'w', encoding='utf-8') as info_file:
+                json.dump({key: info.get(key) for key in ('title', 'duration', 'view_count')},
+                          info_file, ensure_ascii=False)
+            # info появляется раньше видео: у видео в кэше info есть всегда
+            os.replace(info_tmp, self.info_path(name))
+            os.replace(media_tmp, self.path(name))
+        except OSError as e:
+            logger.warning(f"Не удалось сохранить {name} в кэш: {e}")
+            self._remove(media_tmp)
+            self._remove(info_tmp)
+            return False
+        
+        with self._lock:
+            self._add_locked(name, size)
+            self._evict_locked()
+        return True
+
+_shared_caches: Dict[Tuple[str, int], MediaCache] = {}
+_shared_lock = threading.Lock()
+
+def shared_media_cache(directory: str = None, max_bytes: int = None) -> MediaCache:
+    """Кэш видео текущего процесса для каталога"""
+    key = (directory or settings.MEDIA_CACHE_DIR, max_bytes or settings.MEDIA_CACHE_MAX_BYTES)
+    with _shared_lock:
+        cache = _shared_caches.get(key)
+        if cache is None:
+            cache = _shared_caches[key] = MediaCache(*key)
+        return cache
@@ -0,0 +1,175 @@
+import json
+import logging
+import re
+import socket
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Dict, NamedTuple, Optional, Tuple
+
+from .cache import TTLCache
+from .metrics import METADATA_CACHE
+from ..config.settings import settings
+
+if TYPE_CHECKING:
+    from .database import DatabaseService
+
+logger = logging.getLogger(__name__)
+
+# Срок действия подписанной ссылки googlevideo: ...?expire=1700000000&... или .../expire/1700000000/...
+EXPIRE_RE = re.compile(r'[?&/]expire[=/](\d+)')
+
+# Крупные поля, не нужные ни для лимитов, ни для скачивания
+DROPPED_KEYS = ('automatic_captions', 'subtitles', 'thumbnails', 'heatmap', 'description', 'chapters',
+                'tags', 'categories', 'comments')
+
+HOST = socket.gethostname()
+
+def url_expiry(info: Dict[str, Any]) -> Optional[float]:
+    """Самый ранний срок действия ссылок выбранного и запасных форматов (unix time)"""
+    formats = [info] + list(info.get('formats') or []) + list(info.get('requested_formats') or [])
+    expiries = []
+    for item in formats:
+        match = EXPIRE_RE.search(item.get('url') or '')
+        if match:
+            expiries.append(float(match.group(1)))
+    return min(expiries) if expiries else None
+
+def compact_info(info: Dict[str, Any]) -> Dict[str, Any]:
+    """Info yt-dlp без крупных и служебных полей (служебные '__*' хранят функции)"""
+    return {key: value for key, value in info.items()
+            if key not in DROPPED_KEYS and not key.startswith('__')}
+
+class CachedMetadata(NamedTuple):
+    """Запись кэша метаданных: info yt-dlp в JSON и сроки ее годности (unix time)"""
+    video_id: str
+    profile: str  # профиль настроек yt-dlp, которым выбран формат
+    info_json: str
+    host: str  # подписанные ссылки привязаны к IP, с которого их получили
+    fetched_at: float
+    fresh_until: float
+    stale_until: float
+    urls_expire_at: Optional[float] = None
+    
+    def info(self) -> Dict[str, Any]:
+        """Копия info, которую можно менять"""
+        return json.loads(self.info_json)
+    
+    def is_fresh(self, now: float = None) -> bool:
+        """Метаданные свежие; устаревшие годятся только для быстрых отказов по лимитам"""
+        return (now or time.time()) < self.fresh_until
+
+class MetadataCache:
+    """
+    Кэш результатов extract_info по ID видео: LRU в памяти и, по желанию,
+    общая таблица video_metadata_cache
+    
+    Запись свежая METADATA_CACHE_TTL секунд, после этого до METADATA_CACHE_STALE_TTL
+    она еще отвечает на проверки длительности и размера (stale-while-revalidate),
+    а обновляется в фоне. Ссылки форматов переиспользуются для скачивания, только
+    пока не истек их подписанный срок expire (с запасом METADATA_URL_MARGIN) и только
+    на том же хосте.
+    """
+    
+    def __init__(self, db_service: Optional['DatabaseService'] = None, maxsize: int = None,
+                 ttl: float = None, stale_ttl: float = None, url_margin: float = None):
+        self.db_service = db_service
+        self.maxsize = maxsize or settings.METADATA_CACHE_SIZE
+        self.ttl = settings.METADATA_CACHE_TTL if ttl is None else ttl
+        self.stale_ttl = max(self.ttl, settings.METADATA_CACHE_STALE_TTL if stale_ttl is None else stale_ttl)
+        self.url_margin = settings.METADATA_URL_MARGIN if url_margin is None else url_margin
+        self._memory = TTLCache(maxsize=self.maxsize, ttl=self.stale_ttl)
+        self._refreshing = set()
+        self._lock = threading.Lock()
+    
+    def __reduce__(self) -> Tuple[Any, Tuple]:
+        # В дочернем процессе (DOWNLOAD_EXECUTOR=process) соединений с БД нет:
+        # там используется общий для процесса кэш в памяти
+        return shared_metadata_cache, (self.maxsize, self.ttl, self.stale_ttl, self.url_margin)
+    
+    def get(self, video_id: str) -> Optional[CachedMetadata]:
+        """Найти запись: сначала в памяти, затем в БД"""
+        now = time.time()
+        entry = self._memory.get(video_id)
+        if entry is None and self.db_service is not None:
+            row = self.db_service.get_video_metadata(video_id)
+            if row and row['stale_until'] > now:
+                entry = CachedMetadata(**row)
+                self._memory.set(video_id, entry, ttl=entry.stale_until - now)
+        
+        if entry is None:
+            METADATA_CACHE.inc(result='miss')
+        else:
+            METADATA_CACHE.inc(result='fresh' if entry.is_fresh(now) else 'stale')
+        return entry
+    
+    def put(self, video_id: str, profile: str, info: Dict[str, Any]) -> Optional[CachedMetadata]:
+        """Запомнить результат извлечения"""
+        try:
+            info_json = json.dumps(compact_info(info), ensure_ascii=False, default=str)
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Не удалось сохранить метаданные {video_id}: {e}")
+            return None
+        
+        now = time.time()
+        # Трансляция может закончиться и стать обычным видео: без устаревшего окна
+        stale_ttl = self.ttl if info.get('is_live') else self.stale_ttl
+        entry = CachedMetadata(
+            video_id=video_id,
+            profile=profile,
+            info_json=info_json,
+            host=HOST,
+            fetched_at=now,
+            fresh_until=now + self.ttl,
+            stale_until=now + stale_ttl,
+            urls_expire_at=url_expiry(info),
+        )
+        self._memory.set(video_id, entry, ttl=stale_ttl)
+        if self.db_service is not None:
+            self.db_service.save_video_metadata(entry)
+        return entry
+    
+    def urls_usable(self, entry: CachedMetadata, profile: str, now: float = None) -> bool:
+        """Можно ли скачивать по ссылкам из записи, не извлекая информацию заново"""
+        now = now or time.time()
+        if entry.profile != profile or entry.host != HOST:
+            return False
+        if entry.urls_expire_at is None:
+            # Срок ссылок неизвестен - доверяем им, пока запись свежая
+            return entry.is_fresh(now)
+        return now < entry.urls_expire_at - self.url_margin
+    
+    def invalidate(self, video_id: str) -> None:
+        """Удалить запись, ссылки которой перестали работать"""
+        self._memory.pop(video_id)
+        if self.db_service is not None:
+            self.db_service.delete_video_metadata(video_id)
+    
+    def begin_refresh(self, video_id: str) -> bool:
+        """Занять фоновое обновление записи (False - его уже выполняет другой поток)"""
+        with self._lock:
+            if video_id in self._refreshing:
+                return False
+            self._refreshing.add(video_id)
+            return True
+    
+    def end_refresh(self, video_id: str) -> None:
+        """Освободить фоновое обновление записи"""
+        with self._lock:
+            self._refreshing.discard(video_id)
+    
+    def clear(self) -> None:
+        """Очистить кэш в памяти"""
+        self._memory.clear()
+
+_shared_caches: Dict[Tuple, MetadataCache] = {}
+_shared_lock = threading.Lock()
+
+def shared_metadata_cache(maxsize: int = None, ttl: float = None, stale_ttl: float = None,
+                          url_margin: float = None) -> MetadataCache:
+    """Кэш метаданных текущего процесса в памяти с заданными настройками"""
+    key = (maxsize, ttl, stale_ttl, url_margin)
+    with _shared_lock:
+        cache = _shared_caches.get(key)
+        if cache is None:
+            cache = _shared_caches[key] = MetadataCache(None, maxsize, ttl, stale_ttl, url_margin)
+        return cache
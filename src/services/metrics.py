@@ -0,0 +1,333 @@
+import bisect
+import functools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from .tracing import traced
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограмм по умолчанию, секунды
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+def escape_label(value: Any) -> str:
+    """Экранирование значения метки"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def format_labels(names: Sequence[str], values: Sequence[Any], extra: str = '') -> str:
+    """Метки в формате Prometheus: {a="1",b="2"}"""
+    pairs = [f'{name}="{escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def format_value(value: float) -> str:
+    """Число в формате Prometheus"""
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    """Базовая метрика с метками"""
+    
+    kind = 'untyped'
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+    
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        """Значения меток в порядке labelnames"""
+        try:
+            if len(labels) == len(self.labelnames):
+                return tuple([str(labels[name]) for name in self.labelnames])
+        except KeyError:
+            pass
+        raise ValueError(f"Метрика {self.name} ожидает метки {self.labelnames}, получены {tuple(labels)}")
+    
+    def samples(self) -> Iterable[str]:
+        """Строки значений для экспорта"""
+        raise NotImplementedError
+    
+    def render(self) -> str:
+        """Метрика в текстовом формате Prometheus"""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return '\n'.join(lines)
+
+class Counter(Metric):
+    """Монотонно растущий счетчик"""
+    
+    kind = 'counter'
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+    
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        """Увеличить счетчик"""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+    
+    def value(self, **labels: Any) -> float:
+        """Текущее значение"""
+        return self._values.get(self._key(labels), 0)
+    
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in values:
+            yield f"{self.name}{format_labels(self.labelnames, key)} {format_value(value)}"
+
+class Gauge(Metric):
+    """
+    Текущее значение, которое может расти и убывать
+    
+    Значение можно задать через set или функцией set_function, которая вызывается
+    при каждом экспорте и возвращает число или словарь {значения меток: число}.
+    """
+    
+    kind = 'gauge'
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._function: Optional[Callable[[], Any]] = None
+    
+    def set(self, value: float, **labels: Any) -> None:
+        """Задать значение"""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+    
+    def set_function(self, function: Optional[Callable[[], Any]]) -> None:
+        """Вычислять значение при экспорте"""
+        self._function = function
+    
+    def _collect(self) -> List[Tuple[Tuple[str, ...], float]]:
+        """Значения на момент экспорта"""
+        if self._function is None:
+            with self._lock:
+                return list(self._values.items())
+        result = self._function()
+        if isinstance(result, dict):
+            return [((tuple(str(v) for v in key) if isinstance(key, tuple) else (str(key),)), value)
+                    for key, value in result.items()]
+        return [((), result)]
+    
+    def samples(self) -> Iterable[str]:
+        try:
+            values = self._collect()
+        except Exception as e:
+            logger.warning(f"Не удалось получить значение метрики {self.name}: {e}")
+            return
+        for key, value in values:
+            yield f"{self.name}{format_labels(self.labelnames, key)} {format_value(value)}"
+
+class Histogram(Metric):
+    """Распределение значений (обычно длительностей) по корзинам"""
+    
+    kind = 'histogram'
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Для каждого набора меток: [счетчики корзин + переполнение, сумма, количество]
+        self._values: Dict[Tuple[str, ...], list] = {}
+    
+    def observe(self, value: float, **labels: Any) -> None:
+        """Учесть значение"""
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+    
+    @contextmanager
+    def time(self, **labels: Any) -> Iterator[None]:
+        """Замерить длительность блока, в том числе завершившегося исключением"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+    
+    def count(self, **labels: Any) -> int:
+        """Количество наблюдений"""
+        state = self._values.get(self._key(labels))
+        return state[2] if state else 0
+    
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            values = [(key, list(state[0]), state[1], state[2]) for key, state in self._values.items()]
+        for key, counts, total, count in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                labels = format_labels(self.labelnames, key, f'le="{format_value(float(bound))}"')
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {format_value(total)}"
+            yield f"{self.name}_count{labels} {count}"
+
+class Registry:
+    """Набор метрик процесса"""
+    
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+    
+    def register(self, metric: Metric) -> Metric:
+        """Добавить метрику"""
+        if metric.name in self._metrics:
+            raise ValueError(f"Метрика {metric.name} уже зарегистрирована")
+        self._metrics[metric.name] = metric
+        return metric
+    
+    def render(self) -> str:
+        """Все метрики в текстовом формате Prometheus"""
+        return '\n'.join(metric.render() for metric in self._metrics.values()) + '\n'
+
+REGISTRY = Registry()
+
+# Запросы и объем
+REQUESTS = REGISTRY.register(Counter(
+    'bot_requests_total', 'Запросы на скачивание по исходу', ['outcome']
+))
+DOWNLOADED_BYTES = REGISTRY.register(Counter(
+    'bot_downloaded_bytes_total', 'Скачано байт видео'
+))
+METADATA_CACHE = REGISTRY.register(Counter(
+    'bot_metadata_cache_total', 'Обращения к кэшу метаданных видео по результату', ['result']
+))
+MEDIA_CACHE = REGISTRY.register(Counter(
+    'bot_media_cache_total', 'Обращения к кэшу видео на диске по результату', ['result']
+))
+MEDIA_CACHE_BYTES = REGISTRY.register(Gauge(
+    'bot_media_cache_bytes', 'Объем видео в кэше на диске'
+))
+
+# Время этапов
+EXTRACT_SECONDS = REGISTRY.register(Histogram(
+    'bot_extract_info_seconds', 'Время извлечения информации о видео yt-dlp'
+))
+DOWNLOAD_SECONDS = REGISTRY.register(Histogram(
+    'bot_download_seconds', 'Время скачивания выбранного формата'
+))
+UPLOAD_SECONDS = REGISTRY.register(Histogram(
+    'bot_upload_seconds', 'Время отправки видео в Telegram'
+))
+DB_SECONDS = REGISTRY.register(Histogram(
+    'bot_db_query_seconds', 'Время запросов к PostgreSQL', ['method'],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 10)
+))
+
+# Состояние пулов и очередей (значения вычисляются при экспорте)
+DOWNLOADS_IN_FLIGHT = REGISTRY.register(Gauge(
+    'bot_downloads_in_flight', 'Скачивания, выполняющиеся в пуле платформы', ['platform']
+))
+DOWNLOADS_WAITING = REGISTRY.register(Gauge(
+    'bot_downloads_waiting', 'Скачивания, ожидающие свободного места в пуле платформы', ['platform']
+))
+JOB_QUEUE_DEPTH = REGISTRY.register(Gauge(
+    'bot_job_queue_depth', 'Задания в download_jobs по статусам', ['status']
+))
+DB_POOL = REGISTRY.register(Gauge(
+    'bot_db_pool', 'Статистика пула соединений с БД', ['stat']
+))
+
+def timed(histogram: Histogram, **labels: Any) -> Callable:
+    """Декоратор: замерять длительность вызовов функции"""
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start, **labels)
+        return wrapper
+    return decorator
+
+def timed_query(func: Callable) -> Callable:
+    """Декоратор метода работы с БД: время в bot_db_query_seconds{method=...} и span db.<method>"""
+    return timed(DB_SECONDS, method=func.__name__)(traced(f"db.{func.__name__}")(func))
+
+def bind_download_pools(download_pools: Dict[str, Any]) -> None:
+    """Экспортировать загрузку пулов скачиваний по платформам"""
+    DOWNLOADS_IN_FLIGHT.set_function(lambda: {name: pool.active for name, pool in download_pools.items()})
+    DOWNLOADS_WAITING.set_function(lambda: {name: pool.waiting for name, pool in download_pools.items()})
+
+def bind_db_pool(db_service: Any) -> None:
+    """Экспортировать статистику пула соединений"""
+    DB_POOL.set_function(lambda: {
+        name: value for name, value in db_service.pool_stats().items() if isinstance(value, (int, float))
+    })
+
+def bind_job_queue(job_queue: Any) -> None:
+    """Экспортировать глубину очереди заданий"""
+    JOB_QUEUE_DEPTH.set_function(job_queue.depth)
+
+class MetricsServer:
+    """HTTP сервер с единственным адресом /metrics в фоновом потоке"""
+    
+    def __init__(self, listen: str, port: int, registry: Registry = REGISTRY):
+        self.listen = listen
+        self.port = port
+        self.registry = registry
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+    
+    def _handler_class(self) -> type:
+        """Обработчик запросов, привязанный к реестру"""
+        registry = self.registry
+        
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?', 1)[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def log_message(self, format, *args):
+                # Запросы сборщика метрик не засоряют лог
+                pass
+        
+        return Handler
+    
+    def start(self) -> None:
+        """Начать отдавать метрики"""
+        self._server = ThreadingHTTPServer((self.listen, self.port), self._handler_class())
+        self._server.daemon_threads = True
+        # При port=0 узнаем порт, выбранный системой
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name='metrics', daemon=True)
+        self._thread.start()
+        logger.info(f"Метрики доступны на http://{self.listen}:{self.port}/metrics")
+    
+    def stop(self) -> None:
+        """Остановить сервер"""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+            self._thread = None
@@ -0,0 +1,245 @@
+import fcntl
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from ..config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Недокачанный файл <video_id>.<format_id>.part, рядом состояние <video_id>.<format_id>.part.json
+PART_SUFFIX = '.part'
+STATE_SUFFIX = '.json'
+UNSAFE_NAME_RE = re.compile(r'[^A-Za-z0-9_+-]')
+
+# Как часто открытие недокачанного файла заодно удаляет заброшенные, секунды
+GC_INTERVAL = 600
+
+def merge_ranges(ranges: Iterable[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Объединить пересекающиеся и смежные диапазоны [start, end]"""
+    merged: List[Tuple[int, int]] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+def missing_ranges(done: Iterable[Tuple[int, int]], total: int) -> List[Tuple[int, int]]:
+    """Диапазоны файла размером total, которых нет в done"""
+    missing = []
+    position = 0
+    for start, end in merge_ranges(done):
+        if start > position:
+            missing.append((position, min(start, total) - 1))
+        position = max(position, end + 1)
+    if position < total:
+        missing.append((position, total - 1))
+    return missing
+
+class PartialDownload:
+    """
+    Недокачанный файл формата и его состояние: ссылка, полный размер и уже
+    скачанные диапазоны байт
+    
+    Состояние переписывается атомарно после каждого скачанного куска, поэтому
+    повтор или перезапущенный воркер продолжает с того же места. Пока объект
+    открыт, файл заблокирован flock: второй процесс или поток его не возьмет,
+    а сборка мусора не удалит.
+    """
+    
+    def __init__(self, path: str, video_id: str, format_id: str, url: str, lock_fd: int):
+        self.path = path
+        self.state_path = path + STATE_SUFFIX
+        self.video_id = video_id
+        self.format_id = format_id
+        self.url = url
+        self.total: Optional[int] = None
+        self.done: List[Tuple[int, int]] = []
+        self._lock = threading.Lock()
+        self._lock_fd = lock_fd
+    
+    def __enter__(self) -> 'PartialDownload':
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+    
+    @property
+    def done_bytes(self) -> int:
+        return sum(end - start + 1 for start, end in self.done)
+    
+    def load(self) -> None:
+        """Прочитать сохраненное состояние; чужое или поврежденное отбрасывается"""
+        try:
+            with open(self.state_path, encoding='utf-8') as state_file:
+                state = json.load(state_file)
+            total = int(state['total'])
+            done = [(int(start), int(end)) for start, end in state['done']]
+        except (OSError, ValueError, KeyError, TypeError):
+            return
+        if (state.get('video_id'), state.get('format_id')) != (self.video_id, self.format_id):
+            return
+        if os.path.getsize(self.path) != total:
+            return
+        self.total = total
+        self.done = merge_ranges(done)
+    
+    def save(self) -> None:
+        """Записать состояние атомарно (временный файл и rename)"""
+        state = {
+            'video_id': self.video_id,
+            'format_id': self.format_id,
+            'url': self.url,
+            'total': self.total,
+            'done': self.done,
+            'updated_at': time.time(),
+        }
+        temp_path = f"{self.state_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as state_file:
+            json.dump(state, state_file)
+        os.replace(temp_path, self.state_path)
+    
+    def reset(self, total: int) -> None:
+        """Начать файл заново: размер другой или состояние потеряно"""
+        with self._lock:
+            self.total = total
+            self.done = []
+            self.save()
+    
+    def mark(self, start: int, end: int) -> None:
+        """Отметить диапазон скачанным"""
+        with self._lock:
+            self.done = merge_ranges(self.done + [(start, end)])
+            self.save()
+    
+    def finish(self, target: str) -> None:
+        """Перенести докачанный файл в target и удалить состояние"""
+        shutil.move(self.path, target)
+        self._remove(self.state_path)
+    
+    def discard(self) -> None:
+        """Удалить файл и состояние (формат не подходит или размер превышен)"""
+        self._remove(self.path)
+        self._remove(self.state_path)
+    
+    def close(self) -> None:
+        """Снять блокировку"""
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+    
+    def _remove(self, path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+class PartialDownloads:
+    """
+    Каталог недокачанных файлов по ID видео и формата
+    
+    Файлы, которые не обновлялись дольше ttl (видео больше не запрашивают,
+    воркер не вернулся), удаляются при старте и затем не чаще раза в GC_INTERVAL.
+    """
+    
+    def __init__(self, directory: str = None, ttl: float = None):
+        self.directory = directory or settings.PARTIAL_DIR
+        self.ttl = settings.PARTIAL_TTL if ttl is None else ttl
+        self._last_gc = 0.0
+        os.makedirs(self.directory, exist_ok=True)
+        self.collect_garbage()
+    
+    def __reduce__(self) -> Tuple[Any, Tuple[str, float]]:
+        # Дочерний процесс (DOWNLOAD_EXECUTOR=process) открывает тот же каталог
+        return shared_partial_downloads, (self.directory, self.ttl)
+    
+    def path(self, video_id: str, format_id: str) -> str:
+        return os.path.join(self.directory, f"{video_id}.{UNSAFE_NAME_RE.sub('_', format_id)}{PART_SUFFIX}")
+    
+    def open(self, video_id: str, format_id: str, url: str) -> Optional[PartialDownload]:
+        """
+        Взять недокачанный файл формата (или новый) с сохраненным состоянием
+        
+        None - файл сейчас скачивает другой поток или процесс.
+        """
+        self.maybe_collect_garbage()
+        path = self.path(video_id, format_id)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return None
+        
+        partial = PartialDownload(path, video_id, format_id, url, fd)
+        partial.load()
+        if partial.done:
+            logger.info(f"Продолжаем {video_id} ({format_id}) с {partial.done_bytes} из {partial.total} байт")
+        return partial
+    
+    def maybe_collect_garbage(self) -> None:
+        if time.time() - self._last_gc >= GC_INTERVAL:
+            self.collect_garbage()
+    
+    def collect_garbage(self, now: float = None) -> int:
+        """Удалить недокачанные файлы и состояния старше ttl; возвращает число удаленных файлов"""
+        now = now or time.time()
+        self._last_gc = now
+        removed = 0
+        expired = now - self.ttl
+        with os.scandir(self.directory) as entries:
+            # mtime файла меняется с каждым записанным куском
+            stale = [entry.path for entry in entries
+                     if PART_SUFFIX in entry.name and entry.stat().st_mtime < expired]
+        for path in stale:
+            if path.endswith(PART_SUFFIX):
+                removed += self._remove_unlocked(path)
+            elif not os.path.exists(path.split(PART_SUFFIX + STATE_SUFFIX, 1)[0] + PART_SUFFIX):
+                # Состояние без файла или временный файл прерванной записи состояния
+                removed += self._remove(path)
+        if removed:
+            logger.info(f"Удалено заброшенных недокачанных файлов: {removed}")
+        return removed
+    
+    def _remove_unlocked(self, path: str) -> int:
+        """Удалить файл и его состояние, если файл никто не скачивает"""
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except FileNotFoundError:
+            return 0
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            return 0
+        else:
+            return self._remove(path) + self._remove(path + STATE_SUFFIX)
+        finally:
+            os.close(fd)
+    
+    def _remove(self, path: str) -> int:
+        try:
+            os.remove(path)
+            return 1
+        except FileNotFoundError:
+            return 0
+        except OSError as e:
+            logger.warning(f"Не удалось удалить недокачанный файл {path}: {e}")
+            return 0
+
+_shared_stores: Dict[Tuple[str, float], PartialDownloads] = {}
+_shared_lock = threading.Lock()
+
+def shared_partial_downloads(directory: str = None, ttl: float = None) -> PartialDownloads:
+    """Каталог недокачанных файлов текущего процесса"""
+    key = (directory or settings.PARTIAL_DIR, settings.PARTIAL_TTL if ttl is None else ttl)
+    with _shared_lock:
+        store = _shared_stores.get(key)
+        if store is None:
+            store = _shared_stores[key] = PartialDownloads(*key)
+        return store
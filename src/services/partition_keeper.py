@@ -0,0 +1,46 @@
+import logging
+import threading
+from typing import TYPE_CHECKING
+
+from ..config.settings import settings
+
+if TYPE_CHECKING:
+    from .database import DatabaseService
+
+logger = logging.getLogger(__name__)
+
+class PartitionKeeper:
+    """
+    Периодическое создание секций downloads на будущие месяцы
+    
+    Без него секции создаются только при старте и командой manage.py partitions:
+    у долго работающего процесса строки нового месяца попадали бы в downloads_default.
+    Ошибка БД пишется в лог, попытка повторяется на следующем такте.
+    """
+    
+    def __init__(self, db_service: 'DatabaseService', interval: float = None):
+        self.db_service = db_service
+        self.interval = settings.DB_PARTITION_CHECK_INTERVAL if interval is None else interval
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def start(self) -> None:
+        """Запуск фонового потока (interval=0 - выключено)"""
+        if self._thread is None and self.interval > 0:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='partition-keeper', daemon=True)
+            self._thread.start()
+    
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.db_service.ensure_partitions()
+            except Exception as e:
+                logger.error(f"Ошибка создания секций downloads: {e}")
+    
+    def close(self) -> None:
+        """Остановка фонового потока"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,169 @@
+import re
+from dataclasses import dataclass, field, replace
+from typing import Any, Callable, Dict, Iterable, Iterator, NamedTuple, Optional, Tuple
+
+from .youtube_url import parse_youtube_url
+from ..config.settings import settings
+
+YOUTUBE = 'youtube'
+
+# (ID видео на платформе, время начала в секундах)
+ParsedURL = Tuple[str, Optional[int]]
+
+# Начало ссылки до хоста платформы: схема и любые поддомены
+HOST_PREFIX = r'\s*(?:https?://)?(?:[\w-]+\.)*'
+
+class PathURLParser:
+    """
+    Разбор ссылки по хостам и шаблону пути с группой id
+    
+    Класс, а не замыкание: загрузчик вместе с платформой передается в пул процессов.
+    """
+    
+    def __init__(self, hosts: str, path: str):
+        self.url_re = re.compile(
+            r'\s*(?:(?i:https?)://)?(?:(?i:www|m|player)\.)?'
+            rf'(?i:{hosts})(?::\d+)?{path}/?(?:[?#]\S*)?\s*'
+        )
+    
+    def __call__(self, url: str) -> Optional[ParsedURL]:
+        match = self.url_re.fullmatch(url)
+        return (match.group('id'), None) if match else None
+
+@dataclass
+class Platform:
+    """
+    Платформа видео: распознавание ссылок, профиль yt-dlp, лимиты и размер пула
+    
+    Ключ видео (video_id в кэшах, очереди заданий и downloads) у YouTube - ID как есть,
+    у остальных платформ - ID с префиксом платформы, чтобы ID разных платформ не совпадали.
+    """
+    name: str
+    title: str
+    hosts: str  # регулярное выражение хостов для общего выражения реестра
+    parse_url: Callable[[str], Optional[ParsedURL]]
+    url_template: str  # каноническая ссылка по ID видео на платформе
+    examples: Tuple[str, ...] = ()
+    ydl_options: Dict[str, Any] = field(default_factory=dict)  # поверх общих настроек скачивания
+    max_duration: Optional[int] = None  # None - MAX_DURATION
+    max_file_size: Optional[int] = None  # None - MAX_FILE_SIZE
+    workers: Optional[int] = None  # None - DOWNLOAD_WORKERS
+    
+    def key(self, native_id: str) -> str:
+        """Ключ видео по ID на платформе"""
+        return native_id if self.name == YOUTUBE else f"{self.name}-{native_id}"
+    
+    def native_id(self, key: str) -> str:
+        """ID видео на платформе по ключу"""
+        return key if self.name == YOUTUBE else key[len(self.name) + 1:]
+    
+    def parse(self, url: str) -> Optional[ParsedURL]:
+        """(ключ видео, время начала) или None, если это не ссылка на видео платформы"""
+        parsed = self.parse_url(url)
+        return (self.key(parsed[0]), parsed[1]) if parsed else None
+    
+    def canonical_url(self, key: str) -> str:
+        """Каноническая ссылка на видео без посторонних параметров"""
+        return self.url_template.format(id=self.native_id(key))
+    
+    def profile(self, name: str) -> str:
+        """Имя профиля пула YoutubeDL: у каждой платформы свои настройки yt-dlp"""
+        return name if self.name == YOUTUBE else f"{self.name}-{name}"
+
+class MediaURL(NamedTuple):
+    """Ссылка, распознанная реестром платформ"""
+    platform: Platform
+    video_id: str
+    start_time: Optional[int] = None
+
+BUILTIN_PLATFORMS: Dict[str, Platform] = {platform.name: platform for platform in (
+    Platform(
+        name=YOUTUBE,
+        title='YouTube',
+        hosts=r'youtube\.com|youtube-nocookie\.com|youtu\.be',
+        parse_url=parse_youtube_url,
+        url_template='https://www.youtube.com/watch?v={id}',
+        examples=('https://www.youtube.com/watch?v=...', 'https://youtu.be/...', 'https://youtube.com/shorts/...'),
+        ydl_options={
+            'extractor_args': {
+                'youtube': {
+                    'skip': ['dash', 'hls'],
+                    'player_client': ['android', 'web'],
+                }
+            },
+        },
+    ),
+    Platform(
+        name='vimeo',
+        title='Vimeo',
+        hosts=r'vimeo\.com',
+        parse_url=PathURLParser(r'vimeo\.com', r'/(?:video/|channels/[\w-]+/)?(?P<id>\d+)'),
+        url_template='https://vimeo.com/{id}',
+        examples=('https://vimeo.com/...',),
+    ),
+    Platform(
+        name='tiktok',
+        title='TikTok',
+        hosts=r'tiktok\.com',
+        parse_url=PathURLParser(r'tiktok\.com', r'/(?:@[\w.-]*/video|embed(?:/v2)?)/(?P<id>\d+)'),
+        # Экстрактор TikTok принимает ссылку без имени автора
+        url_template='https://www.tiktok.com/@/video/{id}',
+        examples=('https://www.tiktok.com/@.../video/...',),
+    ),
+)}
+
+class PlatformRegistry:
+    """
+    Платформы, ссылки на которые принимает бот
+    
+    Хосты всех платформ собраны в одно регулярное выражение с именованной группой
+    на платформу: ссылка проверяется одним проходом, платформу называет сработавшая
+    группа, а путь и ID разбирает только парсер этой платформы.
+    """
+    
+    def __init__(self, platforms: Iterable[Platform]):
+        self.platforms: Dict[str, Platform] = {platform.name: platform for platform in platforms}
+        if not self.platforms:
+            raise ValueError("At least one platform is required")
+        alternatives = '|'.join(f"(?P<{name}>{platform.hosts})" for name, platform in self.platforms.items())
+        self.dispatch_re = re.compile(rf'{HOST_PREFIX}(?:{alternatives})(?::\d+)?(?:[/?#\s]|$)', re.IGNORECASE)
+    
+    def __iter__(self) -> Iterator[Platform]:
+        return iter(self.platforms.values())
+    
+    def __len__(self) -> int:
+        return len(self.platforms)
+    
+    def get(self, name: str) -> Optional[Platform]:
+        return self.platforms.get(name)
+    
+    def route(self, url: str) -> Optional[MediaURL]:
+        """Платформа и ключ видео по ссылке; None - ссылка не на видео поддерживаемой платформы"""
+        match = self.dispatch_re.match(url)
+        if not match:
+            return None
+        platform = self.platforms[match.lastgroup]
+        parsed = platform.parse(url)
+        return MediaURL(platform, *parsed) if parsed else None
+    
+    def title(self, name: str) -> str:
+        """Название платформы для сообщений (в том числе отключенной, из старой статистики)"""
+        platform = self.platforms.get(name) or BUILTIN_PLATFORMS.get(name)
+        return platform.title if platform else name
+
+def parse_platform_map(value: str) -> Dict[str, int]:
+    """Значения по платформам: 'youtube=4,tiktok=2' -> {'youtube': 4, 'tiktok': 2}"""
+    return {name: int(number) for name, number in (item.split('=', 1) for item in value.split(',') if item)}
+
+def build_registry(names: str = None, workers: str = None, max_duration: str = None) -> PlatformRegistry:
+    """Реестр платформ по настройкам PLATFORMS, PLATFORM_WORKERS и PLATFORM_MAX_DURATION"""
+    names = [name for name in (settings.PLATFORMS if names is None else names).split(',') if name]
+    workers = parse_platform_map(settings.PLATFORM_WORKERS if workers is None else workers)
+    max_duration = parse_platform_map(settings.PLATFORM_MAX_DURATION if max_duration is None else max_duration)
+    unknown = (set(names) | set(workers) | set(max_duration)) - set(BUILTIN_PLATFORMS)
+    if unknown:
+        raise ValueError(f"Unknown platforms: {', '.join(sorted(unknown))}")
+    return PlatformRegistry(
+        replace(BUILTIN_PLATFORMS[name], workers=workers.get(name), max_duration=max_duration.get(name))
+        for name in names
+    )
@@ -0,0 +1,237 @@
+import io
+import logging
+import os
+import re
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import IO, TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from yt_dlp.networking import Request
+
+from .partial_downloads import missing_ranges
+
+if TYPE_CHECKING:
+    from .partial_downloads import PartialDownload
+
+logger = logging.getLogger(__name__)
+
+READ_SIZE = 256 * 1024
+CONTENT_RANGE_RE = re.compile(r'bytes (\d+)-(\d+)/(\d+)')
+
+# Запись куска: (смещение в файле, данные)
+Writer = Callable[[int, bytes], None]
+
+class FileTooLarge(Exception):
+    """Скачиваемый файл превысил MAX_FILE_SIZE"""
+
+class RangesNotSupported(Exception):
+    """Сервер не отдает байтовые диапазоны (нет ответа 206 с Content-Range)"""
+
+class DownloadCancelled(Exception):
+    """Кусок не докачивается: другой кусок того же файла уже не удался"""
+
+def pwrite_all(fd: int, data: bytes, offset: int) -> None:
+    """os.pwrite, дописывающий данные при частичной записи"""
+    view = memoryview(data)
+    while view:
+        written = os.pwrite(fd, view, offset)
+        view = view[written:]
+        offset += written
+
+class RangeDownloader:
+    """
+    Скачивание файла по одной ссылке параллельными байтовыми диапазонами
+    
+    YouTube ограничивает скорость одного соединения, поэтому крупный формат быстрее
+    скачать несколькими Range запросами одновременно. Ответ на первый кусок сообщает
+    полный размер в Content-Range: превышение лимита отклоняется до того, как начнутся
+    остальные куски. Куски пишутся по своим смещениям в заранее выделенный файл
+    (os.pwrite) или буфер в памяти. Оборвавшийся кусок дозапрашивается с места обрыва
+    до retries раз, не затрагивая остальные.
+    """
+    
+    def __init__(self, urlopen: Callable[[Request], Any], connections: int, chunk_size: int,
+                 retries: int, max_size: int):
+        self.urlopen = urlopen
+        self.connections = connections
+        self.chunk_size = chunk_size
+        self.retries = retries
+        self.max_size = max_size
+    
+    def _open(self, url: str, headers: Dict[str, str], start: int, end: int) -> Any:
+        request_headers = dict(headers)
+        request_headers['Range'] = f"bytes={start}-{end}"
+        return self.urlopen(Request(url, headers=request_headers))
+    
+    def _total_size(self, response: Any, start: int = 0) -> int:
+        """Полный размер файла из ответа на первый запрошенный кусок"""
+        match = CONTENT_RANGE_RE.fullmatch((response.headers.get('Content-Range') or '').strip())
+        if response.status != 206 or not match or int(match.group(1)) != start:
+            raise RangesNotSupported(f"HTTP {response.status}")
+        return int(match.group(3))
+    
+    def split(self, ranges: Iterable[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        """Разбить диапазоны [start, end] на куски не больше chunk_size"""
+        return [(start, min(start + self.chunk_size - 1, end))
+                for first, end in ranges for start in range(first, end + 1, self.chunk_size)]
+    
+    def chunks(self, total: int) -> List[Tuple[int, int]]:
+        """Диапазоны [start, end] кусков файла"""
+        return self.split([(0, total - 1)]) if total else []
+    
+    def _fetch(self, url: str, headers: Dict[str, str], start: int, end: int, write: Writer,
+               cancelled: threading.Event, on_done: Callable[[int, int], None], response: Any = None) -> None:
+        """Скачать кусок, при обрыве продолжая с недокачанного байта"""
+        position = start
+        attempt = 0
+        try:
+            while position <= end:
+                try:
+                    if cancelled.is_set():
+                        raise DownloadCancelled()
+                    if response is None:
+                        response = self._open(url, headers, position, end)
+                        if response.status != 206:
+                            raise IOError(f"HTTP {response.status} на диапазон {position}-{end}")
+                    with response:
+                        while position <= end:
+                            data = response.read(min(READ_SIZE, end - position + 1))
+                            if not data:
+                                raise IOError(f"Соединение закрыто на байте {position} из {start}-{end}")
+                            write(position, data)
+                            position += len(data)
+                            if cancelled.is_set():
+                                raise DownloadCancelled()
+                except DownloadCancelled:
+                    raise
+                except Exception as e:
+                    attempt += 1
+                    if attempt > self.retries:
+                        # Остальные куски не начинаются и прерываются
+                        cancelled.set()
+                        raise
+                    logger.warning(f"Кусок {start}-{end} оборвался на байте {position}: {e}, повтор {attempt}")
+                finally:
+                    response = None
+        finally:
+            # Скачанная часть куска пригодится при возобновлении, даже если он не докачан
+            if position > start:
+                on_done(start, position - 1)
+    
+    def _download(self, url: str, headers: Dict[str, str], allocate: Callable[[int, bool], Writer],
+                  partial: Optional['PartialDownload'] = None) -> int:
+        """
+        Узнать размер по первому недостающему куску, выделить место и скачать
+        все недостающие куски
+        """
+        resume = partial is not None and bool(partial.total)
+        if resume:
+            missing = missing_ranges(partial.done, partial.total)
+            if not missing:
+                return partial.total
+            first = self.split(missing[:1])[0]
+        else:
+            first = (0, self.chunk_size - 1)
+        
+        response = self._open(url, headers, *first)
+        try:
+            total = self._total_size(response, first[0])
+            if total > self.max_size:
+                raise FileTooLarge(total)
+            if partial is not None and partial.total != total:
+                # Файл по ссылке не тот, что скачивался раньше: начинаем заново
+                partial.reset(total)
+                resume = False
+            write = allocate(total, resume)
+        except BaseException:
+            response.close()
+            raise
+        
+        first = (first[0], min(first[1], total - 1))
+        done = partial.done if partial is not None else []
+        chunks = [first] + self.split(missing_ranges(done + [first], total))
+        on_done = partial.mark if partial is not None else (lambda start, end: None)
+        cancelled = threading.Event()
+        with ThreadPoolExecutor(max_workers=min(self.connections, len(chunks)),
+                                thread_name_prefix='range') as executor:
+            # Первый кусок уже запрошен - читаем его из того же ответа
+            futures = [executor.submit(self._fetch, url, headers, *first, write, cancelled, on_done, response)]
+            futures += [executor.submit(self._fetch, url, headers, start, end, write, cancelled, on_done)
+                        for start, end in chunks[1:]]
+            error = None
+            try:
+                for future in futures:
+                    try:
+                        future.result()
+                    except DownloadCancelled:
+                        pass
+                    except Exception as e:
+                        error = error or e
+            except BaseException:
+                cancelled.set()
+                raise
+        if error is not None:
+            raise error
+        return total
+    
+    def download_to_file(self, url: str, headers: Dict[str, str], path: str,
+                         partial: Optional['PartialDownload'] = None) -> int:
+        """
+        Скачать в файл path, место под который выделяется сразу на весь размер
+        
+        С partial скачанные диапазоны записываются в его состояние, а уже
+        скачанные раньше не запрашиваются повторно.
+        """
+        fd = None
+        
+        def allocate(total: int, resume: bool) -> Writer:
+            nonlocal fd
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | (0 if resume else os.O_TRUNC), 0o600)
+            try:
+                # Нехватка места обнаруживается до скачивания
+                os.posix_fallocate(fd, 0, total)
+            except (AttributeError, OSError):
+                os.ftruncate(fd, total)
+            return lambda offset, data: pwrite_all(fd, data, offset)
+        
+        try:
+            return self._download(url, headers, allocate, partial)
+        finally:
+            if fd is not None:
+                os.close(fd)
+    
+    def download_to_buffer(self, url: str, headers: Dict[str, str], spool_size: int) -> IO[bytes]:
+        """
+        Скачать в буфер: в памяти, если файл не больше spool_size, иначе
+        в анонимный временный файл
+        """
+        buffer = None
+        view = None
+        
+        def allocate(total: int, resume: bool) -> Writer:
+            nonlocal buffer, view
+            if total <= spool_size:
+                buffer = io.BytesIO(bytes(total))
+                view = buffer.getbuffer()
+                
+                def write(offset: int, data: bytes) -> None:
+                    view[offset:offset + len(data)] = data
+                return write
+            
+            buffer = tempfile.TemporaryFile(suffix='.mp4')
+            os.ftruncate(buffer.fileno(), total)
+            return lambda offset, data: pwrite_all(buffer.fileno(), data, offset)
+        
+        try:
+            self._download(url, headers, allocate)
+        except BaseException:
+            if view is not None:
+                view.release()
+            if buffer is not None:
+                buffer.close()
+            raise
+        if view is not None:
+            view.release()
+        buffer.seek(0)
+        return buffer
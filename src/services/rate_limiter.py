@@ -0,0 +1,165 @@
+import asyncio
+import logging
+import time
+from typing import TYPE_CHECKING, Dict, List, NamedTuple, Optional, Tuple
+
+from .cache import TTLCache
+from ..config.settings import settings
+
+if TYPE_CHECKING:
+    from .database import DatabaseService
+
+logger = logging.getLogger(__name__)
+
+SCOPE_USER = 'user'
+SCOPE_GLOBAL = 'global'
+
+class RateDecision(NamedTuple):
+    """Результат проверки лимита"""
+    allowed: bool
+    retry_after: float = 0.0  # через сколько секунд появится токен
+    scope: Optional[str] = None  # какой лимит сработал: user или global
+
+class TokenBucket:
+    """Корзина токенов: пополняется на rate токенов в секунду, вмещает не больше burst"""
+    
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = now
+    
+    def wait_time(self, now: float) -> float:
+        """Пополнить корзину и вернуть, сколько ждать до следующего токена (0 - токен есть)"""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+    
+    def consume(self) -> None:
+        """Забрать токен"""
+        self.tokens -= 1
+
+class RateLimiter:
+    """
+    Ограничение частоты запросов корзинами токенов в памяти процесса:
+    отдельная корзина на каждого пользователя и одна общая
+    
+    Запрос проходит, только если токен есть в обеих корзинах, и тогда забирается
+    из обеих. Лимит с rate <= 0 отключен. Корзины пользователей хранятся в LRU
+    и забываются, когда успели бы наполниться заново, поэтому память ограничена.
+    """
+    
+    def __init__(self, user_rate: float = None, user_burst: float = None,
+                 global_rate: float = None, global_burst: float = None, maxsize: int = None):
+        # Rate в настройках задается в запросах в минуту
+        self.user_rate = (settings.RATE_LIMIT_USER_PER_MINUTE if user_rate is None else user_rate) / 60
+        self.user_burst = settings.RATE_LIMIT_USER_BURST if user_burst is None else user_burst
+        self.global_rate = (settings.RATE_LIMIT_GLOBAL_PER_MINUTE if global_rate is None else global_rate) / 60
+        self.global_burst = settings.RATE_LIMIT_GLOBAL_BURST if global_burst is None else global_burst
+        
+        idle_ttl = self.user_burst / self.user_rate if self.user_rate > 0 else 0
+        self._users = TTLCache(maxsize=maxsize or settings.RATE_LIMIT_CACHE_SIZE, ttl=idle_ttl)
+        self._global: Optional[TokenBucket] = None
+        self.rejected: Dict[str, int] = {SCOPE_USER: 0, SCOPE_GLOBAL: 0}
+    
+    def limits(self, user_id: int) -> List[Tuple[str, str, float, float]]:
+        """Включенные лимиты для пользователя: (scope, ключ, rate, burst)"""
+        limits = []
+        if self.user_rate > 0:
+            limits.append((SCOPE_USER, f"user:{user_id}", self.user_rate, self.user_burst))
+        if self.global_rate > 0:
+            limits.append((SCOPE_GLOBAL, SCOPE_GLOBAL, self.global_rate, self.global_burst))
+        return limits
+    
+    def _bucket(self, scope: str, key: str, rate: float, burst: float, now: float) -> TokenBucket:
+        """Корзина по ключу (новая корзина полна)"""
+        if scope == SCOPE_GLOBAL:
+            if self._global is None:
+                self._global = TokenBucket(rate, burst, now)
+            return self._global
+        bucket = self._users.get(key)
+        if bucket is None:
+            bucket = TokenBucket(rate, burst, now)
+        self._users.set(key, bucket)
+        return bucket
+    
+    def check(self, user_id: int) -> RateDecision:
+        """Проверить лимиты и забрать токены, если запрос проходит"""
+        now = time.monotonic()
+        buckets = []
+        for scope, key, rate, burst in self.limits(user_id):
+            bucket = self._bucket(scope, key, rate, burst, now)
+            wait = bucket.wait_time(now)
+            if wait > 0:
+                return self.reject(scope, wait)
+            buckets.append(bucket)
+        
+        for bucket in buckets:
+            bucket.consume()
+        return RateDecision(True)
+    
+    def reject(self, scope: str, retry_after: float) -> RateDecision:
+        """Учесть отказ"""
+        self.rejected[scope] += 1
+        return RateDecision(False, retry_after, scope)
+    
+    async def acquire(self, user_id: int) -> RateDecision:
+        """Проверить лимиты для запроса пользователя"""
+        return self.check(user_id)
+
+class PostgresRateLimiter(RateLimiter):
+    """
+    Корзины токенов в таблице rate_limit_buckets, общие для всех реплик бота
+    
+    Пополнение и списание выполняются в одной транзакции: строки корзин блокируются
+    upsert'ом в фиксированном порядке (сначала пользователь, затем общая), поэтому
+    параллельные реплики не тратят один токен дважды и не блокируют друг друга
+    взаимно. Если БД недоступна, запрос пропускается - лимитер не должен ронять бота.
+    """
+    
+    def __init__(self, db_service: 'DatabaseService', **kwargs):
+        super().__init__(**kwargs)
+        self.db_service = db_service
+    
+    def check(self, user_id: int) -> RateDecision:
+        """Проверить лимиты и забрать токены в БД"""
+        limits = self.limits(user_id)
+        if not limits:
+            return RateDecision(True)
+        try:
+            with self.db_service.get_connection() as conn:
+                cursor = conn.cursor()
+                waits = []
+                for scope, key, rate, burst in limits:
+                    cursor.execute("""
+                        INSERT INTO rate_limit_buckets AS b (key, tokens, updated_at)
+                        VALUES (%s, %s, now())
+                        ON CONFLICT (key) DO UPDATE
+                        SET tokens = LEAST(%s, b.tokens + EXTRACT(EPOCH FROM now() - b.updated_at) * %s),
+                            updated_at = now()
+                        RETURNING tokens
+                    """, (key, burst, burst, rate))
+                    tokens = cursor.fetchone()[0]
+                    waits.append((scope, 0.0 if tokens >= 1 else (1 - tokens) / rate))
+                
+                if all(wait == 0 for _, wait in waits):
+                    cursor.execute(
+                        "UPDATE rate_limit_buckets SET tokens = tokens - 1 WHERE key = ANY(%s)",
+                        ([key for _, key, _, _ in limits],)
+                    )
+                conn.commit()
+        except Exception as e:
+            logger.warning(f"Не удалось проверить лимит запросов в БД: {e}")
+            return RateDecision(True)
+        
+        for scope, wait in waits:
+            if wait > 0:
+                return self.reject(scope, wait)
+        return RateDecision(True)
+    
+    async def acquire(self, user_id: int) -> RateDecision:
+        """Проверить лимиты, не блокируя event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.check, user_id)
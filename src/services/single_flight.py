@@ -0,0 +1,48 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+class SingleFlight:
+    """Реестр выполняющихся операций: одинаковые запросы ждут первый вместо повтора"""
+    
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+    
+    def is_running(self, key: Hashable) -> bool:
+        """Проверка, выполняется ли уже операция по ключу"""
+        return key in self._calls
+    
+    def __len__(self) -> int:
+        return len(self._calls)
+    
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Выполнить операцию или присоединиться к уже запущенной
+        
+        Returns:
+            Tuple[Any, bool]: (result, shared) - shared=True, если результат получен от чужого запуска
+        """
+        future = self._calls.get(key)
+        if future is not None:
+            # shield: отмена одного ожидающего не должна отменять общий результат
+            return await asyncio.shield(future), True
+        
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        try:
+            result = await func()
+        except asyncio.CancelledError:
+            # Ожидающие получают обычное исключение: CancelledError не ловится
+            # через except Exception, и их сообщения о статусе остались бы без ответа
+            future.set_exception(RuntimeError(f"Operation {key!r} was cancelled"))
+            future.exception()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Помечаем исключение полученным, если ожидающих не было
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            del self._calls[key]
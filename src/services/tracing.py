@@ -0,0 +1,162 @@
+import contextvars
+import functools
+import json
+import logging
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from ..config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+class Span:
+    """Замер одного этапа обработки запроса"""
+    
+    __slots__ = ('trace', 'name', 'span_id', 'parent_id', 'started_at', 'duration', 'attributes')
+    
+    def __init__(self, trace: 'Trace', name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.trace = trace
+        self.name = name
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.started_at = time.time()
+        self.duration: Optional[float] = None
+        self.attributes = attributes
+    
+    def set(self, key: str, value: Any) -> None:
+        """Добавить атрибут"""
+        self.attributes[key] = value
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Span для экспорта в JSON"""
+        return {
+            'request_id': self.trace.request_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start': round(self.started_at, 6),
+            'duration_ms': round(self.duration * 1000, 3),
+            'attributes': self.attributes,
+        }
+
+class NoopSpan:
+    """Span запроса, не попавшего в выборку: атрибуты отбрасываются"""
+    
+    def set(self, key: str, value: Any) -> None:
+        pass
+
+NOOP_SPAN = NoopSpan()
+
+class Trace:
+    """Завершенные span'ы одного запроса, которые выгружаются вместе"""
+    
+    def __init__(self, request_id: str):
+        self.request_id = request_id
+        self.spans: List[Span] = []
+
+class JsonLinesExporter:
+    """Запись span'ов в файл, по одному JSON объекту на строку"""
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+    
+    def export(self, spans: List[Span]) -> None:
+        """Дописать span'ы запроса в файл"""
+        lines = ''.join(json.dumps(span.to_dict(), ensure_ascii=False, default=str) + '\n' for span in spans)
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as trace_file:
+                trace_file.write(lines)
+
+_request_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar('request_id', default=None)
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar('current_span', default=None)
+
+_exporter: Optional[JsonLinesExporter] = JsonLinesExporter(settings.TRACE_FILE) if settings.TRACE_FILE else None
+_sample_rate: float = settings.TRACE_SAMPLE_RATE
+
+def configure(path: Optional[str], sample_rate: float) -> None:
+    """Задать файл выгрузки (None - выключить) и долю запросов в выборке"""
+    global _exporter, _sample_rate
+    _exporter = JsonLinesExporter(path) if path else None
+    _sample_rate = sample_rate
+
+def current_request_id() -> Optional[str]:
+    """ID текущего запроса"""
+    return _request_id.get()
+
+def current_span() -> Any:
+    """Текущий span (NOOP_SPAN вне выборки)"""
+    return _current_span.get() or NOOP_SPAN
+
+@contextmanager
+def _open_span(trace: Trace, name: str, parent_id: Optional[str], attributes: Dict[str, Any]) -> Iterator[Span]:
+    """Открыть span, сделать его текущим и записать длительность по выходу"""
+    span = Span(trace, name, parent_id, attributes)
+    token = _current_span.set(span)
+    start = time.perf_counter()
+    try:
+        yield span
+    except BaseException as e:
+        span.set('error', type(e).__name__)
+        raise
+    finally:
+        span.duration = time.perf_counter() - start
+        _current_span.reset(token)
+        trace.spans.append(span)
+
+@contextmanager
+def start_trace(name: str, request_id: str = None, **attributes: Any) -> Iterator[Any]:
+    """
+    Начать обработку запроса: новый request ID и корневой span
+    
+    В выборку попадает доля TRACE_SAMPLE_RATE запросов; у остальных есть только
+    request ID, а span'ы не создаются, поэтому накладные расходы почти нулевые.
+    """
+    request_token = _request_id.set(request_id or uuid.uuid4().hex[:16])
+    exporter = _exporter
+    try:
+        if exporter is None or random.random() >= _sample_rate:
+            yield NOOP_SPAN
+            return
+        
+        trace = Trace(_request_id.get())
+        try:
+            with _open_span(trace, name, None, attributes) as root:
+                yield root
+        finally:
+            try:
+                exporter.export(trace.spans)
+            except Exception as e:
+                logger.warning(f"Не удалось выгрузить трассировку {trace.request_id}: {e}")
+    finally:
+        _request_id.reset(request_token)
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Any]:
+    """Замерить этап внутри текущего запроса"""
+    parent = _current_span.get()
+    if parent is None:
+        yield NOOP_SPAN
+        return
+    with _open_span(parent.trace, name, parent.span_id, attributes) as child:
+        yield child
+
+def traced(name: str) -> Callable:
+    """Декоратор: вызов функции - span с заданным именем"""
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current_span.get() is None:
+                return func(*args, **kwargs)
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def in_context(func: Callable, *args: Any) -> Callable[[], Any]:
+    """Вызов для пула потоков с контекстом текущего запроса (run_in_executor его не передает)"""
+    return functools.partial(contextvars.copy_context().run, func, *args)
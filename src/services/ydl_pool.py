@@ -0,0 +1,119 @@
+import logging
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import yt_dlp
+
+from ..config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+class PooledYoutubeDL:
+    """Экземпляр YoutubeDL в пуле и число выполненных им запросов"""
+    
+    __slots__ = ('ydl', 'uses')
+    
+    def __init__(self, ydl: yt_dlp.YoutubeDL):
+        self.ydl = ydl
+        self.uses = 0
+
+class YoutubeDLPool:
+    """
+    Пул долгоживущих экземпляров YoutubeDL по профилям настроек
+    
+    Создание YoutubeDL заново загружает экстракторы, HTTP opener и cookie jar;
+    экземпляр из пула переиспользует их, а кэш плеера и подписей хранится в общем
+    cachedir. Экземпляр выдается одному потоку за раз и пересоздается после
+    max_uses запросов, чтобы не копить состояние (cookies, кэш экстракторов).
+    """
+    
+    def __init__(self, max_idle: int = None, max_uses: int = None):
+        self.max_idle = max_idle or settings.YTDL_POOL_SIZE
+        self.max_uses = max_uses or settings.YTDL_MAX_USES
+        self._lock = threading.Lock()
+        self._idle: Dict[str, List[PooledYoutubeDL]] = defaultdict(list)
+        self.created = 0
+        self.recycled = 0
+    
+    def __reduce__(self) -> Tuple[Callable, Tuple[int, int]]:
+        # В дочерний процесс (DOWNLOAD_EXECUTOR=process) передаются только настройки:
+        # там используется свой пул, общий для всех вызовов в этом процессе
+        return shared_pool, (self.max_idle, self.max_uses)
+    
+    def _acquire(self, profile: str, options: Callable[[], Dict[str, Any]]) -> PooledYoutubeDL:
+        """Свободный экземпляр профиля или новый"""
+        with self._lock:
+            idle = self._idle[profile]
+            if idle:
+                return idle.pop()
+            self.created += 1
+        # Новый экземпляр создается вне блокировки: это самая долгая часть
+        return PooledYoutubeDL(yt_dlp.YoutubeDL(options()))
+    
+    def _release(self, profile: str, entry: PooledYoutubeDL) -> None:
+        """Вернуть экземпляр в пул или закрыть, если он отработал свое"""
+        entry.uses += 1
+        with self._lock:
+            keep = entry.uses < self.max_uses and len(self._idle[profile]) < self.max_idle
+            if keep:
+                self._idle[profile].append(entry)
+            else:
+                self.recycled += 1
+        if not keep:
+            self._close(entry)
+    
+    def _close(self, entry: PooledYoutubeDL) -> None:
+        try:
+            entry.ydl.close()
+        except Exception as e:
+            logger.warning(f"Не удалось закрыть экземпляр YoutubeDL: {e}")
+    
+    @contextmanager
+    def lease(self, profile: str, options: Callable[[], Dict[str, Any]]) -> Iterator[yt_dlp.YoutubeDL]:
+        """
+        Взять экземпляр профиля на время блока with
+        
+        options вызывается только при создании нового экземпляра, поэтому
+        экземпляры одного профиля должны строиться из одинаковых настроек.
+        """
+        entry = self._acquire(profile, options)
+        try:
+            yield entry.ydl
+        finally:
+            self._release(profile, entry)
+    
+    def warm_up(self, profile: str, options: Callable[[], Dict[str, Any]], count: int = 1) -> None:
+        """Заранее создать экземпляры профиля, чтобы первые запросы не ждали инициализации"""
+        entries = [self._acquire(profile, options) for _ in range(min(count, self.max_idle))]
+        for entry in entries:
+            with self._lock:
+                self._idle[profile].append(entry)
+    
+    def idle_count(self, profile: str = None) -> int:
+        """Число свободных экземпляров (всего или профиля)"""
+        with self._lock:
+            if profile is not None:
+                return len(self._idle.get(profile, ()))
+            return sum(len(idle) for idle in self._idle.values())
+    
+    def close(self) -> None:
+        """Закрыть все свободные экземпляры"""
+        with self._lock:
+            entries = [entry for idle in self._idle.values() for entry in idle]
+            self._idle.clear()
+        for entry in entries:
+            self._close(entry)
+
+_shared_pools: Dict[Tuple[int, int], YoutubeDLPool] = {}
+_shared_lock = threading.Lock()
+
+def shared_pool(max_idle: Optional[int] = None, max_uses: Optional[int] = None) -> YoutubeDLPool:
+    """Пул текущего процесса с заданными настройками"""
+    key = (max_idle or settings.YTDL_POOL_SIZE, max_uses or settings.YTDL_MAX_USES)
+    with _shared_lock:
+        pool = _shared_pools.get(key)
+        if pool is None:
+            pool = _shared_pools[key] = YoutubeDLPool(*key)
+        return pool
@@ -1,39 +1,97 @@
 import logging
 import os
 import tempfile
+import threading
 import yt_dlp
-from typing import Tuple, Dict, Any
+from typing import IO, Tuple, Dict, Any, Optional, Union
+from yt_dlp.networking import Request
 
+from .format_selector import FormatSelector
+from .media_cache import MediaCache, shared_media_cache
+from .metadata_cache import MetadataCache, shared_metadata_cache
+from .metrics import DOWNLOAD_SECONDS, DOWNLOADED_BYTES, EXTRACT_SECONDS
+from .partial_downloads import PartialDownload, PartialDownloads, shared_partial_downloads
+from .platforms import BUILTIN_PLATFORMS, YOUTUBE, Platform
+from .range_downloader import FileTooLarge, RangeDownloader, RangesNotSupported
+from .tracing import span
+from .ydl_pool import YoutubeDLPool, shared_pool
 from ..config.settings import settings
 
 logger = logging.getLogger(__name__)
 
+STREAM_READ_SIZE = 256 * 1024
+STREAM_PROTOCOLS = ('http', 'https')
+
+# Вид ошибки скачивания (info['error_kind']): limit и unavailable повтором не исправить
+ERROR_LIMIT = 'limit'
+ERROR_UNAVAILABLE = 'unavailable'
+ERROR_TRANSIENT = 'transient'
+PERMANENT_ERRORS = (ERROR_LIMIT, ERROR_UNAVAILABLE)
+
+# Какой лимит нарушен (info['limit'] при error_kind == 'limit')
+LIMIT_DURATION = 'duration'
+LIMIT_SIZE = 'size'
+
+def classify_error(error: Exception) -> str:
+    """Вид ошибки yt-dlp: видео недоступно (приватное, удалено) или временный сбой"""
+    cause = error
+    if isinstance(error, yt_dlp.utils.DownloadError) and error.exc_info and error.exc_info[1]:
+        cause = error.exc_info[1]
+    if isinstance(cause, yt_dlp.utils.ExtractorError) and cause.expected:
+        return ERROR_UNAVAILABLE
+    return ERROR_TRANSIENT
+
 class YouTubeDownloader:
-    """Сервис для скачивания видео с YouTube"""
+    """
+    Сервис для скачивания видео через yt-dlp
+    
+    Экземпляр обслуживает одну платформу (по умолчанию YouTube): ее профиль
+    yt-dlp и лимиты; экземпляры YoutubeDL в общем пуле у платформ разные.
+    """
     
-    def __init__(self):
-        self.max_duration = settings.MAX_DURATION
-        self.max_file_size = settings.MAX_FILE_SIZE
+    def __init__(self, ydl_pool: YoutubeDLPool = None, metadata_cache: MetadataCache = None,
+                 media_cache: MediaCache = None, partials: PartialDownloads = None,
+                 platform: Platform = None):
+        self.platform = platform or BUILTIN_PLATFORMS[YOUTUBE]
+        self.max_duration = self.platform.max_duration or settings.MAX_DURATION
+        self.max_file_size = self.platform.max_file_size or settings.MAX_FILE_SIZE
+        self.stream_mode = settings.DOWNLOAD_MODE == 'stream'
+        self.spool_size = settings.STREAM_SPOOL_SIZE
+        # Параллельное скачивание диапазонами (1 соединение - выключено)
+        self.range_connections = settings.RANGE_CONNECTIONS
+        self.range_chunk_size = settings.RANGE_CHUNK_SIZE
+        self.range_min_size = settings.RANGE_MIN_SIZE
+        self.ydl_pool = ydl_pool or shared_pool()
+        self.metadata_cache = metadata_cache or shared_metadata_cache()
+        # Кэш скачанных видео на диске (None - выключен)
+        if media_cache is None and settings.MEDIA_CACHE_DIR:
+            media_cache = shared_media_cache()
+        self.media_cache = media_cache
+        # Недокачанные файлы для возобновления (None - выключено)
+        if partials is None and settings.PARTIAL_DIR:
+            partials = shared_partial_downloads()
+        self.partials = partials
+        self.format_selector = FormatSelector(self.max_file_size, settings.MAX_HEIGHT)
+        # Ключ профиля формата для кэша file_id
+        self.format_key = f"h{settings.MAX_HEIGHT}-{self.max_file_size // (1024*1024)}mb"
+        self.info_profile = self.platform.profile('info')
     
     def get_ydl_options(self, output_path: str) -> Dict[str, Any]:
         """Получить настройки для yt-dlp"""
-        return {
-            'format': f'best[height<=720][filesize<{self.max_file_size}]/best[filesize<{self.max_file_size}]/mp4[filesize<{self.max_file_size}]/best',
+        options = {
+            'format': self.format_selector,
             'outtmpl': output_path,
+            'quiet': True,
             'no_warnings': True,
+            'progress_hooks': [self.check_progress],
             'extractaudio': False,
             'embed_subs': False,
             'writesubtitles': False,
             'writeautomaticsub': False,
             'ignoreerrors': False,
-            'no_cache_dir': True,
+            # Общий кэш плеера и подписей (None - каталог yt-dlp по умолчанию)
+            'cachedir': settings.YTDL_CACHE_DIR or None,
             'force_overwrites': True,
-            'extractor_args': {
-                'youtube': {
-                    'skip': ['dash', 'hls'],
-                    'player_client': ['android', 'web'],
-                }
-            },
             'http_headers': {
                 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
                 'Accept-Language': 'en-US,en;q=0.9',
@@ -43,28 +101,312 @@ class YouTubeDownloader:
                 'Upgrade-Insecure-Requests': '1',
             }
         }
+        # Профиль платформы: аргументы экстрактора и прочее поверх общих настроек
+        options.update(self.platform.ydl_options)
+        return options
+    
+    def get_info_options(self) -> Dict[str, Any]:
+        """Настройки yt-dlp для извлечения информации без скачивания"""
+        return {'quiet': True, 'cachedir': settings.YTDL_CACHE_DIR or None}
+    
+    def download_profile(self) -> str:
+        """Профиль пула: формат и прогресс-хук зависят от лимита размера"""
+        return self.platform.profile(f"download-{self.max_file_size}")
+    
+    def warm_up(self) -> None:
+        """Создать экземпляры YoutubeDL заранее, до первых запросов"""
+        self.ydl_pool.warm_up(self.info_profile, self.get_info_options)
+        self.ydl_pool.warm_up(self.download_profile(), lambda: self.get_ydl_options(''),
+                              self.platform.workers or settings.DOWNLOAD_WORKERS)
+    
+    def size_error(self) -> str:
+        """Сообщение о превышении лимита размера"""
+        return f"❌ Файл слишком большой (максимум {self.max_file_size//1024//1024} MB)"
+    
+    def expected_size(self, info: Dict[str, Any]) -> Optional[int]:
+        """Ожидаемый размер выбранного формата (сумма дорожек при склейке)"""
+        formats = info.get('requested_formats') or [info]
+        sizes = [f.get('filesize') or f.get('filesize_approx') for f in formats]
+        if not all(sizes):
+            return None
+        return sum(sizes)
+    
+    def check_progress(self, status: Dict[str, Any]) -> None:
+        """Прогресс-хук yt-dlp: прервать скачивание, как только байты превысят MAX_FILE_SIZE"""
+        if status.get('status') != 'downloading':
+            return
+        projected = max(status.get('downloaded_bytes') or 0, status.get('total_bytes') or 0)
+        if projected > self.max_file_size:
+            raise FileTooLarge(projected)
+    
+    def limit_error(self, message: str, info: Dict[str, Any], limit: str) -> Tuple[bool, str, Dict[str, Any]]:
+        """Отказ по лимиту длительности или размера"""
+        info['error_kind'] = ERROR_LIMIT
+        info['limit'] = limit
+        return False, message, info
+    
+    def check_limits(self, raw_info: Dict[str, Any], check_size: bool = True) -> Optional[Tuple[bool, str, Dict[str, Any]]]:
+        """Отказ по длительности или размеру выбранного формата, None - лимиты соблюдены"""
+        info = self.summarize_info(raw_info)
+        
+        # Проверяем длительность (у трансляций она не ограничена)
+        if raw_info.get('is_live') or (info['duration'] and info['duration'] > self.max_duration):
+            return self.limit_error(
+                f"❌ Видео слишком длинное (максимум {self.max_duration//60} минут)", info, LIMIT_DURATION
+            )
+        
+        # Проверяем размер выбранного формата до скачивания
+        expected_size = self.expected_size(raw_info) if check_size else None
+        if expected_size and expected_size > self.max_file_size:
+            return self.limit_error(self.size_error(), info, LIMIT_SIZE)
+        return None
+    
+    def summarize_info(self, info: Dict[str, Any]) -> Dict[str, Any]:
+        """Краткая информация о видео из результата yt-dlp"""
+        return {
+            'title': info.get('title', 'Unknown'),
+            'duration': info.get('duration', 0),
+            'view_count': info.get('view_count', 0)
+        }
+    
+    def video_id(self, url: str) -> Optional[str]:
+        """Ключ видео для кэшей (None для ссылок не на платформу загрузчика)"""
+        parsed = self.platform.parse(url)
+        return parsed[0] if parsed else None
     
     def extract_info(self, url: str) -> Tuple[bool, Dict[str, Any]]:
         """Извлечь информацию о видео без скачивания"""
+        video_id = self.video_id(url)
+        cached = self.metadata_cache.get(video_id) if video_id else None
+        if cached is not None:
+            if not cached.is_fresh():
+                self.refresh_in_background(url, video_id, cached.profile)
+            return True, self.summarize_info(cached.info())
+        
         try:
-            with yt_dlp.YoutubeDL({'quiet': True}) as ydl:
+            with EXTRACT_SECONDS.time(), self.ydl_pool.lease(self.info_profile, self.get_info_options) as ydl:
                 info = ydl.extract_info(url, download=False)
-                return True, {
-                    'title': info.get('title', 'Unknown'),
-                    'duration': info.get('duration', 0),
-                    'view_count': info.get('view_count', 0)
-                }
         except Exception as e:
             logger.error(f"Ошибка извлечения информации: {e}")
             return False, {'error': str(e)}
+        
+        if video_id:
+            self.metadata_cache.put(video_id, self.info_profile, info)
+        return True, self.summarize_info(info)
+    
+    def refresh_in_background(self, url: str, video_id: str, profile: str) -> None:
+        """Обновить устаревшую запись кэша метаданных, не задерживая ответ"""
+        if not self.metadata_cache.begin_refresh(video_id):
+            return
+        threading.Thread(
+            target=self.refresh_metadata, args=(url, video_id, profile),
+            name=f"metadata-{video_id}", daemon=True
+        ).start()
+    
+    def refresh_metadata(self, url: str, video_id: str, profile: str) -> None:
+        """Извлечь информацию заново и заменить запись кэша"""
+        options = self.get_info_options if profile == self.info_profile else (lambda: self.get_ydl_options(''))
+        try:
+            with EXTRACT_SECONDS.time(), self.ydl_pool.lease(profile, options) as ydl:
+                info = ydl.extract_info(url, download=False)
+            self.metadata_cache.put(video_id, profile, info)
+        except Exception as e:
+            logger.warning(f"Не удалось обновить метаданные {video_id}: {e}")
+            if classify_error(e) == ERROR_UNAVAILABLE:
+                self.metadata_cache.invalidate(video_id)
+        finally:
+            self.metadata_cache.end_refresh(video_id)
     
-    def download(self, url: str) -> Tuple[bool, str, Dict[str, Any]]:
+    def with_format(self, raw_info: Dict[str, Any], fmt: Dict[str, Any]) -> Dict[str, Any]:
+        """Info видео с другим выбранным форматом"""
+        selected = dict(raw_info)
+        selected.pop('requested_formats', None)
+        selected.update(fmt)
+        return selected
+    
+    def apply_format_selection(self, raw_info: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Уточнить выбор формата по длительности видео
+        
+        Селектор в yt-dlp не знает длительности и оценивает размер только по filesize;
+        здесь форматы без размера оцениваются по битрейту × длительности.
         """
-        Скачать видео с YouTube
+        ranked = self.format_selector.select(raw_info)
+        if ranked and ranked[0].get('format_id') != raw_info.get('format_id'):
+            return self.with_format(raw_info, ranked[0])
+        return raw_info
+    
+    def select_fallback_format(self, raw_info: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Следующий по рангу формат, укладывающийся в лимит, вместо выбранного"""
+        duration = raw_info.get('duration')
+        return next((fmt for fmt in self.format_selector.select(raw_info)
+                     if fmt.get('format_id') != raw_info.get('format_id')
+                     and self.format_selector.fits(fmt, duration)), None)
+    
+    def is_streamable(self, info: Dict[str, Any]) -> bool:
+        """Можно ли скачать выбранный формат одним HTTP потоком (без склейки и HLS)"""
+        return (not info.get('requested_formats')
+                and bool(info.get('url'))
+                and info.get('protocol', 'https') in STREAM_PROTOCOLS)
+    
+    def use_ranges(self, info: Dict[str, Any]) -> bool:
+        """Скачивать ли формат параллельными диапазонами: одиночный HTTP файл не меньше RANGE_MIN_SIZE"""
+        return (self.range_connections > 1 and self.is_streamable(info)
+                and (self.expected_size(info) or 0) >= self.range_min_size)
     
+    def range_downloader(self, ydl: yt_dlp.YoutubeDL) -> RangeDownloader:
+        """Скачивание диапазонами через HTTP opener экземпляра yt-dlp (прокси, cookies)"""
+        return RangeDownloader(ydl.urlopen, self.range_connections, self.range_chunk_size,
+                               settings.RANGE_RETRIES, self.max_file_size)
+    
+    def open_partial(self, video_id: Optional[str], info: Dict[str, Any]) -> Optional[PartialDownload]:
+        """Недокачанный файл формата, если возобновление включено и формат - одиночный HTTP файл"""
+        if self.partials is None or not video_id or not info.get('format_id') or not self.is_streamable(info):
+            return None
+        return self.partials.open(video_id, info['format_id'], info['url'])
+    
+    def fetch_to_file(self, ydl: yt_dlp.YoutubeDL, info: Dict[str, Any], path: str, video_id: str = None) -> None:
+        """
+        Скачать выбранный формат в файл: с возобновлением недокачанного,
+        диапазонами или загрузчиком yt-dlp
+        
+        Недокачанный файл при ошибке остается в PARTIAL_DIR вместе с состоянием,
+        повтор (или другой воркер) продолжает с уже скачанных байт.
+        """
+        headers = info.get('http_headers') or {}
+        partial = self.open_partial(video_id, info)
+        if partial is not None:
+            with partial:
+                try:
+                    self.range_downloader(ydl).download_to_file(info['url'], headers, partial.path, partial)
+                except RangesNotSupported as e:
+                    partial.discard()
+                    logger.info(f"Сервер не отдает диапазоны ({e}), скачиваем без возобновления")
+                except FileTooLarge:
+                    partial.discard()
+                    raise
+                else:
+                    partial.finish(path)
+                    return
+        elif self.use_ranges(info):
+            try:
+                self.range_downloader(ydl).download_to_file(info['url'], headers, path)
+                return
+            except RangesNotSupported as e:
+                logger.info(f"Сервер не отдает диапазоны ({e}), скачиваем одним потоком")
+        ydl.process_info(dict(info))
+    
+    def stream_to_buffer(self, ydl: yt_dlp.YoutubeDL, info: Dict[str, Any]) -> IO[bytes]:
+        """
+        Скачать выбранный формат в буфер, который держится в памяти до STREAM_SPOOL_SIZE
+        и только сверх этого сбрасывается на диск
+        
+        Размер проверяется по Content-Length и по мере чтения: превышение MAX_FILE_SIZE
+        прерывает передачу сразу, а не после скачивания всего файла.
+        """
+        if self.use_ranges(info):
+            try:
+                return self.range_downloader(ydl).download_to_buffer(
+                    info['url'], info.get('http_headers') or {}, self.spool_size
+                )
+            except RangesNotSupported as e:
+                logger.info(f"Сервер не отдает диапазоны ({e}), скачиваем одним потоком")
+        
+        buffer = tempfile.SpooledTemporaryFile(max_size=self.spool_size, suffix='.mp4')
+        try:
+            with ydl.urlopen(Request(info['url'], headers=info.get('http_headers') or {})) as response:
+                content_length = int(response.headers.get('Content-Length') or 0)
+                if content_length > self.max_file_size:
+                    raise FileTooLarge(content_length)
+                
+                written = 0
+                while True:
+                    chunk = response.read(STREAM_READ_SIZE)
+                    if not chunk:
+                        break
+                    written += len(chunk)
+                    if written > self.max_file_size:
+                        raise FileTooLarge(written)
+                    buffer.write(chunk)
+            
+            buffer.seek(0)
+            return buffer
+        except BaseException:
+            buffer.close()
+            raise
+    
+    def download(self, url: str) -> Tuple[bool, Union[str, IO[bytes]], Dict[str, Any]]:
+        """
+        Скачать видео с платформы загрузчика
+        
+        Страница и плеер разбираются один раз: полученный info используется
+        для проверки лимитов, выбора формата и самого скачивания. Известное видео
+        проверяется по кэшу метаданных без обращения к платформе, а пока подписанные
+        ссылки форматов действуют, по ним же и скачивается. Видео из кэша на диске
+        отдается без yt-dlp: возвращается временный файл (ссылка на файл кэша).
+        В режиме stream одиночный HTTP формат читается в буфер без временного файла,
+        вызывающий код должен закрыть возвращенный буфер.
+        
+        При ошибке info['error_kind'] - limit, unavailable или transient; если скачан
+        запасной формат, info['fallback'] = True. С PARTIAL_DIR недокачанный файл
+        формата при ошибке сохраняется, и повтор скачивает только недостающие байты.
+        
         Returns:
-            Tuple[bool, str, Dict]: (success, file_path_or_error, info)
+            Tuple[bool, str | IO, Dict]: (success, file_path_or_buffer_or_error, info)
         """
+        video_id = self.video_id(url)
+        if video_id and self.media_cache is not None:
+            hit = self.from_media_cache(video_id)
+            if hit is not None:
+                return hit
+        
+        profile = self.download_profile()
+        cached = self.metadata_cache.get(video_id) if video_id else None
+        cached_info = None
+        if cached is not None:
+            cached_info = cached.info()
+            # Выбранный формат (и его размер) зависит от профиля, длительность - нет
+            rejection = self.check_limits(cached_info, check_size=cached.profile == profile)
+            if rejection is not None:
+                if not cached.is_fresh():
+                    self.refresh_in_background(url, video_id, cached.profile)
+                return rejection
+            if not self.metadata_cache.urls_usable(cached, profile):
+                cached_info = None
+        
+        success, result, info = self.download_info(url, video_id, cached_info)
+        if not success and cached_info is not None and info.get('error_kind') == ERROR_TRANSIENT:
+            # Ссылки из кэша могли отозвать раньше срока expire: извлекаем заново
+            logger.warning(f"Скачивание {video_id} по кэшированным ссылкам не удалось: {result}")
+            self.metadata_cache.invalidate(video_id)
+            success, result, info = self.download_info(url, video_id, None)
+        
+        # Запасной формат хуже выбранного профилем - его не кэшируем
+        if (success and video_id and self.media_cache is not None
+                and info.get('format_id') and not info.get('fallback')):
+            with span('media_cache.put'):
+                self.media_cache.put(video_id, info['format_id'], result, info)
+        return success, result, info
+    
+    def from_media_cache(self, video_id: str) -> Optional[Tuple[bool, str, Dict[str, Any]]]:
+        """Видео из кэша на диске, если оно там есть и укладывается в лимиты"""
+        with span('media_cache.checkout') as cache_span:
+            hit = self.media_cache.checkout(video_id, self.max_file_size)
+            cache_span.set('hit', hit is not None)
+        if hit is None:
+            return None
+        
+        path, info = hit
+        rejection = self.check_limits(info, check_size=False)
+        if rejection is not None:
+            os.remove(path)
+            return rejection
+        info['media_cache'] = True
+        return True, path, info
+    
+    def download_info(self, url: str, video_id: Optional[str],
+                      cached_info: Optional[Dict[str, Any]]) -> Tuple[bool, Union[str, IO[bytes]], Dict[str, Any]]:
+        """Скачать видео по кэшированной информации или извлечь ее заново"""
         temp_filename = None
         
         def safe_remove(file_path):
@@ -76,63 +418,105 @@ class YouTubeDownloader:
                 logger.warning(f"Не удалось удалить файл {file_path}: {e}")
         
         try:
-            # Сначала проверяем информацию о видео
-            success, info = self.extract_info(url)
-            if not success:
-                return False, info.get('error', 'Unknown error'), {}
-            
-            # Проверяем длительность
-            if info['duration'] and info['duration'] > self.max_duration:
-                return False, f"❌ Видео слишком длинное (максимум {self.max_duration//60} минут)", info
-            
             # Создаем временный файл
             with tempfile.NamedTemporaryFile(suffix='.mp4', delete=False) as temp_file:
                 temp_filename = temp_file.name
             
-            # Получаем настройки yt-dlp
-            ydl_opts = self.get_ydl_options(temp_filename)
-            
             # Принудительно удаляем файл если существует
             safe_remove(temp_filename)
             
-            # Скачиваем видео
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                try:
-                    ydl.download([url])
-                except Exception as e:
-                    # Пробуем с альтернативными настройками
-                    logger.warning(f"Первая попытка не удалась: {e}, пробуем альтернативные настройки")
+            with self.ydl_pool.lease(self.download_profile(), lambda: self.get_ydl_options(temp_filename)) as ydl:
+                # Экземпляр из пула мог скачивать в другой файл
+                ydl.params['outtmpl']['default'] = temp_filename
+                
+                if cached_info is not None:
+                    raw_info = cached_info
+                else:
+                    # Единственное извлечение информации о видео (формат выбирается сразу)
+                    try:
+                        with EXTRACT_SECONDS.time(), span('youtube.extract_info'):
+                            raw_info = self.apply_format_selection(ydl.extract_info(url, download=False))
+                    except Exception as e:
+                        logger.error(f"Ошибка извлечения информации: {e}")
+                        return False, str(e), {'error_kind': classify_error(e)}
+                    if video_id:
+                        self.metadata_cache.put(video_id, self.download_profile(), raw_info)
                     
-                    alt_opts = {
-                        'format': 'worst[ext=mp4]/worst',
-                        'outtmpl': temp_filename,
-                        'no_warnings': True,
-                        'no_cache_dir': True,
-                        'force_overwrites': True,
-                    }
+                    rejection = self.check_limits(raw_info)
+                    if rejection is not None:
+                        return rejection
+                
+                info = self.summarize_info(raw_info)
+                info['format_id'] = raw_info.get('format_id')
+                
+                if self.stream_mode and self.is_streamable(raw_info):
+                    try:
+                        with DOWNLOAD_SECONDS.time(), span('youtube.download', mode='stream',
+                                                            format_id=raw_info.get('format_id')):
+                            buffer = self.stream_to_buffer(ydl, raw_info)
+                    except FileTooLarge:
+                        return self.limit_error(self.size_error(), info, LIMIT_SIZE)
                     
-                    safe_remove(temp_filename)
+                    file_size = buffer.seek(0, os.SEEK_END)
+                    buffer.seek(0)
+                    if file_size == 0:
+                        buffer.close()
+                        info['error_kind'] = ERROR_TRANSIENT
+                        return False, "❌ Скачанный файл пустой", info
                     
-                    with yt_dlp.YoutubeDL(alt_opts) as ydl_alt:
-                        ydl_alt.download([url])
+                    info['file_size'] = file_size
+                    DOWNLOADED_BYTES.inc(file_size)
+                    return True, buffer, info
+                
+                # Скачиваем видео по уже извлеченной информации; прогресс-хук
+                # прерывает загрузку при превышении лимита размера
+                with DOWNLOAD_SECONDS.time(), span('youtube.download', mode='file',
+                                                    format_id=raw_info.get('format_id')) as download_span:
+                    try:
+                        self.fetch_to_file(ydl, raw_info, temp_filename, video_id)
+                    except FileTooLarge:
+                        safe_remove(temp_filename + '.part')
+                        return self.limit_error(self.size_error(), info, LIMIT_SIZE)
+                    except Exception as e:
+                        # Пробуем запасной формат из уже полученного списка
+                        logger.warning(f"Первая попытка не удалась: {e}, пробуем альтернативный формат")
+                        
+                        fallback = self.select_fallback_format(raw_info)
+                        if fallback is None:
+                            raise
+                        
+                        safe_remove(temp_filename)
+                        
+                        fallback_info = self.with_format(raw_info, fallback)
+                        info['fallback'] = True
+                        download_span.set('fallback', True)
+                        try:
+                            with span('youtube.fallback', format_id=fallback.get('format_id'), cause=str(e)[:200]):
+                                self.fetch_to_file(ydl, fallback_info, temp_filename, video_id)
+                        except FileTooLarge:
+                            safe_remove(temp_filename + '.part')
+                            return self.limit_error(self.size_error(), info, LIMIT_SIZE)
             
             # Проверяем результат скачивания
             if not os.path.exists(temp_filename):
+                info['error_kind'] = ERROR_TRANSIENT
                 return False, "❌ Файл не был создан", info
             
             file_size = os.path.getsize(temp_filename)
             if file_size == 0:
                 safe_remove(temp_filename)
+                info['error_kind'] = ERROR_TRANSIENT
                 return False, "❌ Скачанный файл пустой", info
             
             if file_size > self.max_file_size:
                 safe_remove(temp_filename)
-                return False, f"❌ Файл слишком большой (максимум {self.max_file_size//1024//1024} MB)", info
+                return self.limit_error(self.size_error(), info, LIMIT_SIZE)
             
             info['file_size'] = file_size
+            DOWNLOADED_BYTES.inc(file_size)
             return True, temp_filename, info
-            
+        
         except Exception as e:
-            logger.error(f"Ошибка скачивания YouTube: {e}")
+            logger.error(f"Ошибка скачивания {self.platform.title}: {e}")
             safe_remove(temp_filename)
-            return False, str(e), {}
+            return False, str(e), {'error_kind': classify_error(e)}
@@ -0,0 +1,82 @@
+import re
+from typing import NamedTuple, Optional
+
+# Ссылка целиком: схема, хост YouTube (с поддоменами www/m/music), путь, query и фрагмент.
+# Хост сравнивается без учета регистра, ID видео - с учетом.
+YOUTUBE_URL_RE = re.compile(
+    r'\s*(?:(?i:https?)://)?'
+    r'(?:(?i:www|m|music)\.)?'
+    r'(?P<host>(?i:youtube\.com|youtube-nocookie\.com|youtu\.be))(?::\d+)?'
+    r'(?P<path>/[^?#\s]*)?'
+    r'(?P<query>\?[^#\s]*)?'
+    r'(?P<fragment>#\S*)?\s*'
+)
+
+# Путь youtube.com с ID видео прямо в пути
+PATH_ID_RE = re.compile(r'/(?:shorts|embed|live|v|e)/([A-Za-z0-9_-]{11})/?')
+
+# Путь youtu.be
+SHORT_PATH_RE = re.compile(r'/([A-Za-z0-9_-]{11})/?')
+
+VIDEO_ID_RE = re.compile(r'[A-Za-z0-9_-]{11}')
+
+# Параметры v, t и start в query или фрагменте
+PARAM_RE = re.compile(r'[?&#](v|t|start|time_continue)=([^&#]*)')
+
+# Метка времени: 90, 90s, 1m30s, 1h2m3s
+TIMESTAMP_RE = re.compile(r'(?:(\d+)h)?(?:(\d+)m)?(?:(\d+)s?)?')
+
+class YouTubeURL(NamedTuple):
+    """Разобранная ссылка на YouTube видео"""
+    video_id: str
+    start_time: Optional[int] = None
+
+def parse_timestamp(value: str) -> Optional[int]:
+    """Перевести метку времени из ссылки в секунды"""
+    match = TIMESTAMP_RE.fullmatch(value)
+    if not value or not match:
+        return None
+    hours, minutes, seconds = match.groups()
+    return int(hours or 0) * 3600 + int(minutes or 0) * 60 + int(seconds or 0)
+
+def parse_youtube_url(url: str) -> Optional[YouTubeURL]:
+    """
+    Разобрать ссылку на YouTube видео
+    
+    Поддерживаются watch, youtu.be, shorts, embed, live, мобильные и music ссылки;
+    посторонние параметры (si, feature, list, utm_*) отбрасываются.
+    
+    Returns:
+        Optional[YouTubeURL]: (video_id, start_time) или None, если это не ссылка на видео
+    """
+    match = YOUTUBE_URL_RE.fullmatch(url)
+    if not match:
+        return None
+    
+    path = match.group('path') or ''
+    video_id = None
+    if match.group('host').lower() == 'youtu.be':
+        id_match = SHORT_PATH_RE.fullmatch(path)
+        if not id_match:
+            return None
+        video_id = id_match.group(1)
+    elif path not in ('/watch', '/watch/'):
+        # ID из пути; для /watch он берется из параметра v
+        id_match = PATH_ID_RE.fullmatch(path)
+        if not id_match:
+            return None
+        video_id = id_match.group(1)
+    
+    start_time = None
+    params = (match.group('query') or '') + (match.group('fragment') or '')
+    if params:
+        for name, value in PARAM_RE.findall(params):
+            if name == 'v':
+                if video_id is None and VIDEO_ID_RE.fullmatch(value):
+                    video_id = value
+            elif start_time is None:
+                start_time = parse_timestamp(value)
+    
+    if video_id is None:
+        return None
+    return YouTubeURL(video_id, start_time)
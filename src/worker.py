@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+
+import asyncio
+import logging
+import signal
+import sys
+from pathlib import Path
+from typing import Dict
+
+# Добавляем корневую папку в путь
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from telegram import Bot
+
+from src.bot.worker import DownloadWorker
+from src.config.settings import settings
+from src.services.database import DatabaseService
+from src.services.download_pool import DownloadPool
+from src.services.job_queue import JobQueue
+from src.services.metadata_cache import MetadataCache
+from src.services.metrics import MetricsServer, bind_db_pool, bind_download_pools, bind_job_queue
+from src.services.partition_keeper import PartitionKeeper
+from src.services.platforms import PlatformRegistry, build_registry
+from src.services.youtube_downloader import YouTubeDownloader
+
+# Настройка логирования
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.INFO,
+    handlers=[
+        logging.FileHandler('worker.log'),
+        logging.StreamHandler()
+    ]
+)
+
+async def run(db_service: DatabaseService, platforms: PlatformRegistry, download_pools: Dict[str, DownloadPool]):
+    """Работа воркера до сигнала остановки"""
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+    
+    job_queue = JobQueue(db_service)
+    metrics_server = None
+    if settings.WORKER_METRICS_PORT:
+        bind_download_pools(download_pools)
+        bind_db_pool(db_service)
+        bind_job_queue(job_queue)
+        metrics_server = MetricsServer(settings.METRICS_LISTEN, settings.WORKER_METRICS_PORT)
+        try:
+            metrics_server.start()
+        except OSError as e:
+            # Занятый порт метрик не должен останавливать воркер
+            logging.error(f"Не удалось запустить сервер метрик на порту {settings.WORKER_METRICS_PORT}: {e}")
+            metrics_server = None
+    
+    try:
+        async with Bot(settings.BOT_TOKEN) as bot:
+            metadata_cache = MetadataCache(
+                db_service if settings.METADATA_CACHE_BACKEND == 'postgres' else None
+            )
+            # У каждой платформы свой загрузчик и свои слоты воркера
+            services = {
+                platform.name: YouTubeDownloader(metadata_cache=metadata_cache, platform=platform)
+                for platform in platforms
+            }
+            if settings.DOWNLOAD_EXECUTOR == 'thread':
+                for service in services.values():
+                    service.warm_up()
+            worker = DownloadWorker(
+                bot, job_queue, db_service, next(iter(services.values())),
+                platforms=platforms, services=services, download_pools=download_pools
+            )
+            await worker.run(stop_event)
+    finally:
+        if metrics_server:
+            metrics_server.stop()
+
+def main():
+    """Точка входа воркера скачиваний (режим DOWNLOAD_DISPATCH=queue)"""
+    db_service = DatabaseService()
+    partition_keeper = PartitionKeeper(db_service)
+    download_pools: Dict[str, DownloadPool] = {}
+    try:
+        settings.validate()
+        platforms = build_registry()
+        download_pools.update(
+            (platform.name, DownloadPool(max_workers=platform.workers)) for platform in platforms
+        )
+        db_service.init_database()
+        partition_keeper.start()
+        asyncio.run(run(db_service, platforms, download_pools))
+    except KeyboardInterrupt:
+        logging.info("Получен сигнал остановки")
+    except Exception as e:
+        logging.error(f"Критическая ошибка воркера: {e}")
+        sys.exit(1)
+    finally:
+        partition_keeper.close()
+        for download_pool in download_pools.values():
+            download_pool.shutdown()
+        db_service.close()
+
+if __name__ == '__main__':
+    main()
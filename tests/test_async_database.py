@@ -0,0 +1,150 @@
+import pytest
+from unittest.mock import Mock, patch
+from datetime import datetime
+
+from src.services.async_database import AsyncDatabaseService, resolve
+from src.services.database import DatabaseService
+from src.models.download import Download
+
+class TestAsyncDatabaseService:
+    
+    @pytest.fixture
+    def mock_db_config(self):
+        return {
+            'host': 'test_host',
+            'database': 'test_db',
+            'user': 'test_user',
+            'password': 'test_pass',
+            'port': 5432
+        }
+    
+    @pytest.fixture
+    def db_service(self, mock_db_config):
+        service = AsyncDatabaseService(DatabaseService(mock_db_config), max_workers=2)
+        yield service
+        service.close()
+    
+    @pytest.mark.asyncio
+    async def test_resolve(self):
+        """Тест получения результата синхронного и асинхронного вызова"""
+        async def coro():
+            return 'async'
+        
+        assert await resolve('sync') == 'sync'
+        assert await resolve(coro()) == 'async'
+    
+    def test_db_config(self, db_service, mock_db_config):
+        """Тест доступа к настройкам подключения"""
+        assert db_service.db_config == mock_db_config
+    
+    @pytest.mark.asyncio
+    @patch('src.services.database.psycopg2.connect')
+    async def test_save_download_success(self, mock_connect, db_service):
+        """Тест успешного сохранения скачивания"""
+        mock_conn = Mock()
+        mock_cursor = Mock()
+        mock_conn.cursor.return_value = mock_cursor
+        mock_cursor.fetchone.return_value = (1, datetime.now())
+        mock_connect.return_value = mock_conn
+        
+        download = Download(
+            user_id=123,
+            platform='youtube',
+            video_url='https://youtube.com/test'
+        )
+        
+        result = await db_service.save_download(download)
+        
+        assert result is True
+        assert download.id == 1
+        mock_cursor.execute.assert_called_once()
+        mock_conn.commit.assert_called_once()
+    
+    @pytest.mark.asyncio
+    @patch('src.services.database.psycopg2.connect')
+    async def test_save_download_failure(self, mock_connect, db_service):
+        """Тест ошибки при сохранении"""
+        mock_conn = Mock()
+        mock_cursor = Mock()
+        mock_conn.cursor.return_value = mock_cursor
+        mock_cursor.execute.side_effect = Exception("DB error")
+        mock_connect.return_value = mock_conn
+        
+        download = Download(
+            user_id=123,
+            platform='youtube',
+            video_url='https://youtube.com/test'
+        )
+        
+        result = await db_service.save_download(download)
+        
+        assert result is False
+        mock_conn.rollback.assert_called_once()
+    
+    @pytest.mark.asyncio
+    @patch('src.services.database.psycopg2.connect')
+    async def test_get_user_stats(self, mock_connect, db_service):
+        """Тест получения статистики пользователя"""
+        mock_conn = Mock()
+        mock_cursor = Mock()
+        mock_conn.cursor.return_value = mock_cursor
+        mock_cursor.fetchall.return_value = [
+            {'platform': 'youtube', 'count': 5}
+        ]
+        mock_connect.return_value = mock_conn
+        
+        stats = await db_service.get_user_stats(123)
+        
+        assert len(stats) == 1
+        assert stats[0]['platform'] == 'youtube'
+        assert stats[0]['count'] == 5
+    
+    @pytest.mark.asyncio
+    @patch('src.services.database.psycopg2.connect')
+    async def test_get_file_id(self, mock_connect, db_service):
+        """Тест получения сохраненного file_id"""
+        mock_conn = Mock()
+        mock_cursor = Mock()
+        mock_conn.cursor.return_value = mock_cursor
+        mock_cursor.fetchone.return_value = {'file_id': 'abc', 'title': 'Test', 'file_size': 1024}
+        mock_connect.return_value = mock_conn
+        
+        entry = await db_service.get_file_id('dQw4w9WgXcQ', 'h720-50mb')
+        
+        assert entry['file_id'] == 'abc'
+    
+    @pytest.mark.asyncio
+    @patch('src.services.database.psycopg2.connect')
+    async def test_save_and_delete_file_id(self, mock_connect, db_service):
+        """Тест сохранения и удаления file_id"""
+        mock_conn = Mock()
+        mock_cursor = Mock()
+        mock_conn.cursor.return_value = mock_cursor
+        mock_connect.return_value = mock_conn
+        
+        assert await db_service.save_file_id('dQw4w9WgXcQ', 'h720-50mb', 'abc', 'Test', 1024) is True
+        assert await db_service.delete_file_id('dQw4w9WgXcQ', 'h720-50mb') is True
+        assert mock_conn.commit.call_count == 2
+    
+    @pytest.mark.asyncio
+    @patch('src.services.database.psycopg2.connect')
+    async def test_init_database(self, mock_connect, db_service):
+        """Тест инициализации базы данных"""
+        mock_conn = Mock()
+        mock_cursor = Mock()
+        mock_conn.cursor.return_value = mock_cursor
+        mock_connect.return_value = mock_conn
+        
+        await db_service.init_database()
+        
+        mock_cursor.execute.assert_called_once()
+        mock_conn.commit.assert_called_once()
+    
+    @pytest.mark.asyncio
+    @patch('src.services.database.psycopg2.connect')
+    async def test_init_database_failure(self, mock_connect, db_service):
+        """Тест ошибки инициализации базы данных"""
+        mock_connect.side_effect = Exception("Connection error")
+        
+        with pytest.raises(Exception, match="Connection error"):
+            await db_service.init_database()
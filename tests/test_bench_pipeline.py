@@ -0,0 +1,45 @@
+import urllib.request
+
+from benchmarks import bench_pipeline
+from benchmarks.fakes import FakeMediaServer, media_bytes
+
+class TestFakeMediaServer:
+
+    def test_range_request(self):
+        """Тест частичной отдачи файла по Range"""
+        server = FakeMediaServer().start()
+        try:
+            request = urllib.request.Request(server.url('abc', 1000), headers={'Range': 'bytes=100-199'})
+            with urllib.request.urlopen(request, timeout=5) as response:
+                assert response.status == 206
+                assert response.headers['Content-Range'] == 'bytes 100-199/1000'
+                assert response.read() == media_bytes(100, 100)
+            
+            with urllib.request.urlopen(server.url('abc', 1000), timeout=5) as response:
+                assert response.read() == media_bytes(0, 1000)
+        finally:
+            server.stop()
+
+class TestBenchPipeline:
+
+    def test_smoke(self, capsys):
+        """Тест: бенчмарк проходит без сети и отчитывается о всех запросах"""
+        report = bench_pipeline.main([
+            '--requests', '6', '--rate', '200', '--videos', '3', '--sizes', '64KB,128KB',
+            '--extract-latency', '0', '--upload-latency', '0', '--db-latency', '0',
+            '--download-rate', '0', '--json'
+        ])
+        
+        assert report['completed'] == 6
+        assert report['failed'] == 0
+        assert report['media_requests'] == 3
+        assert report['p50_ms'] <= report['p95_ms'] <= report['p99_ms']
+        assert '"throughput_rps"' in capsys.readouterr().out
+    
+    def test_percentile(self):
+        """Тест процентилей по ближайшему рангу"""
+        values = [float(v) for v in range(1, 101)]
+        
+        assert bench_pipeline.percentile(values, 50) == 50
+        assert bench_pipeline.percentile(values, 99) == 99
+        assert bench_pipeline.percentile([], 50) == 0
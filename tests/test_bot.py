@@ -1,10 +1,11 @@
+import asyncio
 import pytest
-from unittest.mock import Mock, patch
+from unittest.mock import AsyncMock, Mock, patch
 
 from src.bot.bot import YouTubeBotApp
 
 class TestYouTubeBotApp:
-    
+
     @pytest.fixture
     def mock_token(self):
         return "test_token"
@@ -55,6 +56,7 @@ class TestYouTubeBotApp:
     def test_run_with_setup(self, mock_settings, mock_application):
         """Тест запуска после настройки"""
         mock_settings.validate.return_value = None
+        mock_settings.METRICS_PORT = 0
         mock_app_instance = Mock()
         mock_application.builder.return_value.token.return_value.build.return_value = mock_app_instance
         
@@ -67,6 +69,43 @@ class TestYouTubeBotApp:
         
         mock_app_instance.run_polling.assert_called_once()
     
+    @patch('src.bot.bot.MetricsServer')
+    @patch('src.bot.bot.settings')
+    def test_run_starts_metrics_server(self, mock_settings, mock_metrics_server):
+        """Тест: сервер метрик запускается на заданном порту и останавливается вместе с ботом"""
+        mock_settings.BOT_MODE = 'polling'
+        mock_settings.METRICS_PORT = 9100
+        mock_settings.METRICS_LISTEN = '127.0.0.1'
+        app = YouTubeBotApp("test_token")
+        app.application = Mock()
+        app.application.running = False
+        
+        app.run(metrics_port=9101)
+        
+        mock_metrics_server.assert_called_once_with('127.0.0.1', 9101)
+        mock_metrics_server.return_value.start.assert_called_once()
+        
+        app.stop()
+        
+        mock_metrics_server.return_value.stop.assert_called_once()
+    
+    @patch('src.bot.bot.MetricsServer')
+    @patch('src.bot.bot.settings')
+    def test_metrics_port_in_use(self, mock_settings, mock_metrics_server):
+        """Тест: занятый порт метрик не мешает запуску бота"""
+        mock_settings.BOT_MODE = 'polling'
+        mock_settings.METRICS_LISTEN = '127.0.0.1'
+        mock_metrics_server.return_value.start.side_effect = OSError(98, 'Address already in use')
+        app = YouTubeBotApp("test_token")
+        app.application = Mock()
+        app.application.running = False
+        
+        app.run(metrics_port=9101)
+        
+        app.application.run_polling.assert_called_once()
+        assert app.metrics_server is None
+        app.stop()
+    
     @patch('src.bot.bot.Application')
     @patch('src.bot.bot.settings')
     def test_stop(self, mock_settings, mock_application):
@@ -83,4 +122,88 @@ class TestYouTubeBotApp:
         app.stop()
         
         mock_app_instance.stop.assert_called_once()
-
+    
+    
+    def test_stop_shuts_down_download_pool(self):
+        """Тест остановки пула скачиваний"""
+        app = YouTubeBotApp("test_token")
+        download_pool = Mock()
+        app.download_pools = {'youtube': download_pool}
+        
+        app.stop()
+        
+        download_pool.shutdown.assert_called_once()
+    
+    def test_stop_closes_database_pool(self):
+        """Тест закрытия пула соединений с БД"""
+        app = YouTubeBotApp("test_token")
+        app.db_service = Mock()
+        
+        app.stop()
+        
+        app.db_service.close.assert_called_once()
+    
+    @patch('src.bot.bot.settings')
+    def test_async_database_backend(self, mock_settings):
+        """Тест выбора асинхронного сервиса БД в настройках"""
+        from src.services.async_database import AsyncDatabaseService
+        
+        mock_settings.BOT_TOKEN = "settings_token"
+        mock_settings.DB_BACKEND = 'async'
+        app = YouTubeBotApp()
+        
+        assert isinstance(app.handler_db_service, AsyncDatabaseService)
+        assert app.handlers.db_service is app.handler_db_service
+        assert app.handler_db_service.db_service is app.db_service
+        app.stop()
+    
+    def test_stop_flushes_download_writer(self):
+        """Тест финального сброса отложенной записи при остановке"""
+        app = YouTubeBotApp("test_token")
+        app.download_writer = Mock()
+        
+        app.stop()
+        
+        app.download_writer.close.assert_called_once()
+    
+    @patch('src.bot.bot.asyncio.run')
+    @patch('src.bot.bot.settings')
+    def test_run_webhook_mode(self, mock_settings, mock_asyncio_run):
+        """Тест запуска в режиме webhook вместо polling"""
+        mock_settings.BOT_MODE = 'webhook'
+        mock_settings.METRICS_PORT = 0
+        app = YouTubeBotApp("test_token")
+        app.application = Mock()
+        app.run_webhook = Mock(return_value='coroutine')
+        
+        app.run(register_webhook=False)
+        
+        app.run_webhook.assert_called_once_with(False)
+        mock_asyncio_run.assert_called_once_with('coroutine')
+        app.application.run_polling.assert_not_called()
+    
+    @pytest.mark.asyncio
+    @patch('src.bot.bot.settings')
+    async def test_run_webhook_registers_and_serves(self, mock_settings):
+        """Тест: webhook регистрируется с секретом, сервер работает до сигнала остановки"""
+        mock_settings.WEBHOOK_URL = 'https://bot.example.com/'
+        mock_settings.WEBHOOK_SECRET = 'secret'
+        mock_settings.WEBHOOK_MAX_CONNECTIONS = 40
+        app = YouTubeBotApp("test_token")
+        app.application = AsyncMock()
+        app.application.__aenter__.return_value = app.application
+        server = Mock(url_path='/telegram', start=AsyncMock(), stop=AsyncMock())
+        app.create_webhook_server = Mock(return_value=server)
+        
+        stop_event = asyncio.Event()
+        stop_event.set()
+        await app.run_webhook(stop_event=stop_event)
+        
+        app.application.bot.set_webhook.assert_called_once()
+        kwargs = app.application.bot.set_webhook.call_args[1]
+        assert kwargs['url'] == 'https://bot.example.com/telegram'
+        assert kwargs['secret_token'] == 'secret'
+        app.application.start.assert_called_once()
+        server.start.assert_called_once()
+        server.stop.assert_called_once()
+        app.application.stop.assert_called_once()
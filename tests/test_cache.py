@@ -0,0 +1,50 @@
+from unittest.mock import patch
+
+from src.services.cache import TTLCache
+
+class TestTTLCache:
+    
+    def test_get_set(self):
+        """Тест сохранения и чтения значения"""
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set('a', 1)
+        
+        assert cache.get('a') == 1
+        assert cache.get('missing', 'default') == 'default'
+    
+    def test_lru_eviction(self):
+        """Тест вытеснения давно неиспользуемых записей"""
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        
+        assert cache.get('a') == 1
+        assert cache.get('b') is None
+        assert cache.get('c') == 3
+        assert len(cache) == 2
+    
+    @patch('src.services.cache.time.monotonic')
+    def test_expiration(self, mock_monotonic):
+        """Тест устаревания записей по TTL"""
+        mock_monotonic.return_value = 100
+        cache = TTLCache(maxsize=10, ttl=5)
+        cache.set('a', 1)
+        cache.set('b', 2, ttl=50)
+        
+        mock_monotonic.return_value = 106
+        
+        assert cache.get('a') is None
+        assert cache.get('b') == 2
+    
+    def test_pop_and_clear(self):
+        """Тест удаления записей"""
+        cache = TTLCache()
+        cache.set('a', 1)
+        cache.set('b', 2)
+        
+        assert cache.pop('a') == 1
+        assert cache.pop('a') is None
+        cache.clear()
+        assert len(cache) == 0
@@ -1,12 +1,12 @@
 import pytest
 from unittest.mock import Mock, patch, MagicMock
-from datetime import datetime
+from datetime import date, datetime
 
 from src.services.database import DatabaseService
 from src.models.download import Download
 
 class TestDatabaseService:
-    
+
     @pytest.fixture
     def mock_db_config(self):
         return {
@@ -84,6 +84,46 @@ class TestDatabaseService:
         assert result is False
         mock_conn.rollback.assert_called_once()
     
+    @patch('src.services.database.execute_values')
+    @patch('src.services.database.psycopg2.connect')
+    def test_save_downloads_batch(self, mock_connect, mock_execute_values, db_service):
+        """Тест пакетного сохранения скачиваний"""
+        mock_conn = Mock()
+        mock_cursor = Mock()
+        mock_conn.cursor.return_value = mock_cursor
+        mock_connect.return_value = mock_conn
+        
+        downloads = [
+            Download(user_id=1, platform='youtube', video_url='https://youtube.com/1'),
+            Download(user_id=2, platform='youtube', video_url='https://youtube.com/2', status='failed'),
+        ]
+        
+        assert db_service.save_downloads(downloads) is True
+        
+        rows = mock_execute_values.call_args[0][2]
+        assert [row[0] for row in rows] == [1, 2]
+        assert rows[1][4] == 'failed'
+        mock_conn.commit.assert_called_once()
+    
+    @patch('src.services.database.psycopg2.connect')
+    def test_save_downloads_empty(self, mock_connect, db_service):
+        """Тест пакетного сохранения пустого списка"""
+        assert db_service.save_downloads([]) is True
+        mock_connect.assert_not_called()
+    
+    @patch('src.services.database.execute_values')
+    @patch('src.services.database.psycopg2.connect')
+    def test_save_downloads_failure(self, mock_connect, mock_execute_values, db_service):
+        """Тест ошибки пакетного сохранения"""
+        mock_conn = Mock()
+        mock_connect.return_value = mock_conn
+        mock_execute_values.side_effect = Exception("DB error")
+        
+        downloads = [Download(user_id=1, platform='youtube', video_url='https://youtube.com/1')]
+        
+        assert db_service.save_downloads(downloads) is False
+        mock_conn.rollback.assert_called_once()
+    
     @patch('src.services.database.psycopg2.connect')
     def test_get_user_stats(self, mock_connect, db_service):
         """Тест получения статистики пользователя"""
@@ -101,6 +141,128 @@ class TestDatabaseService:
         assert stats[0]['platform'] == 'youtube'
         assert stats[0]['count'] == 5
     
+    @patch('src.services.database.psycopg2.connect')
+    def test_get_file_id(self, mock_connect, db_service):
+        """Тест получения сохраненного file_id"""
+        mock_conn = Mock()
+        mock_cursor = Mock()
+        mock_conn.cursor.return_value = mock_cursor
+        mock_cursor.fetchone.return_value = {'file_id': 'abc', 'title': 'Test', 'file_size': 1024}
+        mock_connect.return_value = mock_conn
+        
+        entry = db_service.get_file_id('dQw4w9WgXcQ', 'h720-50mb')
+        
+        assert entry['file_id'] == 'abc'
+        assert mock_cursor.execute.call_args[0][1] == ('dQw4w9WgXcQ', 'h720-50mb')
+    
+    @patch('src.services.database.psycopg2.connect')
+    def test_get_file_id_missing(self, mock_connect, db_service):
+        """Тест отсутствия file_id в кэше"""
+        mock_conn = Mock()
+        mock_cursor = Mock()
+        mock_conn.cursor.return_value = mock_cursor
+        mock_cursor.fetchone.return_value = None
+        mock_connect.return_value = mock_conn
+        
+        assert db_service.get_file_id('dQw4w9WgXcQ', 'h720-50mb') is None
+    
+    @patch('src.services.database.psycopg2.connect')
+    def test_save_and_delete_file_id(self, mock_connect, db_service):
+        """Тест сохранения и удаления file_id"""
+        mock_conn = Mock()
+        mock_cursor = Mock()
+        mock_conn.cursor.return_value = mock_cursor
+        mock_connect.return_value = mock_conn
+        
+        assert db_service.save_file_id('dQw4w9WgXcQ', 'h720-50mb', 'abc', 'Test', 1024) is True
+        assert db_service.delete_file_id('dQw4w9WgXcQ', 'h720-50mb') is True
+        assert mock_conn.commit.call_count == 2
+    
+    @patch('src.services.database.psycopg2.connect')
+    def test_save_and_get_video_metadata(self, mock_connect, db_service):
+        """Тест сохранения записи кэша метаданных и чтения ее обратно"""
+        from src.services.metadata_cache import CachedMetadata
+        
+        mock_conn = Mock()
+        mock_cursor = Mock()
+        mock_conn.cursor.return_value = mock_cursor
+        mock_connect.return_value = mock_conn
+        entry = CachedMetadata('dQw4w9WgXcQ', 'download-1', '{}', 'host', 1.0, 2.0, 3.0, None)
+        
+        assert db_service.save_video_metadata(entry) is True
+        assert 'ON CONFLICT (video_id)' in mock_cursor.execute.call_args[0][0]
+        assert mock_cursor.execute.call_args[0][1] == tuple(entry)
+        
+        mock_cursor.fetchone.return_value = entry._asdict()
+        assert CachedMetadata(**db_service.get_video_metadata('dQw4w9WgXcQ')) == entry
+    
+    @patch('src.services.database.psycopg2.connect')
+    def test_save_file_id_failure(self, mock_connect, db_service):
+        """Тест ошибки сохранения file_id"""
+        mock_connect.side_effect = Exception("Connection error")
+        
+        assert db_service.save_file_id('dQw4w9WgXcQ', 'h720-50mb', 'abc') is False
+    
+    @patch('src.services.database.psycopg2.connect')
+    def test_get_user_stats_reads_summary_table(self, mock_connect, db_service):
+        """Тест чтения статистики из user_stats без агрегации по downloads"""
+        mock_conn = Mock()
+        mock_cursor = Mock()
+        mock_conn.cursor.return_value = mock_cursor
+        mock_cursor.fetchall.return_value = []
+        mock_connect.return_value = mock_conn
+        
+        db_service.get_user_stats(123)
+        
+        query = mock_cursor.execute.call_args[0][0]
+        assert 'FROM user_stats' in query
+        assert 'GROUP BY' not in query
+    
+    @patch('src.services.database.psycopg2.connect')
+    def test_get_user_stats_cached(self, mock_connect, db_service):
+        """Тест кэширования статистики и сброса кэша при новой записи"""
+        mock_conn = Mock()
+        mock_cursor = Mock()
+        mock_conn.cursor.return_value = mock_cursor
+        mock_cursor.fetchall.return_value = [{'platform': 'youtube', 'count': 5}]
+        mock_cursor.fetchone.return_value = (1, datetime.now())
+        mock_connect.return_value = mock_conn
+        
+        db_service.get_user_stats(123)
+        db_service.get_user_stats(123)
+        assert mock_cursor.fetchall.call_count == 1
+        
+        db_service.save_download(Download(user_id=123, platform='youtube', video_url='https://youtube.com/test'))
+        db_service.get_user_stats(123)
+        assert mock_cursor.fetchall.call_count == 2
+    
+    @patch('src.services.database.psycopg2.connect')
+    def test_get_user_stats_error_not_cached(self, mock_connect, db_service):
+        """Тест: ошибка БД не кэшируется"""
+        mock_connect.side_effect = Exception("Connection error")
+        
+        assert db_service.get_user_stats(123) == []
+        assert db_service.get_user_stats(123) == []
+        assert mock_connect.call_count == 2
+    
+    @patch('src.services.database.psycopg2.connect')
+    def test_rebuild_user_stats(self, mock_connect, db_service):
+        """Тест пересчета user_stats по таблице downloads"""
+        mock_conn = Mock()
+        mock_cursor = Mock()
+        mock_cursor.rowcount = 7
+        mock_conn.cursor.return_value = mock_cursor
+        mock_connect.return_value = mock_conn
+        db_service._stats_cache.set(123, [{'platform': 'youtube', 'count': 1}])
+        
+        assert db_service.rebuild_user_stats() == 7
+        
+        query = mock_cursor.execute.call_args[0][0]
+        assert 'TRUNCATE user_stats' in query
+        assert 'GROUP BY user_id, platform' in query
+        mock_conn.commit.assert_called_once()
+        assert db_service._stats_cache.get(123) is None
+    
     @patch('src.services.database.psycopg2.connect')
     def test_init_database(self, mock_connect, db_service):
         """Тест инициализации базы данных"""
@@ -113,4 +275,113 @@ class TestDatabaseService:
         
         mock_cursor.execute.assert_called_once()
         mock_conn.commit.assert_called_once()
-
+        query = mock_cursor.execute.call_args[0][0]
+        assert 'trg_downloads_user_stats' in query
+        assert 'PARTITION BY RANGE (created_at)' in query
+        assert 'SELECT downloads_ensure_partitions(3);' in query
+        assert query.startswith('SELECT pg_advisory_xact_lock(')
+    
+    
+    @patch('src.services.database.psycopg2.connect')
+    def test_pool_stats_and_close(self, mock_connect, db_service):
+        """Тест статистики и закрытия пула соединений"""
+        mock_conn = Mock()
+        mock_conn.closed = 0
+        mock_conn.info.transaction_status = 0
+        mock_connect.return_value = mock_conn
+        
+        with db_service.get_connection():
+            pass
+        with db_service.get_connection():
+            pass
+        
+        stats = db_service.pool_stats()
+        assert stats['checkouts'] == 2
+        assert stats['idle'] == 1
+        mock_connect.assert_called_once()
+        
+        db_service.close()
+        mock_conn.close.assert_called_once()
+    
+    @patch('src.services.database.psycopg2.connect')
+    def test_ensure_partitions(self, mock_connect, db_service):
+        """Тест создания месячных секций"""
+        mock_conn = Mock()
+        mock_cursor = Mock()
+        mock_conn.cursor.return_value = mock_cursor
+        mock_cursor.fetchone.return_value = (2,)
+        mock_connect.return_value = mock_conn
+        
+        assert db_service.ensure_partitions(6) == 2
+        
+        mock_cursor.execute.assert_called_with("SELECT downloads_ensure_partitions(%s)", (6,))
+        mock_conn.commit.assert_called_once()
+    
+    @patch('src.services.database.psycopg2.connect')
+    def test_migrate_to_partitioned(self, mock_connect, db_service):
+        """Тест переноса несекционированной таблицы"""
+        mock_conn = Mock()
+        mock_cursor = Mock()
+        mock_conn.cursor.return_value = mock_cursor
+        mock_cursor.fetchone.return_value = ('r',)
+        mock_connect.return_value = mock_conn
+        
+        assert db_service.migrate_to_partitioned(drop_legacy=True) is True
+        
+        queries = [call[0][0] for call in mock_cursor.execute.call_args_list]
+        assert 'RENAME TO downloads_legacy' in queries[1]
+        assert 'PARTITION BY RANGE' in queries[2]
+        assert 'FROM downloads_legacy' in queries[3]
+        # Счетчики пересчитываются до фиксации переноса, а не отдельной транзакцией
+        assert 'TRUNCATE user_stats' in queries[4]
+        assert queries[5] == "DROP TABLE downloads_legacy"
+        mock_conn.commit.assert_called_once()
+    
+    @patch('src.services.database.psycopg2.connect')
+    def test_migrate_already_partitioned(self, mock_connect, db_service):
+        """Тест: миграция секционированной таблицы не выполняется"""
+        mock_conn = Mock()
+        mock_cursor = Mock()
+        mock_conn.cursor.return_value = mock_cursor
+        mock_cursor.fetchone.return_value = ('p',)
+        mock_connect.return_value = mock_conn
+        
+        assert db_service.migrate_to_partitioned() is False
+        mock_cursor.execute.assert_called_once()
+    
+    @patch('src.services.database.date')
+    @patch('src.services.database.psycopg2.connect')
+    def test_detach_old_partitions(self, mock_connect, mock_date, db_service):
+        """Тест отсоединения секций старше срока хранения"""
+        mock_date.today.return_value = date(2026, 3, 15)
+        mock_conn = Mock()
+        mock_cursor = Mock()
+        mock_conn.cursor.return_value = mock_cursor
+        mock_cursor.fetchall.return_value = [
+            ('downloads_2020_12',), ('downloads_2021_02',), ('downloads_2021_03',),
+            ('downloads_default',), ('downloads_2026_03',)
+        ]
+        mock_connect.return_value = mock_conn
+        
+        detached = db_service.detach_old_partitions(keep_months=60)
+        
+        assert detached == ['downloads_2020_12', 'downloads_2021_02']
+        queries = [call[0][0] for call in mock_cursor.execute.call_args_list]
+        assert 'ALTER TABLE downloads DETACH PARTITION "downloads_2020_12"' in queries
+        assert 'ALTER TABLE "downloads_2021_02" RENAME TO "downloads_archive_2021_02"' in queries
+    
+    @patch('src.services.database.date')
+    @patch('src.services.database.psycopg2.connect')
+    def test_detach_old_partitions_drop(self, mock_connect, mock_date, db_service):
+        """Тест удаления старых секций"""
+        mock_date.today.return_value = date(2026, 1, 1)
+        mock_conn = Mock()
+        mock_cursor = Mock()
+        mock_conn.cursor.return_value = mock_cursor
+        mock_cursor.fetchall.return_value = [('downloads_2020_12',), ('downloads_2021_01',)]
+        mock_connect.return_value = mock_conn
+        
+        assert db_service.detach_old_partitions(keep_months=60, drop=True) == ['downloads_2020_12']
+        
+        queries = [call[0][0] for call in mock_cursor.execute.call_args_list]
+        assert 'DROP TABLE "downloads_2020_12"' in queries
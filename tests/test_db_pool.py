@@ -0,0 +1,124 @@
+import threading
+import time
+
+import psycopg2
+import pytest
+from psycopg2 import extensions
+from unittest.mock import Mock, patch
+
+from src.services.db_pool import ConnectionPool, PoolTimeout
+
+def make_conn():
+    """Фейковое соединение psycopg2"""
+    conn = Mock()
+    conn.closed = 0
+    conn.info.transaction_status = extensions.TRANSACTION_STATUS_IDLE
+    return conn
+
+class TestConnectionPool:
+
+    @pytest.fixture
+    def mock_connect(self):
+        with patch('src.services.db_pool.psycopg2.connect', side_effect=lambda **kw: make_conn()) as mock:
+            yield mock
+    
+    @pytest.fixture
+    def pool(self, mock_connect):
+        pool = ConnectionPool({'host': 'test'}, min_size=1, max_size=2, timeout=0.2, check_interval=60)
+        yield pool
+        pool.close()
+    
+    def test_invalid_sizes(self):
+        """Тест проверки размеров пула"""
+        with pytest.raises(ValueError):
+            ConnectionPool({}, min_size=5, max_size=1)
+    
+    def test_connection_reused(self, pool, mock_connect):
+        """Тест повторного использования соединения"""
+        with pool.connection() as first:
+            pass
+        with pool.connection() as second:
+            pass
+        
+        assert first is second
+        mock_connect.assert_called_once_with(host='test')
+    
+    def test_timeout_when_exhausted(self, pool):
+        """Тест ожидания и таймаута при исчерпании пула"""
+        first = pool.getconn()
+        second = pool.getconn()
+        
+        with pytest.raises(PoolTimeout):
+            pool.getconn()
+        
+        assert pool.stats()['timeouts'] == 1
+        pool.putconn(first)
+        pool.putconn(second)
+    
+    def test_waiter_gets_released_connection(self, pool):
+        """Тест выдачи соединения ожидающему потоку"""
+        first = pool.getconn()
+        second = pool.getconn()
+        result = {}
+        
+        waiter = threading.Thread(target=lambda: result.setdefault('conn', pool.getconn()))
+        waiter.start()
+        time.sleep(0.05)
+        pool.putconn(first)
+        waiter.join(1)
+        
+        assert result['conn'] is first
+        stats = pool.stats()
+        assert stats['waits'] == 1
+        assert stats['wait_time_max'] > 0
+        pool.putconn(second)
+        pool.putconn(result['conn'])
+    
+    def test_broken_connection_replaced(self, pool, mock_connect):
+        """Тест переподключения при сломанном соединении"""
+        with pytest.raises(psycopg2.OperationalError):
+            with pool.connection():
+                raise psycopg2.OperationalError("server closed the connection")
+        
+        with pool.connection():
+            pass
+        
+        assert mock_connect.call_count == 2
+        assert pool.stats()['size'] == 1
+    
+    def test_health_check_on_checkout(self, pool, mock_connect):
+        """Тест проверки простаивающего соединения перед выдачей"""
+        pool.check_interval = 0
+        conn = pool.getconn()
+        pool.putconn(conn)
+        conn.cursor.return_value.execute.side_effect = psycopg2.OperationalError("gone")
+        
+        new_conn = pool.getconn()
+        
+        assert new_conn is not conn
+        conn.close.assert_called_once()
+        assert pool.stats()['reconnects'] == 1
+        pool.putconn(new_conn)
+    
+    def test_open_transaction_rolled_back(self, pool):
+        """Тест отката незавершенной транзакции при возврате"""
+        conn = pool.getconn()
+        conn.info.transaction_status = extensions.TRANSACTION_STATUS_INTRANS
+        
+        pool.putconn(conn)
+        
+        conn.rollback.assert_called_once()
+        assert pool.stats()['idle'] == 1
+    
+    def test_warmup_and_close(self, pool, mock_connect):
+        """Тест предварительного открытия и закрытия пула"""
+        pool.warmup()
+        conn = pool.getconn()
+        pool.putconn(conn)
+        
+        pool.close()
+        
+        conn.close.assert_called_once()
+        assert pool.stats()['size'] == 0
+        with pytest.raises(RuntimeError):
+            pool.getconn()
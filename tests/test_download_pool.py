@@ -0,0 +1,66 @@
+import asyncio
+import threading
+
+import pytest
+
+from src.services.download_pool import DownloadPool, DownloadQueueFull
+
+class TestDownloadPool:
+
+    @pytest.fixture
+    def pool(self):
+        pool = DownloadPool(max_workers=1, max_queue=1, executor_type='thread')
+        yield pool
+        pool.shutdown()
+
+    def test_invalid_executor_type(self):
+        """Тест неизвестного типа пула"""
+        with pytest.raises(ValueError):
+            DownloadPool(executor_type='fiber')
+
+    @pytest.mark.asyncio
+    async def test_run_in_worker_thread(self, pool):
+        """Тест выполнения функции вне event loop"""
+        main_thread = threading.get_ident()
+
+        result = await pool.run(lambda x: (x * 2, threading.get_ident()), 21)
+
+        assert result[0] == 42
+        assert result[1] != main_thread
+        assert pool.active == 0
+        assert pool.queue_position() == 0
+
+    @pytest.mark.asyncio
+    async def test_queue_position_and_limit(self, pool):
+        """Тест позиции в очереди и лимита ожидания"""
+        release = threading.Event()
+
+        first = asyncio.create_task(pool.run(release.wait))
+        await asyncio.sleep(0.05)
+        assert pool.active == 1
+        assert pool.queue_position() == 1
+
+        second = asyncio.create_task(pool.run(lambda: 'second'))
+        await asyncio.sleep(0.05)
+        assert pool.waiting == 1
+        assert pool.is_full()
+
+        with pytest.raises(DownloadQueueFull):
+            await pool.run(lambda: 'third')
+
+        release.set()
+        assert await first is True
+        assert await second == 'second'
+        assert pool.queue_position() == 0
+
+    @pytest.mark.asyncio
+    async def test_exception_releases_slot(self, pool):
+        """Тест освобождения слота при ошибке"""
+        def fail():
+            raise RuntimeError("boom")
+
+        with pytest.raises(RuntimeError, match="boom"):
+            await pool.run(fail)
+
+        assert pool.active == 0
+        assert await pool.run(lambda: 'ok') == 'ok'
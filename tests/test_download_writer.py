@@ -0,0 +1,99 @@
+import threading
+import time
+
+import pytest
+from unittest.mock import Mock
+
+from src.models.download import Download
+from src.services.download_writer import BufferedDownloadWriter
+
+def make_download(n: int) -> Download:
+    return Download(user_id=n, platform='youtube', video_url=f'https://youtu.be/{n}')
+
+class TestBufferedDownloadWriter:
+
+    @pytest.fixture
+    def mock_db_service(self):
+        db_service = Mock()
+        db_service.save_downloads.return_value = True
+        return db_service
+    
+    @pytest.fixture
+    def writer(self, mock_db_service):
+        return BufferedDownloadWriter(mock_db_service, batch_size=3, flush_interval=60, max_buffer=5)
+    
+    def test_save_does_not_touch_database(self, writer, mock_db_service):
+        """Тест: запись ставится в буфер без обращения к БД"""
+        assert writer.save_download(make_download(1)) is True
+        
+        assert writer.pending() == 1
+        mock_db_service.save_downloads.assert_not_called()
+    
+    def test_flush_in_batches(self, writer, mock_db_service):
+        """Тест сброса буфера пачками по batch_size"""
+        for n in range(5):
+            writer.save_download(make_download(n))
+        
+        assert writer.flush() is True
+        
+        sizes = [len(call[0][0]) for call in mock_db_service.save_downloads.call_args_list]
+        assert sizes == [3, 2]
+        assert writer.written == 5
+        assert writer.pending() == 0
+    
+    def test_overflow_drops_oldest(self, writer):
+        """Тест политики переполнения: отбрасываются самые старые записи"""
+        for n in range(7):
+            writer.save_download(make_download(n))
+        
+        assert writer.pending() == 5
+        assert writer.dropped == 2
+        assert writer._buffer[0].user_id == 2
+    
+    def test_failed_flush_keeps_records(self, writer, mock_db_service):
+        """Тест возврата пачки в буфер при ошибке БД"""
+        mock_db_service.save_downloads.return_value = False
+        for n in range(2):
+            writer.save_download(make_download(n))
+        
+        assert writer.flush() is False
+        
+        assert writer.pending() == 2
+        assert writer._buffer[0].user_id == 0
+        assert writer.failed_flushes == 1
+    
+    def test_background_flush_on_size(self, writer, mock_db_service):
+        """Тест фонового сброса при достижении размера пачки"""
+        flushed = threading.Event()
+        mock_db_service.save_downloads.side_effect = lambda batch: flushed.set() or True
+        writer.start()
+        
+        for n in range(3):
+            writer.save_download(make_download(n))
+        
+        assert flushed.wait(2)
+        writer.close()
+        assert writer.written == 3
+    
+    def test_background_flush_on_interval(self, mock_db_service):
+        """Тест фонового сброса по таймеру"""
+        writer = BufferedDownloadWriter(mock_db_service, batch_size=100, flush_interval=0.05, max_buffer=1000)
+        writer.start()
+        writer.save_download(make_download(1))
+        
+        deadline = time.monotonic() + 2
+        while writer.pending() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        
+        writer.close()
+        assert writer.written == 1
+    
+    def test_close_flushes_buffer(self, writer, mock_db_service):
+        """Тест финального сброса при остановке"""
+        writer.start()
+        writer.save_download(make_download(1))
+        
+        writer.close()
+        
+        mock_db_service.save_downloads.assert_called_once()
+        assert writer.pending() == 0
@@ -0,0 +1,65 @@
+import pytest
+from unittest.mock import Mock
+
+from src.services.file_id_cache import FileIdCache
+
+class TestFileIdCache:
+
+    @pytest.fixture
+    def mock_db_service(self):
+        return Mock()
+    
+    @pytest.fixture
+    def cache(self, mock_db_service):
+        return FileIdCache(mock_db_service, maxsize=10, ttl=60)
+    
+    @pytest.mark.asyncio
+    async def test_get_from_database_then_memory(self, cache, mock_db_service):
+        """Тест чтения из БД с последующим попаданием в память"""
+        mock_db_service.get_file_id.return_value = {'file_id': 'abc', 'title': 'Test', 'file_size': 1}
+        
+        assert (await cache.get('vid', 'fmt'))['file_id'] == 'abc'
+        assert (await cache.get('vid', 'fmt'))['file_id'] == 'abc'
+        
+        mock_db_service.get_file_id.assert_called_once_with('vid', 'fmt')
+    
+    @pytest.mark.asyncio
+    async def test_get_miss(self, cache, mock_db_service):
+        """Тест отсутствия file_id"""
+        mock_db_service.get_file_id.return_value = None
+        
+        assert (await cache.get('vid', 'fmt')) is None
+    
+    @pytest.mark.asyncio
+    async def test_put(self, cache, mock_db_service):
+        """Тест сохранения file_id"""
+        await cache.put('vid', 'fmt', 'abc', 'Test', 1024)
+        
+        assert (await cache.get('vid', 'fmt'))['file_id'] == 'abc'
+        mock_db_service.save_file_id.assert_called_once_with('vid', 'fmt', 'abc', 'Test', 1024)
+        mock_db_service.get_file_id.assert_not_called()
+    
+    @pytest.mark.asyncio
+    async def test_invalidate(self, cache, mock_db_service):
+        """Тест инвалидации устаревшего file_id"""
+        await cache.put('vid', 'fmt', 'abc')
+        mock_db_service.get_file_id.return_value = None
+        
+        await cache.invalidate('vid', 'fmt')
+        
+        assert (await cache.get('vid', 'fmt')) is None
+        mock_db_service.delete_file_id.assert_called_once_with('vid', 'fmt')
+    
+    @pytest.mark.asyncio
+    async def test_async_database_backend(self):
+        """Тест работы с асинхронным сервисом БД"""
+        from unittest.mock import AsyncMock
+        
+        db_service = AsyncMock()
+        db_service.get_file_id.return_value = {'file_id': 'abc', 'title': 'Test', 'file_size': 1}
+        cache = FileIdCache(db_service, maxsize=10, ttl=60)
+        
+        assert (await cache.get('vid', 'fmt'))['file_id'] == 'abc'
+        await cache.invalidate('vid', 'fmt')
+        
+        db_service.delete_file_id.assert_awaited_once_with('vid', 'fmt')
@@ -0,0 +1,91 @@
+import random
+
+import pytest
+
+from benchmarks.format_samples import LECTURE, MUSIC_VIDEO, SAMPLES, SHORT_WEBM, TOO_LARGE, WEB_DASH
+from src.services.format_selector import FormatSelector, estimate_size, is_progressive
+
+MAX_FILE_SIZE = 50 * 1024 * 1024
+
+def format_ids(formats):
+    return [fmt['format_id'] for fmt in formats]
+
+class TestFormatSelector:
+
+    @pytest.fixture
+    def selector(self):
+        return FormatSelector(MAX_FILE_SIZE, max_height=720)
+    
+    def test_estimate_size(self):
+        """Тест оценки размера: filesize, filesize_approx, затем битрейт × длительность"""
+        assert estimate_size({'filesize': 100, 'filesize_approx': 200, 'tbr': 1000}, 60) == 100
+        assert estimate_size({'filesize_approx': 200, 'tbr': 1000}, 60) == 200
+        assert estimate_size({'tbr': 1000}, 60) == 1000 * 125 * 60
+        assert estimate_size({'vbr': 800, 'abr': 128}, 10) == 928 * 125 * 10
+        assert estimate_size({'tbr': 1000}) is None
+        assert estimate_size({}, 60) is None
+    
+    def test_is_progressive(self):
+        """Тест: раскадровки и отдельные дорожки не выбираются"""
+        assert is_progressive({'vcodec': 'avc1', 'acodec': 'mp4a', 'ext': 'mp4'})
+        assert not is_progressive({'vcodec': 'none', 'acodec': 'mp4a', 'ext': 'm4a'})
+        assert not is_progressive({'vcodec': 'avc1', 'acodec': 'none', 'ext': 'mp4'})
+        assert not is_progressive({'ext': 'mhtml', 'format_note': 'storyboard'})
+    
+    @pytest.mark.parametrize('sample, expected', [
+        (MUSIC_VIDEO, '22'),  # 720p mp4 помещается
+        (LECTURE, '18'),  # 720p не помещается по битрейту × длительности
+        (WEB_DASH, '18'),  # единственный формат без склейки
+        (SHORT_WEBM, '18'),  # mp4 без перепаковки важнее высоты webm
+    ])
+    def test_select_recorded(self, selector, sample, expected):
+        """Тест выбора по записанным спискам форматов"""
+        assert selector.select(sample)[0]['format_id'] == expected
+    
+    def test_rank_order(self, selector):
+        """Тест: превышающие лимит форматы в конце, выше 720p - после подходящих"""
+        assert format_ids(selector.select(MUSIC_VIDEO)) == ['22', '18', '17']
+        assert format_ids(selector.select(LECTURE)) == ['18', '22']
+        assert format_ids(selector.select(SHORT_WEBM)) == ['18', '45', '43', '37']
+    
+    def test_unknown_size_below_known(self, selector):
+        """Тест: формат неизвестного размера ниже того, что точно помещается"""
+        formats = [
+            {'format_id': 'a', 'ext': 'mp4', 'height': 720},
+            {'format_id': 'b', 'ext': 'mp4', 'height': 360, 'filesize': 1000},
+        ]
+        assert format_ids(selector.rank(formats)) == ['b', 'a']
+    
+    def test_deterministic(self, selector):
+        """Тест: выбор не зависит от порядка форматов и различает равные по format_id"""
+        for sample in SAMPLES.values():
+            expected = format_ids(selector.select(sample))
+            for seed in range(5):
+                formats = list(sample['formats'])
+                random.Random(seed).shuffle(formats)
+                assert format_ids(selector.rank(formats, sample['duration'])) == expected
+        
+        twins = [{'format_id': 'x', 'ext': 'mp4', 'height': 360}, {'format_id': 'y', 'ext': 'mp4', 'height': 360}]
+        assert format_ids(selector.rank(twins)) == format_ids(selector.rank(twins[::-1])) == ['y', 'x']
+    
+    def test_fits(self, selector):
+        """Тест проверки лимита размера"""
+        assert selector.fits(LECTURE['formats'][1], LECTURE['duration'])
+        assert not selector.fits(LECTURE['formats'][2], LECTURE['duration'])
+        assert selector.fits({'format_id': '18'})
+    
+    def test_ytdlp_selector(self, selector):
+        """Тест селектора для параметра format yt-dlp"""
+        ctx = {'formats': WEB_DASH['formats'], 'has_merged_format': True, 'incomplete_formats': False}
+        assert format_ids(selector(ctx)) == ['18']
+        
+        # Слишком большой формат все равно выбирается, отказ дает проверка лимитов
+        ctx['formats'] = TOO_LARGE['formats']
+        assert format_ids(selector(ctx)) == ['22']
+        
+        # Без прогрессивных форматов - лучший в списке, как 'best'
+        ctx['formats'] = [fmt for fmt in WEB_DASH['formats'] if not is_progressive(fmt)]
+        assert format_ids(selector(ctx)) == ['137']
+        
+        ctx['formats'] = []
+        assert list(selector(ctx)) == []
@@ -1,15 +1,19 @@
+import io
 import pytest
 from unittest.mock import Mock, AsyncMock, patch
 import tempfile
 
-from src.bot.handlers import BotHandlers
+from src.bot.handlers import BotHandlers, request_outcome
 from src.models.download import Download
+from src.services.platforms import build_registry
 
 class TestBotHandlers:
-    
+
     @pytest.fixture
     def mock_db_service(self):
-        return Mock()
+        db_service = Mock()
+        db_service.get_file_id.return_value = None
+        return db_service
     
     @pytest.fixture
     def mock_youtube_service(self):
@@ -80,13 +84,15 @@ class TestBotHandlers:
         args = update.message.reply_text.call_args[0]
         assert "пока нет" in args[0]
     
-    def test_is_youtube_url(self, handlers):
-        """Тест проверки YouTube URL"""
-        assert handlers.is_youtube_url("https://www.youtube.com/watch?v=test")
-        assert handlers.is_youtube_url("https://youtu.be/test")
-        assert handlers.is_youtube_url("https://youtube.com/shorts/test")
-        assert not handlers.is_youtube_url("https://vimeo.com/test")
-        assert not handlers.is_youtube_url("https://instagram.com/test")
+    def test_is_supported_url(self, handlers):
+        """Тест проверки ссылки (по умолчанию только YouTube)"""
+        assert handlers.is_supported_url("https://www.youtube.com/watch?v=dQw4w9WgXcQ")
+        assert handlers.is_supported_url("https://youtu.be/dQw4w9WgXcQ")
+        assert handlers.is_supported_url("https://youtube.com/shorts/dQw4w9WgXcQ")
+        assert not handlers.is_supported_url("https://notyoutube.com.evil/watch?v=dQw4w9WgXcQ")
+        assert not handlers.is_supported_url("https://vimeo.com/test")
+        assert not handlers.is_supported_url("https://vimeo.com/76979871")
+        assert not handlers.is_supported_url("https://instagram.com/test")
     
     @pytest.mark.asyncio
     async def test_handle_message_invalid_url(self, handlers):
@@ -113,7 +119,7 @@ class TestBotHandlers:
         update = Mock()
         context = Mock()
         update.effective_user.id = 123
-        update.message.text = "https://youtube.com/watch?v=test"
+        update.message.text = "https://youtube.com/watch?v=dQw4w9WgXcQ&si=share"
         update.message.reply_text = AsyncMock(return_value=Mock())
         update.message.reply_video = AsyncMock()
         
@@ -133,10 +139,99 @@ class TestBotHandlers:
         
         # Проверяем вызовы
         mock_youtube_service.download.assert_called_once_with(
-            "https://youtube.com/watch?v=test"
+            "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
         )
         update.message.reply_video.assert_called_once()
         mock_db_service.save_download.assert_called_once()
+        assert mock_db_service.save_download.call_args[0][0].video_id == 'dQw4w9WgXcQ'
+        status_message.edit_text.assert_called_with("✅ Видео отправлено!")
+    
+    def test_request_outcome(self):
+        """Тест исхода запроса для метрик"""
+        assert request_outcome(True, {}) == 'completed'
+        assert request_outcome(False, {'error_kind': 'limit', 'limit': 'duration'}) == 'too_long'
+        assert request_outcome(False, {'error_kind': 'limit', 'limit': 'size'}) == 'too_big'
+        assert request_outcome(False, {'error_kind': 'transient'}) == 'failed'
+    
+    @pytest.mark.asyncio
+    @patch('os.unlink')
+    @patch('builtins.open')
+    async def test_handle_message_counts_outcome(self, mock_open, mock_unlink, handlers, mock_youtube_service):
+        """Тест учета исхода и времени отправки в метриках"""
+        from src.services.metrics import REQUESTS, UPLOAD_SECONDS
+        
+        update = Mock()
+        context = Mock()
+        update.effective_user.id = 123
+        update.message.text = "https://youtu.be/dQw4w9WgXcQ"
+        status_message = Mock()
+        status_message.edit_text = AsyncMock()
+        update.message.reply_text = AsyncMock(return_value=status_message)
+        update.message.reply_video = AsyncMock()
+        mock_youtube_service.download.return_value = (
+            True, '/tmp/test.mp4', {'title': 'Test Video', 'file_size': 1024}
+        )
+        completed = REQUESTS.value(outcome='completed')
+        uploads = UPLOAD_SECONDS.count()
+        
+        await handlers.handle_message(update, context)
+        
+        assert REQUESTS.value(outcome='completed') == completed + 1
+        assert UPLOAD_SECONDS.count() == uploads + 1
+    
+    @pytest.mark.asyncio
+    @patch('os.unlink')
+    @patch('builtins.open')
+    async def test_handle_message_traced(self, mock_open, mock_unlink, handlers, mock_youtube_service, monkeypatch):
+        """Тест трассировки запроса: корневой span с исходом и этапы обработки"""
+        from src.services import tracing
+        
+        exporter = Mock()
+        monkeypatch.setattr(tracing, '_exporter', exporter)
+        monkeypatch.setattr(tracing, '_sample_rate', 1.0)
+        update = Mock()
+        context = Mock()
+        update.effective_user.id = 123
+        update.message.text = "https://youtu.be/dQw4w9WgXcQ"
+        status_message = Mock()
+        status_message.edit_text = AsyncMock()
+        update.message.reply_text = AsyncMock(return_value=status_message)
+        update.message.reply_video = AsyncMock()
+        mock_youtube_service.download.return_value = (
+            True, '/tmp/test.mp4', {'title': 'Test Video', 'file_size': 1024}
+        )
+        
+        await handlers.handle_message(update, context)
+        
+        spans = {span.name: span for span in exporter.export.call_args[0][0]}
+        assert set(spans) == {'handle_message', 'file_id_cache.send', 'download_pool.run', 'telegram.upload'}
+        root = spans['handle_message']
+        assert root.attributes == {'user_id': 123, 'video_id': 'dQw4w9WgXcQ', 'platform': 'youtube', 'outcome': 'completed'}
+        assert spans['telegram.upload'].parent_id == root.span_id
+        assert len({span.trace.request_id for span in spans.values()}) == 1
+    
+    @pytest.mark.asyncio
+    async def test_handle_message_stream_buffer(self, handlers, mock_db_service, mock_youtube_service):
+        """Тест отправки буфера потокового режима"""
+        update = Mock()
+        context = Mock()
+        update.effective_user.id = 123
+        update.message.text = "https://youtube.com/watch?v=dQw4w9WgXcQ&si=share"
+        status_message = Mock()
+        status_message.edit_text = AsyncMock()
+        update.message.reply_text = AsyncMock(return_value=status_message)
+        update.message.reply_video = AsyncMock()
+        
+        buffer = tempfile.SpooledTemporaryFile(max_size=1024)
+        buffer.write(b'video')
+        buffer.seek(0)
+        mock_youtube_service.download.return_value = (True, buffer, {'title': 'Test Video', 'file_size': 5})
+        
+        await handlers.handle_message(update, context)
+        
+        assert update.message.reply_video.call_args[0][0] == b'video'
+        assert update.message.reply_video.call_args[1]['filename'] == 'video.mp4'
+        assert buffer.closed
         status_message.edit_text.assert_called_with("✅ Видео отправлено!")
     
     @pytest.mark.asyncio
@@ -146,7 +241,7 @@ class TestBotHandlers:
         update = Mock()
         context = Mock()
         update.effective_user.id = 123
-        update.message.text = "https://youtube.com/watch?v=test"
+        update.message.text = "https://youtube.com/watch?v=dQw4w9WgXcQ&si=share"
         update.message.reply_text = AsyncMock(return_value=Mock())
         
         status_message = Mock()
@@ -165,4 +260,414 @@ class TestBotHandlers:
         assert call_args.status == 'failed'
         
         status_message.edit_text.assert_called_with("❌ Ошибка: Ошибка скачивания")
+    
+    
+    @pytest.mark.asyncio
+    async def test_handle_message_queue_full(self, handlers, mock_youtube_service):
+        """Тест отказа при переполненной очереди скачиваний"""
+        update = Mock()
+        context = Mock()
+        update.effective_user.id = 123
+        update.message.text = "https://youtube.com/watch?v=dQw4w9WgXcQ&si=share"
+        update.message.reply_text = AsyncMock()
+        handlers.download_pool = Mock()
+        handlers.download_pool.is_full.return_value = True
+        
+        await handlers.handle_message(update, context)
+        
+        args = update.message.reply_text.call_args[0]
+        assert "слишком много запросов" in args[0]
+        mock_youtube_service.download.assert_not_called()
+    
+    @pytest.mark.asyncio
+    async def test_handle_message_queued_position(self, handlers, mock_youtube_service):
+        """Тест сообщения о позиции в очереди"""
+        update = Mock()
+        context = Mock()
+        update.effective_user.id = 123
+        update.message.text = "https://youtube.com/watch?v=dQw4w9WgXcQ&si=share"
+        status_message = Mock()
+        status_message.edit_text = AsyncMock()
+        update.message.reply_text = AsyncMock(return_value=status_message)
+        handlers.download_pool = Mock()
+        handlers.download_pool.is_full.return_value = False
+        handlers.download_pool.queue_position.return_value = 3
+        handlers.download_pool.run = AsyncMock(return_value=(False, "Ошибка скачивания", {}))
+        
+        await handlers.handle_message(update, context)
+        
+        args = update.message.reply_text.call_args[0]
+        assert "позиция 3" in args[0]
+        handlers.download_pool.run.assert_called_once_with(
+            mock_youtube_service.download, "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+        )
+    
+    @pytest.mark.asyncio
+    async def test_handle_message_rate_limited(self, handlers, mock_youtube_service):
+        """Тест отказа по лимиту частоты с временем до повтора"""
+        from src.services.rate_limiter import RateDecision
+        
+        update = Mock()
+        context = Mock()
+        update.effective_user.id = 123
+        update.message.text = "https://youtu.be/dQw4w9WgXcQ"
+        update.message.reply_text = AsyncMock()
+        handlers.rate_limiter = Mock()
+        handlers.rate_limiter.acquire = AsyncMock(return_value=RateDecision(False, 7.2, 'user'))
+        handlers.file_id_cache = AsyncMock()
+        
+        await handlers.handle_message(update, context)
+        
+        handlers.rate_limiter.acquire.assert_called_once_with(123)
+        assert "через 8 с" in update.message.reply_text.call_args[0][0]
+        handlers.file_id_cache.get.assert_not_called()
+        mock_youtube_service.download.assert_not_called()
+    
+    @pytest.mark.asyncio
+    async def test_handle_message_cached_file_id(self, handlers, mock_db_service, mock_youtube_service):
+        """Тест повторной отправки видео по file_id без скачивания"""
+        update = Mock()
+        context = Mock()
+        update.effective_user.id = 123
+        update.message.text = "https://youtu.be/dQw4w9WgXcQ"
+        update.message.reply_text = AsyncMock()
+        update.message.reply_video = AsyncMock()
+        handlers.file_id_cache = AsyncMock()
+        handlers.file_id_cache.get.return_value = {'file_id': 'cached_id', 'title': 'Test', 'file_size': None}
+        
+        await handlers.handle_message(update, context)
+        
+        handlers.file_id_cache.get.assert_called_once_with('dQw4w9WgXcQ', mock_youtube_service.format_key)
+        assert update.message.reply_video.call_args[0][0] == 'cached_id'
+        mock_youtube_service.download.assert_not_called()
+        update.message.reply_text.assert_not_called()
+        assert mock_db_service.save_download.call_args[0][0].status == 'completed'
+    
+    @pytest.mark.asyncio
+    @patch('os.unlink')
+    @patch('builtins.open')
+    async def test_handle_message_stale_file_id(self, mock_open, mock_unlink, handlers, mock_youtube_service):
+        """Тест инвалидации file_id, отклоненного Telegram"""
+        from telegram.error import BadRequest
+        
+        update = Mock()
+        context = Mock()
+        update.effective_user.id = 123
+        update.message.text = "https://youtu.be/dQw4w9WgXcQ"
+        status_message = Mock()
+        status_message.edit_text = AsyncMock()
+        update.message.reply_text = AsyncMock(return_value=status_message)
+        uploaded = Mock()
+        uploaded.video.file_id = 'new_id'
+        update.message.reply_video = AsyncMock(side_effect=[BadRequest("Wrong file identifier"), uploaded])
+        handlers.file_id_cache = AsyncMock()
+        handlers.file_id_cache.get.return_value = {'file_id': 'stale_id', 'title': 'Test'}
+        mock_youtube_service.download.return_value = (
+            True, '/tmp/test.mp4', {'title': 'Test Video', 'file_size': 1024}
+        )
+        
+        await handlers.handle_message(update, context)
+        
+        fmt = mock_youtube_service.format_key
+        handlers.file_id_cache.invalidate.assert_called_once_with('dQw4w9WgXcQ', fmt)
+        mock_youtube_service.download.assert_called_once()
+        handlers.file_id_cache.put.assert_called_once_with('dQw4w9WgXcQ', fmt, 'new_id', 'Test Video', 1024)
+        status_message.edit_text.assert_called_with("✅ Видео отправлено!")
+    
+    @pytest.mark.asyncio
+    @patch('os.unlink')
+    @patch('builtins.open')
+    async def test_handle_message_cached_send_timeout(self, mock_open, mock_unlink, handlers, mock_youtube_service):
+        """Тест: сетевой сбой при отправке по file_id не инвалидирует кэш"""
+        from telegram.error import TimedOut
+        
+        update = Mock()
+        context = Mock()
+        update.effective_user.id = 123
+        update.message.text = "https://youtu.be/dQw4w9WgXcQ"
+        status_message = Mock()
+        status_message.edit_text = AsyncMock()
+        update.message.reply_text = AsyncMock(return_value=status_message)
+        uploaded = Mock()
+        uploaded.video.file_id = 'new_id'
+        update.message.reply_video = AsyncMock(side_effect=[TimedOut(), uploaded])
+        handlers.file_id_cache = AsyncMock()
+        handlers.file_id_cache.get.return_value = {'file_id': 'cached_id', 'title': 'Test'}
+        mock_youtube_service.download.return_value = (
+            True, '/tmp/test.mp4', {'title': 'Test Video', 'file_size': 1024}
+        )
+        
+        await handlers.handle_message(update, context)
+        
+        handlers.file_id_cache.invalidate.assert_not_called()
+        mock_youtube_service.download.assert_called_once()
+        status_message.edit_text.assert_called_with("✅ Видео отправлено!")
+    
+    @pytest.mark.asyncio
+    @patch('os.unlink')
+    @patch('builtins.open')
+    async def test_handle_message_fallback_not_cached(self, mock_open, mock_unlink, handlers, mock_youtube_service):
+        """Тест: file_id запасного формата не кэшируется"""
+        update = Mock()
+        context = Mock()
+        update.effective_user.id = 123
+        update.message.text = "https://youtu.be/dQw4w9WgXcQ"
+        status_message = Mock()
+        status_message.edit_text = AsyncMock()
+        update.message.reply_text = AsyncMock(return_value=status_message)
+        update.message.reply_video = AsyncMock(return_value=Mock(video=Mock(file_id='low_id')))
+        handlers.file_id_cache = AsyncMock()
+        handlers.file_id_cache.get.return_value = None
+        mock_youtube_service.download.return_value = (
+            True, '/tmp/test.mp4', {'title': 'Test Video', 'file_size': 1024, 'fallback': True}
+        )
+        
+        await handlers.handle_message(update, context)
+        
+        update.message.reply_video.assert_called_once()
+        handlers.file_id_cache.put.assert_not_called()
+    
+    @pytest.mark.asyncio
+    @patch('os.unlink')
+    @patch('builtins.open')
+    async def test_handle_message_single_flight(self, mock_open, mock_unlink,
+                                                handlers, mock_db_service, mock_youtube_service):
+        """Тест: одновременные запросы одного видео скачивают его один раз"""
+        import asyncio
+        import threading
+        
+        release = threading.Event()
+        
+        def slow_download(url):
+            release.wait(5)
+            return True, '/tmp/test.mp4', {'title': 'Test Video', 'file_size': 1024}
+        
+        mock_youtube_service.download.side_effect = slow_download
+        handlers.file_id_cache = AsyncMock()
+        handlers.file_id_cache.get.return_value = None
+        
+        def make_update():
+            update = Mock()
+            update.effective_user.id = 123
+            update.message.text = "https://youtu.be/dQw4w9WgXcQ"
+            status_message = Mock()
+            status_message.edit_text = AsyncMock()
+            update.message.reply_text = AsyncMock(return_value=status_message)
+            uploaded = Mock()
+            uploaded.video.file_id = 'uploaded_id'
+            update.message.reply_video = AsyncMock(return_value=uploaded)
+            return update, status_message
+        
+        first, first_status = make_update()
+        second, second_status = make_update()
+        
+        tasks = [
+            asyncio.create_task(handlers.handle_message(first, Mock())),
+            asyncio.create_task(handlers.handle_message(second, Mock())),
+        ]
+        await asyncio.sleep(0.05)
+        release.set()
+        await asyncio.gather(*tasks)
+        
+        mock_youtube_service.download.assert_called_once()
+        assert second.message.reply_video.call_args[0][0] == 'uploaded_id'
+        assert mock_db_service.save_download.call_count == 2
+        first_status.edit_text.assert_called_with("✅ Видео отправлено!")
+        second_status.edit_text.assert_called_with("✅ Видео отправлено!")
+    
+    @pytest.mark.asyncio
+    @patch('os.unlink')
+    @patch('builtins.open')
+    async def test_handle_message_flight_finished_during_status(self, mock_open, mock_unlink,
+                                                                handlers, mock_db_service, mock_youtube_service):
+        """Тест: скачивание, завершившееся во время отправки статуса, не повторяется"""
+        import asyncio
+        import threading
+        
+        release = threading.Event()
+        
+        def slow_download(url):
+            release.wait(5)
+            return True, '/tmp/test.mp4', {'title': 'Test Video', 'file_size': 1024}
+        
+        mock_youtube_service.download.side_effect = slow_download
+        
+        def make_update():
+            update = Mock()
+            update.effective_user.id = 123
+            update.message.text = "https://youtu.be/dQw4w9WgXcQ"
+            status_message = Mock()
+            status_message.edit_text = AsyncMock()
+            update.message.reply_text = AsyncMock(return_value=status_message)
+            uploaded = Mock()
+            uploaded.video.file_id = 'uploaded_id'
+            update.message.reply_video = AsyncMock(return_value=uploaded)
+            return update, status_message
+        
+        first, _ = make_update()
+        second, second_status = make_update()
+        first_task = asyncio.create_task(handlers.handle_message(first, Mock()))
+        await asyncio.sleep(0.05)
+        
+        async def status_after_first_finished(text):
+            # Первое скачивание завершается, пока второй запрос отправляет статус
+            release.set()
+            await first_task
+            return second_status
+        
+        second.message.reply_text = AsyncMock(side_effect=status_after_first_finished)
+        await handlers.handle_message(second, Mock())
+        
+        mock_youtube_service.download.assert_called_once()
+        assert second.message.reply_video.call_args[0][0] == 'uploaded_id'
+        second_status.edit_text.assert_called_with("✅ Видео отправлено!")
+    
+    @pytest.mark.asyncio
+    async def test_stats_command_async_backend(self, mock_youtube_service):
+        """Тест команды /stats с асинхронным сервисом БД"""
+        db_service = AsyncMock()
+        db_service.get_user_stats.return_value = [{'platform': 'youtube', 'count': 2}]
+        handlers = BotHandlers(db_service, mock_youtube_service)
+        update = Mock()
+        update.effective_user.id = 123
+        update.message.reply_text = AsyncMock()
+        
+        await handlers.stats_command(update, Mock())
+        
+        db_service.get_user_stats.assert_awaited_once_with(123)
+        assert "YouTube: 2" in update.message.reply_text.call_args[0][0]
+    
+    @pytest.mark.asyncio
+    async def test_handle_message_write_behind(self, mock_db_service, mock_youtube_service):
+        """Тест записи результата через буфер без ожидания БД"""
+        writer = Mock()
+        handlers = BotHandlers(mock_db_service, mock_youtube_service, download_writer=writer)
+        update = Mock()
+        update.effective_user.id = 123
+        update.message.text = "https://youtube.com/watch?v=dQw4w9WgXcQ&si=share"
+        status_message = Mock()
+        status_message.edit_text = AsyncMock()
+        update.message.reply_text = AsyncMock(return_value=status_message)
+        mock_youtube_service.download.return_value = (False, "Ошибка скачивания", {})
+        
+        await handlers.handle_message(update, Mock())
+        
+        writer.save_download.assert_called_once()
+        assert writer.save_download.call_args[0][0].status == 'failed'
+        mock_db_service.save_download.assert_not_called()
+    
+    @pytest.mark.asyncio
+    async def test_handle_message_dispatches_job(self, mock_db_service, mock_youtube_service):
+        """Тест режима диспетчера: задание ставится в очередь, скачивания нет"""
+        job_queue = Mock()
+        job_queue.submit = AsyncMock()
+        handlers = BotHandlers(mock_db_service, mock_youtube_service, job_queue=job_queue)
+        
+        update = Mock()
+        context = Mock()
+        update.effective_user.id = 123
+        update.effective_chat.id = 456
+        update.message.message_id = 10
+        update.message.text = "https://youtu.be/dQw4w9WgXcQ?si=share"
+        status_message = Mock(message_id=11)
+        status_message.edit_text = AsyncMock()
+        update.message.reply_text = AsyncMock(return_value=status_message)
+        
+        await handlers.handle_message(update, context)
+        
+        job = job_queue.submit.call_args[0][0]
+        assert (job.user_id, job.chat_id, job.video_id) == (123, 456, 'dQw4w9WgXcQ')
+        assert (job.message_id, job.status_message_id) == (10, 11)
+        assert job.platform == 'youtube'
+        mock_youtube_service.download.assert_not_called()
+        mock_db_service.save_download.assert_not_called()
+    
+    @pytest.mark.asyncio
+    async def test_stats_command_by_platform(self, mock_db_service, mock_youtube_service):
+        """Тест /stats: счетчики по платформам, в том числе отключенной"""
+        handlers = BotHandlers(mock_db_service, mock_youtube_service, platforms=build_registry('youtube'))
+        update = Mock()
+        update.effective_user.id = 123
+        update.message.reply_text = AsyncMock()
+        mock_db_service.get_user_stats.return_value = [
+            {'platform': 'vimeo', 'count': 2}, {'platform': 'youtube', 'count': 5}
+        ]
+        
+        await handlers.stats_command(update, Mock())
+        
+        text = update.message.reply_text.call_args[0][0]
+        assert text.index("YouTube: 5") < text.index("Vimeo: 2")
+        assert "Всего: 7" in text
+
+class TestPlatformRouting:
 
+    @pytest.fixture
+    def services(self):
+        return {'youtube': Mock(format_key='h720'), 'vimeo': Mock(format_key='h720')}
+    
+    @pytest.fixture
+    def pools(self):
+        pools = {}
+        for name in ('youtube', 'vimeo'):
+            pool = Mock()
+            pool.is_full.return_value = False
+            pool.queue_position.return_value = 0
+            pool.run = AsyncMock(return_value=(False, "Ошибка скачивания", {}))
+            pools[name] = pool
+        return pools
+    
+    @pytest.fixture
+    def handlers(self, services, pools):
+        db_service = Mock()
+        handlers = BotHandlers(
+            db_service, services['youtube'], platforms=build_registry('youtube,vimeo'),
+            services=services, download_pools=pools
+        )
+        handlers.file_id_cache = AsyncMock()
+        handlers.file_id_cache.get.return_value = None
+        return handlers
+    
+    def make_update(self, text):
+        update = Mock()
+        update.effective_user.id = 123
+        update.message.text = text
+        status_message = Mock()
+        status_message.edit_text = AsyncMock()
+        update.message.reply_text = AsyncMock(return_value=status_message)
+        return update
+    
+    @pytest.mark.asyncio
+    async def test_routes_to_platform_pool(self, handlers, services, pools):
+        """Тест: ссылка Vimeo скачивается загрузчиком и в пуле Vimeo"""
+        await handlers.handle_message(self.make_update("https://vimeo.com/76979871?share=copy"), Mock())
+        
+        pools['vimeo'].run.assert_called_once_with(services['vimeo'].download, 'https://vimeo.com/76979871')
+        pools['youtube'].run.assert_not_called()
+        handlers.file_id_cache.get.assert_called_once_with('vimeo-76979871', 'h720')
+        download = handlers.db_service.save_download.call_args[0][0]
+        assert (download.platform, download.video_id) == ('vimeo', 'vimeo-76979871')
+    
+    @pytest.mark.asyncio
+    async def test_busy_platform_does_not_block_others(self, handlers, pools):
+        """Тест: заполненный пул одной платформы не мешает другой"""
+        pools['vimeo'].is_full.return_value = True
+        
+        vimeo = self.make_update("https://vimeo.com/76979871")
+        await handlers.handle_message(vimeo, Mock())
+        youtube = self.make_update("https://youtu.be/dQw4w9WgXcQ")
+        await handlers.handle_message(youtube, Mock())
+        
+        assert "слишком много запросов" in vimeo.message.reply_text.call_args[0][0]
+        pools['vimeo'].run.assert_not_called()
+        pools['youtube'].run.assert_called_once()
+    
+    @pytest.mark.asyncio
+    async def test_caption_names_platform(self, handlers, pools):
+        """Тест подписи к видео с названием платформы"""
+        pools['vimeo'].run.return_value = (True, io.BytesIO(b'video'), {'title': 'Test', 'file_size': 5})
+        update = self.make_update("https://vimeo.com/76979871")
+        update.message.reply_video = AsyncMock(return_value=Mock(video=Mock(file_id='id')))
+        
+        await handlers.handle_message(update, Mock())
+        
+        assert "📺 Vimeo" in update.message.reply_video.call_args[1]['caption']
@@ -0,0 +1,117 @@
+import pytest
+from contextlib import contextmanager
+from datetime import datetime
+from unittest.mock import Mock
+
+from src.models.job import DownloadJob
+from src.services.job_queue import JobQueue
+
+class TestJobQueue:
+
+    @pytest.fixture
+    def cursor(self):
+        return Mock()
+    
+    @pytest.fixture
+    def db_service(self, cursor):
+        conn = Mock()
+        conn.cursor.return_value = cursor
+        db_service = Mock()
+        
+        @contextmanager
+        def get_connection():
+            yield conn
+        
+        db_service.get_connection = get_connection
+        db_service.conn = conn
+        return db_service
+    
+    @pytest.fixture
+    def queue(self, db_service):
+        return JobQueue(db_service, visibility_timeout=300, max_attempts=3, backoff=10, backoff_max=60)
+    
+    def make_row(self, **overrides):
+        row = {
+            'id': 7, 'user_id': 1, 'chat_id': 1, 'video_url': 'https://youtu.be/dQw4w9WgXcQ',
+            'video_id': 'dQw4w9WgXcQ', 'platform': 'youtube', 'message_id': 10, 'status_message_id': 11,
+            'status': 'running', 'attempts': 1, 'max_attempts': 3, 'last_error': None,
+            'created_at': datetime(2026, 1, 1), 'run_at': datetime(2026, 1, 1), 'locked_by': 'w1'
+        }
+        row.update(overrides)
+        return row
+    
+    def test_enqueue(self, queue, cursor, db_service):
+        """Тест постановки задания в очередь"""
+        cursor.fetchone.return_value = (7, datetime(2026, 1, 1))
+        job = DownloadJob(user_id=1, chat_id=1, video_url='url', video_id='dQw4w9WgXcQ')
+        
+        queue.enqueue(job)
+        
+        assert job.id == 7
+        assert job.max_attempts == 3
+        assert 'INSERT INTO download_jobs' in cursor.execute.call_args[0][0]
+        assert 'youtube' in cursor.execute.call_args[0][1]
+        db_service.conn.commit.assert_called_once()
+    
+    def test_claim_uses_skip_locked(self, queue, cursor):
+        """Тест получения задания: SKIP LOCKED и таймаут видимости"""
+        cursor.fetchone.return_value = self.make_row()
+        
+        job = queue.claim('w1')
+        
+        query, params = cursor.execute.call_args[0]
+        assert 'FOR UPDATE SKIP LOCKED' in query
+        assert "status IN ('queued', 'running')" in query
+        assert params == ('w1', 300, None, None)
+        assert job.id == 7
+        assert job.attempts == 1
+        assert job.platform == 'youtube'
+    
+    def test_claim_by_platform(self, queue, cursor):
+        """Тест: слот платформы берет только задания своей платформы"""
+        cursor.fetchone.return_value = self.make_row(platform='vimeo', video_id='vimeo-76979871')
+        
+        job = queue.claim('w1', 'vimeo')
+        
+        query, params = cursor.execute.call_args[0]
+        assert 'platform = %s' in query
+        assert params == ('w1', 300, 'vimeo', 'vimeo')
+        assert job.platform == 'vimeo'
+    
+    def test_claim_empty(self, queue, cursor):
+        """Тест пустой очереди"""
+        cursor.fetchone.return_value = None
+        
+        assert queue.claim('w1') is None
+    
+    def test_ack_checks_attempt(self, queue, cursor):
+        """Тест подтверждения только своей попытки"""
+        cursor.rowcount = 0
+        job = DownloadJob(user_id=1, chat_id=1, video_url='url', id=7, attempts=2)
+        
+        assert queue.ack(job) is False
+        assert cursor.execute.call_args[0][1] == ('done', None, 7, 2)
+    
+    def test_retry_with_backoff(self, queue, cursor):
+        """Тест возврата задания в очередь с экспоненциальной паузой"""
+        job = DownloadJob(user_id=1, chat_id=1, video_url='url', id=7, attempts=2, max_attempts=3)
+        
+        assert queue.retry(job, 'timeout') is True
+        
+        query, params = cursor.execute.call_args[0]
+        assert "status = 'queued'" in query
+        assert params == ('timeout', 20, 7, 2)
+        assert job.status == 'queued'
+    
+    def test_retry_exhausted(self, queue, cursor):
+        """Тест: после max_attempts задание помечается failed"""
+        cursor.rowcount = 1
+        job = DownloadJob(user_id=1, chat_id=1, video_url='url', id=7, attempts=3, max_attempts=3)
+        
+        assert queue.retry(job, 'timeout') is False
+        assert cursor.execute.call_args[0][1] == ('failed', 'timeout', 7, 3)
+        assert job.status == 'failed'
+    
+    def test_retry_delay_capped(self, queue):
+        """Тест ограничения паузы повтора"""
+        assert [queue.retry_delay(n) for n in (1, 2, 3, 4, 5)] == [10, 20, 40, 60, 60]
@@ -0,0 +1,78 @@
+import pytest
+from unittest.mock import patch
+
+from src import manage
+
+class TestManage:
+    
+    @patch('src.manage.DatabaseService')
+    def test_rebuild_stats(self, mock_db_class, capsys):
+        """Тест команды пересчета статистики"""
+        mock_db_class.return_value.rebuild_user_stats.return_value = 3
+        
+        manage.main(['rebuild-stats'])
+        
+        mock_db_class.return_value.rebuild_user_stats.assert_called_once()
+        mock_db_class.return_value.close.assert_called_once()
+        assert '3' in capsys.readouterr().out
+    
+    @patch('src.manage.DatabaseService')
+    def test_partitions(self, mock_db_class):
+        """Тест команды создания секций"""
+        mock_db_class.return_value.ensure_partitions.return_value = 2
+        
+        manage.main(['partitions', '--months-ahead', '6'])
+        
+        mock_db_class.return_value.ensure_partitions.assert_called_once_with(6)
+    
+    @patch('src.manage.DatabaseService')
+    def test_migrate_partitions(self, mock_db_class):
+        """Тест команды миграции на секционирование"""
+        manage.main(['migrate-partitions', '--drop-legacy'])
+        
+        mock_db_class.return_value.migrate_to_partitioned.assert_called_once_with(drop_legacy=True)
+    
+    @patch('src.manage.DatabaseService')
+    def test_retention(self, mock_db_class):
+        """Тест команды отсоединения старых секций"""
+        mock_db_class.return_value.detach_old_partitions.return_value = ['downloads_2019_01']
+        
+        manage.main(['retention', '--keep-months', '60'])
+        
+        mock_db_class.return_value.detach_old_partitions.assert_called_once_with(60, drop=False)
+    
+    @patch('src.manage.JobQueue')
+    @patch('src.manage.DatabaseService')
+    def test_purge_jobs(self, mock_db_class, mock_queue_class):
+        """Тест команды очистки завершенных заданий"""
+        mock_queue_class.return_value.purge.return_value = 5
+        
+        manage.main(['purge-jobs', '--older-than-days', '3'])
+        
+        mock_queue_class.assert_called_once_with(mock_db_class.return_value)
+        mock_queue_class.return_value.purge.assert_called_once_with(3)
+    
+    @patch('src.manage.DatabaseService')
+    def test_purge_metadata(self, mock_db_class, capsys):
+        """Тест команды очистки устаревших метаданных"""
+        mock_db_class.return_value.purge_video_metadata.return_value = 4
+        
+        manage.main(['purge-metadata'])
+        
+        mock_db_class.return_value.purge_video_metadata.assert_called_once()
+        assert '4' in capsys.readouterr().out
+    
+    @patch('src.manage.DatabaseService')
+    def test_command_failure(self, mock_db_class):
+        """Тест завершения с ошибкой"""
+        mock_db_class.return_value.rebuild_user_stats.side_effect = Exception("DB error")
+        
+        with pytest.raises(SystemExit):
+            manage.main(['rebuild-stats'])
+        
+        mock_db_class.return_value.close.assert_called_once()
+    
+    def test_unknown_command(self):
+        """Тест неизвестной команды"""
+        with pytest.raises(SystemExit):
+            manage.main(['unknown'])
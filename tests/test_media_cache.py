@@ -0,0 +1,120 @@
+import io
+import os
+import pickle
+import time
+
+import pytest
+
+from src.services import media_cache
+from src.services.media_cache import MediaCache, shared_media_cache
+
+def write_source(path, size):
+    """Скачанный файл заданного размера"""
+    path.write_bytes(b'v' * size)
+    return str(path)
+
+class TestMediaCache:
+
+    @pytest.fixture
+    def cache_dir(self, tmp_path):
+        return tmp_path / 'cache'
+    
+    @pytest.fixture
+    def cache(self, cache_dir):
+        return MediaCache(str(cache_dir), max_bytes=1000)
+    
+    def test_put_and_checkout(self, cache, tmp_path):
+        """Тест: сохраненное видео отдается отдельным файлом вместе с info"""
+        source = write_source(tmp_path / 'download.mp4', 100)
+        
+        assert cache.put('dQw4w9WgXcQ', '18', source, {'title': 'Test Video', 'duration': 300}) is True
+        path, info = cache.checkout('dQw4w9WgXcQ', max_size=1000)
+        
+        assert path != cache.path('dQw4w9WgXcQ.18.mp4')
+        assert open(path, 'rb').read() == b'v' * 100
+        assert info == {'title': 'Test Video', 'duration': 300, 'view_count': None, 'file_size': 100}
+        
+        # Вызывающий код удаляет свою копию, файл кэша остается
+        os.remove(path)
+        os.remove(source)
+        assert cache.checkout('dQw4w9WgXcQ', max_size=1000) is not None
+        assert cache.total_bytes == 100
+    
+    def test_checkout_miss(self, cache):
+        """Тест промаха кэша"""
+        assert cache.checkout('dQw4w9WgXcQ', max_size=1000) is None
+    
+    def test_checkout_respects_size_limit(self, cache, tmp_path):
+        """Тест: выбирается самый крупный формат, который укладывается в лимит"""
+        cache.put('dQw4w9WgXcQ', '17', write_source(tmp_path / 'a.mp4', 50), {})
+        cache.put('dQw4w9WgXcQ', '18', write_source(tmp_path / 'b.mp4', 200), {})
+        
+        assert cache.checkout('dQw4w9WgXcQ', max_size=1000)[1]['file_size'] == 200
+        assert cache.checkout('dQw4w9WgXcQ', max_size=100)[1]['file_size'] == 50
+        assert cache.checkout('dQw4w9WgXcQ', max_size=10) is None
+    
+    def test_put_buffer(self, cache):
+        """Тест: буфер потокового режима сохраняется и перематывается в начало"""
+        buffer = io.BytesIO(b'stream')
+        
+        assert cache.put('dQw4w9WgXcQ', '18', buffer, {}) is True
+        
+        assert buffer.read() == b'stream'
+        assert open(cache.path('dQw4w9WgXcQ.18.mp4'), 'rb').read() == b'stream'
+    
+    def test_evicts_least_recently_used(self, cache, tmp_path):
+        """Тест: сверх бюджета удаляются давно не использованные видео"""
+        for video_id in ('video_a', 'video_b', 'video_c'):
+            cache.put(video_id, '18', write_source(tmp_path / f'{video_id}.mp4', 400), {})
+            if video_id == 'video_b':
+                cache.checkout('video_a', max_size=1000)
+        
+        assert cache.total_bytes == 800
+        assert cache.checkout('video_b', max_size=1000) is None
+        assert not os.path.exists(cache.path('video_b.18.mp4'))
+        assert not os.path.exists(cache.info_path('video_b.18.mp4'))
+        assert cache.checkout('video_a', max_size=1000) is not None
+    
+    def test_too_large_not_cached(self, cache, tmp_path):
+        """Тест: файл больше всего бюджета не сохраняется"""
+        assert cache.put('dQw4w9WgXcQ', '18', write_source(tmp_path / 'big.mp4', 2000), {}) is False
+        assert os.listdir(cache.directory) == []
+    
+    def test_rebuild_index_on_startup(self, cache_dir, tmp_path):
+        """Тест: индекс восстанавливается по именам и mtime, остатки записей удаляются"""
+        cache = MediaCache(str(cache_dir), max_bytes=1000)
+        cache.put('video_a', '18', write_source(tmp_path / 'a.mp4', 300), {'title': 'A'})
+        cache.put('video_b', '22', write_source(tmp_path / 'b.mp4', 300), {'title': 'B'})
+        os.utime(cache.path('video_a.18.mp4'), (time.time() - 100, time.time() - 100))
+        (cache_dir / '.tmp-deadbeef.mp4').write_bytes(b'partial')
+        (cache_dir / 'unrelated.txt').write_text('x')
+        
+        restarted = MediaCache(str(cache_dir), max_bytes=500)
+        
+        # Бюджет уменьшился: вытеснен файл с более старым mtime
+        assert restarted.total_bytes == 300
+        assert restarted.checkout('video_a', max_size=1000) is None
+        assert restarted.checkout('video_b', max_size=1000)[1]['title'] == 'B'
+        assert not (cache_dir / '.tmp-deadbeef.mp4').exists()
+        assert (cache_dir / 'unrelated.txt').exists()
+    
+    def test_file_removed_outside_index(self, cache, tmp_path):
+        """Тест: файл, удаленный мимо индекса, считается промахом"""
+        cache.put('dQw4w9WgXcQ', '18', write_source(tmp_path / 'a.mp4', 100), {})
+        os.remove(cache.path('dQw4w9WgXcQ.18.mp4'))
+        
+        assert cache.checkout('dQw4w9WgXcQ', max_size=1000) is None
+        assert cache.total_bytes == 0
+    
+    def test_unsafe_format_id(self, cache):
+        """Тест: format_id не может выйти за пределы имени файла"""
+        assert MediaCache.filename('dQw4w9WgXcQ', '../137+140') == 'dQw4w9WgXcQ.___137+140.mp4'
+    
+    def test_pickle_uses_process_cache(self, cache_dir, monkeypatch):
+        """Тест: в дочерний процесс передается общий для процесса кэш того же каталога"""
+        monkeypatch.setattr(media_cache, '_shared_caches', {})
+        cache = MediaCache(str(cache_dir), max_bytes=1000)
+        
+        restored = pickle.loads(pickle.dumps(cache))
+        
+        assert restored is shared_media_cache(str(cache_dir), 1000)
@@ -0,0 +1,143 @@
+import pickle
+import time
+from unittest.mock import Mock
+
+import pytest
+
+from src.services import metadata_cache
+from src.services.metadata_cache import CachedMetadata, MetadataCache, shared_metadata_cache, url_expiry
+
+def make_info(expire: int = None, **extra):
+    """Info yt-dlp с подписанными ссылками форматов"""
+    query = f"?expire={expire}&sig=x" if expire else ''
+    info = {
+        'id': 'dQw4w9WgXcQ',
+        'title': 'Test Video',
+        'duration': 300,
+        'format_id': '18',
+        'url': f"https://rr1.googlevideo.com/videoplayback{query}",
+        'formats': [{'format_id': '18', 'url': f"https://rr1.googlevideo.com/videoplayback{query}"}],
+        'thumbnails': [{'url': 'https://i.ytimg.com/x.jpg'}] * 100,
+        '__post_extractor': lambda: {},
+    }
+    info.update(extra)
+    return info
+
+class TestMetadataCache:
+
+    @pytest.fixture
+    def cache(self):
+        return MetadataCache(maxsize=10, ttl=60, stale_ttl=3600, url_margin=300)
+    
+    def test_url_expiry(self):
+        """Тест: срок ссылок - самый ранний expire среди форматов"""
+        info = make_info(2000, formats=[
+            {'url': 'https://rr1.googlevideo.com/videoplayback?expire=1500&sig=x'},
+            {'url': 'https://manifest.googlevideo.com/api/manifest/hls/expire/1200/ip/1.2.3.4/file.m3u8'},
+            {'url': None},
+        ])
+        
+        assert url_expiry(info) == 1200
+        assert url_expiry({'url': 'https://example.com/video.mp4'}) is None
+    
+    def test_put_and_get(self, cache):
+        """Тест: запись хранит info без крупных и служебных полей"""
+        cache.put('dQw4w9WgXcQ', 'download-1', make_info(int(time.time()) + 3600))
+        
+        entry = cache.get('dQw4w9WgXcQ')
+        info = entry.info()
+        
+        assert entry.is_fresh()
+        assert info['title'] == 'Test Video'
+        assert 'thumbnails' not in info
+        assert '__post_extractor' not in info
+        assert info is not entry.info()
+        assert cache.get('missing') is None
+    
+    def test_stale_entry(self, cache):
+        """Тест: после TTL запись остается, но уже не свежая"""
+        entry = cache.put('dQw4w9WgXcQ', 'download-1', make_info())
+        
+        assert not entry.is_fresh(entry.fetched_at + 61)
+        assert entry.stale_until == pytest.approx(entry.fetched_at + 3600)
+    
+    def test_live_has_no_stale_window(self, cache):
+        """Тест: трансляция не отвечает устаревшими данными после TTL"""
+        entry = cache.put('dQw4w9WgXcQ', 'download-1', make_info(is_live=True))
+        
+        assert entry.stale_until == entry.fresh_until
+    
+    def test_urls_usable_until_expire(self, cache):
+        """Тест: ссылки годятся до expire минус запас и только для того же профиля и хоста"""
+        now = time.time()
+        entry = cache.put('dQw4w9WgXcQ', 'download-1', make_info(int(now) + 1000))
+        
+        assert cache.urls_usable(entry, 'download-1', now)
+        # Запись уже не свежая, но подписанные ссылки еще действуют
+        assert cache.urls_usable(entry, 'download-1', now + 600)
+        assert not cache.urls_usable(entry, 'download-1', now + 800)
+        assert not cache.urls_usable(entry, 'download-2', now)
+        assert not cache.urls_usable(entry._replace(host='other-host'), 'download-1', now)
+    
+    def test_urls_without_expire_usable_while_fresh(self, cache):
+        """Тест: ссылки без срока используются, только пока запись свежая"""
+        entry = cache.put('dQw4w9WgXcQ', 'download-1', make_info())
+        
+        assert cache.urls_usable(entry, 'download-1', entry.fetched_at + 30)
+        assert not cache.urls_usable(entry, 'download-1', entry.fetched_at + 120)
+    
+    def test_postgres_tier(self):
+        """Тест: промах в памяти читается из БД, запись и удаление доходят до БД"""
+        db = Mock()
+        cache = MetadataCache(db, maxsize=10, ttl=60, stale_ttl=3600)
+        entry = cache.put('dQw4w9WgXcQ', 'download-1', make_info())
+        db.save_video_metadata.assert_called_once_with(entry)
+        
+        cache.clear()
+        db.get_video_metadata.return_value = entry._asdict()
+        
+        assert cache.get('dQw4w9WgXcQ') == entry
+        assert cache.get('dQw4w9WgXcQ') == entry
+        db.get_video_metadata.assert_called_once_with('dQw4w9WgXcQ')
+        
+        cache.invalidate('dQw4w9WgXcQ')
+        db.delete_video_metadata.assert_called_once_with('dQw4w9WgXcQ')
+    
+    def test_postgres_expired_row_ignored(self):
+        """Тест: запись из БД после stale_until не используется"""
+        db = Mock()
+        now = time.time()
+        db.get_video_metadata.return_value = CachedMetadata(
+            'dQw4w9WgXcQ', 'download-1', '{}', 'host', now - 100, now - 50, now - 1
+        )._asdict()
+        cache = MetadataCache(db, maxsize=10, ttl=60, stale_ttl=3600)
+        
+        assert cache.get('dQw4w9WgXcQ') is None
+    
+    def test_lru_eviction(self):
+        """Тест: сверх maxsize вытесняются давно не использованные записи"""
+        cache = MetadataCache(maxsize=2, ttl=60, stale_ttl=3600)
+        for video_id in ('a', 'b'):
+            cache.put(video_id, 'info', make_info())
+        cache.get('a')
+        cache.put('c', 'info', make_info())
+        
+        assert cache.get('b') is None
+        assert cache.get('a') is not None
+    
+    def test_refresh_is_exclusive(self, cache):
+        """Тест: фоновое обновление записи выполняется одним потоком"""
+        assert cache.begin_refresh('dQw4w9WgXcQ') is True
+        assert cache.begin_refresh('dQw4w9WgXcQ') is False
+        cache.end_refresh('dQw4w9WgXcQ')
+        assert cache.begin_refresh('dQw4w9WgXcQ') is True
+    
+    def test_pickle_uses_process_cache(self, monkeypatch):
+        """Тест: в дочерний процесс передается кэш в памяти без соединения с БД"""
+        monkeypatch.setattr(metadata_cache, '_shared_caches', {})
+        cache = MetadataCache(Mock(), maxsize=10, ttl=60, stale_ttl=3600, url_margin=300)
+        
+        restored = pickle.loads(pickle.dumps(cache))
+        
+        assert restored is shared_metadata_cache(10, 60, 3600, 300)
+        assert restored.db_service is None
@@ -0,0 +1,137 @@
+import urllib.error
+import urllib.request
+
+import pytest
+
+from src.services.metrics import Counter, Gauge, Histogram, MetricsServer, Registry, timed, timed_query, DB_SECONDS
+
+class TestMetrics:
+
+    def test_counter(self):
+        """Тест счетчика с метками"""
+        counter = Counter('test_requests_total', 'Запросы', ['outcome'])
+        counter.inc(outcome='completed')
+        counter.inc(2, outcome='completed')
+        counter.inc(outcome='failed')
+        
+        assert counter.value(outcome='completed') == 3
+        rendered = counter.render()
+        assert '# TYPE test_requests_total counter' in rendered
+        assert 'test_requests_total{outcome="completed"} 3' in rendered
+        assert 'test_requests_total{outcome="failed"} 1' in rendered
+    
+    def test_wrong_labels(self):
+        """Тест: метки должны совпадать с объявленными"""
+        counter = Counter('test_total', 'Тест', ['outcome'])
+        
+        with pytest.raises(ValueError):
+            counter.inc(status='x')
+    
+    def test_histogram(self):
+        """Тест накопительных корзин гистограммы"""
+        histogram = Histogram('test_seconds', 'Время', buckets=(0.1, 1))
+        histogram.observe(0.05)
+        histogram.observe(0.5)
+        histogram.observe(5)
+        
+        lines = histogram.render().splitlines()
+        assert 'test_seconds_bucket{le="0.1"} 1' in lines
+        assert 'test_seconds_bucket{le="1.0"} 2' in lines
+        assert 'test_seconds_bucket{le="+Inf"} 3' in lines
+        assert 'test_seconds_sum 5.55' in lines
+        assert 'test_seconds_count 3' in lines
+    
+    def test_histogram_time_on_error(self):
+        """Тест: длительность учитывается и при исключении"""
+        histogram = Histogram('test_seconds', 'Время')
+        
+        with pytest.raises(RuntimeError):
+            with histogram.time():
+                raise RuntimeError("boom")
+        
+        assert histogram.count() == 1
+    
+    def test_gauge_function(self):
+        """Тест датчика, вычисляемого при экспорте"""
+        gauge = Gauge('test_pool', 'Пул', ['stat'])
+        stats = {'idle': 1}
+        gauge.set_function(lambda: stats)
+        stats['idle'] = 4
+        
+        assert 'test_pool{stat="idle"} 4' in gauge.render()
+    
+    def test_gauge_function_error(self):
+        """Тест: ошибка источника не ломает экспорт остальных метрик"""
+        registry = Registry()
+        broken = registry.register(Gauge('test_broken', 'Сломанный'))
+        broken.set_function(lambda: 1 / 0)
+        registry.register(Gauge('test_ok', 'Рабочий')).set(1)
+        
+        rendered = registry.render()
+        assert 'test_ok 1' in rendered
+        assert '# TYPE test_broken gauge' in rendered
+    
+    def test_label_escaping(self):
+        """Тест экранирования значений меток"""
+        gauge = Gauge('test_labels', 'Метки', ['name'])
+        gauge.set(1, name='a"b\\c')
+        
+        assert 'test_labels{name="a\\"b\\\\c"} 1' in gauge.render()
+    
+    def test_duplicate_registration(self):
+        """Тест: имя метрики уникально в реестре"""
+        registry = Registry()
+        registry.register(Counter('test_total', 'Тест'))
+        
+        with pytest.raises(ValueError):
+            registry.register(Counter('test_total', 'Тест'))
+    
+    def test_timed(self):
+        """Тест декоратора замера времени"""
+        histogram = Histogram('test_seconds', 'Время', ['method'])
+        
+        @timed(histogram, method='work')
+        def work(x):
+            return x * 2
+        
+        assert work(2) == 4
+        assert histogram.count(method='work') == 1
+    
+    def test_timed_query(self):
+        """Тест: метка method берется из имени функции"""
+        @timed_query
+        def load_something():
+            return 1
+        
+        before = DB_SECONDS.count(method='load_something')
+        load_something()
+        
+        assert DB_SECONDS.count(method='load_something') == before + 1
+        assert load_something.__name__ == 'load_something'
+
+class TestMetricsServer:
+
+    @pytest.fixture
+    def server(self):
+        registry = Registry()
+        registry.register(Counter('test_requests_total', 'Запросы')).inc()
+        server = MetricsServer('127.0.0.1', 0, registry)
+        server.start()
+        yield server
+        server.stop()
+    
+    def test_metrics_endpoint(self, server):
+        """Тест отдачи метрик по HTTP"""
+        with urllib.request.urlopen(f'http://127.0.0.1:{server.port}/metrics', timeout=5) as response:
+            body = response.read().decode()
+            content_type = response.headers['Content-Type']
+        
+        assert 'test_requests_total 1' in body
+        assert content_type.startswith('text/plain')
+    
+    def test_unknown_path(self, server):
+        """Тест: другие адреса возвращают 404"""
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(f'http://127.0.0.1:{server.port}/', timeout=5)
+        
+        assert error.value.code == 404
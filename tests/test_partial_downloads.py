@@ -0,0 +1,243 @@
+import os
+import pickle
+import time
+from unittest import mock
+
+import pytest
+import yt_dlp
+
+from benchmarks.fakes import FakeMediaServer, FakeYoutubeDL, media_bytes
+from src.config.settings import settings
+from src.services import partial_downloads
+from src.services.metadata_cache import MetadataCache
+from src.services.partial_downloads import PartialDownloads, merge_ranges, missing_ranges, shared_partial_downloads
+from src.services.range_downloader import RangeDownloader
+from src.services.ydl_pool import YoutubeDLPool
+from src.services.youtube_downloader import YouTubeDownloader
+
+SIZE = 256 * 1024
+CHUNK = 64 * 1024
+
+def age(path, seconds):
+    """Сдвинуть mtime файла в прошлое"""
+    past = time.time() - seconds
+    os.utime(path, (past, past))
+
+class TestRanges:
+
+    def test_merge_ranges(self):
+        """Тест объединения пересекающихся и смежных диапазонов"""
+        assert merge_ranges([(10, 19), (0, 4), (5, 9), (30, 39), (35, 50)]) == [(0, 19), (30, 50)]
+        assert merge_ranges([]) == []
+    
+    def test_missing_ranges(self):
+        """Тест поиска недостающих диапазонов"""
+        assert missing_ranges([(0, 9), (20, 29)], 40) == [(10, 19), (30, 39)]
+        assert missing_ranges([(10, 39)], 40) == [(0, 9)]
+        assert missing_ranges([(0, 39)], 40) == []
+        assert missing_ranges([], 40) == [(0, 39)]
+
+class TestPartialDownloads:
+
+    @pytest.fixture
+    def store(self, tmp_path):
+        return PartialDownloads(str(tmp_path / 'partial'), ttl=3600)
+    
+    def test_state_survives_reopen(self, store):
+        """Тест: скачанные диапазоны сохраняются в состоянии и читаются при следующем открытии"""
+        with store.open('dQw4w9WgXcQ', '18', 'https://example.com/a') as partial:
+            partial.reset(100)
+            with open(partial.path, 'wb') as part_file:
+                part_file.truncate(100)
+            partial.mark(0, 29)
+            partial.mark(30, 49)
+        
+        with store.open('dQw4w9WgXcQ', '18', 'https://example.com/b') as partial:
+            assert partial.total == 100
+            assert partial.done == [(0, 49)]
+            assert partial.done_bytes == 50
+    
+    def test_state_of_other_size_ignored(self, store):
+        """Тест: состояние не подходит к файлу другого размера"""
+        with store.open('dQw4w9WgXcQ', '18', 'https://example.com/a') as partial:
+            partial.reset(100)
+            partial.mark(0, 49)
+        
+        with store.open('dQw4w9WgXcQ', '18', 'https://example.com/a') as partial:
+            assert partial.total is None
+            assert partial.done == []
+    
+    def test_locked_while_open(self, store):
+        """Тест: недокачанный файл не выдается второму потоку, пока открыт"""
+        partial = store.open('dQw4w9WgXcQ', '18', 'https://example.com/a')
+        assert store.open('dQw4w9WgXcQ', '18', 'https://example.com/a') is None
+        assert store.open('dQw4w9WgXcQ', '22', 'https://example.com/a') is not None
+        partial.close()
+        assert store.open('dQw4w9WgXcQ', '18', 'https://example.com/a') is not None
+    
+    def test_finish_and_discard(self, store, tmp_path):
+        """Тест: докачанный файл переносится, отброшенный удаляется вместе с состоянием"""
+        with store.open('dQw4w9WgXcQ', '18', 'https://example.com/a') as partial:
+            partial.reset(3)
+            with open(partial.path, 'wb') as part_file:
+                part_file.write(b'abc')
+            partial.finish(str(tmp_path / 'video.mp4'))
+        assert (tmp_path / 'video.mp4').read_bytes() == b'abc'
+        
+        with store.open('dQw4w9WgXcQ', '22', 'https://example.com/a') as partial:
+            partial.reset(3)
+            partial.discard()
+        assert os.listdir(store.directory) == []
+    
+    def test_collect_garbage(self, store):
+        """Тест: удаляются только заброшенные файлы старше ttl, занятые и свежие остаются"""
+        with store.open('old', '18', 'https://example.com/a') as partial:
+            partial.reset(10)
+        old = partial
+        with store.open('fresh', '18', 'https://example.com/a') as partial:
+            partial.reset(10)
+        busy = store.open('busy', '18', 'https://example.com/a')
+        busy.reset(10)
+        orphan = os.path.join(store.directory, 'gone.18.part.json')
+        open(orphan, 'w').close()
+        unrelated = os.path.join(store.directory, 'notes.txt')
+        open(unrelated, 'w').close()
+        for path in (old.path, old.state_path, busy.path, busy.state_path, orphan, unrelated):
+            age(path, 7200)
+        
+        assert store.collect_garbage() == 3
+        
+        assert sorted(os.listdir(store.directory)) == [
+            'busy.18.part', 'busy.18.part.json', 'fresh.18.part', 'fresh.18.part.json', 'notes.txt'
+        ]
+        busy.close()
+    
+    def test_pickle_uses_shared_store(self, store, monkeypatch):
+        """Тест: в дочерний процесс передается каталог, а не блокировки"""
+        monkeypatch.setattr(partial_downloads, '_shared_stores', {})
+        restored = pickle.loads(pickle.dumps(store))
+        
+        assert restored is not store
+        assert restored.directory == store.directory
+        assert restored is shared_partial_downloads(store.directory, store.ttl)
+
+class TestResume:
+
+    @pytest.fixture
+    def server(self):
+        server = FakeMediaServer().start()
+        yield server
+        server.stop()
+    
+    @pytest.fixture
+    def store(self, tmp_path):
+        return PartialDownloads(str(tmp_path / 'partial'), ttl=3600)
+    
+    def make_downloader(self, urlopen=None, retries=0):
+        return RangeDownloader(urlopen or FakeYoutubeDL().urlopen, 1, CHUNK, retries, 10 * 1024 * 1024)
+    
+    def test_resume_after_failed_chunk(self, server, store):
+        """Тест: после сбоя скачиваются только недостающие куски"""
+        url = server.url('abc', SIZE)
+        opener = FakeYoutubeDL().urlopen
+        calls = []
+        
+        def failing_urlopen(request):
+            calls.append(request)
+            if len(calls) == 3:
+                raise IOError("Connection reset")
+            return opener(request)
+        
+        with store.open('abc', '18', url) as partial:
+            with pytest.raises(IOError):
+                self.make_downloader(failing_urlopen).download_to_file(url, {}, partial.path, partial)
+        assert server.requests == 2
+        
+        with store.open('abc', '18', url) as partial:
+            assert partial.done == [(0, 2 * CHUNK - 1)]
+            self.make_downloader().download_to_file(url, {}, partial.path, partial)
+            assert open(partial.path, 'rb').read() == media_bytes(0, SIZE)
+        assert server.requests == 4
+        assert server.bytes_sent == SIZE
+    
+    def test_resume_inside_chunk(self, server, store):
+        """Тест: скачанная часть оборвавшегося куска тоже не запрашивается повторно"""
+        url = server.url('abc', SIZE)
+        server.drop_requests = 1
+        
+        with store.open('abc', '18', url) as partial:
+            with pytest.raises(Exception):
+                self.make_downloader().download_to_file(url, {}, partial.path, partial)
+            assert partial.done == [(0, CHUNK // 2 - 1)]
+        
+        with store.open('abc', '18', url) as partial:
+            self.make_downloader().download_to_file(url, {}, partial.path, partial)
+            assert open(partial.path, 'rb').read() == media_bytes(0, SIZE)
+        assert server.bytes_sent == SIZE
+    
+    def test_complete_partial_not_downloaded_again(self, server, store):
+        """Тест: файл, докачанный до сбоя воркера, не скачивается повторно"""
+        url = server.url('abc', SIZE)
+        with store.open('abc', '18', url) as partial:
+            self.make_downloader().download_to_file(url, {}, partial.path, partial)
+        
+        with store.open('abc', '18', url) as partial:
+            assert self.make_downloader().download_to_file(url, {}, partial.path, partial) == SIZE
+        assert server.requests == 4
+    
+    def test_changed_file_restarted(self, server, store):
+        """Тест: если размер по ссылке изменился, файл скачивается заново"""
+        with store.open('abc', '18', server.url('abc', SIZE)) as partial:
+            partial.reset(SIZE)
+            with open(partial.path, 'wb') as part_file:
+                part_file.truncate(SIZE)
+            partial.mark(0, CHUNK - 1)
+        
+        url = server.url('abc', SIZE // 2)
+        with store.open('abc', '18', url) as partial:
+            self.make_downloader().download_to_file(url, {}, partial.path, partial)
+            assert partial.total == SIZE // 2
+            assert open(partial.path, 'rb').read() == media_bytes(0, SIZE // 2)
+
+class TestYouTubeDownloaderResume:
+
+    URL = 'https://www.youtube.com/watch?v=dQw4w9WgXcQ'
+    
+    @pytest.fixture
+    def server(self):
+        server = FakeMediaServer().start()
+        yield server
+        server.stop()
+    
+    @pytest.fixture
+    def downloader(self, server, tmp_path, monkeypatch):
+        monkeypatch.setattr(settings, 'RANGE_RETRIES', 0)
+        FakeYoutubeDL.configure(server, [SIZE])
+        with mock.patch.object(yt_dlp, 'YoutubeDL', FakeYoutubeDL):
+            downloader = YouTubeDownloader(YoutubeDLPool(max_idle=1, max_uses=10), MetadataCache(),
+                                           partials=PartialDownloads(str(tmp_path / 'partial'), ttl=3600))
+            downloader.range_chunk_size = CHUNK
+            yield downloader
+    
+    def test_retry_resumes(self, downloader, server):
+        """Тест: после неудачи недокачанные файлы остаются, повтор докачивает недостающее"""
+        # Обрываются основной формат и запасной
+        server.drop_requests = 2
+        
+        success, result, info = downloader.download(self.URL)
+        
+        assert success is False
+        assert info['error_kind'] == 'transient'
+        assert sorted(os.listdir(downloader.partials.directory)) == [
+            'dQw4w9WgXcQ.17.part', 'dQw4w9WgXcQ.17.part.json', 'dQw4w9WgXcQ.18.part', 'dQw4w9WgXcQ.18.part.json'
+        ]
+        sent_before = server.bytes_sent
+        
+        success, path, info = downloader.download(self.URL)
+        
+        assert success is True
+        assert info['format_id'] == '18'
+        assert open(path, 'rb').read() == media_bytes(0, SIZE)
+        assert server.bytes_sent - sent_before == SIZE - CHUNK // 2
+        assert sorted(os.listdir(downloader.partials.directory)) == ['dQw4w9WgXcQ.17.part', 'dQw4w9WgXcQ.17.part.json']
+        os.remove(path)
@@ -0,0 +1,40 @@
+import threading
+
+from unittest.mock import Mock
+
+from src.services.partition_keeper import PartitionKeeper
+
+class TestPartitionKeeper:
+
+    def test_ensures_partitions_periodically(self):
+        """Тест: секции досоздаются по таймеру, ошибка БД не останавливает поток"""
+        db_service = Mock()
+        called = threading.Event()
+        calls = []
+        
+        def ensure_partitions():
+            calls.append(1)
+            if len(calls) == 1:
+                raise Exception("DB error")
+            called.set()
+        
+        db_service.ensure_partitions.side_effect = ensure_partitions
+        keeper = PartitionKeeper(db_service, interval=0.01)
+        keeper.start()
+        try:
+            assert called.wait(5)
+        finally:
+            keeper.close()
+        
+        assert len(calls) >= 2
+    
+    def test_disabled(self):
+        """Тест: interval=0 выключает фоновое создание секций"""
+        db_service = Mock()
+        keeper = PartitionKeeper(db_service, interval=0)
+        
+        keeper.start()
+        keeper.close()
+        
+        assert keeper._thread is None
+        db_service.ensure_partitions.assert_not_called()
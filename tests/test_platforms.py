@@ -0,0 +1,123 @@
+import pickle
+
+import pytest
+
+from src.services.metadata_cache import MetadataCache
+from src.services.platforms import BUILTIN_PLATFORMS, PlatformRegistry, build_registry, parse_platform_map
+from src.services.ydl_pool import YoutubeDLPool
+from src.services.youtube_downloader import YouTubeDownloader
+
+VALID_URLS = [
+    ('https://www.youtube.com/watch?v=dQw4w9WgXcQ&t=42', 'youtube', 'dQw4w9WgXcQ', 42),
+    ('youtu.be/dQw4w9WgXcQ', 'youtube', 'dQw4w9WgXcQ', None),
+    ('https://vimeo.com/76979871', 'vimeo', 'vimeo-76979871', None),
+    ('https://player.vimeo.com/video/76979871?h=abc', 'vimeo', 'vimeo-76979871', None),
+    ('https://vimeo.com/channels/staffpicks/76979871', 'vimeo', 'vimeo-76979871', None),
+    ('HTTPS://WWW.TIKTOK.COM/@scout2015/video/6718335390845095173?lang=en', 'tiktok', 'tiktok-6718335390845095173', None),
+    ('https://www.tiktok.com/embed/v2/6718335390845095173', 'tiktok', 'tiktok-6718335390845095173', None),
+]
+
+INVALID_URLS = [
+    'https://notyoutube.com.evil/watch?v=dQw4w9WgXcQ',
+    'https://vimeo.com.evil/76979871',
+    'https://vimeo.com/test',
+    'https://www.tiktok.com/@scout2015',
+    'https://instagram.com/p/abc',
+    'просто текст',
+]
+
+class TestPlatformRegistry:
+
+    @pytest.fixture
+    def registry(self):
+        return build_registry('youtube,vimeo,tiktok')
+    
+    @pytest.mark.parametrize('url, platform, video_id, start_time', VALID_URLS)
+    def test_route(self, registry, url, platform, video_id, start_time):
+        """Тест: общее выражение выбирает платформу, ее парсер - ключ видео"""
+        media = registry.route(url)
+        assert (media.platform.name, media.video_id, media.start_time) == (platform, video_id, start_time)
+    
+    @pytest.mark.parametrize('url', INVALID_URLS)
+    def test_route_rejects(self, registry, url):
+        """Тест: посторонние хосты и ссылки не на видео не распознаются"""
+        assert registry.route(url) is None
+    
+    def test_disabled_platform_not_routed(self):
+        """Тест: ссылки платформ не из PLATFORMS не принимаются"""
+        registry = build_registry('youtube')
+        assert registry.route('https://vimeo.com/76979871') is None
+        assert registry.route('https://youtu.be/dQw4w9WgXcQ') is not None
+    
+    def test_canonical_url(self, registry):
+        """Тест канонической ссылки по ключу видео"""
+        assert registry.get('youtube').canonical_url('dQw4w9WgXcQ') == 'https://www.youtube.com/watch?v=dQw4w9WgXcQ'
+        assert registry.get('vimeo').canonical_url('vimeo-76979871') == 'https://vimeo.com/76979871'
+        for url, name, video_id, _ in VALID_URLS:
+            platform = registry.get(name)
+            assert platform.parse(platform.canonical_url(video_id))[0] == video_id
+    
+    def test_build_registry_overrides(self):
+        """Тест размера пула и лимита длительности по платформам"""
+        registry = build_registry('youtube,tiktok', workers='tiktok=2', max_duration='tiktok=180')
+        assert [platform.name for platform in registry] == ['youtube', 'tiktok']
+        assert (registry.get('tiktok').workers, registry.get('tiktok').max_duration) == (2, 180)
+        assert (registry.get('youtube').workers, registry.get('youtube').max_duration) == (None, None)
+        # Встроенные описания платформ не меняются
+        assert BUILTIN_PLATFORMS['tiktok'].workers is None
+    
+    def test_build_registry_unknown(self):
+        """Тест: неизвестная платформа - ошибка конфигурации"""
+        with pytest.raises(ValueError):
+            build_registry('youtube,rutube')
+        with pytest.raises(ValueError):
+            build_registry('youtube', workers='rutube=2')
+        with pytest.raises(ValueError):
+            PlatformRegistry([])
+    
+    def test_parse_platform_map(self):
+        """Тест разбора значений по платформам"""
+        assert parse_platform_map('youtube=4,tiktok=2') == {'youtube': 4, 'tiktok': 2}
+        assert parse_platform_map('') == {}
+    
+    def test_title(self, registry):
+        """Тест названия платформы для статистики"""
+        assert build_registry('youtube').title('vimeo') == 'Vimeo'
+        assert registry.title('unknown') == 'unknown'
+    
+    def test_platform_picklable(self, registry):
+        """Тест: платформа передается в пул процессов вместе с загрузчиком"""
+        platform = pickle.loads(pickle.dumps(registry.get('vimeo')))
+        assert platform.parse('https://vimeo.com/76979871') == ('vimeo-76979871', None)
+
+class TestPlatformDownloader:
+
+    def make_downloader(self, name, **overrides):
+        platform = build_registry(name, **overrides).get(name)
+        return YouTubeDownloader(YoutubeDLPool(max_idle=1, max_uses=10), MetadataCache(), platform=platform)
+    
+    def test_youtube_profile_unchanged(self):
+        """Тест: у YouTube прежние имена профилей и аргументы экстрактора"""
+        downloader = self.make_downloader('youtube')
+        assert downloader.info_profile == 'info'
+        assert downloader.download_profile().startswith('download-')
+        assert 'youtube' in downloader.get_ydl_options('')['extractor_args']
+    
+    def test_platform_profile(self):
+        """Тест: у другой платформы свои профили пула, аргументы YouTube ей не передаются"""
+        downloader = self.make_downloader('vimeo')
+        assert downloader.info_profile == 'vimeo-info'
+        assert downloader.download_profile().startswith('vimeo-download-')
+        assert 'extractor_args' not in downloader.get_ydl_options('')
+        assert downloader.video_id('https://vimeo.com/76979871') == 'vimeo-76979871'
+        assert downloader.video_id('https://youtu.be/dQw4w9WgXcQ') is None
+    
+    def test_platform_limits(self):
+        """Тест лимита длительности платформы"""
+        downloader = self.make_downloader('tiktok', max_duration='tiktok=180')
+        
+        rejection = downloader.check_limits({'title': 'Test', 'duration': 181})
+        
+        assert rejection[0] is False
+        assert rejection[2]['limit'] == 'duration'
+        assert downloader.check_limits({'title': 'Test', 'duration': 180}) is None
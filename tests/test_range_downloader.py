@@ -0,0 +1,142 @@
+import os
+from unittest import mock
+from unittest.mock import Mock
+
+import pytest
+import yt_dlp
+
+from benchmarks.fakes import FakeMediaServer, FakeYoutubeDL, media_bytes
+from src.services.metadata_cache import MetadataCache
+from src.services.range_downloader import FileTooLarge, RangeDownloader, RangesNotSupported
+from src.services.ydl_pool import YoutubeDLPool
+from src.services.youtube_downloader import YouTubeDownloader
+
+SIZE = 256 * 1024
+
+@pytest.fixture
+def server():
+    # 1 MB/s на соединение: куски одного файла заведомо качаются одновременно
+    server = FakeMediaServer(rate=1024 * 1024).start()
+    yield server
+    server.stop()
+
+def make_downloader(connections=4, chunk_size=64 * 1024, retries=2, max_size=10 * 1024 * 1024):
+    return RangeDownloader(FakeYoutubeDL().urlopen, connections, chunk_size, retries, max_size)
+
+class TestRangeDownloader:
+
+    def test_chunks(self):
+        """Тест разбиения файла на диапазоны"""
+        downloader = make_downloader(chunk_size=100)
+        assert downloader.chunks(250) == [(0, 99), (100, 199), (200, 249)]
+        assert downloader.chunks(100) == [(0, 99)]
+    
+    def test_download_to_file(self, server, tmp_path):
+        """Тест: куски скачиваются параллельно и пишутся по своим смещениям"""
+        path = str(tmp_path / 'video.mp4')
+        
+        total = make_downloader().download_to_file(server.url('abc', SIZE), {}, path)
+        
+        assert total == SIZE
+        assert open(path, 'rb').read() == media_bytes(0, SIZE)
+        assert server.requests == 4
+        assert server.max_active > 1
+    
+    def test_download_to_buffer(self, server):
+        """Тест: файл не больше spool_size собирается в памяти"""
+        buffer = make_downloader().download_to_buffer(server.url('abc', SIZE + 1), {}, spool_size=SIZE * 2)
+        
+        assert buffer.read() == media_bytes(0, SIZE + 1)
+        assert server.requests == 5
+    
+    def test_download_to_spooled_file(self, server):
+        """Тест: файл больше spool_size пишется во временный файл"""
+        buffer = make_downloader().download_to_buffer(server.url('abc', SIZE), {}, spool_size=1024)
+        
+        assert not hasattr(buffer, 'getbuffer')
+        assert buffer.read() == media_bytes(0, SIZE)
+        buffer.close()
+    
+    def test_failed_chunk_resumed(self, server, tmp_path):
+        """Тест: оборвавшийся кусок дозапрашивается с места обрыва, остальные не повторяются"""
+        path = str(tmp_path / 'video.mp4')
+        server.drop_requests = 1
+        
+        make_downloader(connections=1).download_to_file(server.url('abc', SIZE), {}, path)
+        
+        assert open(path, 'rb').read() == media_bytes(0, SIZE)
+        assert server.requests == 5
+        assert server.bytes_sent == SIZE
+    
+    def test_retries_exhausted(self, server, tmp_path):
+        """Тест: после retries обрывов кусок считается неудачным"""
+        server.drop_requests = 3
+        
+        with pytest.raises(Exception):
+            make_downloader(connections=1, retries=2).download_to_file(
+                server.url('abc', SIZE), {}, str(tmp_path / 'video.mp4')
+            )
+    
+    def test_too_large_rejected_up_front(self, server, tmp_path):
+        """Тест: превышение лимита видно по первому ответу, файл не создается"""
+        path = str(tmp_path / 'video.mp4')
+        
+        with pytest.raises(FileTooLarge):
+            make_downloader(max_size=SIZE - 1).download_to_file(server.url('abc', SIZE), {}, path)
+        
+        assert not os.path.exists(path)
+        assert server.requests == 1
+    
+    def test_ranges_not_supported(self, tmp_path):
+        """Тест: ответ 200 вместо 206 - скачивание диапазонами невозможно"""
+        response = Mock(status=200, headers={})
+        downloader = RangeDownloader(Mock(return_value=response), 4, 1024, 2, 10 * 1024 * 1024)
+        
+        with pytest.raises(RangesNotSupported):
+            downloader.download_to_file('https://example.com/video.mp4', {}, str(tmp_path / 'video.mp4'))
+        response.close.assert_called_once()
+
+class TestYouTubeDownloaderRanges:
+
+    URL = 'https://www.youtube.com/watch?v=dQw4w9WgXcQ'
+    
+    @pytest.fixture
+    def downloader(self, server):
+        FakeYoutubeDL.configure(server, [SIZE])
+        with mock.patch.object(yt_dlp, 'YoutubeDL', FakeYoutubeDL):
+            downloader = YouTubeDownloader(YoutubeDLPool(max_idle=1, max_uses=10), MetadataCache())
+            downloader.range_connections = 4
+            downloader.range_chunk_size = 64 * 1024
+            downloader.range_min_size = 0
+            yield downloader
+    
+    def test_file_mode(self, downloader, server):
+        """Тест: в режиме file формат скачивается диапазонами во временный файл"""
+        success, path, info = downloader.download(self.URL)
+        
+        assert success is True
+        assert info['file_size'] == SIZE
+        assert open(path, 'rb').read() == media_bytes(0, SIZE)
+        assert server.max_active > 1
+        os.remove(path)
+    
+    def test_stream_mode(self, downloader, server):
+        """Тест: в режиме stream диапазоны собираются в буфер"""
+        downloader.stream_mode = True
+        
+        success, buffer, info = downloader.download(self.URL)
+        
+        assert success is True
+        assert info['file_size'] == SIZE
+        assert buffer.read() == media_bytes(0, SIZE)
+        assert server.requests == 4
+    
+    def test_small_file_single_stream(self, downloader, server):
+        """Тест: файл меньше RANGE_MIN_SIZE скачивается одним запросом"""
+        downloader.range_min_size = SIZE + 1
+        downloader.stream_mode = True
+        
+        success, buffer, info = downloader.download(self.URL)
+        
+        assert success is True
+        assert server.requests == 1
@@ -0,0 +1,125 @@
+import pytest
+from unittest.mock import MagicMock, patch
+
+from src.services.rate_limiter import PostgresRateLimiter, RateLimiter, TokenBucket
+
+class TestTokenBucket:
+
+    def test_refill(self):
+        """Тест пополнения корзины со временем"""
+        bucket = TokenBucket(rate=1, burst=2, now=0)
+        bucket.consume()
+        bucket.consume()
+        
+        assert bucket.wait_time(0) == 1
+        assert bucket.wait_time(0.5) == 0.5
+        assert bucket.wait_time(1) == 0
+    
+    def test_burst_cap(self):
+        """Тест: корзина не наполняется сверх burst"""
+        bucket = TokenBucket(rate=1, burst=2, now=0)
+        bucket.wait_time(100)
+        
+        assert bucket.tokens == 2
+
+class TestRateLimiter:
+
+    @patch('src.services.rate_limiter.time.monotonic')
+    def test_user_limit(self, mock_monotonic):
+        """Тест лимита пользователя: burst запросов подряд, затем отказ с retry-after"""
+        mock_monotonic.return_value = 0
+        limiter = RateLimiter(user_rate=6, user_burst=2, global_rate=0, global_burst=1)
+        
+        assert limiter.check(1).allowed
+        assert limiter.check(1).allowed
+        decision = limiter.check(1)
+        
+        assert not decision.allowed
+        assert decision.scope == 'user'
+        assert decision.retry_after == pytest.approx(10)
+        assert limiter.rejected['user'] == 1
+        # Другой пользователь не затронут
+        assert limiter.check(2).allowed
+        
+        mock_monotonic.return_value = 10
+        assert limiter.check(1).allowed
+    
+    @patch('src.services.rate_limiter.time.monotonic')
+    def test_global_limit(self, mock_monotonic):
+        """Тест общего лимита на всех пользователей"""
+        mock_monotonic.return_value = 0
+        limiter = RateLimiter(user_rate=60, user_burst=5, global_rate=60, global_burst=2)
+        
+        assert limiter.check(1).allowed
+        assert limiter.check(2).allowed
+        decision = limiter.check(3)
+        
+        assert not decision.allowed
+        assert decision.scope == 'global'
+        assert limiter.rejected == {'user': 0, 'global': 1}
+    
+    @patch('src.services.rate_limiter.time.monotonic')
+    def test_rejected_request_keeps_tokens(self, mock_monotonic):
+        """Тест: отклоненный общим лимитом запрос не тратит токен пользователя"""
+        mock_monotonic.return_value = 0
+        limiter = RateLimiter(user_rate=60, user_burst=1, global_rate=60, global_burst=1)
+        
+        assert limiter.check(1).allowed
+        assert not limiter.check(2).allowed
+        
+        mock_monotonic.return_value = 1
+        assert limiter.check(2).allowed
+    
+    def test_disabled(self):
+        """Тест: нулевая частота отключает лимиты"""
+        limiter = RateLimiter(user_rate=0, user_burst=1, global_rate=0, global_burst=1)
+        
+        assert all(limiter.check(1).allowed for _ in range(100))
+
+class TestPostgresRateLimiter:
+
+    @pytest.fixture
+    def cursor(self):
+        return MagicMock()
+    
+    @pytest.fixture
+    def limiter(self, cursor):
+        db_service = MagicMock()
+        db_service.get_connection.return_value.__enter__.return_value.cursor.return_value = cursor
+        return PostgresRateLimiter(db_service, user_rate=60, user_burst=3, global_rate=120, global_burst=10)
+    
+    def test_allowed_consumes_tokens(self, limiter, cursor):
+        """Тест: при наличии токенов они списываются в обеих корзинах"""
+        cursor.fetchone.side_effect = [(2.0,), (5.0,)]
+        
+        decision = limiter.check(7)
+        
+        assert decision.allowed
+        assert cursor.execute.call_count == 3
+        assert cursor.execute.call_args_list[0][0][1] == ('user:7', 3, 3, 1.0)
+        assert cursor.execute.call_args[0][1] == (['user:7', 'global'],)
+    
+    def test_rejected(self, limiter, cursor):
+        """Тест: без токенов ничего не списывается, возвращается retry-after"""
+        cursor.fetchone.side_effect = [(0.5,), (5.0,)]
+        
+        decision = limiter.check(7)
+        
+        assert not decision.allowed
+        assert decision.scope == 'user'
+        assert decision.retry_after == pytest.approx(0.5)
+        assert cursor.execute.call_count == 2
+        assert limiter.rejected['user'] == 1
+    
+    def test_database_error_allows(self, limiter, cursor):
+        """Тест: недоступная БД не блокирует запросы"""
+        cursor.execute.side_effect = Exception("connection refused")
+        
+        assert limiter.check(7).allowed
+    
+    @pytest.mark.asyncio
+    async def test_acquire(self, limiter, cursor):
+        """Тест асинхронной проверки через пул потоков"""
+        cursor.fetchone.side_effect = [(2.0,), (5.0,)]
+        
+        assert (await limiter.acquire(7)).allowed
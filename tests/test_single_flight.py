@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+
+from src.services.single_flight import SingleFlight
+
+class TestSingleFlight:
+
+    @pytest.mark.asyncio
+    async def test_concurrent_calls_share_result(self):
+        """Тест: одновременные запросы выполняют операцию один раз"""
+        flight = SingleFlight()
+        calls = 0
+        release = asyncio.Event()
+        
+        async def work():
+            nonlocal calls
+            calls += 1
+            await release.wait()
+            return 'result'
+        
+        tasks = [asyncio.create_task(flight.do('key', work)) for _ in range(5)]
+        await asyncio.sleep(0)
+        assert flight.is_running('key')
+        release.set()
+        results = await asyncio.gather(*tasks)
+        
+        assert calls == 1
+        assert [r for r, _ in results] == ['result'] * 5
+        assert [shared for _, shared in results].count(False) == 1
+        assert not flight.is_running('key')
+    
+    @pytest.mark.asyncio
+    async def test_failure_fans_out(self):
+        """Тест: ошибка передается всем ожидающим"""
+        flight = SingleFlight()
+        release = asyncio.Event()
+        
+        async def work():
+            await release.wait()
+            raise ValueError("download failed")
+        
+        tasks = [asyncio.create_task(flight.do('key', work)) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        
+        assert all(isinstance(r, ValueError) for r in results)
+        assert len(flight) == 0
+    
+    @pytest.mark.asyncio
+    async def test_leader_cancel_fails_waiters(self):
+        """Тест: отмена первого запроса передается ожидающим как обычная ошибка"""
+        flight = SingleFlight()
+        started = asyncio.Event()
+        
+        async def work():
+            started.set()
+            await asyncio.Event().wait()
+        
+        leader = asyncio.create_task(flight.do('key', work))
+        await started.wait()
+        waiter = asyncio.create_task(flight.do('key', work))
+        await asyncio.sleep(0)
+        leader.cancel()
+        
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        with pytest.raises(RuntimeError):
+            await waiter
+        assert len(flight) == 0
+    
+    @pytest.mark.asyncio
+    async def test_sequential_calls_run_again(self):
+        """Тест: после завершения операция запускается заново"""
+        flight = SingleFlight()
+        calls = 0
+        
+        async def work():
+            nonlocal calls
+            calls += 1
+            return calls
+        
+        assert await flight.do('key', work) == (1, False)
+        assert await flight.do('key', work) == (2, False)
@@ -0,0 +1,97 @@
+import json
+
+import pytest
+
+from src.services import tracing
+from src.services.download_pool import DownloadPool
+from src.services.tracing import JsonLinesExporter, current_request_id, current_span, span, start_trace, traced
+
+@pytest.fixture
+def trace_file(tmp_path, monkeypatch):
+    path = tmp_path / 'trace.jsonl'
+    monkeypatch.setattr(tracing, '_exporter', JsonLinesExporter(str(path)))
+    monkeypatch.setattr(tracing, '_sample_rate', 1.0)
+    return path
+
+def read_spans(path):
+    return [json.loads(line) for line in path.read_text(encoding='utf-8').splitlines()]
+
+class TestTracing:
+
+    def test_spans_exported(self, trace_file):
+        """Тест выгрузки вложенных span'ов одного запроса"""
+        with start_trace('request', user_id=1) as root:
+            request_id = current_request_id()
+            with span('stage', step=1) as stage:
+                stage.set('fallback', True)
+            root.set('outcome', 'completed')
+        
+        spans = {item['name']: item for item in read_spans(trace_file)}
+        assert set(spans) == {'request', 'stage'}
+        assert spans['request']['request_id'] == spans['stage']['request_id'] == request_id
+        assert spans['request']['parent_id'] is None
+        assert spans['stage']['parent_id'] == spans['request']['span_id']
+        assert spans['stage']['attributes'] == {'step': 1, 'fallback': True}
+        assert spans['request']['attributes'] == {'user_id': 1, 'outcome': 'completed'}
+        assert spans['stage']['duration_ms'] >= 0
+        assert current_request_id() is None
+    
+    def test_error_recorded(self, trace_file):
+        """Тест: исключение помечает span и пробрасывается дальше"""
+        with pytest.raises(RuntimeError):
+            with start_trace('request'):
+                with span('stage'):
+                    raise RuntimeError("boom")
+        
+        spans = {item['name']: item for item in read_spans(trace_file)}
+        assert spans['stage']['attributes']['error'] == 'RuntimeError'
+        assert spans['request']['attributes']['error'] == 'RuntimeError'
+    
+    def test_not_sampled(self, trace_file, monkeypatch):
+        """Тест: вне выборки есть request ID, но span'ы не пишутся"""
+        monkeypatch.setattr(tracing, '_sample_rate', 0.0)
+        
+        with start_trace('request') as root:
+            assert current_request_id()
+            assert root is tracing.NOOP_SPAN
+            with span('stage') as stage:
+                assert stage is tracing.NOOP_SPAN
+        
+        assert not trace_file.exists()
+    
+    def test_span_outside_request(self):
+        """Тест: span вне запроса ничего не делает"""
+        with span('stage') as stage:
+            stage.set('key', 'value')
+        
+        assert current_span() is tracing.NOOP_SPAN
+    
+    def test_traced(self, trace_file):
+        """Тест декоратора span'а для синхронной функции"""
+        @traced('db.query')
+        def query():
+            return 42
+        
+        with start_trace('request'):
+            assert query() == 42
+        
+        assert [item['name'] for item in read_spans(trace_file)] == ['db.query', 'request']
+    
+    @pytest.mark.asyncio
+    async def test_context_propagated_to_download_pool(self, trace_file):
+        """Тест: request ID и span'ы доходят до потока пула скачиваний"""
+        pool = DownloadPool(max_workers=1, max_queue=1, executor_type='thread')
+        
+        def work():
+            with span('youtube.download'):
+                return current_request_id()
+        
+        try:
+            with start_trace('request'):
+                request_id = current_request_id()
+                assert await pool.run(work) == request_id
+        finally:
+            pool.shutdown()
+        
+        spans = {item['name']: item for item in read_spans(trace_file)}
+        assert spans['youtube.download']['parent_id'] == spans['request']['span_id']
@@ -0,0 +1,119 @@
+import asyncio
+import json
+
+import pytest
+import pytest_asyncio
+from telegram.ext import Application
+
+from src.bot.webhook import WebhookServer
+
+SECRET = 'test-secret_123'
+
+# Записанное обновление Telegram с текстовым сообщением
+RECORDED_UPDATE = {
+    'update_id': 10001,
+    'message': {
+        'message_id': 42,
+        'date': 1700000000,
+        'chat': {'id': 123, 'type': 'private', 'first_name': 'Test'},
+        'from': {'id': 123, 'is_bot': False, 'first_name': 'Test'},
+        'text': 'https://youtu.be/dQw4w9WgXcQ'
+    }
+}
+
+async def post(port, body, secret=SECRET, path='/telegram', method='POST', extra=b''):
+    """Отправить HTTP запрос на локальный сервер и вернуть статус"""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    headers = f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(body)}\r\nConnection: close\r\n"
+    if secret is not None:
+        headers += f"X-Telegram-Bot-Api-Secret-Token: {secret}\r\n"
+    writer.write(headers.encode() + extra + b"\r\n" + body)
+    await writer.drain()
+    status_line = await reader.readline()
+    writer.close()
+    await writer.wait_closed()
+    return int(status_line.split()[1])
+
+class TestWebhookServer:
+    
+    @pytest_asyncio.fixture
+    async def server(self):
+        application = Application.builder().token('123456:TEST').build()
+        server = WebhookServer(application, '127.0.0.1', 0, '/telegram', SECRET)
+        await server.start()
+        yield server
+        await server.stop()
+    
+    @pytest.mark.asyncio
+    async def test_recorded_update_is_queued(self, server):
+        """Тест: записанный Update попадает в очередь приложения"""
+        status = await post(server.port, json.dumps(RECORDED_UPDATE).encode())
+        
+        assert status == 200
+        update = server.application.update_queue.get_nowait()
+        assert update.update_id == 10001
+        assert update.message.text == 'https://youtu.be/dQw4w9WgXcQ'
+        assert server.received == 1
+    
+    @pytest.mark.asyncio
+    async def test_wrong_secret_rejected(self, server):
+        """Тест отказа при неверном секретном токене"""
+        assert await post(server.port, json.dumps(RECORDED_UPDATE).encode(), secret='wrong') == 403
+        assert await post(server.port, json.dumps(RECORDED_UPDATE).encode(), secret=None) == 403
+        
+        assert server.application.update_queue.empty()
+        assert server.rejected == 2
+    
+    @pytest.mark.asyncio
+    async def test_wrong_path_and_method(self, server):
+        """Тест неизвестного пути и метода"""
+        assert await post(server.port, b'{}', path='/other') == 404
+        assert await post(server.port, b'', method='GET') == 405
+    
+    @pytest.mark.asyncio
+    async def test_invalid_json(self, server):
+        """Тест некорректного тела запроса"""
+        assert await post(server.port, b'not json') == 400
+        assert await post(server.port, b'1') == 400
+        assert await post(server.port, b'[{"update_id": 1}]') == 400
+        assert server.application.update_queue.empty()
+    
+    @pytest.mark.asyncio
+    async def test_body_too_large(self, server):
+        """Тест ограничения размера тела"""
+        server.max_body_size = 10
+        assert await post(server.port, json.dumps(RECORDED_UPDATE).encode()) == 413
+    
+    @pytest.mark.asyncio
+    async def test_keep_alive_connection(self, server):
+        """Тест нескольких обновлений по одному соединению"""
+        reader, writer = await asyncio.open_connection('127.0.0.1', server.port)
+        for update_id in (1, 2):
+            body = json.dumps(dict(RECORDED_UPDATE, update_id=update_id)).encode()
+            writer.write(
+                f"POST /telegram HTTP/1.1\r\nContent-Length: {len(body)}\r\n"
+                f"X-Telegram-Bot-Api-Secret-Token: {SECRET}\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+            assert (await reader.readline()).startswith(b'HTTP/1.1 200')
+            while (await reader.readline()) != b'\r\n':
+                pass
+        writer.close()
+        await writer.wait_closed()
+        
+        assert server.application.update_queue.qsize() == 2
+    
+    @pytest.mark.asyncio
+    async def test_reuse_port(self):
+        """Тест: два воркера слушают один порт"""
+        application = Application.builder().token('123456:TEST').build()
+        first = WebhookServer(application, '127.0.0.1', 0, '/telegram', SECRET, reuse_port=True)
+        await first.start()
+        second = WebhookServer(application, '127.0.0.1', first.port, '/telegram', SECRET, reuse_port=True)
+        await second.start()
+        
+        assert second.port == first.port
+        assert await post(first.port, json.dumps(RECORDED_UPDATE).encode()) == 200
+        
+        await second.stop()
+        await first.stop()
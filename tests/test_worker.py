@@ -0,0 +1,249 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, Mock, patch
+
+from src.bot.worker import DownloadWorker
+from src.models.job import DownloadJob
+from src.services.platforms import build_registry
+
+class TestDownloadWorker:
+
+    @pytest.fixture
+    def job(self):
+        return DownloadJob(
+            user_id=1, chat_id=100, video_url='https://youtu.be/dQw4w9WgXcQ?si=x',
+            video_id='dQw4w9WgXcQ', message_id=10, status_message_id=11,
+            id=7, status='running', attempts=1, max_attempts=3
+        )
+    
+    @pytest.fixture
+    def worker(self):
+        bot = Mock()
+        bot.send_video = AsyncMock(return_value=Mock(video=Mock(file_id='new_id')))
+        bot.edit_message_text = AsyncMock()
+        job_queue = Mock()
+        job_queue.ack.return_value = True
+        youtube_service = Mock(format_key='h720')
+        download_pool = Mock(max_workers=2)
+        download_pool.run = AsyncMock()
+        file_id_cache = AsyncMock()
+        file_id_cache.get.return_value = None
+        return DownloadWorker(
+            bot, job_queue, Mock(), youtube_service, download_pool, file_id_cache,
+            poll_interval=0.01
+        )
+    
+    @pytest.mark.asyncio
+    @patch('os.unlink')
+    @patch('builtins.open')
+    async def test_process_success(self, mock_open, mock_unlink, worker, job):
+        """Тест: видео скачано, отправлено, задание подтверждено"""
+        worker.download_pool.run.return_value = (True, '/tmp/v.mp4', {'title': 'Test', 'file_size': 1024})
+        
+        await worker.process(job)
+        
+        worker.download_pool.run.assert_called_once_with(
+            worker.youtube_service.download, 'https://www.youtube.com/watch?v=dQw4w9WgXcQ'
+        )
+        assert worker.bot.send_video.call_args[0][0] == 100
+        assert worker.bot.send_video.call_args[1]['reply_to_message_id'] == 10
+        worker.file_id_cache.put.assert_called_once_with('dQw4w9WgXcQ', 'h720', 'new_id', 'Test', 1024)
+        worker.job_queue.ack.assert_called_once_with(job)
+        assert worker.db_service.save_download.call_args[0][0].status == 'completed'
+        worker.bot.edit_message_text.assert_called_once_with("✅ Видео отправлено!", chat_id=100, message_id=11)
+    
+    @pytest.mark.asyncio
+    async def test_process_cached(self, worker, job):
+        """Тест: уже загруженное видео отправляется по file_id без скачивания"""
+        worker.file_id_cache.get.return_value = {'file_id': 'cached', 'title': 'Test'}
+        
+        await worker.process(job)
+        
+        worker.download_pool.run.assert_not_called()
+        assert worker.bot.send_video.call_args[0][1] == 'cached'
+        worker.job_queue.ack.assert_called_once_with(job)
+    
+    @pytest.mark.asyncio
+    @patch('os.unlink')
+    @patch('builtins.open')
+    async def test_process_cached_send_timeout(self, mock_open, mock_unlink, worker, job):
+        """Тест: сетевой сбой при отправке по file_id ведет к скачиванию без инвалидации"""
+        from telegram.error import TimedOut
+        
+        worker.file_id_cache.get.return_value = {'file_id': 'cached', 'title': 'Test'}
+        worker.bot.send_video.side_effect = [TimedOut(), Mock(video=Mock(file_id='new_id'))]
+        worker.download_pool.run.return_value = (True, '/tmp/v.mp4', {'title': 'Test', 'file_size': 1024})
+        
+        await worker.process(job)
+        
+        worker.file_id_cache.invalidate.assert_not_called()
+        worker.download_pool.run.assert_called_once()
+        worker.job_queue.ack.assert_called_once_with(job)
+    
+    @pytest.mark.asyncio
+    @patch('os.unlink')
+    @patch('builtins.open')
+    async def test_process_fallback_not_cached(self, mock_open, mock_unlink, worker, job):
+        """Тест: file_id запасного формата не кэшируется"""
+        worker.download_pool.run.return_value = (
+            True, '/tmp/v.mp4', {'title': 'Test', 'file_size': 1024, 'fallback': True}
+        )
+        
+        await worker.process(job)
+        
+        worker.bot.send_video.assert_called_once()
+        worker.file_id_cache.put.assert_not_called()
+        worker.job_queue.ack.assert_called_once_with(job)
+    
+    @pytest.mark.asyncio
+    async def test_process_permanent_error(self, worker, job):
+        """Тест: ошибка лимита не повторяется"""
+        worker.download_pool.run.return_value = (False, "❌ Видео слишком длинное", {'error_kind': 'limit'})
+        
+        await worker.process(job)
+        
+        worker.job_queue.ack.assert_called_once_with(job, 'failed', "❌ Видео слишком длинное")
+        worker.job_queue.retry.assert_not_called()
+        assert worker.db_service.save_download.call_args[0][0].status == 'failed'
+    
+    @pytest.mark.asyncio
+    async def test_process_unavailable_not_retried(self, worker, job):
+        """Тест: недоступное видео не повторяется, даже без префикса ошибки лимита"""
+        worker.download_pool.run.return_value = (False, "Video unavailable", {'error_kind': 'unavailable'})
+        
+        await worker.process(job)
+        
+        worker.job_queue.ack.assert_called_once_with(job, 'failed', "Video unavailable")
+        worker.job_queue.retry.assert_not_called()
+    
+    @pytest.mark.asyncio
+    async def test_process_transient_error_retried(self, worker, job):
+        """Тест: сетевая ошибка возвращает задание в очередь"""
+        worker.download_pool.run.return_value = (False, "HTTP Error 503", {'error_kind': 'transient'})
+        worker.job_queue.retry.return_value = True
+        
+        await worker.process(job)
+        
+        worker.job_queue.retry.assert_called_once_with(job, "HTTP Error 503")
+        worker.job_queue.ack.assert_not_called()
+        worker.db_service.save_download.assert_not_called()
+        worker.bot.edit_message_text.assert_not_called()
+    
+    @pytest.mark.asyncio
+    async def test_process_empty_file_retried(self, worker, job):
+        """Тест: временная ошибка с префиксом не считается окончательной"""
+        worker.download_pool.run.return_value = (False, "❌ Файл не был создан", {'error_kind': 'transient'})
+        worker.job_queue.retry.return_value = True
+        
+        await worker.process(job)
+        
+        worker.job_queue.retry.assert_called_once_with(job, "❌ Файл не был создан")
+        worker.job_queue.ack.assert_not_called()
+    
+    @pytest.mark.asyncio
+    @patch('os.unlink')
+    @patch('builtins.open')
+    async def test_failed_upload_removes_temp_file(self, mock_open, mock_unlink, worker, job):
+        """Тест: временный файл удаляется, даже если отправка упала"""
+        worker.download_pool.run.return_value = (True, '/tmp/v.mp4', {'title': 'Test'})
+        worker.bot.send_video.side_effect = RuntimeError("timed out")
+        worker.job_queue.retry.return_value = True
+        
+        await worker.process(job)
+        
+        mock_unlink.assert_called_once_with('/tmp/v.mp4')
+        worker.job_queue.retry.assert_called_once()
+    
+    @pytest.mark.asyncio
+    async def test_process_retries_exhausted(self, worker, job):
+        """Тест: после последней попытки пользователь получает ошибку"""
+        worker.download_pool.run.side_effect = RuntimeError("upload failed")
+        worker.job_queue.retry.return_value = False
+        
+        await worker.process(job)
+        
+        assert worker.db_service.save_download.call_args[0][0].status == 'failed'
+        assert "ошибка" in worker.bot.edit_message_text.call_args[0][0]
+    
+    @pytest.mark.asyncio
+    async def test_process_expired_job(self, worker, job):
+        """Тест: задание, брошенное пропавшим воркером после последней попытки"""
+        job.attempts = 4
+        
+        await worker.process(job)
+        
+        worker.download_pool.run.assert_not_called()
+        assert worker.job_queue.ack.call_args[0][1] == 'failed'
+    
+    @pytest.mark.asyncio
+    async def test_run_loop_stops(self, worker, job):
+        """Тест цикла: задание обрабатывается, пустая очередь опрашивается до остановки"""
+        stop_event = asyncio.Event()
+        jobs = [job]
+        worker.job_queue.claim.side_effect = lambda worker_id, platform: jobs.pop() if jobs else None
+        worker.process = AsyncMock(side_effect=lambda j: None)
+        
+        async def stop_later():
+            await asyncio.sleep(0.05)
+            stop_event.set()
+        
+        await asyncio.gather(worker.run_loop(stop_event), stop_later())
+        
+        worker.process.assert_called_once_with(job)
+
+class TestDownloadWorkerPlatforms:
+
+    @pytest.fixture
+    def pools(self):
+        pools = {'youtube': Mock(max_workers=2), 'vimeo': Mock(max_workers=1)}
+        for pool in pools.values():
+            pool.run = AsyncMock(return_value=(True, '/tmp/v.mp4', {'title': 'Test', 'file_size': 1024}))
+        return pools
+    
+    @pytest.fixture
+    def worker(self, pools):
+        bot = Mock()
+        bot.send_video = AsyncMock(return_value=Mock(video=Mock(file_id='new_id')))
+        bot.edit_message_text = AsyncMock()
+        job_queue = Mock()
+        job_queue.ack.return_value = True
+        services = {'youtube': Mock(format_key='h720'), 'vimeo': Mock(format_key='h720')}
+        file_id_cache = AsyncMock()
+        file_id_cache.get.return_value = None
+        db_service = Mock()
+        return DownloadWorker(
+            bot, job_queue, db_service, services['youtube'], file_id_cache=file_id_cache,
+            platforms=build_registry('youtube,vimeo'), services=services, download_pools=pools
+        )
+    
+    def make_job(self, platform, video_id):
+        return DownloadJob(
+            user_id=1, chat_id=100, video_url='url', video_id=video_id, platform=platform,
+            id=7, status='running', attempts=1, max_attempts=3
+        )
+    
+    def test_slots_per_platform(self, worker):
+        """Тест: слотов у платформы столько, сколько воркеров в ее пуле"""
+        assert worker.slots() == ['youtube', 'youtube', 'vimeo']
+    
+    @pytest.mark.asyncio
+    @patch('os.unlink')
+    @patch('builtins.open')
+    async def test_job_uses_platform(self, mock_open, mock_unlink, worker, pools):
+        """Тест: задание скачивается в пуле своей платформы и сохраняется с ней"""
+        await worker.process(self.make_job('vimeo', 'vimeo-76979871'))
+        
+        pools['vimeo'].run.assert_called_once_with(worker.services['vimeo'].download, 'https://vimeo.com/76979871')
+        pools['youtube'].run.assert_not_called()
+        assert "📺 Vimeo" in worker.bot.send_video.call_args[1]['caption']
+        assert worker.db_service.save_download.call_args[0][0].platform == 'vimeo'
+    
+    @pytest.mark.asyncio
+    async def test_disabled_platform_failed(self, worker, pools):
+        """Тест: задание отключенной платформы завершается ошибкой без скачивания"""
+        await worker.process(self.make_job('tiktok', 'tiktok-1'))
+        
+        assert worker.job_queue.ack.call_args[0][1] == 'failed'
+        assert worker.db_service.save_download.call_args[0][0].platform == 'tiktok'
+        for pool in pools.values():
+            pool.run.assert_not_called()
@@ -0,0 +1,135 @@
+import pickle
+import threading
+import time
+from unittest.mock import Mock, patch
+
+import pytest
+
+from src.services import ydl_pool
+from src.services.ydl_pool import YoutubeDLPool, shared_pool
+
+@pytest.fixture
+def mock_ydl():
+    with patch('src.services.ydl_pool.yt_dlp.YoutubeDL', side_effect=lambda options: Mock()) as mock:
+        yield mock
+
+class TestYoutubeDLPool:
+
+    def test_reuses_instance(self, mock_ydl):
+        """Тест: освобожденный экземпляр выдается снова, а настройки строятся один раз"""
+        pool = YoutubeDLPool(max_idle=2, max_uses=10)
+        options = Mock(return_value={'quiet': True})
+        
+        with pool.lease('info', options) as first:
+            pass
+        with pool.lease('info', options) as second:
+            pass
+        
+        assert first is second
+        options.assert_called_once()
+        mock_ydl.assert_called_once_with({'quiet': True})
+        assert pool.created == 1
+    
+    def test_profiles_are_separate(self, mock_ydl):
+        """Тест: экземпляры разных профилей не смешиваются"""
+        pool = YoutubeDLPool(max_idle=2, max_uses=10)
+        
+        with pool.lease('info', dict) as info_ydl:
+            pass
+        with pool.lease('download', dict) as download_ydl:
+            pass
+        
+        assert info_ydl is not download_ydl
+        assert pool.idle_count('info') == 1
+        assert pool.idle_count() == 2
+    
+    def test_recycles_after_max_uses(self, mock_ydl):
+        """Тест: после max_uses запросов экземпляр закрывается и создается новый"""
+        pool = YoutubeDLPool(max_idle=2, max_uses=3)
+        
+        seen = []
+        for _ in range(4):
+            with pool.lease('info', dict) as ydl:
+                seen.append(ydl)
+        
+        assert seen[0] is seen[1] is seen[2]
+        assert seen[3] is not seen[0]
+        seen[0].close.assert_called_once()
+        assert pool.recycled == 1
+    
+    def test_closes_extra_instances(self, mock_ydl):
+        """Тест: сверх max_idle свободные экземпляры закрываются"""
+        pool = YoutubeDLPool(max_idle=1, max_uses=10)
+        
+        with pool.lease('info', dict) as first:
+            with pool.lease('info', dict) as second:
+                assert first is not second
+        
+        assert pool.idle_count('info') == 1
+        first.close.assert_called_once()
+        second.close.assert_not_called()
+        
+        pool.close()
+        
+        second.close.assert_called_once()
+        assert pool.idle_count() == 0
+    
+    def test_released_on_error(self, mock_ydl):
+        """Тест: экземпляр возвращается в пул и после ошибки скачивания"""
+        pool = YoutubeDLPool(max_idle=2, max_uses=10)
+        
+        with pytest.raises(RuntimeError):
+            with pool.lease('info', dict):
+                raise RuntimeError("HTTP 403")
+        
+        assert pool.idle_count('info') == 1
+    
+    def test_concurrent_leases_are_exclusive(self, mock_ydl):
+        """Тест: один экземпляр никогда не выдается двум потокам одновременно"""
+        pool = YoutubeDLPool(max_idle=4, max_uses=5)
+        in_use = set()
+        lock = threading.Lock()
+        errors = []
+        
+        def work():
+            for _ in range(20):
+                with pool.lease('download', dict) as ydl:
+                    with lock:
+                        if id(ydl) in in_use:
+                            errors.append(ydl)
+                        in_use.add(id(ydl))
+                    time.sleep(0.001)
+                    with lock:
+                        in_use.discard(id(ydl))
+        
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        assert errors == []
+        assert pool.idle_count('download') <= 4
+    
+    def test_warm_up(self, mock_ydl):
+        """Тест: прогрев создает экземпляры заранее, но не больше max_idle"""
+        pool = YoutubeDLPool(max_idle=2, max_uses=10)
+        
+        pool.warm_up('download', dict, count=5)
+        
+        assert pool.idle_count('download') == 2
+        assert mock_ydl.call_count == 2
+        with pool.lease('download', dict):
+            pass
+        assert mock_ydl.call_count == 2
+    
+    def test_pickle_uses_process_pool(self, monkeypatch):
+        """Тест: при передаче в дочерний процесс пул заменяется общим пулом процесса"""
+        monkeypatch.setattr(ydl_pool, '_shared_pools', {})
+        pool = YoutubeDLPool(max_idle=3, max_uses=7)
+        
+        restored = pickle.loads(pickle.dumps(pool))
+        
+        assert restored is not pool
+        assert restored is shared_pool(3, 7)
+        assert (restored.max_idle, restored.max_uses) == (3, 7)
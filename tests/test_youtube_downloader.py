@@ -1,15 +1,21 @@
 import pytest
 from unittest.mock import Mock, patch, mock_open
 import tempfile
+import time
 import os
 
-from src.services.youtube_downloader import YouTubeDownloader
+import yt_dlp
+
+from src.services.youtube_downloader import FileTooLarge, YouTubeDownloader, classify_error
+from src.services.media_cache import MediaCache
+from src.services.metadata_cache import MetadataCache
+from src.services.ydl_pool import YoutubeDLPool
 
 class TestYouTubeDownloader:
-    
+
     @pytest.fixture
     def downloader(self):
-        return YouTubeDownloader()
+        return YouTubeDownloader(YoutubeDLPool(max_idle=2, max_uses=10), MetadataCache())
     
     def test_init(self, downloader):
         """Тест инициализации"""
@@ -22,8 +28,11 @@ class TestYouTubeDownloader:
         options = downloader.get_ydl_options(output_path)
         
         assert options['outtmpl'] == output_path
-        assert options['no_cache_dir'] is True
+        assert 'no_cache_dir' not in options
+        assert 'cachedir' in options
         assert options['force_overwrites'] is True
+        assert options['progress_hooks'] == [downloader.check_progress]
+        assert options['format'] is downloader.format_selector
         assert 'youtube' in options['extractor_args']
     
     @patch('src.services.youtube_downloader.yt_dlp.YoutubeDL')
@@ -35,7 +44,7 @@ class TestYouTubeDownloader:
             'duration': 300,
             'view_count': 1000
         }
-        mock_ydl.return_value.__enter__.return_value = mock_instance
+        mock_ydl.return_value = mock_instance
         
         success, info = downloader.extract_info('https://youtube.com/test')
         
@@ -49,7 +58,7 @@ class TestYouTubeDownloader:
         """Тест ошибки при извлечении информации"""
         mock_instance = Mock()
         mock_instance.extract_info.side_effect = Exception("Network error")
-        mock_ydl.return_value.__enter__.return_value = mock_instance
+        mock_ydl.return_value = mock_instance
         
         success, info = downloader.extract_info('https://youtube.com/test')
         
@@ -57,49 +66,336 @@ class TestYouTubeDownloader:
         assert 'error' in info
         assert 'Network error' in info['error']
     
+    @pytest.fixture
+    def mock_ydl_instance(self):
+        """Экземпляр YoutubeDL, который один раз извлекает информацию о видео"""
+        instance = Mock()
+        instance.extract_info.return_value = {
+            'title': 'Test Video',
+            'duration': 300,
+            'view_count': 1000,
+            'format_id': '18',
+            'formats': [
+                {'format_id': '18', 'ext': 'mp4', 'vcodec': 'avc1', 'acodec': 'mp4a'},
+                {'format_id': '17', 'ext': '3gp', 'vcodec': 'mp4v', 'acodec': 'mp4a'},
+            ]
+        }
+        instance.process_info.return_value = None
+        instance.params = {'outtmpl': {'default': ''}}
+        return instance
+    
     @patch('src.services.youtube_downloader.yt_dlp.YoutubeDL')
     @patch('src.services.youtube_downloader.tempfile.NamedTemporaryFile')
     @patch('os.path.exists')
     @patch('os.path.getsize')
     @patch('os.remove')
     def test_download_success(self, mock_remove, mock_getsize, mock_exists,
-                            mock_tempfile, mock_ydl, downloader):
+                            mock_tempfile, mock_ydl, downloader, mock_ydl_instance):
         """Тест успешного скачивания"""
         # Настраиваем моки
         mock_temp = Mock()
         mock_temp.name = '/tmp/test.mp4'
         mock_tempfile.return_value.__enter__.return_value = mock_temp
+        mock_ydl.return_value = mock_ydl_instance
         
-        mock_ydl_instance = Mock()
-        mock_ydl_instance.download.return_value = None  # Успешное скачивание
-        mock_ydl.return_value.__enter__.return_value = mock_ydl_instance
+        mock_exists.return_value = True
+        mock_getsize.return_value = 1024 * 1024  # 1MB
         
-        # Мокируем extract_info для реального объекта downloader
-        with patch.object(downloader, 'extract_info', return_value=(True, {
-            'title': 'Test Video',
-            'duration': 300,
-            'view_count': 1000
-        })):
-            mock_exists.return_value = True
-            mock_getsize.return_value = 1024 * 1024  # 1MB
-            
+        success, result, info = downloader.download('https://youtube.com/test')
+        
+        assert success is True
+        assert result == '/tmp/test.mp4'
+        assert info['title'] == 'Test Video'
+        assert info['file_size'] == 1024 * 1024
+    
+    def make_response(self, data, content_length=None):
+        """HTTP ответ, который отдает данные кусками"""
+        response = Mock()
+        response.headers = {'Content-Length': str(content_length if content_length is not None else len(data))}
+        chunks = [data[i:i + 4] for i in range(0, len(data), 4)] + [b'']
+        response.read.side_effect = chunks
+        response.__enter__ = Mock(return_value=response)
+        response.__exit__ = Mock(return_value=False)
+        return response
+    
+    @patch('src.services.youtube_downloader.yt_dlp.YoutubeDL')
+    def test_download_stream_mode(self, mock_ydl, downloader, mock_ydl_instance):
+        """Тест потокового режима: видео читается в буфер без временного файла"""
+        downloader.stream_mode = True
+        mock_ydl_instance.extract_info.return_value.update({
+            'url': 'https://googlevideo.test/v', 'protocol': 'https'
+        })
+        mock_ydl_instance.urlopen.return_value = self.make_response(b'0123456789')
+        mock_ydl.return_value = mock_ydl_instance
+        
+        success, result, info = downloader.download('https://youtube.com/test')
+        
+        assert success is True
+        assert result.read() == b'0123456789'
+        assert info['file_size'] == 10
+        mock_ydl_instance.process_info.assert_not_called()
+        result.close()
+    
+    @patch('src.services.youtube_downloader.yt_dlp.YoutubeDL')
+    def test_download_stream_aborts_when_too_large(self, mock_ydl, downloader, mock_ydl_instance):
+        """Тест: превышение лимита прерывает передачу, не дочитывая файл"""
+        downloader.stream_mode = True
+        downloader.max_file_size = 6
+        mock_ydl_instance.extract_info.return_value.update({
+            'url': 'https://googlevideo.test/v', 'protocol': 'https'
+        })
+        response = self.make_response(b'0123456789' * 10, content_length=0)
+        mock_ydl_instance.urlopen.return_value = response
+        mock_ydl.return_value = mock_ydl_instance
+        
+        success, result, info = downloader.download('https://youtube.com/test')
+        
+        assert success is False
+        assert "Файл слишком большой" in result
+        assert response.read.call_count == 2
+    
+    def test_stream_rejects_content_length(self, downloader):
+        """Тест: Content-Length больше лимита отклоняется до чтения"""
+        downloader.max_file_size = 5
+        ydl = Mock()
+        response = self.make_response(b'0123456789')
+        ydl.urlopen.return_value = response
+        
+        with pytest.raises(FileTooLarge):
+            downloader.stream_to_buffer(ydl, {'url': 'https://googlevideo.test/v'})
+        response.read.assert_not_called()
+    
+    def test_is_streamable(self, downloader):
+        """Тест: склейка и HLS скачиваются через файл"""
+        assert downloader.is_streamable({'url': 'https://x', 'protocol': 'https'})
+        assert not downloader.is_streamable({'url': 'https://x', 'protocol': 'm3u8_native'})
+        assert not downloader.is_streamable({'requested_formats': [{}, {}]})
+    
+    @patch('src.services.youtube_downloader.yt_dlp.YoutubeDL')
+    @patch('src.services.youtube_downloader.tempfile.NamedTemporaryFile')
+    @patch('os.path.exists')
+    @patch('os.path.getsize')
+    @patch('os.remove')
+    def test_download_extracts_once(self, mock_remove, mock_getsize, mock_exists,
+                                    mock_tempfile, mock_ydl, downloader, mock_ydl_instance):
+        """Тест: информация извлекается один раз и переиспользуется для скачивания"""
+        mock_temp = Mock()
+        mock_temp.name = '/tmp/test.mp4'
+        mock_tempfile.return_value.__enter__.return_value = mock_temp
+        mock_ydl.return_value = mock_ydl_instance
+        mock_exists.return_value = True
+        mock_getsize.return_value = 1024
+        
+        downloader.download('https://youtube.com/test')
+        
+        mock_ydl.assert_called_once()
+        mock_ydl_instance.extract_info.assert_called_once_with('https://youtube.com/test', download=False)
+        mock_ydl_instance.process_info.assert_called_once()
+        assert mock_ydl_instance.process_info.call_args[0][0]['format_id'] == '18'
+        mock_ydl_instance.download.assert_not_called()
+    
+    @patch('src.services.youtube_downloader.yt_dlp.YoutubeDL')
+    @patch('src.services.youtube_downloader.tempfile.NamedTemporaryFile')
+    @patch('os.path.exists')
+    @patch('os.path.getsize')
+    @patch('os.remove')
+    def test_download_fallback_uses_extracted_formats(self, mock_remove, mock_getsize, mock_exists,
+                                                      mock_tempfile, mock_ydl, downloader, mock_ydl_instance):
+        """Тест: запасной формат выбирается без повторного извлечения"""
+        mock_temp = Mock()
+        mock_temp.name = '/tmp/test.mp4'
+        mock_tempfile.return_value.__enter__.return_value = mock_temp
+        mock_ydl.return_value = mock_ydl_instance
+        mock_ydl_instance.process_info.side_effect = [Exception("HTTP 403"), None]
+        mock_exists.return_value = True
+        mock_getsize.return_value = 1024
+        
+        success, result, info = downloader.download('https://youtube.com/test')
+        
+        assert success is True
+        mock_ydl.assert_called_once()
+        mock_ydl_instance.extract_info.assert_called_once()
+        assert mock_ydl_instance.process_info.call_args[0][0]['format_id'] == '17'
+        assert mock_ydl_instance.process_info.call_args[0][0]['title'] == 'Test Video'
+        assert info['fallback'] is True
+    
+    @patch('src.services.youtube_downloader.yt_dlp.YoutubeDL')
+    @patch('src.services.youtube_downloader.tempfile.NamedTemporaryFile')
+    @patch('os.path.exists')
+    @patch('os.path.getsize')
+    @patch('os.remove')
+    def test_download_reselects_by_duration(self, mock_remove, mock_getsize, mock_exists,
+                                            mock_tempfile, mock_ydl, downloader, mock_ydl_instance):
+        """Тест: формат без filesize оценивается по битрейту и длительности после извлечения"""
+        mock_temp = Mock()
+        mock_temp.name = '/tmp/test.mp4'
+        mock_tempfile.return_value.__enter__.return_value = mock_temp
+        mock_ydl.return_value = mock_ydl_instance
+        mock_ydl_instance.extract_info.return_value.update({
+            'format_id': '22',
+            'formats': [
+                {'format_id': '18', 'ext': 'mp4', 'vcodec': 'avc1', 'acodec': 'mp4a', 'height': 360, 'tbr': 500},
+                # 2500 Кбит/с × 300 с ≈ 94 MB - больше лимита
+                {'format_id': '22', 'ext': 'mp4', 'vcodec': 'avc1', 'acodec': 'mp4a', 'height': 720, 'tbr': 2500},
+            ],
+        })
+        mock_exists.return_value = True
+        mock_getsize.return_value = 1024
+        
+        success, result, info = downloader.download('https://youtube.com/test')
+        
+        assert success is True
+        assert info['format_id'] == '18'
+        assert mock_ydl_instance.process_info.call_args[0][0]['format_id'] == '18'
+    
+    @patch('src.services.youtube_downloader.yt_dlp.YoutubeDL')
+    @patch('src.services.youtube_downloader.tempfile.NamedTemporaryFile')
+    @patch('os.path.exists')
+    @patch('os.path.getsize')
+    @patch('os.remove')
+    def test_download_fallback_traced(self, mock_remove, mock_getsize, mock_exists, mock_tempfile, mock_ydl,
+                                      downloader, mock_ydl_instance, tmp_path, monkeypatch):
+        """Тест: span'ы извлечения и скачивания, запасной формат отмечен в трассировке"""
+        import json
+        from src.services import tracing
+        
+        trace_path = tmp_path / 'trace.jsonl'
+        monkeypatch.setattr(tracing, '_exporter', tracing.JsonLinesExporter(str(trace_path)))
+        monkeypatch.setattr(tracing, '_sample_rate', 1.0)
+        mock_temp = Mock()
+        mock_temp.name = '/tmp/test.mp4'
+        mock_tempfile.return_value.__enter__.return_value = mock_temp
+        mock_ydl.return_value = mock_ydl_instance
+        mock_ydl_instance.process_info.side_effect = [Exception("HTTP 403"), None]
+        mock_exists.return_value = True
+        mock_getsize.return_value = 1024
+        
+        with tracing.start_trace('request'):
             success, result, info = downloader.download('https://youtube.com/test')
-            
-            assert success is True
-            assert result == '/tmp/test.mp4'
-            assert info['title'] == 'Test Video'
-            assert info['file_size'] == 1024 * 1024
+        
+        assert success is True
+        spans = {item['name']: item for item in map(json.loads, trace_path.read_text().splitlines())}
+        assert set(spans) == {'request', 'youtube.extract_info', 'youtube.download', 'youtube.fallback'}
+        assert spans['youtube.download']['attributes']['fallback'] is True
+        assert spans['youtube.download']['attributes']['format_id'] == '18'
+        assert spans['youtube.fallback']['attributes']['format_id'] == '17'
+        assert spans['youtube.fallback']['parent_id'] == spans['youtube.download']['span_id']
     
-    def test_download_too_long(self, downloader):
+    @patch('src.services.youtube_downloader.yt_dlp.YoutubeDL')
+    def test_download_too_long(self, mock_ydl, downloader, mock_ydl_instance):
         """Тест скачивания слишком длинного видео"""
-        with patch.object(downloader, 'extract_info', return_value=(True, {
+        mock_ydl_instance.extract_info.return_value = {
             'title': 'Long Video',
             'duration': 1200,  # 20 minutes
-        })):
-            success, result, info = downloader.download('https://youtube.com/test')
-            
-            assert success is False
-            assert 'слишком длинное' in result
+        }
+        mock_ydl.return_value = mock_ydl_instance
+        
+        success, result, info = downloader.download('https://youtube.com/test')
+        
+        assert success is False
+        assert 'слишком длинное' in result
+        assert info['limit'] == 'duration'
+        mock_ydl_instance.process_info.assert_not_called()
+    
+    @patch('src.services.youtube_downloader.yt_dlp.YoutubeDL')
+    def test_download_format_too_large_before_download(self, mock_ydl, downloader, mock_ydl_instance):
+        """Тест отказа по размеру формата до начала скачивания"""
+        mock_ydl_instance.extract_info.return_value = {
+            'title': 'Large Video',
+            'duration': 300,
+            'filesize_approx': 100 * 1024 * 1024,
+        }
+        mock_ydl.return_value = mock_ydl_instance
+        
+        success, result, info = downloader.download('https://youtube.com/test')
+        
+        assert success is False
+        assert 'слишком большой' in result
+        assert info['limit'] == 'size'
+        mock_ydl_instance.process_info.assert_not_called()
+    
+    @patch('src.services.youtube_downloader.yt_dlp.YoutubeDL')
+    def test_download_merged_formats_too_large(self, mock_ydl, downloader, mock_ydl_instance):
+        """Тест: размер склеиваемых дорожек суммируется до скачивания"""
+        mock_ydl_instance.extract_info.return_value.update({
+            'requested_formats': [
+                {'format_id': '136', 'filesize': 40 * 1024 * 1024},
+                {'format_id': '140', 'filesize': 20 * 1024 * 1024},
+            ]
+        })
+        mock_ydl.return_value = mock_ydl_instance
+        
+        success, result, info = downloader.download('https://youtube.com/test')
+        
+        assert success is False
+        assert 'слишком большой' in result
+        mock_ydl_instance.process_info.assert_not_called()
+    
+    @patch('src.services.youtube_downloader.yt_dlp.YoutubeDL')
+    def test_download_live_rejected(self, mock_ydl, downloader, mock_ydl_instance):
+        """Тест отказа для прямой трансляции без длительности"""
+        mock_ydl_instance.extract_info.return_value.update({'duration': None, 'is_live': True})
+        mock_ydl.return_value = mock_ydl_instance
+        
+        success, result, info = downloader.download('https://youtube.com/test')
+        
+        assert success is False
+        assert 'слишком длинное' in result
+        mock_ydl_instance.process_info.assert_not_called()
+    
+    def test_classify_error(self):
+        """Тест: недоступное видео отличается от временного сбоя"""
+        unavailable = yt_dlp.utils.ExtractorError('Video unavailable', expected=True)
+        wrapped = yt_dlp.utils.DownloadError('ERROR: Video unavailable', (type(unavailable), unavailable, None))
+        
+        assert classify_error(wrapped) == 'unavailable'
+        assert classify_error(unavailable) == 'unavailable'
+        assert classify_error(yt_dlp.utils.DownloadError('HTTP Error 503')) == 'transient'
+        assert classify_error(OSError('reset')) == 'transient'
+    
+    @patch('src.services.youtube_downloader.yt_dlp.YoutubeDL')
+    def test_download_limit_error_kind(self, mock_ydl, downloader, mock_ydl_instance):
+        """Тест: отказ по лимиту помечается как окончательный"""
+        mock_ydl_instance.extract_info.return_value.update({'duration': 10000})
+        mock_ydl.return_value = mock_ydl_instance
+        
+        success, result, info = downloader.download('https://youtube.com/test')
+        
+        assert success is False
+        assert info['error_kind'] == 'limit'
+    
+    def test_check_progress(self, downloader):
+        """Тест прогресс-хука: лимит проверяется по скачанным и ожидаемым байтам"""
+        downloader.max_file_size = 100
+        downloader.check_progress({'status': 'downloading', 'downloaded_bytes': 50, 'total_bytes': 90})
+        downloader.check_progress({'status': 'finished', 'downloaded_bytes': 500})
+        
+        with pytest.raises(FileTooLarge):
+            downloader.check_progress({'status': 'downloading', 'downloaded_bytes': 10, 'total_bytes': 200})
+        with pytest.raises(FileTooLarge):
+            downloader.check_progress({'status': 'downloading', 'downloaded_bytes': 101})
+    
+    @patch('src.services.youtube_downloader.yt_dlp.YoutubeDL')
+    @patch('src.services.youtube_downloader.tempfile.NamedTemporaryFile')
+    @patch('os.remove')
+    @patch('os.path.exists')
+    def test_download_aborted_by_progress_hook(self, mock_exists, mock_remove, mock_tempfile,
+                                               mock_ydl, downloader, mock_ydl_instance):
+        """Тест: превышение размера во время скачивания прерывает загрузку без запасного формата"""
+        mock_temp = Mock()
+        mock_temp.name = '/tmp/test.mp4'
+        mock_tempfile.return_value.__enter__.return_value = mock_temp
+        mock_ydl_instance.process_info.side_effect = FileTooLarge(60 * 1024 * 1024)
+        mock_ydl.return_value = mock_ydl_instance
+        mock_exists.return_value = True
+        
+        success, result, info = downloader.download('https://youtube.com/test')
+        
+        assert success is False
+        assert result == downloader.size_error()
+        assert info['title'] == 'Test Video'
+        mock_ydl_instance.process_info.assert_called_once()
+        mock_remove.assert_any_call('/tmp/test.mp4.part')
     
     @patch('src.services.youtube_downloader.yt_dlp.YoutubeDL')
     @patch('src.services.youtube_downloader.tempfile.NamedTemporaryFile')
@@ -107,29 +403,21 @@ class TestYouTubeDownloader:
     @patch('os.path.getsize')
     @patch('os.remove')
     def test_download_empty_file(self, mock_remove, mock_getsize, mock_exists,
-                                mock_tempfile, mock_ydl, downloader):
+                                mock_tempfile, mock_ydl, downloader, mock_ydl_instance):
         """Тест скачивания пустого файла"""
         mock_temp = Mock()
         mock_temp.name = '/tmp/test.mp4'
         mock_tempfile.return_value.__enter__.return_value = mock_temp
+        mock_ydl.return_value = mock_ydl_instance
         
-        mock_ydl_instance = Mock()
-        mock_ydl_instance.download.return_value = None
-        mock_ydl.return_value.__enter__.return_value = mock_ydl_instance
+        mock_exists.return_value = True
+        mock_getsize.return_value = 0  # Empty file
         
-        # Мокируем extract_info для реального объекта downloader
-        with patch.object(downloader, 'extract_info', return_value=(True, {
-            'title': 'Test Video',
-            'duration': 300
-        })):
-            mock_exists.return_value = True
-            mock_getsize.return_value = 0  # Empty file
-            
-            success, result, info = downloader.download('https://youtube.com/test')
-            
-            assert success is False
-            assert 'пустой' in result
-            mock_remove.assert_called()  # Проверяем что remove был вызван
+        success, result, info = downloader.download('https://youtube.com/test')
+        
+        assert success is False
+        assert 'пустой' in result
+        mock_remove.assert_called()  # Проверяем что remove был вызван
     
     @patch('src.services.youtube_downloader.yt_dlp.YoutubeDL')
     @patch('src.services.youtube_downloader.tempfile.NamedTemporaryFile')
@@ -137,92 +425,325 @@ class TestYouTubeDownloader:
     @patch('os.path.getsize')
     @patch('os.remove')
     def test_download_file_too_large(self, mock_remove, mock_getsize, mock_exists,
-                                    mock_tempfile, mock_ydl, downloader):
+                                    mock_tempfile, mock_ydl, downloader, mock_ydl_instance):
         """Тест скачивания слишком большого файла"""
         mock_temp = Mock()
         mock_temp.name = '/tmp/test.mp4'
         mock_tempfile.return_value.__enter__.return_value = mock_temp
+        mock_ydl.return_value = mock_ydl_instance
+        
+        mock_exists.return_value = True
+        mock_getsize.return_value = 100 * 1024 * 1024  # 100MB (больше лимита 50MB)
         
-        mock_ydl_instance = Mock()
-        mock_ydl_instance.download.return_value = None
-        mock_ydl.return_value.__enter__.return_value = mock_ydl_instance
+        success, result, info = downloader.download('https://youtube.com/test')
         
-        # Мокируем extract_info для реального объекта downloader
-        with patch.object(downloader, 'extract_info', return_value=(True, {
-            'title': 'Large Video',
-            'duration': 300
-        })):
-            mock_exists.return_value = True
-            mock_getsize.return_value = 100 * 1024 * 1024  # 100MB (больше лимита 50MB)
-            
-            success, result, info = downloader.download('https://youtube.com/test')
-            
-            assert success is False
-            assert 'слишком большой' in result
-            mock_remove.assert_called()  # Проверяем что remove был вызван
+        assert success is False
+        assert 'слишком большой' in result
+        mock_remove.assert_called()  # Проверяем что remove был вызван
     
-    def test_download_extract_info_failure(self, downloader):
+    @patch('src.services.youtube_downloader.yt_dlp.YoutubeDL')
+    def test_download_extract_info_failure(self, mock_ydl, downloader, mock_ydl_instance):
         """Тест ошибки при получении информации о видео"""
-        with patch.object(downloader, 'extract_info', return_value=(False, {
-            'error': 'Network error'
-        })):
-            success, result, info = downloader.download('https://youtube.com/test')
-            
-            assert success is False
-            assert result == 'Network error'
+        mock_ydl_instance.extract_info.side_effect = Exception("Network error")
+        mock_ydl.return_value = mock_ydl_instance
+        
+        success, result, info = downloader.download('https://youtube.com/test')
+        
+        assert success is False
+        assert result == 'Network error'
     
     @patch('src.services.youtube_downloader.yt_dlp.YoutubeDL')
     @patch('src.services.youtube_downloader.tempfile.NamedTemporaryFile')
     @patch('os.path.exists')
     @patch('os.remove')
     def test_download_file_not_created(self, mock_remove, mock_exists,
-                                      mock_tempfile, mock_ydl, downloader):
+                                      mock_tempfile, mock_ydl, downloader, mock_ydl_instance):
         """Тест когда файл не был создан после скачивания"""
         mock_temp = Mock()
         mock_temp.name = '/tmp/test.mp4'
         mock_tempfile.return_value.__enter__.return_value = mock_temp
+        mock_ydl.return_value = mock_ydl_instance
         
-        mock_ydl_instance = Mock()
-        mock_ydl_instance.download.return_value = None
-        mock_ydl.return_value.__enter__.return_value = mock_ydl_instance
+        mock_exists.return_value = False  # Файл не существует
         
-        # Мокируем extract_info для реального объекта downloader
-        with patch.object(downloader, 'extract_info', return_value=(True, {
-            'title': 'Test Video',
-            'duration': 300
-        })):
-            mock_exists.return_value = False  # Файл не существует
-            
-            success, result, info = downloader.download('https://youtube.com/test')
-            
-            assert success is False
-            assert 'не был создан' in result
+        success, result, info = downloader.download('https://youtube.com/test')
+        
+        assert success is False
+        assert 'не был создан' in result
     
     @patch('src.services.youtube_downloader.yt_dlp.YoutubeDL')
     @patch('src.services.youtube_downloader.tempfile.NamedTemporaryFile')
     @patch('os.path.exists')
     @patch('os.remove')
-    def test_download_general_exception(self, mock_remove, mock_exists, mock_tempfile, mock_ydl, downloader):
+    def test_download_general_exception(self, mock_remove, mock_exists, mock_tempfile, mock_ydl,
+                                         downloader, mock_ydl_instance):
         """Тест обработки общих исключений"""
         mock_temp = Mock()
         mock_temp.name = '/tmp/test.mp4'
         mock_tempfile.return_value.__enter__.return_value = mock_temp
-    
-        # Настраиваем YoutubeDL чтобы работал при создании, но падал при download
-        mock_ydl_instance = Mock()
-        mock_ydl_instance.download.side_effect = Exception("General error")
-        mock_ydl.return_value.__enter__.return_value = mock_ydl_instance
-    
+        
+        # Настраиваем YoutubeDL чтобы работал при создании, но падал при скачивании
+        mock_ydl_instance.process_info.side_effect = Exception("General error")
+        mock_ydl.return_value = mock_ydl_instance
+        
         # Мокируем что файл существует для вызова safe_remove
         mock_exists.return_value = True
+        
+        success, result, info = downloader.download('https://youtube.com/test')
+        
+        assert success is False
+        assert 'General error' in result
+        mock_remove.assert_called()  # Теперь remove должен вызваться
     
-        # Мокируем extract_info для реального объекта downloader
-        with patch.object(downloader, 'extract_info', return_value=(True, {
+    @patch('src.services.youtube_downloader.yt_dlp.YoutubeDL')
+    @patch('src.services.youtube_downloader.tempfile.NamedTemporaryFile')
+    @patch('os.path.exists')
+    @patch('os.path.getsize')
+    @patch('os.remove')
+    def test_download_reuses_ydl_instance(self, mock_remove, mock_getsize, mock_exists,
+                                          mock_tempfile, mock_ydl, downloader, mock_ydl_instance):
+        """Тест: повторные скачивания используют тот же экземпляр YoutubeDL с новым файлом"""
+        first, second = Mock(), Mock()
+        first.name = '/tmp/first.mp4'
+        second.name = '/tmp/second.mp4'
+        mock_tempfile.return_value.__enter__.side_effect = [first, second]
+        mock_ydl.return_value = mock_ydl_instance
+        mock_exists.return_value = True
+        mock_getsize.return_value = 1024
+        
+        assert downloader.download('https://youtube.com/a')[1] == '/tmp/first.mp4'
+        assert mock_ydl_instance.params['outtmpl']['default'] == '/tmp/first.mp4'
+        assert downloader.download('https://youtube.com/b')[1] == '/tmp/second.mp4'
+        
+        mock_ydl.assert_called_once()
+        assert mock_ydl_instance.params['outtmpl']['default'] == '/tmp/second.mp4'
+        assert mock_ydl_instance.process_info.call_count == 2
+    
+    @patch('src.services.youtube_downloader.yt_dlp.YoutubeDL')
+    def test_profiles_depend_on_size_limit(self, mock_ydl, downloader, mock_ydl_instance):
+        """Тест: извлечение и скачивание с другим лимитом размера используют разные экземпляры"""
+        mock_ydl_instance.extract_info.return_value.update({'duration': 10000})
+        mock_ydl.return_value = mock_ydl_instance
+        
+        downloader.extract_info('https://youtube.com/test')
+        downloader.download('https://youtube.com/test')
+        downloader.download('https://youtube.com/test')
+        downloader.max_file_size = 10 * 1024 * 1024
+        downloader.download('https://youtube.com/test')
+        
+        assert mock_ydl.call_count == 3
+        assert mock_ydl.call_args_list[0][0][0]['quiet'] is True
+        assert 'format' not in mock_ydl.call_args_list[0][0][0]
+
+class TestYouTubeDownloaderMetadataCache:
+
+    URL = 'https://www.youtube.com/watch?v=dQw4w9WgXcQ'
+    
+    @pytest.fixture
+    def downloader(self):
+        return YouTubeDownloader(YoutubeDLPool(max_idle=2, max_uses=10), MetadataCache(maxsize=10, ttl=60))
+    
+    @pytest.fixture
+    def mock_ydl_instance(self):
+        instance = Mock()
+        instance.extract_info.side_effect = lambda url, download: {
+            'id': 'dQw4w9WgXcQ',
             'title': 'Test Video',
-            'duration': 300
-        })):
-            success, result, info = downloader.download('https://youtube.com/test')
+            'duration': 300,
+            'format_id': '18',
+            'url': f"https://rr1.googlevideo.com/videoplayback?expire={int(time.time()) + 6 * 3600}",
+            'formats': [{'format_id': '18', 'ext': 'mp4', 'vcodec': 'avc1', 'acodec': 'mp4a'}],
+        }
+        instance.params = {'outtmpl': {'default': ''}}
+        return instance
+    
+    @pytest.fixture
+    def temp_file(self):
+        with patch('src.services.youtube_downloader.tempfile.NamedTemporaryFile') as mock_tempfile, \
+                patch('os.path.exists', return_value=True), \
+                patch('os.path.getsize', return_value=1024), \
+                patch('os.remove'):
+            mock_tempfile.return_value.__enter__.return_value.name = '/tmp/test.mp4'
+            yield
+    
+    @patch('src.services.youtube_downloader.yt_dlp.YoutubeDL')
+    def test_known_long_video_rejected_without_extraction(self, mock_ydl, downloader, mock_ydl_instance):
+        """Тест: повторный запрос слишком длинного видео отклоняется по кэшу"""
+        extract = mock_ydl_instance.extract_info.side_effect
+        mock_ydl_instance.extract_info.side_effect = lambda url, download: dict(extract(url, download), duration=10000)
+        mock_ydl.return_value = mock_ydl_instance
+        
+        first = downloader.download(self.URL)
+        second = downloader.download(self.URL)
+        
+        assert first[0] is False and second[0] is False
+        assert second[2]['limit'] == 'duration'
+        assert mock_ydl_instance.extract_info.call_count == 1
+    
+    @patch('src.services.youtube_downloader.yt_dlp.YoutubeDL')
+    def test_download_reuses_valid_urls(self, mock_ydl, downloader, mock_ydl_instance, temp_file):
+        """Тест: пока подписанные ссылки действуют, повторное скачивание не извлекает info"""
+        mock_ydl.return_value = mock_ydl_instance
+        
+        assert downloader.download(self.URL)[0] is True
+        assert downloader.download(self.URL)[0] is True
+        
+        assert mock_ydl_instance.extract_info.call_count == 1
+        assert mock_ydl_instance.process_info.call_count == 2
+        assert mock_ydl_instance.process_info.call_args[0][0]['title'] == 'Test Video'
+    
+    @patch('src.services.youtube_downloader.yt_dlp.YoutubeDL')
+    def test_expired_urls_reextracted(self, mock_ydl, downloader, mock_ydl_instance, temp_file):
+        """Тест: ссылки, срок которых скоро истечет, не используются"""
+        extract = mock_ydl_instance.extract_info.side_effect
+        mock_ydl_instance.extract_info.side_effect = lambda url, download: dict(
+            extract(url, download), url=f"https://rr1.googlevideo.com/videoplayback?expire={int(time.time()) + 60}"
+        )
+        mock_ydl.return_value = mock_ydl_instance
+        
+        downloader.download(self.URL)
+        downloader.download(self.URL)
+        
+        assert mock_ydl_instance.extract_info.call_count == 2
+    
+    @patch('src.services.youtube_downloader.yt_dlp.YoutubeDL')
+    def test_revoked_urls_invalidated(self, mock_ydl, downloader, mock_ydl_instance, temp_file):
+        """Тест: отказ по кэшированным ссылкам сбрасывает запись и повторяет скачивание с извлечением"""
+        mock_ydl_instance.process_info.side_effect = [None, Exception("HTTP Error 403"), None]
+        mock_ydl.return_value = mock_ydl_instance
+        
+        downloader.download(self.URL)
+        success, result, info = downloader.download(self.URL)
+        
+        assert success is True
+        assert mock_ydl_instance.extract_info.call_count == 2
+        assert mock_ydl_instance.process_info.call_count == 3
+    
+    @patch('src.services.youtube_downloader.yt_dlp.YoutubeDL')
+    def test_stale_rejection_refreshes_in_background(self, mock_ydl, mock_ydl_instance):
+        """Тест: устаревшая запись отвечает отказом сразу и обновляется в фоне"""
+        downloader = YouTubeDownloader(YoutubeDLPool(max_idle=2, max_uses=10), MetadataCache(maxsize=10, ttl=0))
+        extract = mock_ydl_instance.extract_info.side_effect
+        mock_ydl_instance.extract_info.side_effect = lambda url, download: dict(extract(url, download), duration=10000)
+        mock_ydl.return_value = mock_ydl_instance
+        downloader.download(self.URL)
+        
+        with patch.object(downloader, 'refresh_metadata') as refresh:
+            success, result, info = downloader.download(self.URL)
+            for _ in range(100):
+                if refresh.called:
+                    break
+                time.sleep(0.01)
+        
+        assert success is False
+        assert info['limit'] == 'duration'
+        assert mock_ydl_instance.extract_info.call_count == 1
+        refresh.assert_called_once_with(self.URL, 'dQw4w9WgXcQ', downloader.download_profile())
+    
+    @patch('src.services.youtube_downloader.yt_dlp.YoutubeDL')
+    def test_refresh_metadata(self, mock_ydl, downloader, mock_ydl_instance):
+        """Тест: фоновое обновление заменяет запись, а недоступное видео удаляет"""
+        mock_ydl.return_value = mock_ydl_instance
+        profile = downloader.download_profile()
+        
+        downloader.refresh_metadata(self.URL, 'dQw4w9WgXcQ', profile)
+        
+        assert downloader.metadata_cache.get('dQw4w9WgXcQ').profile == profile
+        
+        mock_ydl_instance.extract_info.side_effect = yt_dlp.utils.DownloadError(
+            'ERROR: Video unavailable', (yt_dlp.utils.ExtractorError, yt_dlp.utils.ExtractorError('gone', expected=True), None)
+        )
+        downloader.refresh_metadata(self.URL, 'dQw4w9WgXcQ', profile)
+        
+        assert downloader.metadata_cache.get('dQw4w9WgXcQ') is None
+        assert downloader.metadata_cache.begin_refresh('dQw4w9WgXcQ') is True
+    
+    @patch('src.services.youtube_downloader.yt_dlp.YoutubeDL')
+    def test_extract_info_cached(self, mock_ydl, downloader, mock_ydl_instance):
+        """Тест: информация о видео извлекается один раз"""
+        mock_ydl.return_value = mock_ydl_instance
+        
+        first = downloader.extract_info(self.URL)
+        second = downloader.extract_info(self.URL)
+        
+        assert first == second == (True, {'title': 'Test Video', 'duration': 300, 'view_count': 0})
+        mock_ydl_instance.extract_info.assert_called_once()
+
+class TestYouTubeDownloaderMediaCache:
+
+    URL = 'https://youtu.be/dQw4w9WgXcQ'
+    
+    @pytest.fixture
+    def downloader(self, tmp_path):
+        return YouTubeDownloader(
+            YoutubeDLPool(max_idle=2, max_uses=10), MetadataCache(maxsize=10, ttl=60),
+            MediaCache(str(tmp_path / 'media'), max_bytes=10 * 1024 * 1024)
+        )
+    
+    @pytest.fixture
+    def mock_ydl_instance(self, tmp_path):
+        """YoutubeDL, который записывает 1 KB в выходной файл"""
+        instance = Mock()
+        instance.extract_info.return_value = {
+            'id': 'dQw4w9WgXcQ', 'title': 'Test Video', 'duration': 300, 'view_count': 7, 'format_id': '18',
+            'formats': [{'format_id': '18'}, {'format_id': '17'}],
+        }
+        instance.params = {'outtmpl': {'default': ''}}
+        instance.process_info.side_effect = lambda info: open(instance.params['outtmpl']['default'], 'wb').write(b'v' * 1024)
+        return instance
+    
+    @patch('src.services.youtube_downloader.yt_dlp.YoutubeDL')
+    def test_cache_hit_skips_yt_dlp(self, mock_ydl, downloader, mock_ydl_instance):
+        """Тест: повторное скачивание отдается из кэша на диске без yt-dlp"""
+        mock_ydl.return_value = mock_ydl_instance
+        
+        success, first_path, first_info = downloader.download(self.URL)
+        assert success is True
+        os.remove(first_path)
+        downloader.metadata_cache.clear()
+        
+        success, path, info = downloader.download(self.URL)
         
-            assert success is False
-            assert 'General error' in result
-            mock_remove.assert_called()  # Теперь remove должен вызваться
+        assert success is True
+        assert path != first_path
+        assert open(path, 'rb').read() == b'v' * 1024
+        assert info['title'] == 'Test Video'
+        assert info['file_size'] == 1024
+        assert info['media_cache'] is True
+        mock_ydl_instance.extract_info.assert_called_once()
+        mock_ydl_instance.process_info.assert_called_once()
+        os.remove(path)
+    
+    @patch('src.services.youtube_downloader.yt_dlp.YoutubeDL')
+    def test_cache_hit_checks_duration(self, mock_ydl, downloader, mock_ydl_instance):
+        """Тест: видео из кэша проверяется по текущему лимиту длительности"""
+        mock_ydl.return_value = mock_ydl_instance
+        os.remove(downloader.download(self.URL)[1])
+        downloader.max_duration = 60
+        
+        success, result, info = downloader.download(self.URL)
+        
+        assert success is False
+        assert info['limit'] == 'duration'
+        assert downloader.media_cache.total_bytes == 1024
+    
+    @patch('src.services.youtube_downloader.yt_dlp.YoutubeDL')
+    def test_fallback_not_cached(self, mock_ydl, downloader, mock_ydl_instance):
+        """Тест: видео в запасном формате в кэш не попадает"""
+        write = mock_ydl_instance.process_info.side_effect
+        failures = [Exception("HTTP 403")]
+        
+        def process_info(info):
+            if failures:
+                raise failures.pop()
+            write(info)
+        
+        mock_ydl_instance.process_info.side_effect = process_info
+        mock_ydl.return_value = mock_ydl_instance
+        
+        success, path, info = downloader.download(self.URL)
+        
+        assert success is True
+        assert info['fallback'] is True
+        assert downloader.media_cache.total_bytes == 0
+        os.remove(path)
@@ -0,0 +1,104 @@
+import random
+import string
+
+import pytest
+
+from src.services.youtube_url import YouTubeURL, parse_timestamp, parse_youtube_url
+
+VIDEO_ID = 'dQw4w9WgXcQ'
+
+# Ссылки, которые должны разбираться в (video_id, start_time)
+VALID_URLS = [
+    ('https://www.youtube.com/watch?v=dQw4w9WgXcQ', None),
+    ('http://youtube.com/watch?v=dQw4w9WgXcQ', None),
+    ('youtube.com/watch?v=dQw4w9WgXcQ', None),
+    ('https://m.youtube.com/watch?v=dQw4w9WgXcQ&feature=share', None),
+    ('https://music.youtube.com/watch?v=dQw4w9WgXcQ&list=RDAMVM', None),
+    ('https://www.youtube.com/watch?feature=youtu.be&v=dQw4w9WgXcQ', None),
+    ('https://www.youtube.com/watch?v=dQw4w9WgXcQ&t=42', 42),
+    ('https://www.youtube.com/watch?v=dQw4w9WgXcQ&t=42s', 42),
+    ('https://www.youtube.com/watch?v=dQw4w9WgXcQ&t=1m30s', 90),
+    ('https://www.youtube.com/watch?v=dQw4w9WgXcQ&t=1h2m3s', 3723),
+    ('https://www.youtube.com/watch?v=dQw4w9WgXcQ#t=15', 15),
+    ('https://youtu.be/dQw4w9WgXcQ', None),
+    ('https://youtu.be/dQw4w9WgXcQ?si=AbCdEf123&t=7', 7),
+    ('https://www.youtube.com/shorts/dQw4w9WgXcQ', None),
+    ('https://youtube.com/shorts/dQw4w9WgXcQ?feature=share', None),
+    ('https://www.youtube.com/embed/dQw4w9WgXcQ?start=30', 30),
+    ('https://www.youtube-nocookie.com/embed/dQw4w9WgXcQ', None),
+    ('https://www.youtube.com/live/dQw4w9WgXcQ?si=abc', None),
+    ('https://www.youtube.com/v/dQw4w9WgXcQ', None),
+    ('HTTPS://WWW.YOUTUBE.COM/watch?v=dQw4w9WgXcQ', None),
+    ('  https://youtu.be/dQw4w9WgXcQ  ', None),
+    ('https://www.youtube.com/watch?v=dQw4w9WgXcQ&utm_source=tg&utm_medium=share', None),
+]
+
+# Ссылки, которые не являются ссылками на YouTube видео
+INVALID_URLS = [
+    '',
+    'привет',
+    'https://vimeo.com/123456',
+    'https://instagram.com/test',
+    'https://notyoutube.com.evil/watch?v=dQw4w9WgXcQ',
+    'https://youtube.com.evil/watch?v=dQw4w9WgXcQ',
+    'https://evil.com/?u=youtube.com/watch?v=dQw4w9WgXcQ',
+    'https://www.youtube.com@evil.com/watch?v=dQw4w9WgXcQ',
+    'https://www.youtube.com/watch?v=short',
+    'https://www.youtube.com/watch?v=dQw4w9WgXcQextra',
+    'https://www.youtube.com/watch',
+    'https://www.youtube.com/',
+    'https://www.youtube.com/channel/UC38IQsAvIsxxjztdMZQtwHA',
+    'https://www.youtube.com/playlist?list=PL123',
+    'https://youtu.be/',
+    'https://youtu.be/dQw4w9WgXc',
+    'ftp://youtube.com/watch?v=dQw4w9WgXcQ',
+    'смотри https://youtu.be/dQw4w9WgXcQ',
+]
+
+class TestYouTubeURL:
+    
+    @pytest.mark.parametrize('url,start_time', VALID_URLS)
+    def test_valid_urls(self, url, start_time):
+        """Тест разбора поддерживаемых форматов ссылок"""
+        assert parse_youtube_url(url) == YouTubeURL(VIDEO_ID, start_time)
+    
+    @pytest.mark.parametrize('url', INVALID_URLS)
+    def test_invalid_urls(self, url):
+        """Тест отказа для посторонних ссылок и текста"""
+        assert parse_youtube_url(url) is None
+    
+    def test_id_is_case_sensitive(self):
+        """Тест: регистр ID видео сохраняется"""
+        assert parse_youtube_url('https://youtu.be/AbCdEfGhIjK').video_id == 'AbCdEfGhIjK'
+    
+    def test_parse_timestamp(self):
+        """Тест разбора меток времени"""
+        assert parse_timestamp('90') == 90
+        assert parse_timestamp('2m') == 120
+        assert parse_timestamp('1h') == 3600
+        assert parse_timestamp('') is None
+        assert parse_timestamp('abc') is None
+    
+    def test_fuzz_mutations(self):
+        """Тест на случайных искажениях корпуса: парсер не падает и не выдумывает ID"""
+        rng = random.Random(1234)
+        alphabet = string.ascii_letters + string.digits + '-_./?&=#:%@ '
+        
+        for _ in range(2000):
+            url = list(rng.choice(VALID_URLS)[0] if rng.random() < 0.5 else rng.choice(INVALID_URLS))
+            for _ in range(rng.randint(1, 4)):
+                position = rng.randint(0, len(url))
+                operation = rng.random()
+                if operation < 0.4:
+                    url.insert(position, rng.choice(alphabet))
+                elif operation < 0.8 and url:
+                    del url[min(position, len(url) - 1)]
+                elif url:
+                    url[min(position, len(url) - 1)] = rng.choice(alphabet)
+            url = ''.join(url)
+            
+            result = parse_youtube_url(url)
+            if result is not None:
+                assert len(result.video_id) == 11
+                assert result.video_id in url
+                assert result.start_time is None or result.start_time >= 0